@@ -689,29 +689,27 @@ def overlayPoesTed(basemap_obj, ax, start_time, endTime=None,
             # Store our data in arrays
             try:
                 ted_poes_all[sn].append(math.log10(getattr(l, param)))
-                if coords == 'mag' or coords == 'mlt':
-                    lat, lon,_ = models.aacgm.convert_latlon_arr(l.folat, \
-                          l.folon, np.zeros(shape=l.folat.shape), l.time, 'G2A')
-                    lat_poes_all[sn].append(lat)
-                    if coords == 'mag':
-                        lon_poes_all[sn].append(lon)
-                    else:
-                        mlt = models.aacgm.mlt_convert(l.time.year,
-                                                       l.time.month, l.time.day,
-                                                       l.time.hour,
-                                                       l.time.minute,
-                                                       l.time.second, lon,
-                                                       igrf_file)
-                        lon_poes_all[sn].append(mlt * 360.0 / 24.0)
-                else:
-                    lat_poes_all[sn].append(l.folat)
-                    lon_poes_all[sn].append(l.folon)
-
+                lat_poes_all[sn].append(l.folat)
+                lon_poes_all[sn].append(l.folon)
                 time_poes_all[sn].append(l.time)
             except Exception,e:
                 logging.exception(e)
                 logging.exception('could not get parameter for time' + l.time)
 
+        # Convert all of the footprints for this satellite at once
+        if (coords == 'mag' or coords == 'mlt') and len(time_poes_all[sn]) > 0:
+            lat, lon, _ = models.aacgm.convert_latlon_arr(lat_poes_all[sn],
+                                                          lon_poes_all[sn], 0.0,
+                                                          time_poes_all[sn],
+                                                          'G2A',
+                                                          igrf_file=igrf_file)
+            if coords == 'mlt':
+                lon = models.aacgm.convert_mlt_arr(lon, time_poes_all[sn],
+                                                   igrf_file=igrf_file)
+                lon *= 360.0 / 24.0
+            lat_poes_all[sn] = list(lat)
+            lon_poes_all[sn] = list(lon)
+
     if not good_flag:
       return None
 
@@ -847,28 +845,25 @@ def overlayPoesBnd(basemap_obj, ax, start_time, coords='geo', hemi=1,
                 continue
 
             if x > equBndCutoffVal:
-                if coords == 'mag' or coords == 'mlt':
-                    lat, lon, _ = models.aacgm.convert_latlon_arr( \
-                                    curr_poes[l].folat, curr_poes[l].folon, \
-                                    np.zeroes(shape=curr_poes[l].folat.shape), \
-                                    curr_poes[l].time.year, 'G2A')
-                    lat_poes_all[sn].append(lat)
-                    if coords == 'mag':
-                        lon_poes_all[sn].append(lon)
-                    else:
-                        tt = curr_poes[l].time
-                        mlt = models.aacgm.mlt_convert(tt.year, tt.month,
-                                                       tt.day, tt.hour,
-                                                       tt.minute, tt.second,
-                                                       lon, igrf_file)
-                        lon_poes_all[sn].append(mlt * 360.0 / 24.0)
-                else:
-                    lat_poes_all[sn].append(curr_poes[l].folat)
-                    lon_poes_all[sn].append(curr_poes[l].folon)
-
+                lat_poes_all[sn].append(curr_poes[l].folat)
+                lon_poes_all[sn].append(curr_poes[l].folon)
                 ted_poes_all[sn].append(math.log10(curr_poes[l].ted))
                 time_poes_all[sn].append(curr_poes[l].time)
 
+        # Convert all of the footprints for this satellite at once
+        if (coords == 'mag' or coords == 'mlt') and len(time_poes_all[sn]) > 0:
+            lat, lon, _ = models.aacgm.convert_latlon_arr(lat_poes_all[sn],
+                                                          lon_poes_all[sn], 0.0,
+                                                          time_poes_all[sn],
+                                                          'G2A',
+                                                          igrf_file=igrf_file)
+            if coords == 'mlt':
+                lon = models.aacgm.convert_mlt_arr(lon, time_poes_all[sn],
+                                                   igrf_file=igrf_file)
+                lon *= 360.0 / 24.0
+            lat_poes_all[sn] = list(lat)
+            lon_poes_all[sn] = list(lon)
+
     lat_poes_all = np.array(lat_poes_all)
     lon_poes_all = np.array(lon_poes_all)
     ted_poes_all = np.array(ted_poes_all)
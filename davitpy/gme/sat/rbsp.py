@@ -503,6 +503,7 @@ class rbspFp(object):
         import davitpy.models.tsyganenko as ts
         import numpy as np
         import datetime
+        import multiprocessing as mp
 
         fname = 'trace.{:%Y%m%d}.{:%Y%m%d}.dat'.format(self.sTime, self.eTime)
         if not force_web_read:
@@ -512,12 +513,14 @@ class rbspFp(object):
             except:
                 logging.info('Tracing...')
                 trace = ts.tsygTrace(data['lat'], data['lon'], data['alt'],
-                                     datetime=data['time'], rmin=1.047)
+                                     datetime=data['time'], rmin=1.047,
+                                     nprocs=mp.cpu_count())
                 trace.save(fname)
         else:
             logging.info('Tracing...')
             trace = ts.tsygTrace(data['lat'], data['lon'], data['alt'],
-                                 datetime=data['time'], rmin=1.047)
+                                 datetime=data['time'], rmin=1.047,
+                                 nprocs=mp.cpu_count())
 
         # Convert trace.rho to a numpy.ndarray type
         trace.rho = np.asarray(trace.rho)
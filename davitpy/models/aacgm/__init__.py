@@ -11,6 +11,7 @@ import logging
 try:
     from wrapper import convert_latlon, convert_str_to_bit, get_aacgm_coord
     from wrapper import convert_latlon_arr, get_aacgm_coord_arr
+    from wrapper import convert_mlt_arr, mlt_offset
 except Exception, e:
     logging.exception(__file__ + ' -> aacgm: ' + str(e))
 
@@ -19,6 +20,11 @@ try:
 except Exception, e:
     logging.exception(__file__ + ' -> aacgm: ' + str(e))
 
+try:
+    from aacgm import convert_arr
+except Exception, e:
+    logging.exception(__file__ + ' -> aacgm: ' + str(e))
+
 try:
     from aacgm import set_datetime
 except Exception, e:
@@ -1,4 +1,6 @@
 #include <stdio.h>
+#include <string.h>
+#include <math.h>
 
 /*****************************************************************************
  * Author: Angeline G. Burrell, UTDallas, April 2017
@@ -13,12 +15,37 @@
  *****************************************************************************/
 
 #include <Python.h>
+#include <pythread.h>
 
 #include "aacgmlib_v2.h"
 #include "mlt_v2.h"
 
 PyObject *module;
 
+/* The AACGM library keeps its date and coefficients in static variables, so
+ * calls that run without the GIL must still be serialised */
+static PyThread_type_lock aacgm_lock = NULL;
+
+/* Get a C-contiguous buffer of doubles from a python object, such as a numpy
+ * array, and return the number of elements or -1 on failure */
+static Py_ssize_t get_double_buffer(PyObject *obj, Py_buffer *view, int flags)
+{
+  if(PyObject_GetBuffer(obj, view, flags | PyBUF_C_CONTIGUOUS | PyBUF_FORMAT)
+     < 0)
+    return(-1);
+
+  if(view->itemsize != sizeof(double) || view->format == NULL ||
+     view->format[strlen(view->format) - 1] != 'd')
+    {
+      PyErr_SetString(PyExc_TypeError,
+		      "array buffers must contain contiguous doubles");
+      PyBuffer_Release(view);
+      return(-1);
+    }
+
+  return(view->len / view->itemsize);
+}
+
 static PyObject *aacgm_v2_setdatetime(PyObject *self, PyObject *args)
 {
   int year, month, day, hour, minute, second, err;
@@ -30,8 +57,12 @@ static PyObject *aacgm_v2_setdatetime(PyObject *self, PyObject *args)
 		       &second, &root))
     return(NULL);
 
-  /* Call the AACGM routine */
+  /* Call the AACGM routine, waiting for any array conversion to finish */
+  Py_BEGIN_ALLOW_THREADS
+  PyThread_acquire_lock(aacgm_lock, WAIT_LOCK);
   err = AACGM_v2_SetDateTime(year, month, day, hour, minute, second, root);
+  PyThread_release_lock(aacgm_lock);
+  Py_END_ALLOW_THREADS
 
   if(err < 0)
     {
@@ -56,9 +87,13 @@ static PyObject *aacgm_v2_convert(PyObject *self, PyObject *args)
 		       &igrf_file))
     return(NULL);
 
-  /* Call the AACGM routine */
+  /* Call the AACGM routine, waiting for any array conversion to finish */
+  Py_BEGIN_ALLOW_THREADS
+  PyThread_acquire_lock(aacgm_lock, WAIT_LOCK);
   err = AACGM_v2_Convert(in_lat, in_lon, in_h, &out_lat, &out_lon, &out_r,
 			 code, igrf_file);
+  PyThread_release_lock(aacgm_lock);
+  Py_END_ALLOW_THREADS
 
   if(err < 0)
     {
@@ -70,6 +105,83 @@ static PyObject *aacgm_v2_convert(PyObject *self, PyObject *args)
   return Py_BuildValue("ddd", out_lat, out_lon, out_r);
 }
 
+static PyObject *aacgm_v2_convert_arr(PyObject *self, PyObject *args)
+{
+  int code, err, ibuf;
+
+  long nbad;
+
+  Py_ssize_t i, n, nbuf[6];
+
+  double *in_lat, *in_lon, *in_h, *out_lat, *out_lon, *out_r;
+
+  char *igrf_file;
+
+  PyObject *obj[6];
+
+  Py_buffer view[6];
+
+  /* Parse the input as a tupple */
+  if(!PyArg_ParseTuple(args, "OOOOOOis", &obj[0], &obj[1], &obj[2], &obj[3],
+		       &obj[4], &obj[5], &code, &igrf_file))
+    return(NULL);
+
+  /* Get the input (read-only) and output (writable) buffers */
+  for(ibuf = 0; ibuf < 6; ibuf++)
+    {
+      nbuf[ibuf] = get_double_buffer(obj[ibuf], &view[ibuf],
+				     (ibuf < 3) ? PyBUF_SIMPLE : PyBUF_WRITABLE);
+      if(nbuf[ibuf] < 0)
+	{
+	  while(--ibuf >= 0) PyBuffer_Release(&view[ibuf]);
+	  return(NULL);
+	}
+    }
+
+  n = nbuf[0];
+  for(ibuf = 1; ibuf < 6; ibuf++)
+    {
+      if(nbuf[ibuf] != n)
+	{
+	  for(ibuf = 0; ibuf < 6; ibuf++) PyBuffer_Release(&view[ibuf]);
+	  PyErr_SetString(PyExc_ValueError,
+			  "input and output arrays must have the same size");
+	  return(NULL);
+	}
+    }
+
+  in_lat = (double *)view[0].buf;
+  in_lon = (double *)view[1].buf;
+  in_h = (double *)view[2].buf;
+  out_lat = (double *)view[3].buf;
+  out_lon = (double *)view[4].buf;
+  out_r = (double *)view[5].buf;
+
+  /* Call the AACGM routine for each point without holding the GIL */
+  nbad = 0;
+  Py_BEGIN_ALLOW_THREADS
+  PyThread_acquire_lock(aacgm_lock, WAIT_LOCK);
+  for(i = 0; i < n; i++)
+    {
+      err = AACGM_v2_Convert(in_lat[i], in_lon[i], in_h[i], &out_lat[i],
+			     &out_lon[i], &out_r[i], code, igrf_file);
+      if(err < 0)
+	{
+	  out_lat[i] = NAN;
+	  out_lon[i] = NAN;
+	  out_r[i] = NAN;
+	  nbad++;
+	}
+    }
+  PyThread_release_lock(aacgm_lock);
+  Py_END_ALLOW_THREADS
+
+  for(ibuf = 0; ibuf < 6; ibuf++) PyBuffer_Release(&view[ibuf]);
+
+  /* Return the number of points that could not be converted */
+  return Py_BuildValue("l", nbad);
+}
+
 static PyObject *mltconvert_v2(PyObject *self, PyObject *args)
 { 
   int yr, mo, dy, hr, mt, sc;
@@ -83,8 +195,12 @@ static PyObject *mltconvert_v2(PyObject *self, PyObject *args)
 		       &root, &igrf_file))
     return(NULL);
 
-  /* Call the AACGM routine */
+  /* Call the AACGM routine, waiting for any array conversion to finish */
+  Py_BEGIN_ALLOW_THREADS
+  PyThread_acquire_lock(aacgm_lock, WAIT_LOCK);
   mlt = MLTConvert_v2(yr, mo, dy, hr, mt, sc, mlon, root, igrf_file);
+  PyThread_release_lock(aacgm_lock);
+  Py_END_ALLOW_THREADS
     
   return Py_BuildValue("d", mlt);
 }
@@ -101,8 +217,12 @@ static PyObject *mltconvert_yrsec_v2(PyObject *self, PyObject *args)
   if(!PyArg_ParseTuple(args, "iidss", &yr, &yr_sec, &mlon, &root, &igrf_file))
     return(NULL);
 
-  /* Call the AACGM routine */
+  /* Call the AACGM routine, waiting for any array conversion to finish */
+  Py_BEGIN_ALLOW_THREADS
+  PyThread_acquire_lock(aacgm_lock, WAIT_LOCK);
   mlt = MLTConvertYrsec_v2(yr, yr_sec, mlon, root, igrf_file);
+  PyThread_release_lock(aacgm_lock);
+  Py_END_ALLOW_THREADS
 
   return Py_BuildValue("d", mlt);
 }
@@ -120,8 +240,12 @@ static PyObject *inv_mltconvert_v2(PyObject *self, PyObject *args)
 		       &igrf_file))
     return(NULL);
 
-  /* Call the AACGM routine */
+  /* Call the AACGM routine, waiting for any array conversion to finish */
+  Py_BEGIN_ALLOW_THREADS
+  PyThread_acquire_lock(aacgm_lock, WAIT_LOCK);
   mlon = inv_MLTConvert_v2(yr, mo, dy, hr, mt, sc, mlt, igrf_file);
+  PyThread_release_lock(aacgm_lock);
+  Py_END_ALLOW_THREADS
     
   return Py_BuildValue("d", mlon);
 }
@@ -138,8 +262,12 @@ static PyObject *inv_mltconvert_yrsec_v2(PyObject *self, PyObject *args)
   if(!PyArg_ParseTuple(args, "iidss", &yr, &yr_sec, &mlt, &igrf_file))
     return(NULL);
 
-  /* Call the AACGM routine */
+  /* Call the AACGM routine, waiting for any array conversion to finish */
+  Py_BEGIN_ALLOW_THREADS
+  PyThread_acquire_lock(aacgm_lock, WAIT_LOCK);
   mlon = inv_MLTConvertYrsec_v2(yr, yr_sec, mlt, igrf_file);
+  PyThread_release_lock(aacgm_lock);
+  Py_END_ALLOW_THREADS
 
   return Py_BuildValue("d", mlon);
 }
@@ -203,6 +331,37 @@ out_lon : (float)\n\
     Output longitude in degrees\n\
 out_r : (float)\n\
     Geocentric radial distance in Re\n", },
+  { "convert_arr", aacgm_v2_convert_arr, METH_VARARGS,
+    "convert_arr(in_lat, in_lon, height, out_lat, out_lon, out_r, code,\n\
+            igrf_file)\n\
+\n\
+Converts arrays of points between geographic/dedic and magnetic coordinates,\n\
+looping over the points in C without holding the GIL.\n\
+\n\
+Parameters\n\
+-------------\n\
+in_lat : (np.ndarray)\n\
+    Contiguous float64 array of input latitudes in degrees N\n\
+in_lon : (np.ndarray)\n\
+    Contiguous float64 array of input longitudes in degrees E\n\
+height : (np.ndarray)\n\
+    Contiguous float64 array of altitudes above the surface of the earth in km\n\
+out_lat : (np.ndarray)\n\
+    Writable float64 array, same size as in_lat, for the output latitudes\n\
+out_lon : (np.ndarray)\n\
+    Writable float64 array, same size as in_lat, for the output longitudes\n\
+out_r : (np.ndarray)\n\
+    Writable float64 array, same size as in_lat, for the output radial\n\
+    distances in Re\n\
+code : (int)\n\
+    Bitwise code for passing options into converter (see convert)\n\
+igrf_file : (str)\n\
+    Full filename of IGRF coefficient file\n\
+\n\
+Returns\n\
+-------\n\
+nbad : (int)\n\
+    Number of points that could not be converted; their outputs are NaN\n" },
   {"mlt_convert", mltconvert_v2, METH_VARARGS,
     "mlt_convert(yr, mo, dy, hr, mt, sc, mlon, root, igrf_file)\n\
 \n\
@@ -325,6 +484,7 @@ mlon : (float)\n\
   PyMODINIT_FUNC PyInit_aacgm(void)
   {
     module = PyModule_Create(&aacgm_module);
+    aacgm_lock = PyThread_allocate_lock();
     PyModule_AddIntConstant(module, "G2A", G2A);
     PyModule_AddIntConstant(module, "A2G", A2G);
     PyModule_AddIntConstant(module, "TRACE", TRACE);
@@ -339,6 +499,7 @@ mlon : (float)\n\
   PyMODINIT_FUNC initaacgm(void)
   {
     module = Py_InitModule("aacgm", aacgm_v2_methods);
+    aacgm_lock = PyThread_allocate_lock();
     PyModule_AddIntConstant(module, "G2A", G2A);
     PyModule_AddIntConstant(module, "A2G", A2G);
     PyModule_AddIntConstant(module, "TRACE", TRACE);
@@ -22,6 +22,8 @@
 ;                    transformation. This code was left out in the C version.
 ; 20170308 SGS v1.2  Added static to global variables in order to work with RST
 ;                    library.
+;                    Keep the most recently loaded coefficient sets in memory
+;                    so that changing epoch does not always reread the files.
 ;
 ; Functions:
 ;
@@ -84,6 +86,19 @@ static struct {
   double coefs[AACGM_KMAX][NCOORD][POLYORD][NFLAG][2];  /* bracketing coefs */
 } sph_harm_model;
 
+/* most recently used bracketing coefficient sets, keyed by epoch and root */
+#define AACGM_NCACHE 4
+
+static struct {
+  int myear;
+  long stamp;
+  char root[256];
+  double coefs[AACGM_KMAX][NCOORD][POLYORD][NFLAG][2];
+} coef_cache[AACGM_NCACHE];
+
+static int ncache = 0;
+static long cache_clock = 0;
+
 /* SGS added for MSC compatibility */
 #ifndef complex
 struct complex {
@@ -875,6 +890,7 @@ int AACGM_v2_LoadCoefs(int year, char *root)
   char fname[256];
   char yrstr[5];  
   int ret=0;
+  int i,k;
 
   #if DEBUG > 0
   printf("AACGM_v2_LoadCoefs\n");
@@ -889,6 +905,18 @@ int AACGM_v2_LoadCoefs(int year, char *root)
   }
 
   if (year <= 0) return -1;
+
+  /* use the cached coefficients if this epoch has been loaded before */
+  for (k=0;k<ncache;k++) {
+    if (coef_cache[k].myear == year && strcmp(coef_cache[k].root,root) == 0) {
+      memcpy(sph_harm_model.coefs, coef_cache[k].coefs,
+             sizeof(sph_harm_model.coefs));
+      coef_cache[k].stamp = ++cache_clock;
+      myear_old = year;
+      return 0;
+    }
+  }
+
   sprintf(yrstr,"%4.4d",year);  
 
   strcpy(fname,root);
@@ -911,6 +939,21 @@ int AACGM_v2_LoadCoefs(int year, char *root)
 
   myear_old = year;
 
+  /* store the coefficients, replacing the least recently used set */
+  if (ret == 0 && strlen(root) < sizeof(coef_cache[0].root)) {
+    if (ncache < AACGM_NCACHE) k = ncache++;
+    else {
+      k = 0;
+      for (i=1;i<ncache;i++)
+        if (coef_cache[i].stamp < coef_cache[k].stamp) k = i;
+    }
+    coef_cache[k].myear = year;
+    coef_cache[k].stamp = ++cache_clock;
+    strcpy(coef_cache[k].root,root);
+    memcpy(coef_cache[k].coefs, sph_harm_model.coefs,
+           sizeof(sph_harm_model.coefs));
+  }
+
   return ret;
 }
 
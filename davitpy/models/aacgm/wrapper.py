@@ -7,6 +7,8 @@ convert_latlon
 convert_latlon_arr
 get_aacgm_coord
 get_aacgm_coord_arr
+convert_mlt_arr
+mlt_offset
 convert_str_to_bit
 --------------
 '''
@@ -16,6 +18,11 @@ from __future__ import unicode_literals
 import numpy as np
 import datetime as dt
 import logging
+import collections
+
+# MLT at magnetic longitude zero, keyed by time and coefficient files
+_mlt_offsets = collections.OrderedDict()
+_max_mlt_offsets = 1024
 
 
 def convert_latlon(in_lat, in_lon, height, dtime, code="G2A", igrf_file=None,
@@ -124,8 +131,10 @@ def convert_latlon_arr(in_lat, in_lon, height, dtime, code="G2A",
         Input longitude in degrees E (code specifies type of longitude)
     height : (np.ndarray)
         Altitude above the surface of the earth in km
-    dtime : (datetime)
-        Single datetime object for magnetic field
+    dtime : (datetime or np.ndarray)
+        Single datetime object for magnetic field, or an array of datetimes
+        that broadcasts against the points.  Points are converted in groups
+        that share the same time (to the second).
     code : Optional[str]
         String denoting which type(s) of conversion to perform
         G2A        - geographic (geodetic) to AACGM-v2
@@ -157,20 +166,15 @@ def convert_latlon_arr(in_lat, in_lon, height, dtime, code="G2A",
 
     # If someone was lazy and entered a list instead of a numpy array,
     # recast it here
-
-    if isinstance(in_lat, list):
-        in_lat = np.array(in_lat)
-
-    if isinstance(in_lon, list):
-        in_lon = np.array(in_lon)
-
-    if isinstance(height, list):
-        height = np.array(height)
+    in_lat = np.asarray(in_lat, dtype=np.float64)
+    in_lon = np.asarray(in_lon, dtype=np.float64)
+    height = np.asarray(height, dtype=np.float64)
 
     # Ensure that lat, lon, and height are the same length or if the lengths
     # differ that the different ones contain only a single value
-    ulen = np.unique([height.shape, in_lat.shape, in_lon.shape])
-    if ulen.shape[0] > 2 or (ulen.shape[0] == 2 and ulen[0] > 1):
+    try:
+        in_lat, in_lon, height = np.broadcast_arrays(in_lat, in_lon, height)
+    except ValueError:
         logging.error("mismatched input arrays")
         return None, None, None
 
@@ -183,11 +187,22 @@ def convert_latlon_arr(in_lat, in_lon, height, dtime, code="G2A",
         igrf_file = rcParams['IGRF_DAVITPY_COEFF_FILE']
 
     # Test time
-    if isinstance(dtime, dt.date):
-        date = dt.datetime.combine(dtime, dt.time(0))
-
-    assert isinstance(dtime, dt.datetime), \
-        logging.error('time must be specified as datetime object')
+    if np.ndim(dtime) > 0:
+        try:
+            times, itime = _group_datetimes(dtime, in_lat.shape)
+            in_lat, in_lon, height, itime = np.broadcast_arrays(in_lat, in_lon,
+                                                                height, itime)
+        except ValueError:
+            logging.error("mismatched input arrays")
+            return None, None, None
+    else:
+        times = None
+
+        if isinstance(dtime, dt.date):
+            date = dt.datetime.combine(dtime, dt.time(0))
+
+        assert isinstance(dtime, dt.datetime), \
+            logging.error('time must be specified as datetime object')
 
     # Test height
     if np.min(height) < 0:
@@ -213,19 +228,55 @@ def convert_latlon_arr(in_lat, in_lon, height, dtime, code="G2A",
     # Constrain longitudes between -180 and 180
     in_lon = ((in_lon + 180.0) % 360.0) - 180.0
 
-    # Set current date and time
-    aacgm.set_datetime(dtime.year, dtime.month, dtime.day, dtime.hour,
-                       dtime.minute, dtime.second, coeff_prefix)
-
     # make flag
     bit_code = convert_str_to_bit(code)
 
-    # Vectorise the AACGM code
-    convert_vectorised = np.vectorize(aacgm.convert)
-
-    # convert
-    lat_out, lon_out, r_out = convert_vectorised(in_lat, in_lon, height,
-                                                 bit_code, igrf_file)
+    # The C library loops over contiguous double arrays and fills the output
+    # arrays in place
+    in_lat = np.ascontiguousarray(in_lat)
+    in_lon = np.ascontiguousarray(in_lon)
+    height = np.ascontiguousarray(height)
+    lat_out = np.empty(in_lat.shape, dtype=np.float64)
+    lon_out = np.empty(in_lat.shape, dtype=np.float64)
+    r_out = np.empty(in_lat.shape, dtype=np.float64)
+
+    if times is None:
+        # Set current date and time
+        aacgm.set_datetime(dtime.year, dtime.month, dtime.day, dtime.hour,
+                           dtime.minute, dtime.second, coeff_prefix)
+
+        # convert
+        nbad = aacgm.convert_arr(in_lat, in_lon, height, lat_out, lon_out,
+                                 r_out, bit_code, igrf_file)
+    else:
+        # Convert the points that share a time together.  The times are
+        # sorted, so each coefficient epoch is visited once.
+        nbad = 0
+        itime = itime.reshape(-1)
+        order = np.argsort(itime, kind='mergesort')
+        bounds = np.searchsorted(itime[order], np.arange(len(times) + 1))
+        flat_in = [in_lat.reshape(-1), in_lon.reshape(-1), height.reshape(-1)]
+        flat_out = [lat_out.reshape(-1), lon_out.reshape(-1),
+                    r_out.reshape(-1)]
+
+        for i, itm in enumerate(times):
+            ipts = order[bounds[i]:bounds[i+1]]
+            group_out = [np.empty(ipts.shape, dtype=np.float64)
+                         for j in range(3)]
+
+            aacgm.set_datetime(itm.year, itm.month, itm.day, itm.hour,
+                               itm.minute, itm.second, coeff_prefix)
+            nbad += aacgm.convert_arr(flat_in[0][ipts], flat_in[1][ipts],
+                                      flat_in[2][ipts], group_out[0],
+                                      group_out[1], group_out[2], bit_code,
+                                      igrf_file)
+
+            for j in range(3):
+                flat_out[j][ipts] = group_out[j]
+
+    if nbad > 0:
+        logging.warning("unable to convert {:d} of {:d} points".format(
+            nbad, lat_out.size))
 
     return lat_out, lon_out, r_out
 
@@ -311,8 +362,9 @@ def get_aacgm_coord_arr(glat, glon, height, dtime, method="TRACE",
         Geodetic longitude in degrees E
     height : (np.array or list)
         Altitude above the surface of the earth in km
-    dtime : (datetime)
-        Date and time to calculate magnetic location
+    dtime : (datetime or np.ndarray)
+        Date and time to calculate magnetic location, or an array of
+        datetimes that broadcasts against the points
     method : Optioanl[str]
         String denoting which type(s) of conversion to perform
         TRACE      - use field-line tracing, not coefficients
@@ -362,16 +414,151 @@ def get_aacgm_coord_arr(glat, glon, height, dtime, method="TRACE",
 
         if mlon is not None:
             # Get magnetic local time
-            mlt_vectorised = np.vectorize(aacgm.mlt_convert)
-            mlt = mlt_vectorised(dtime.year, dtime.month, dtime.day,
-                                 dtime.hour, dtime.minute, dtime.second, mlon,
-                                 coeff_prefix, igrf_file)
+            mlt = convert_mlt_arr(mlon, dtime, m2a=False, igrf_file=igrf_file,
+                                  coeff_prefix=coeff_prefix)
     except:
         logging.error("Unable to get magnetic lat/lon")
 
     return mlat, mlon, mlt
 
 
+def mlt_offset(dtime, igrf_file=None, coeff_prefix=None):
+    '''Get the magnetic local time at magnetic longitude zero
+
+    Parameters
+    ------------
+    dtime : (datetime)
+        Date and time to calculate magnetic local time
+    igrf_file : Optional[str]
+        Full filename of IGRF coefficient file or None to use
+        rcParams["IGRF_DAVITPY_COEFF_FILE"]. (default=None)
+    coeff_prefix : Optional[str]
+        Location and file prefix for aacgm coefficient files or None to use
+        rcParams["AACGM_DAVITPY_DAT_PREFEX"]. (default=None)
+
+    Returns
+    -------
+    mlt_0 : (float)
+        Magnetic local time in hours at magnetic longitude zero
+
+    Notes
+    -----
+    MLT is linear in magnetic longitude for a given time, so the offset is
+    computed once per time and stored for subsequent calls.
+    '''
+    from davitpy import rcParams
+    from davitpy.models import aacgm
+
+    # Define coefficient file prefix if not supplied
+    if coeff_prefix is None:
+        coeff_prefix = rcParams['AACGM_DAVITPY_DAT_PREFIX']
+
+    # Define IGRF file if not supplied
+    if igrf_file is None:
+        igrf_file = rcParams['IGRF_DAVITPY_COEFF_FILE']
+
+    # The C routine only uses whole seconds
+    key = (dtime.year, dtime.month, dtime.day, dtime.hour, dtime.minute,
+           dtime.second, coeff_prefix, igrf_file)
+
+    try:
+        mlt_0 = _mlt_offsets.pop(key)
+    except KeyError:
+        # Set the AACGM time first, so the offset does not depend on which
+        # time the library was last set to
+        aacgm.set_datetime(dtime.year, dtime.month, dtime.day, dtime.hour,
+                           dtime.minute, dtime.second, coeff_prefix)
+        mlt_0 = aacgm.mlt_convert(dtime.year, dtime.month, dtime.day,
+                                  dtime.hour, dtime.minute, dtime.second, 0.0,
+                                  coeff_prefix, igrf_file)
+        if len(_mlt_offsets) >= _max_mlt_offsets:
+            _mlt_offsets.popitem(last=False)
+
+    # Keep the most recently used offsets at the end of the cache
+    _mlt_offsets[key] = mlt_0
+
+    return mlt_0
+
+
+def convert_mlt_arr(arr, dtime, m2a=False, igrf_file=None, coeff_prefix=None):
+    '''Converts between magnetic longitude and magnetic local time
+
+    Parameters
+    ------------
+    arr : (np.ndarray or list)
+        Magnetic longitudes in degrees E or magnetic local times in hours
+    dtime : (datetime or np.ndarray)
+        Date and time for the conversion, or an array of datetimes that
+        broadcasts against arr
+    m2a : Optional[bool]
+        Convert MLT to AACGM longitude (True) or AACGM longitude to MLT
+        (False).  (default=False)
+    igrf_file : Optional[str]
+        Full filename of IGRF coefficient file or None to use
+        rcParams["IGRF_DAVITPY_COEFF_FILE"]. (default=None)
+    coeff_prefix : Optional[str]
+        Location and file prefix for aacgm coefficient files or None to use
+        rcParams["AACGM_DAVITPY_DAT_PREFEX"]. (default=None)
+
+    Returns
+    -------
+    out : (np.ndarray)
+        Magnetic local times in hours (0-24) or magnetic longitudes in
+        degrees E (-180 to 180).  Non-finite inputs give NaN.
+    '''
+    arr = np.asarray(arr, dtype=np.float64)
+
+    if np.ndim(dtime) > 0:
+        # Find the offset once for each unique time
+        times, itime = _group_datetimes(dtime, arr.shape)
+        mlt_0 = np.array([mlt_offset(itm, igrf_file=igrf_file,
+                                     coeff_prefix=coeff_prefix)
+                          for itm in times])[itime]
+        arr = np.broadcast_to(arr, mlt_0.shape)
+    else:
+        mlt_0 = mlt_offset(dtime, igrf_file=igrf_file,
+                           coeff_prefix=coeff_prefix)
+
+    if m2a:
+        out = ((arr - mlt_0) * 15.0 + 180.0) % 360.0 - 180.0
+    else:
+        out = (mlt_0 + arr / 15.0) % 24.0
+
+    return out
+
+
+def _group_datetimes(dtime, shape):
+    '''Find the unique times, to the second, in an array of datetimes
+
+    Parameters
+    ------------
+    dtime : (np.ndarray or list)
+        Array of datetimes
+    shape : (tuple)
+        Shape of the data array that dtime must broadcast against
+
+    Returns
+    -------
+    times : (list)
+        Sorted list of unique datetimes
+    itime : (np.ndarray)
+        Index into times for each point, with the broadcast shape of dtime
+        and the data array
+
+    Raises
+    ------
+    ValueError
+        If dtime does not broadcast against the data array
+    '''
+    secs = np.array(dtime, dtype='datetime64[s]')
+    secs = np.broadcast_to(secs, np.broadcast(secs, np.empty(shape)).shape)
+
+    usecs, itime = np.unique(secs, return_inverse=True)
+    times = list(usecs.astype(dt.datetime))
+
+    return times, itime.reshape(secs.shape)
+
+
 def convert_str_to_bit(code):
     '''convert string code specification to bit code specification
 
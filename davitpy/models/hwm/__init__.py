@@ -7,6 +7,12 @@ Modules
 ---------------------------
 hwm14   fortran subroutines
 ---------------------------
+
+Functions
+------------------------------------------
+hwm14           winds at one point
+hwm14_batch     winds at arrays of points
+------------------------------------------
   
 """
 import logging
@@ -53,4 +59,88 @@ def hwm14(iyd,sec,alt,glat,glon,stl,f107a,f107,ap,path=None):
 
     return hwm14(iyd,sec,alt,glat,glon,stl,f107a,f107,ap,path)
 
+
+def hwm14_batch(iyd, sec, alt, glat, glon, stl, f107a, f107, ap, path=None):
+    """Horizontal winds at arrays of points, evaluated in a single fortran
+    call. The HWM14 coefficients are only loaded on the first call.
+
+    Parameters
+    ----------
+    iyd : int or np.array
+        year and day as yyddd
+    sec : float or np.array
+        UT (s)
+    alt : float or np.array
+        altitude (km)
+    glat : float or np.array
+        geodetic latitude (deg)
+    glon : float or np.array
+        geodetic longitude (deg)
+    stl : float or np.array
+        not used
+    f107a : float or np.array
+        not used
+    f107 : float or np.array
+        not used
+    ap : list or np.array
+        (..., 2) array, ap[..., 1] is the current 3hr ap index (a negative
+        value turns off the disturbance winds)
+    path : Optional[str]
+        location for davitpy installation.  Default is rcParams' 'DAVITPY_PATH'
+        value.
+
+    Returns
+    -------
+    w : np.array
+        (..., 2) array of meridional (m/s, northward) and zonal (m/s,
+        eastward) winds, at the broadcast shape of the inputs
+
+    Example
+    -------
+        # Winds along a radar beam, on an altitude grid
+        import numpy as np
+        from davitpy.models import hwm
+        alt = np.arange(100., 400., 10.)
+        w = hwm.hwm14_batch(15032, 43200., alt, glat[:, np.newaxis],
+            glon[:, np.newaxis], 0., 0., 0., [0., 10.])
+
+    """
+    import numpy as np
+
+    try:
+        from hwm14 import hwm14_batch
+    except Exception as e:
+        logging.exception(__file__ + ' -> models.hwm.hwm14_batch: ' + str(e))
+        raise
+
+    if path is None:
+        from davitpy import rcParams
+        try:
+            path = "{:s}/davitpy/models/hwm/".format(rcParams['DAVITPY_PATH'])
+        except Exception as e:
+            logging.exception(__file__ + ' -> models.hwm.hwm14_batch: ' +
+                              str(e))
+
+    ap = np.asarray(ap, dtype=np.float32)
+    args = np.broadcast_arrays(np.asarray(iyd), sec, alt, glat, glon, stl,
+                               f107a, f107, ap[..., 0], ap[..., 1])
+    shape = args[0].shape
+    args = [a.ravel() for a in args]
+
+    # The model terms are only recomputed when the day, time or position
+    # change, so evaluate the points with the altitude varying fastest
+    order = np.lexsort((args[2], args[3], args[4], args[1], args[0]))
+    iyd = np.ascontiguousarray(args[0][order], dtype=np.int32)
+    sec, alt, glat, glon, stl, f107a, f107 = \
+        [np.ascontiguousarray(a[order], dtype=np.float32) for a in args[1:8]]
+    ap = np.asfortranarray(np.array([args[8][order], args[9][order]],
+                                    dtype=np.float32))
+
+    w = np.empty((order.size, 2), dtype=np.float32)
+    if order.size > 0:
+        w[order] = hwm14_batch(iyd, sec, alt, glat, glon,
+                               stl, f107a, f107, ap, path).T
+
+    return w.reshape(shape + (2,))
+
 import hwm_input
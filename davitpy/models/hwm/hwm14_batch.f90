@@ -0,0 +1,60 @@
+!!!
+!!!  Batch HWM14 evaluation for the davitpy hwm module, using the routines
+!!!  in hwm14.f90
+!!!
+
+!!!============================================================================
+!!! Loads the HWM14 coefficient files found in path, once. The coefficients
+!!! are kept in the hwm, qwm, dwm and alf modules for the following calls.
+!!!============================================================================
+subroutine hwm14_init(path)
+
+    use hwm
+    implicit none
+    character(250),intent(in) :: path
+
+    if (hwminit) then
+        pathdefault = path
+        call inithwm()
+    endif
+
+    return
+
+end subroutine hwm14_init
+
+!!!============================================================================
+!!! Evaluates HWM14 at n points (see hwm14 for the inputs of each point).
+!!! hwmqt only recomputes its day, time, longitude and latitude terms when
+!!! they change, so points should be sorted with the altitude varying fastest.
+!!!
+!!! Output argument:
+!!!        w(1,:) = meridional wind (m/sec + northward)
+!!!        w(2,:) = zonal wind (m/sec + eastward)
+!!!============================================================================
+subroutine hwm14_batch(n,iyd,sec,alt,glat,glon,stl,f107a,f107,ap,path,w)
+
+    implicit none
+    integer(4),intent(in)     :: n
+    integer(4),intent(in)     :: iyd(n)
+    real(4),intent(in)        :: sec(n),alt(n),glat(n),glon(n),stl(n)
+    real(4),intent(in)        :: f107a(n),f107(n)
+    real(4),intent(in)        :: ap(2,n)
+    character(250),intent(in) :: path
+    real(4),intent(out)       :: w(2,n)
+    real(4)                   :: dw(2)
+    integer(4)                :: i
+
+    call hwm14_init(path)
+
+    do i = 1, n
+        call hwmqt(iyd(i),sec(i),alt(i),glat(i),glon(i),stl(i),f107a(i), &
+                   f107(i),ap(:,i),w(:,i))
+        if (ap(2,i) .ge. 0.0) then
+            call dwm07(iyd(i),sec(i),alt(i),glat(i),glon(i),ap(:,i),dw)
+            w(:,i) = w(:,i) + dw
+        endif
+    enddo
+
+    return
+
+end subroutine hwm14_batch
@@ -10,6 +10,11 @@ Modules
 igrf    fortran subroutines
 ---------------------------
 
+Functions
+-------------------------------------------
+igrf11_batch    field at arrays of points
+-------------------------------------------
+
 """
 import logging
 
@@ -17,3 +22,72 @@ try:
     from igrf import *
 except Exception, e:
     logging.exception(__file__ + ' -> igrf: ' + str(e))
+
+
+def igrf11_batch(date, lat, lon, alt, itype=1, isv=0):
+    """Field at arrays of points, evaluated in a single fortran call
+
+    The coefficients are interpolated in time once per distinct date, and
+    kept for the following calls with the same date.
+
+    Parameters
+    ----------
+    date : float, datetime or np.array
+        decimal year (1900.0 to 2020.0), or datetime
+    lat : float or np.array
+        geodetic latitude if itype is 1, geocentric latitude if itype is 2
+        [degrees N]
+    lon : float or np.array
+        longitude [degrees E]
+    alt : float or np.array
+        height above sea level if itype is 1, distance from the centre of
+        the Earth if itype is 2 [km]
+    itype : Optional[int]
+        1 for geodetic coordinates (default), 2 for geocentric
+    isv : Optional[int]
+        0 for the main field (default), 1 for the secular variation
+
+    Returns
+    -------
+    x, y, z, f : np.array
+        north, east and vertical components, and total intensity [nT] (or
+        [nT/year] for the secular variation), at the broadcast shape of the
+        inputs. f is 1.0e8 for dates out of bounds
+
+    Example
+    -------
+        # Field over a grid at 300 km
+        import numpy as np
+        from davitpy.models import igrf
+        lat, lon = np.meshgrid(np.arange(40., 80.), np.arange(-120., -60.))
+        x, y, z, f = igrf.igrf11_batch(2012.5, lat, lon, 300.)
+
+    """
+    import numpy as np
+    import datetime as dt
+    from igrf import igrf11batch
+
+    # Decimal years
+    date = np.asarray(date)
+    if date.dtype.kind in 'OM':
+        tt = date.astype('datetime64[us]')
+        year = tt.astype('datetime64[Y]')
+        date = (year.astype(int) + 1970. + (tt - year).astype(float) /
+                ((year + 1).astype('datetime64[us]') - year).astype(float))
+
+    date, lat, lon, alt = np.broadcast_arrays(date, lat, lon, alt)
+    shape = date.shape
+    date = date.ravel().astype(np.float32)
+
+    # Points with the same date share the time-interpolated coefficients
+    order = np.argsort(date, kind='mergesort')
+    colat = 90. - lat.ravel()[order]
+    elong = lon.ravel()[order] % 360.
+    out = [np.empty(date.size) for i in range(4)]
+    if date.size > 0:
+        res = igrf11batch(isv, itype, date[order], alt.ravel()[order],
+                          colat, elong)
+        for o, r in zip(out, res):
+            o[order] = r
+
+    return tuple(o.reshape(shape) for o in out)
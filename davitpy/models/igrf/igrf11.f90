@@ -588,6 +588,40 @@ c
       real date
 Cf2py intent(in) isv,date,itype,alt,colat,elong
 Cf2py intent(out) x,y,z,f
+      dimension gt(195)
+c
+c     time-interpolated coefficients, then synthesis
+c
+      call igrf11coef (isv,date,nmx,gt,ier)
+      if (ier.ne.0) then
+       x     = 0.0
+       y     = 0.0
+       z     = 0.0
+       f     = 1.0d8
+       return
+      end if
+      call igrf11synth (itype,alt,colat,elong,nmx,gt,x,y,z,f)
+      return
+      end
+
+      subroutine igrf11coef (isv,date,nmx,gt,ier)
+c
+c     Coefficients of the 11th generation IGRF at a date, interpolated
+c     (or extrapolated) in time as in igrf11syn.
+c   INPUT
+c     isv   = 0 if main-field coefficients are required
+c     isv   = 1 if secular variation coefficients are required
+c     date  = year A.D. (1900.0 to 2020.0)
+c   OUTPUT
+c     nmx   = maximum degree of the coefficients
+c     gt    = the nmx*(nmx+2) coefficients, in the order of gh
+c     ier   = 0, or 1 if the date is out of bounds
+c
+      implicit double precision (a-h,o-z)
+      real date
+Cf2py intent(in) isv,date
+Cf2py intent(out) nmx,gt,ier
+      dimension gt(195)
       dimension gh(3256),g0(120),g1(120),g2(120),g3(120),g4(120),
      1          g5(120),g6(120),g7(120),g8(120),g9(120),ga(120),
      2          gb(120),gc(120),gd(120),ge(120),gf(120),gg(120),
@@ -1006,11 +1040,7 @@ c
      a            -0.3,    0.4,    0.3,    0.1,    0.2,   -0.1,   -0.5,  2012
      b             0.4,    0.2,    0.4,115*0.0/                          2012
 c
-c     set initial values
-c
-      x     = 0.0
-      y     = 0.0
-      z     = 0.0
+      ier   = 0
       if (date.lt.1900.0.or.date.gt.2020.0) go to 11
       if (date.gt.2015.0) write (6,960) date
   960 format (/' This version of the IGRF is intended for use up',
@@ -1059,7 +1089,34 @@ c
       nmx   = 13
       nc    = nmx*(nmx+2)
       kmx   = (nmx+1)*(nmx+2)/2
-    2 r     = alt
+    2 do 12 k=1,nc
+       gt(k) = tc*gh(ll+k) + t*gh(ll+nc+k)
+   12 continue
+      return
+c
+c     error return if date out of bounds
+c
+   11 ier   = 1
+      write (6,961) date
+  961 format (/' This subroutine will not work with a date of',
+     1        f20.3,'.  Date must be in the range 1900.0.ge.date',
+     2        '.le.2020.0. On return f = 1.0d8., x = y = z = 0.')
+      return
+      end
+
+      subroutine igrf11synth (itype,alt,colat,elong,nmx,gt,x,y,z,f)
+c
+c     Synthesis of the field from coefficients given by igrf11coef.
+c     itype, alt, colat, elong, x, y, z and f are as in igrf11syn.
+c
+      implicit double precision (a-h,o-z)
+      dimension gt(195),p(105),q(105),cl(13),sl(13)
+c
+      x     = 0.0
+      y     = 0.0
+      z     = 0.0
+      kmx   = (nmx+1)*(nmx+2)/2
+      r     = alt
       one   = colat*0.017453292
       ct    = cos(one)
       st    = sin(one)
@@ -1126,10 +1183,10 @@ c
 c
 c     synthesis of x, y and z in geocentric coordinates
 c
-    6  lm    = ll + l
-       one   = (tc*gh(lm) + t*gh(lm+nc))*rr                                     
+    6  lm    = l
+       one   = gt(lm)*rr
        if (m.eq.0) go to 9                                                      
-       two   = (tc*gh(lm+1) + t*gh(lm+nc+1))*rr
+       two   = gt(lm+1)*rr
        three = one*cl(m) + two*sl(m)
        x     = x + three*q(k)
        z     = z - (fn + 1.0)*three*p(k)
@@ -1152,14 +1209,40 @@ c
       f     = sqrt(x*x + y*y + z*z)
 c
       return
+      end
+
+      subroutine igrf11batch (n,isv,itype,date,alt,colat,elong,
+     1                        x,y,z,f)
 c
-c     error return if date out of bounds
+c     Synthesis of the field at n points (see igrf11syn for the inputs
+c     and outputs of each point). The time-interpolated coefficients are
+c     only recomputed when the date changes, and are kept between calls,
+c     so points should be sorted by date.
 c
-   11 f     = 1.0d8
-      write (6,961) date
-  961 format (/' This subroutine will not work with a date of',
-     1        f20.3,'.  Date must be in the range 1900.0.ge.date',
-     2        '.le.2020.0. On return f = 1.0d8., x = y = z = 0.')
+      implicit double precision (a-h,o-z)
+      real date(n),lastdt
+      integer lastsv
+      dimension alt(n),colat(n),elong(n),x(n),y(n),z(n),f(n)
+      dimension gt(195)
+      save lastdt,lastsv,nmx,gt,ier
+      data lastdt/-1.0/, lastsv/-1/
+c
+      do 20 i=1,n
+       if (date(i).ne.lastdt.or.isv.ne.lastsv) then
+        call igrf11coef (isv,date(i),nmx,gt,ier)
+        lastdt = date(i)
+        lastsv = isv
+       end if
+       if (ier.ne.0) then
+        x(i)  = 0.0
+        y(i)  = 0.0
+        z(i)  = 0.0
+        f(i)  = 1.0d8
+       else
+        call igrf11synth (itype,alt(i),colat(i),elong(i),nmx,gt,
+     1                    x(i),y(i),z(i),f(i))
+       end if
+   20 continue
       return
       end
 
@@ -7,9 +7,23 @@ Modules
 ---------------------------
 iri     fortran subroutines
 ---------------------------
-    
+
+Functions
+---------------------------------------------------------------------------
+iri_sub             Evaluate IRI at one location and time
+jf_options          IRI options used by the raydarn ray tracing
+edens_profiles      Electron density profiles at many locations and times
+clear_profile_cache Forget the cached electron density profiles
+---------------------------------------------------------------------------
+
 """
 import logging
+import os
+
+# Electron density profiles computed by edens_profiles, keyed by cache file
+# name.  Each entry maps a (lat, lon, UT) key to a tuple of the density
+# profile and the oarr output of iri_sub.
+_profiles = dict()
 
 
 def iri_sub(jf, jmag, alati, along, iyyyy, mmdd, dhour, heibeg, heiend,
@@ -55,3 +69,270 @@ def iri_sub(jf, jmag, alati, along, iyyyy, mmdd, dhour, heibeg, heiend,
 
     return iri_sub(jf, jmag, alati, along, iyyyy, mmdd, dhour, heibeg,
                    heiend, heistp, oarr, data_file_path)
+
+
+def jf_options(hmf2=None, nmf2=None):
+    """The IRI options used by the raydarn ray tracing (see IRI_ARR in
+    raytrace_mpi.f90)
+
+    Parameters
+    ----------
+    hmf2 : Optional[float]
+        F2 peak height in km.  Ignored if None or not positive.
+    nmf2 : Optional[float]
+        log10 of the F2 peak density in m^-3.  Ignored if None or not
+        positive.
+
+    Returns
+    -------
+    jf : (np.ndarray)
+        IRI switches (50 booleans)
+    oarr : (np.ndarray)
+        IRI input/output array (100 floats) holding the specified F2 peak
+
+    """
+    import numpy as np
+
+    jf = np.ones(50, dtype=bool)
+    oarr = np.zeros(100, dtype=np.float32)
+    if hmf2 is not None and hmf2 > 0.:
+        jf[8] = False
+        oarr[1] = hmf2
+    if nmf2 is not None and nmf2 > 0.:
+        jf[7] = False
+        oarr[0] = 10.**nmf2
+    # no temperatures, no ion composition, URSI foF2 model, newest ion
+    # composition model, no ion drift, Te topside (TBT 2011), no foF2 storm
+    # updating, new topside options, NeQuick topside, no auroral boundary,
+    # messages off and no foE storm updating
+    for n in [2, 3, 5, 6, 21, 23, 26, 29, 30, 33, 34, 35]:
+        jf[n - 1] = False
+
+    return jf, oarr
+
+
+def edens_profiles(lat, lon, dtime, jf=None, oarr=None, jmag=0, heibeg=60.,
+                   heiend=560., heistp=1., ut_bin=None, cache=True,
+                   cache_dir=None, data_file_path=None):
+    """Evaluate IRI electron density profiles at many locations and times
+
+    Parameters
+    ----------
+    lat : (float or array-like)
+        Latitude in degrees (geographic, or geomagnetic if jmag=1)
+    lon : (float or array-like)
+        Longitude in degrees (geographic, or geomagnetic if jmag=1)
+    dtime : (datetime or array-like)
+        UT of each profile.  lat, lon and dtime are broadcast together.
+    jf : Optional[array-like]
+        IRI switches (50 booleans).  Default is jf_options().
+    oarr : Optional[array-like]
+        IRI input array (100 floats), used for the parameters that jf
+        marks as user specified.  Default is zeros, or jf_options() if jf
+        is also None.
+    jmag : Optional[int]
+        0 for geographic and 1 for geomagnetic coordinates (default=0)
+    heibeg : Optional[float]
+        Lowest altitude in km (default=60.)
+    heiend : Optional[float]
+        Highest altitude in km (default=560.)
+    heistp : Optional[float]
+        Altitude step in km (default=1.)
+    ut_bin : Optional[float]
+        If set, round the UT of each profile to a multiple of ut_bin hours,
+        so that all the times in a bin share one profile (default=None)
+    cache : Optional[bool]
+        Reuse and store profiles in the profile cache, which is kept in
+        memory and saved to cache_dir so later sessions can reuse it
+        (default=True)
+    cache_dir : Optional[str]
+        Directory of the profile cache.  Default is the iri directory in
+        rcParams' 'DAVIT_TMPDIR'.
+    data_file_path : Optional[str]
+        Path to davitpy installation. Default is to use rcParams'
+        'DAVITPY_PATH'
+
+    Returns
+    -------
+    edens : (np.ndarray)
+        Electron density in m^-3, with the broadcast shape of the inputs
+        followed by one axis for the altitudes
+    oarr : (np.ndarray)
+        oarr output of IRI for each profile, with the broadcast shape of the
+        inputs followed by an axis of length 100
+
+    Notes
+    -----
+    Profiles are cached by date, UT, location and IRI options (jf, jmag,
+    oarr and the altitude grid).  Locations and UT are matched exactly as
+    IRI receives them, in single precision, so a cached profile is the one
+    IRI would compute.  Delete the cache directory or call
+    clear_profile_cache(disk=True) after updating the IRI data files.
+
+    Example
+    -------
+        import datetime as dt
+        from davitpy.models import iri
+        lats = np.linspace(40., 60., 21)
+        ne, oarr = iri.edens_profiles(lats, -90., dt.datetime(2011, 11, 1, 12))
+
+    """
+    import numpy as np
+    from datetime import datetime
+    try:
+        from iri import iri_sub
+    except Exception as e:
+        logging.exception(__file__ + ' -> models.iri.edens_profiles: ' +
+                          str(e))
+        return None, None
+
+    if data_file_path is None:
+        from davitpy import rcParams
+        data_file_path = rcParams['DAVITPY_PATH']
+    if cache and cache_dir is None:
+        from davitpy import rcParams
+        cache_dir = os.path.join(rcParams['DAVIT_TMPDIR'], 'iri')
+
+    if jf is None:
+        jf, def_oarr = jf_options()
+        if oarr is None:
+            oarr = def_oarr
+    jf = np.asarray(jf, dtype=bool)
+    if oarr is None:
+        oarr = np.zeros(100, dtype=np.float32)
+    oarr = np.asarray(oarr, dtype=np.float32)
+
+    try:
+        lat, lon, times = np.broadcast_arrays(
+            np.asarray(lat, dtype=np.float32),
+            np.asarray(lon, dtype=np.float32) % np.float32(360.),
+            np.array(dtime, dtype='datetime64[s]'))
+    except ValueError:
+        logging.error('mismatched input arrays')
+        return None, None
+    shape = lat.shape
+    lat = lat.ravel()
+    lon = lon.ravel()
+    times = times.ravel()
+
+    # IRI returns this many heights
+    nhei = min(int(abs(heiend - heibeg) / abs(heistp)) + 1, 1000)
+
+    # Split the times into dates and UT in hours
+    days = times.astype('datetime64[D]')
+    ut = (times - days).astype(np.float64) / 3600.
+    if ut_bin is not None:
+        ut = np.round(ut / ut_bin) * ut_bin
+    ut = ut.astype(np.float32)
+
+    opt_key = _options_key(jf, jmag, oarr, heibeg, heiend, heistp)
+    edens = np.empty((lat.size, nhei), dtype=np.float32)
+    oout = np.empty((lat.size, 100), dtype=np.float32)
+
+    udays, iday = np.unique(days, return_inverse=True)
+    for i, day in enumerate(udays):
+        day = day.astype(datetime)
+        mmdd = day.month * 100 + day.day
+        if cache:
+            fname = os.path.join(cache_dir, 'edens_{:%Y%m%d}_{}.npz'.format(
+                day, opt_key))
+            store = _load_profiles(fname)
+        else:
+            store = dict()
+        nstore = len(store)
+
+        for j in np.flatnonzero(iday == i):
+            key = (lat[j], lon[j], ut[j])
+            if key not in store:
+                # Adding 25 to dhour tells IRI that it is UT
+                outf, oa = iri_sub(jf, jmag, lat[j], lon[j], day.year, mmdd,
+                                   ut[j] + 25., heibeg, heiend, heistp,
+                                   oarr.copy(), data_file_path)
+                store[key] = (outf[0, :nhei].copy(), oa)
+            edens[j], oout[j] = store[key]
+
+        if cache and len(store) > nstore:
+            _save_profiles(fname, store)
+
+    return (edens.reshape(shape + (nhei,)), oout.reshape(shape + (100,)))
+
+
+def clear_profile_cache(disk=False, cache_dir=None):
+    """Forget the electron density profiles cached by edens_profiles
+
+    Parameters
+    ----------
+    disk : Optional[bool]
+        Also delete the cache files (default=False)
+    cache_dir : Optional[str]
+        Directory of the profile cache.  Default is the iri directory in
+        rcParams' 'DAVIT_TMPDIR'.
+
+    """
+    import glob
+
+    _profiles.clear()
+    if disk:
+        if cache_dir is None:
+            from davitpy import rcParams
+            cache_dir = os.path.join(rcParams['DAVIT_TMPDIR'], 'iri')
+        for fname in glob.glob(os.path.join(cache_dir, 'edens_*.npz')):
+            os.remove(fname)
+
+
+def _options_key(jf, jmag, oarr, heibeg, heiend, heistp):
+    """Short hash of the IRI options that change a profile"""
+    import hashlib
+    import numpy as np
+
+    md5 = hashlib.md5()
+    md5.update(np.packbits(jf).tostring())
+    md5.update(oarr.tostring())
+    md5.update(np.array([jmag, heibeg, heiend, heistp],
+                        dtype=np.float32).tostring())
+    return md5.hexdigest()[:12]
+
+
+def _load_profiles(fname):
+    """Profiles of one cache file, read from disk the first time"""
+    import numpy as np
+
+    if fname not in _profiles:
+        store = dict()
+        if os.path.exists(fname):
+            try:
+                data = np.load(fname)
+                for k, key in enumerate(zip(data['lat'], data['lon'],
+                                            data['ut'])):
+                    store[key] = (data['edens'][k], data['oarr'][k])
+            except Exception as e:
+                logging.warning('unable to read IRI cache {:s}: {:s}'.format(
+                    fname, str(e)))
+                store = dict()
+        _profiles[fname] = store
+
+    return _profiles[fname]
+
+
+def _save_profiles(fname, store):
+    """Write the profiles of one cache file to disk"""
+    import numpy as np
+
+    keys = store.keys()
+    try:
+        cache_dir = os.path.dirname(fname)
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        # Write to a temporary file and rename it so that other processes
+        # never see a partial file
+        tmpname = '{:s}.{:d}.tmp'.format(fname, os.getpid())
+        with open(tmpname, 'wb') as f:
+            np.savez(f, lat=np.array([k[0] for k in keys], dtype=np.float32),
+                     lon=np.array([k[1] for k in keys], dtype=np.float32),
+                     ut=np.array([k[2] for k in keys], dtype=np.float32),
+                     edens=np.array([store[k][0] for k in keys]),
+                     oarr=np.array([store[k][1] for k in keys]))
+        os.rename(tmpname, fname)
+    except Exception as e:
+        logging.warning('unable to write IRI cache {:s}: {:s}'.format(
+            fname, str(e)))
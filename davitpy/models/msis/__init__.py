@@ -4,9 +4,12 @@
 """Mass Spectrometer and Incoherent Scatter
 
 Functions
-------------------
-msis.msisFort.gtd7
-------------------
+-----------------------------------------------------------
+msis.msisFort.gtd7  densities and temperatures at one point
+msis.gtd7_batch     densities and temperatures at arrays of points
+msis.getF107Ap      F107 and AP from the IRI tables
+msis.loadApF107     read the IRI table of F107 and AP
+-----------------------------------------------------------
 
 Parameters
 ----------
@@ -68,19 +71,99 @@ T(2) :
 """
 import logging
 
+# Tables of F107 and AP read by loadApF107, by file name
+_apf107 = dict()
+
 try:
     from msisFort import *
 except Exception as e:
     logging.exception(__file__ + ' -> models.msis: ' + str(e))
 
 
+def gtd7_batch(iyd, sec, alt, glat, glong, stl, f107a, f107, ap, mass=48):
+    """NRLMSISE-00 at arrays of points, evaluated in a single fortran call
+
+    Parameters
+    ----------
+    iyd : int or np.array
+        year and day as YYDDD
+    sec : float or np.array
+        UT (SEC)
+    alt : float or np.array
+        altitude (KM)
+    glat : float or np.array
+        geodetic latitude (DEG)
+    glong : float or np.array
+        geodetic longitude (DEG)
+    stl : float or np.array
+        local aparent solar time (HRS)
+    f107a : float or np.array
+        81 day average of F10.7 flux (centered on day DDD)
+    f107 : float or np.array
+        daily F10.7 flux for previous day
+    ap : list or np.array
+        (..., 7) array of magnetic indices (see gtd7)
+    mass : Optional[int]
+        mass number (see gtd7)
+
+    Returns
+    -------
+    d : np.array
+        (..., 9) array of densities (see gtd7), at the broadcast shape of
+        the inputs
+    t : np.array
+        (..., 2) array of exospheric temperature and temperature at ALT
+
+    Example
+    -------
+        # Density profiles over a radar field of view
+        import numpy as np
+        from davitpy.models import msis
+        alt = np.arange(100., 400., 10.)
+        d, t = msis.gtd7_batch(15032, 43200., alt, glat[..., np.newaxis],
+            glon[..., np.newaxis], 12., 150., 150., [4.]*7)
+
+    """
+    import numpy as np
+    from msisFort import gtd7_batch as batch
+
+    ap = np.asarray(ap, dtype=np.float32)
+    args = np.broadcast_arrays(np.asarray(iyd), sec, alt, glat, glong, stl,
+                               f107a, f107, *[ap[..., i] for i in range(7)])
+    shape = args[0].shape
+    args = [a.ravel() for a in args]
+
+    # The horizontal terms are only recomputed when the date, time or
+    # position change, so evaluate the points with the altitude varying
+    # fastest
+    order = np.lexsort((args[2], args[5], args[3], args[4], args[1],
+                        args[0]))
+    iyd = np.ascontiguousarray(args[0][order], dtype=np.int32)
+    sec, alt, glat, glong, stl, f107a, f107 = \
+        [np.ascontiguousarray(a[order], dtype=np.float32) for a in args[1:8]]
+    ap = np.asfortranarray(np.array([a[order] for a in args[8:]],
+                                    dtype=np.float32))
+
+    d = np.empty((order.size, 9), dtype=np.float32)
+    t = np.empty((order.size, 2), dtype=np.float32)
+    if order.size > 0:
+        dd, tt = batch(iyd, sec, alt, glat, glong, stl, f107a, f107, ap, mass)
+        d[order] = dd.T
+        t[order] = tt.T
+
+    return d.reshape(shape + (9,)), t.reshape(shape + (2,))
+
+
 def getF107Ap(mydatetime=None):
     """
     Obtain F107 and AP required for MSIS input from tabulated values in IRI data.
 
+    The table is parsed once per session, and saved in a binary cache file
+    so that later sessions do not parse it again (see loadApF107).
+
     Parameters
     ----------
-    mydatetime : Optional[datetime]
+    mydatetime : Optional[datetime or array of datetimes]
         defaults to last tabulated value
 
     Returns
@@ -98,76 +181,154 @@ def getF107Ap(mydatetime=None):
         * (5) 3 HR AP index for 9 hours before current time
         * (6) Average of eight 3 hour AP indicies from 12 to 33 hrs prior to current time
         * (7) Average of eight 3 hour AP indicies from 36 to 57 hrs prior to current time
+      For an array of datetimes, datetime, f107 and f107a are arrays and
+      ap is a (n, 7) array, with NaN for the dates outside of the table.
 
     """
-    from davitpy.models import iri
+    import numpy as np
     from datetime import datetime
-    from numpy import mean, floor
-
-    # Get current path to IRI module
-    path = iri.__file__.partition('__init__.py')[0]
-
-    # open apf107.dat file
-    with open('{}apf107.dat'.format(path), 'r') as fileh:
-        data = []
-        for line in fileh:
-            data.append(line)
-
-    # read into array
-    # (cannot use genfromtext because some columns are not separated by anything)
-    tdate = []
-    tap = []
-    tapd = []
-    tf107 = []
-    tf107a = []
-    tf107y = []
-    for ldat in data:
-        yy = int(ldat[1:3])
-        year = 1900 + yy if (yy >= 58) else 2000 + yy
-        tdate.append(datetime(year, int(ldat[4:6]), int(ldat[7:9])).date())
-        ttap = []
-        for iap in xrange(8):
-            ttap.append(int(ldat[9 + 3 * iap:9 + 3 * iap + 4]))
-        tap.append(ttap)
-        tapd.append(int(ldat[33:36]))
-        tf107.append(float(ldat[39:44]))
-        tf107a.append(float(ldat[44:49]))
-        tf107y.append(float(ldat[49:54]))
-
-    # Get required datetime
-    dictOut = {}
+
+    table = loadApF107()
+    days = table['date']
+
+    scalar = mydatetime is None or isinstance(mydatetime, datetime)
     if mydatetime is None:
-        dictOut['datetime'] = datetime(
-            tdate[-1].year, tdate[-1].month, tdate[-1].day)
-    elif mydatetime.date() <= tdate[-1]:
-        dictOut['datetime'] = mydatetime
+        times = days[-1:].astype('datetime64[us]')
     else:
-        logging.error('Invalid date {}'.format(mydatetime))
-        logging.error(
-            'Date must be in range {} to {}'.format(tdate[0], tdate[-1]))
-        return
-
-    # Find entry for date
-    dtInd = tdate.index(dictOut['datetime'].date())
-    # Find hour index
-    hrInd = int(floor(dictOut['datetime'].hour / 3.))
-
-    # f107 output
-    dictOut['f107'] = tf107[dtInd - 1]
-    dictOut['f107a'] = tf107a[dtInd]
-
-    # AP output
-    ttap = [tap[dtInd][hrInd - i] for i in range(hrInd + 1)]
-    for id in xrange(3):
-        for ih in xrange(8):
-            ttap.append(tap[dtInd - id - 1][-ih - 1])
-    dictOut['ap'] = [tapd[dtInd],
-                     ttap[0],
-                     ttap[1],
-                     ttap[2],
-                     ttap[3],
-                     mean(ttap[4:13]),
-                     mean(ttap[13:26])
-                     ]
+        times = np.atleast_1d(np.asarray(mydatetime, dtype='datetime64[us]'))
+
+    # Index of the day and of the 3 hour interval of each time
+    tday = times.astype('datetime64[D]')
+    dtInd = np.searchsorted(days, tday)
+    valid = (tday >= days[0]) & (tday <= days[-1])
+    if not valid.all():
+        logging.error('Invalid date {}'.format(times[~valid][0]))
+        logging.error('Date must be in range {} to {}'.format(days[0],
+                                                              days[-1]))
+        if scalar:
+            return
+    dtInd = np.clip(dtInd, 0, days.size - 1)
+    hrInd = (times - tday).astype('timedelta64[h]').astype(int) // 3
+
+    # 3 hour AP indices in reverse order from the current time
+    ap3 = table['ap'].ravel()
+    cur = 8 * dtInd + hrInd
+    ttap = ap3[np.clip(cur[:, np.newaxis] - np.arange(20), 0, None)]
+
+    f107 = table['f107'][np.clip(dtInd - 1, 0, None)]
+    f107a = table['f107a'][dtInd]
+    ap = np.column_stack((table['apd'][dtInd], ttap[:, :4],
+                          ttap[:, 4:12].mean(axis=1),
+                          ttap[:, 12:20].mean(axis=1)))
+
+    # Dates outside of the table
+    f107 = np.where(valid, f107, np.nan)
+    f107a = np.where(valid, f107a, np.nan)
+    ap[~valid] = np.nan
+
+    dictOut = {}
+    if scalar:
+        dictOut['datetime'] = times[0].astype(datetime)
+        dictOut['f107'] = float(f107[0])
+        dictOut['f107a'] = float(f107a[0])
+        dictOut['ap'] = ap[0].tolist()
+    else:
+        dictOut['datetime'] = times.astype(datetime)
+        dictOut['f107'] = f107
+        dictOut['f107a'] = f107a
+        dictOut['ap'] = ap
 
     return dictOut
+
+
+def loadApF107(fname=None, cache=True, cache_dir=None):
+    """Read the tabulated F107 and AP of the IRI data (apf107.dat)
+
+    The table is kept in memory, and saved in a binary file that is used
+    instead of the text file as long as the text file does not change.
+
+    Parameters
+    ----------
+    fname : Optional[str]
+        table file.  Default is apf107.dat in the IRI module directory
+    cache : Optional[bool]
+        Read and write the binary cache file (default=True)
+    cache_dir : Optional[str]
+        Directory of the binary cache file.  Default is the msis directory
+        in rcParams' 'DAVIT_TMPDIR'.
+
+    Returns
+    -------
+    table : dict
+      containing, one element per day:
+      * date: np.datetime64 date
+      * ap: (n, 8) 3 hour AP indices
+      * apd: daily AP
+      * f107: daily f10.7 flux
+      * f107a: 81 day average of f10.7 flux
+      * f107y: 365 day average of f10.7 flux
+
+    """
+    import os
+    import numpy as np
+
+    if fname is None:
+        from davitpy.models import iri
+        fname = os.path.join(os.path.dirname(iri.__file__), 'apf107.dat')
+
+    if fname in _apf107:
+        return _apf107[fname]
+
+    stat = os.stat(fname)
+    cname = None
+    if cache:
+        if cache_dir is None:
+            from davitpy import rcParams
+            cache_dir = os.path.join(rcParams['DAVIT_TMPDIR'], 'msis')
+        cname = os.path.join(cache_dir, 'apf107.npz')
+
+    # Binary cache, if it was made from the same file
+    table = None
+    if cname is not None and os.path.exists(cname):
+        try:
+            with np.load(cname) as data:
+                if (str(data['source']) == os.path.abspath(fname) and
+                        int(data['size']) == stat.st_size and
+                        float(data['mtime']) == stat.st_mtime):
+                    table = dict((k, data[k]) for k in
+                                 ['date', 'ap', 'apd', 'f107', 'f107a',
+                                  'f107y'])
+        except Exception as e:
+            logging.warning('unable to read {:s}: {:s}'.format(cname, str(e)))
+
+    if table is None:
+        # The columns are not always separated, so use the fixed widths
+        cols = np.genfromtxt(fname, delimiter=[3] * 13 + [5] * 3)
+        yy = cols[:, 0].astype(int)
+        year = np.where(yy >= 58, 1900 + yy, 2000 + yy)
+        date = np.array(['{:04d}-{:02d}-{:02d}'.format(*d) for d in
+                         zip(year, cols[:, 1].astype(int),
+                             cols[:, 2].astype(int))],
+                        dtype='datetime64[D]')
+        table = {'date': date, 'ap': cols[:, 3:11].astype(int),
+                 'apd': cols[:, 11].astype(int), 'f107': cols[:, 13],
+                 'f107a': cols[:, 14], 'f107y': cols[:, 15]}
+
+        if cname is not None:
+            try:
+                if not os.path.isdir(cache_dir):
+                    os.makedirs(cache_dir)
+                # Write to a temporary file and rename it so that other
+                # processes never see a partial file
+                tmpname = '{:s}.{:d}.tmp'.format(cname, os.getpid())
+                with open(tmpname, 'wb') as f:
+                    np.savez(f, source=os.path.abspath(fname),
+                             size=stat.st_size, mtime=stat.st_mtime, **table)
+                os.rename(tmpname, cname)
+            except Exception as e:
+                logging.warning('unable to write {:s}: {:s}'.format(cname,
+                                                                    str(e)))
+
+    _apf107[fname] = table
+
+    return table
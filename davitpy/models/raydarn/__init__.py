@@ -7,7 +7,8 @@ This module wraps the ray-tracing coupled with IRI and IGRF
 
 Modules
 --------------------------------
-raydarn.rt  interfacing run code
+raydarn.rt       interfacing run code
+raydarn.rtTable  ray-tracing lookup tables
 --------------------------------
 
 """
@@ -16,3 +17,7 @@ import logging
 try: from rt import *
 except Exception, e:
     logging.exception(__file__ + ' -> models.raydarn.rt: ' + str(e))
+
+try: from rtTable import *
+except Exception, e:
+    logging.exception(__file__ + ' -> models.raydarn.rtTable: ' + str(e))
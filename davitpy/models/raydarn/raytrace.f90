@@ -0,0 +1,726 @@
+! Copyright (C) 2012  VT SuperDARN Lab
+! Full license can be found in LICENSE.txt
+! Ray tracing routines shared by the MPI program (raytrace_mpi.f90) and the
+! python kernel (rtKernel.f90)
+
+! *************************************************************************
+! Ray-tracing subroutine: computes new ray position and elevation with an
+! adaptative stepsize Runge-Kutta method
+! The error is calculated on Q only for simplicity
+! Outputs:
+!   - nstep, rsave, thsave, grpsave, nrsave: number of steps, altitude, theta,
+!     group range and refractive index along the ray
+!   - nhit, ranout: number of ground hits, and for each hit hour, azimuth,
+!     elevation, reflection altitude, theta, group range, latitude, longitude
+!   - nasp, ionosout: number of ionospheric scatter points, and for each point
+!     altitude, theta, group range, elevation, weight, refractive index,
+!     latitude, longitude, step size
+! *************************************************************************
+SUBROUTINE RAY_RKCK(params, rayhour, rayazim, rayelev, edensARR, edensTHT, dip, &
+                        nstep, rsave, thsave, grpsave, nrsave, nhit, ranout, nasp, ionosout)
+
+  use constants
+  implicit none
+  type(prm),intent(in)::      params
+  real*4,intent(in)::         rayelev, rayazim, rayhour
+  real*4,intent(in)::         edensARR(500,500), edensTHT(500), dip(500,2)
+  integer,intent(out)::       nstep, nhit, nasp
+
+  real*4::        latiin, longiin, latiout, longiout
+  real*4::        edens, edensUP, vedens, nr2, dnr2dr, edensMax
+  real*4::        r, Q, theta, rtmp, Qtmp, thetatmp
+  real*4::        Qk(6), rk(6), thetak(6)
+  real*4::        err, h, htmp, Qerr, Qscal
+  real*4::        grpran, ranelev, rrefl
+  real*4::        sina, sinb, d
+  real*4::        asp_alt, asp_theta, asp_grpran, asp_ran, asp_w, aspect
+  integer::       ihop, nrstep, istep, aspectind, n, naspstep
+
+  ! Arrays for saving ray parameters
+  real*4,dimension(5000),intent(out)::        rsave, thsave, grpsave, nrsave ! ransave, 
+  real*4,dimension(8,params%nhop),intent(out):: ranout
+  real*4,dimension(9,5000),intent(out)::      ionosout
+
+  real*4,parameter::      alti = 0.           ! initial altitude [_km]
+  real*4,parameter::      htry = 10000.       ! initial step size [_m]
+  real*4,parameter::      eps = 1e-3          ! desired accuracy for the RKF integration
+  real*4,parameter::      pgrow = -0.2        ! growth exponent when step size too small
+  real*4,parameter::      pshrink = -0.25     ! shrink exponent when step size too large
+  real*4,parameter::      Safety = 0.9        ! Safety parameter for step adjustments
+
+  ! Find max electron density
+  edensMax = maxval(edensARR)
+
+  ! Initialize r, theta and Q (ref: Coleman, Radio Sci., 33(4), 1187-1197, 1998)
+  r = (Rav + alti)*1e3
+  theta = 0.
+  Q = sin(rayelev*dtor)
+  ! Initialize step size
+  h = htry
+  ! Initialize group range
+  grpran = 0.
+  ! Initialize current elevation
+  ranelev = rayelev
+  ! Initialize reflection altitude
+  rrefl = 0.
+  ! Initialize refractive index
+  nr2 = 1.
+  dnr2dr = 0.
+
+  ! Save to arrays
+  rsave(1) = r
+  thsave(1) = theta
+  grpsave(1) = grpran
+!  ransave(1) = grpran
+  nrsave(1) = sqrt(nr2)
+
+  ! Initialize position
+  latiout = params%txlat
+  longiout = params%txlon
+
+
+  ! Loops until ray describes the desired number of hops
+  ihop = 0        ! hop counter
+  nrstep = 2      ! number of steps per ray counter
+  naspstep = 1    ! number of ionospheric scatter occurence counter
+  do while (ihop.lt.params%nhop.and.r.lt.(Rav + 500.)*1e3.and.theta.lt.edensTHT(500).and.r.ge.Rav*1e3.and.nrstep.lt.5000)
+    ! Current position
+    latiin = latiout
+    longiin = longiout
+    ! Resets error
+    err = 10.
+
+    do while (err.gt.1.)
+    ! Adaptative step Runge-Kutta method (Cash-Karp)
+      ! Initialize derivatives
+      call DERIV(r, theta, Q, nr2, dnr2dr, rk(1), thetak(1), Qk(1))
+
+
+      ! ********** 1st step
+      Qtmp = Q + h*b2(1)*Qk(1)
+      rtmp = r + h*b2(1)*rk(1)
+      thetatmp = theta + h*b2(1)*thetak(1)
+      ! Updates current elevation
+      if ((thetatmp-theta).eq.0.) thetatmp = theta + h / r
+      ranelev = asin( (rtmp*cos(thetatmp-theta) - r) / h)*radeg
+      ! Calculate new position, index of refraction, and index gradient
+      CALL CALC_INDEX(thetatmp, edensTHT, edensARR, rayazim, params%freq, rtmp, ranelev, h, &
+                                      nr2, dnr2dr)
+      ! Calculate derivatives
+      call DERIV(rtmp, thetatmp, Qtmp, nr2, dnr2dr, rk(2), thetak(2), Qk(2))
+
+
+      ! ********** 2nd step
+      Qtmp = Q + h*(b3(1)*Qk(1) + b3(2)*Qk(2))
+      rtmp = r + h*(b3(1)*rk(1) + b3(2)*rk(2))
+      thetatmp = theta + h*(b3(1)*thetak(1) + b3(2)*thetak(2))
+      ! Updates current elevation
+      if ((thetatmp-theta).eq.0.) thetatmp = theta + h / r
+      ranelev = asin( (rtmp*cos(thetatmp-theta) - r) / h)*radeg
+      ! Calculate new position, index of refraction, and index gradient
+      CALL CALC_INDEX(thetatmp, edensTHT, edensARR, rayazim, params%freq, rtmp, ranelev, h, &
+                                      nr2, dnr2dr)
+      ! Calculate derivatives
+      call DERIV(rtmp, thetatmp, Qtmp, nr2, dnr2dr, rk(3), thetak(3), Qk(3))
+
+
+      ! ********** 3rd step
+      Qtmp = Q + h*(b4(1)*Qk(1) + b4(2)*Qk(2) + b4(3)*Qk(3))
+      rtmp = r + h*(b4(1)*rk(1) + b4(2)*rk(2) + b4(3)*rk(3))
+      thetatmp = theta + h*(b4(1)*thetak(1) + b4(2)*thetak(2) + b4(3)*thetak(3))
+      ! Updates current elevation
+      if ((thetatmp-theta).eq.0.) thetatmp = theta + h / r
+      ranelev = asin( (rtmp*cos(thetatmp-theta) - r) / h)*radeg
+      ! Calculate new position, index of refraction, and index gradient
+      CALL CALC_INDEX(thetatmp, edensTHT, edensARR, rayazim, params%freq, rtmp, ranelev, h, &
+                                      nr2, dnr2dr)
+      ! Calculate derivatives
+      call DERIV(rtmp, thetatmp, Qtmp, nr2, dnr2dr, rk(4), thetak(4), Qk(4))
+
+
+      ! ********** 4th step
+      Qtmp = Q + h*(b5(1)*Qk(1) + b5(2)*Qk(2) + b5(3)*Qk(3) + b5(4)*Qk(4))
+      rtmp = r + h*(b5(1)*rk(1) + b5(2)*rk(2) + b5(3)*rk(3) + b5(4)*rk(4))
+      thetatmp = theta + h*(b5(1)*thetak(1) + b5(2)*thetak(2) + b5(3)*thetak(3) + b5(4)*thetak(4))
+      ! Updates current elevation
+      if ((thetatmp-theta).eq.0.) thetatmp = theta + h / r
+      ranelev = asin( (rtmp*cos(thetatmp-theta) - r) / h)*radeg
+      ! Calculate new position, index of refraction, and index gradient
+      CALL CALC_INDEX(thetatmp, edensTHT, edensARR, rayazim, params%freq, rtmp, ranelev, h, &
+                                      nr2, dnr2dr)
+      ! Calculate derivatives
+      call DERIV(rtmp, thetatmp, Qtmp, nr2, dnr2dr, rk(5), thetak(5), Qk(5))
+
+
+      ! ********** 5th step
+      Qtmp = Q + h*(b6(1)*Qk(1) + b6(2)*Qk(2) + b6(3)*Qk(3) + b6(4)*Qk(4) + b6(5)*Qk(5))
+      rtmp = r + h*(b6(1)*rk(1) + b6(2)*rk(2) + b6(3)*rk(3) + b6(4)*rk(4) + b6(5)*rk(5))
+      thetatmp = theta + h*(b6(1)*thetak(1) + b6(2)*thetak(2) + b6(3)*thetak(3) + b6(4)*thetak(4) + b6(5)*thetak(5))
+      ! Updates current elevation
+      if ((thetatmp-theta).eq.0.) thetatmp = theta + h / r
+      ranelev = asin( (rtmp*cos(thetatmp-theta) - r) / h)*radeg
+      ! Calculate new position, index of refraction, and index gradient
+      CALL CALC_INDEX(thetatmp, edensTHT, edensARR, rayazim, params%freq, rtmp, ranelev, h, &
+                                      nr2, dnr2dr)
+      ! Calculate derivatives
+      call DERIV(rtmp, thetatmp, Qtmp, nr2, dnr2dr, rk(6), thetak(6), Qk(6))
+
+
+      ! ********** 6th steps
+      Qtmp = Q + h*(ci(1)*Qk(1) + ci(2)*Qk(2) + ci(3)*Qk(3) + ci(4)*Qk(4) + ci(5)*Qk(5) + ci(6)*Qk(6))
+      rtmp = r + h*(ci(1)*rk(1) + ci(2)*rk(2) + ci(3)*rk(3) + ci(4)*rk(4) + ci(5)*rk(5) + ci(6)*rk(6))
+      thetatmp = theta + h*(ci(1)*thetak(1) + ci(2)*thetak(2) + ci(3)*thetak(3) + &
+          ci(4)*thetak(4) + ci(5)*thetak(5) + ci(6)*thetak(6))
+
+
+      ! ********** Error calculation
+      Qerr = h*(dci(1)*Qk(1) + dci(2)*Qk(2) + dci(3)*Qk(3) + dci(4)*Qk(4) + dci(5)*Qk(5) + dci(6)*Qk(6))
+      ! Calculates reference vector for error adjustment
+      Qscal = sqrt(nr2)*(rtmp - r)/h
+      ! error
+      if (Qscal.eq.0.) then
+          err = 0.
+      else
+          err = abs(Qerr/Qscal)/eps
+      endif
+      ! If error too large, reduce step size and restart
+      if (err.gt.1.) then
+          htmp = Safety*h*err**pshrink
+          ! no less than a 1m step (which is already an overkill)
+          h = max(htmp, 1.)
+      endif
+    enddo
+
+    ! If ray reaches reflection point
+    if (rtmp-r.le.0..and.rtmp-rrefl.ge.0.) rrefl = rtmp
+
+    ! If ray reaches the ground (or passses through it)
+    if (rtmp*1e-3.le.Rav) then
+      ! calculates theta intercepting ground
+      sina = rtmp*sin(thetatmp-theta)/h
+      sinb = r*sina/(Rav*1e3)
+      thetatmp = theta + (pi - asin(sina) - (pi - asin(sinb)))
+
+      ! local elevation angle
+      ranelev = asin( (rtmp*cos(thetatmp-theta) - r) / h)*radeg
+
+      ! Re-evaluate h, rtmp and Qtmp for new thetatmp
+      h = Rav*1e3*sin(thetatmp-theta)/sina
+      rtmp = Rav*1e3
+      Qtmp = sin(pi/2.-asin(sina))
+
+      ! Calculate new position
+      call CALC_POS(latiin, longiin, r*1e-3-Rav, rayazim, h*1e-3, ranelev, latiout, longiout)
+
+      ! Counts number of hops
+      ihop = ihop + 1
+      ! Save ground hit
+      ! Reflection altitude, theta, grp range, hour, azimuth, elevation, true range, latitude, longitude
+      ranout(1:8,ihop) = (/rayhour, rayazim, rayelev, rrefl, thetatmp, grpran+h, latiout, longiout/) ! , (ransave(nrstep-1) + sqrt(nr2)*h)
+
+      ! resets reflection altitude
+      rrefl = 0.
+    endif
+
+    ! Updates group range
+    grpran = grpran + h
+
+    ! Updates current elevation
+    ranelev = asin( (rtmp*cos(thetatmp-theta) - r) / h)*radeg
+
+    ! Calculate new position, index of refraction, and index gradient
+    CALL CALC_INDEX(thetatmp, edensTHT, edensARR, rayazim, params%freq, rtmp, ranelev, h, &
+                                    nr2, dnr2dr)
+
+    ! Search current ray step for good aspect conditions
+    if (grpran.gt.180e3.and.rtmp*1e-3.gt.(Rav+90.)) then
+      CALL CALC_ASPECT(edensTHT, dip, rayazim, theta, thetatmp, r, rtmp, aspectind, aspect)
+      if (aspectind.gt.0) then
+        ! Calculate mean range
+        d = r/rtmp*h*sin(edensTHT(aspectind) - theta)/sin(thetatmp-theta)
+        asp_grpran = grpran + h/2.
+        ! Calculate mean slant range
+!        asp_ran = ransave(nrstep-1) + h/2.*sqrt(nr2)
+        ! Calculate mean ground range
+        asp_theta = (thetatmp-theta)/2. + theta
+        ! Calculate mean altitude
+        asp_alt = sqrt( h**2./4. + r**2. + h/2.*r*sin(ranelev) )
+        ! Calculate weighing (to account for backsground electron density and deviation from perfect aspect conditions)
+        asp_w = ( edensARR(nint(((rtmp-r)/2.+r)*1e-3 - 60. - Rav), aspectind) )**2. / asp_grpran**3.
+
+        ! Write to file
+        ! Reflection altitude, theta, grp range, true range, weights, refractive index, latitude, longitude, aspect
+        ionosout(1:9,naspstep) = (/asp_alt, asp_theta, asp_grpran, ranelev, asp_w, sqrt(nr2), latiin, longiin, h/)
+        naspstep = naspstep + 1
+      endif
+      ! Resets aspect indices
+      aspectind = 0
+    endif
+
+    ! Passes new values
+    Q = Qtmp
+    r = rtmp
+    theta = thetatmp
+
+    ! Calculate new position
+    call CALC_POS(latiin, longiin, r*1e-3-Rav, rayazim, h*1e-3*sqrt(nr2), ranelev, latiout, longiout)
+
+    ! Save to arrays
+    rsave(nrstep) = r
+    thsave(nrstep) = theta
+    grpsave(nrstep) = grpran
+!    ransave(nrstep) = ransave(nrstep-1) + sqrt(nr2)*h
+    nrsave(nrstep) = sqrt(nr2)
+
+    ! Calculates new step size (bigger)
+    if (err.gt.(5./Safety)**(1./pgrow)) then
+        h = Safety*h*err**pgrow
+    else
+        h = 5.*h
+    endif
+    h = min(h, 10e3)
+    nrstep = nrstep + 1
+  enddo
+
+  ! Number of ray steps, ground hits and ionospheric scatter points
+  nstep = nrstep - 1
+  nhit = ihop
+  nasp = naspstep - 1
+
+END SUBROUTINE RAY_RKCK
+
+
+
+! *************************************************************************
+! Calculates derivatives of r, theta and Q
+! (ref: Coleman, Radio Sci., 33(4), 1187-1197, 1998)
+! *************************************************************************
+SUBROUTINE DERIV(r, theta, Q, nr2, dnr2dr, drdp, dthetadp, dQdp)
+
+    implicit none
+    real*4,intent(in):: r, theta, Q, nr2, dnr2dr
+    real*4,intent(out):: drdp, dthetadp, dQdp
+
+    drdp = Q
+    dthetadp = SQRT(nr2 - Q**2.)/r
+    dQdp = 1./2.*dnr2dr + (nr2 - Q**2.)/r
+
+END SUBROUTINE DERIV
+
+
+! *************************************************************************
+! Calculates refractive index and its vertical gradient at a given ray point
+! *************************************************************************
+SUBROUTINE CALC_INDEX(tht, edensTHT, edensARR, azim, freq, r, elev, h, &
+                        nr2, dnr2dr)
+
+    use constants
+    implicit none
+    real*4,intent(in)::     tht, r, azim, freq, h
+    real*4,intent(in)::     edensARR(500,500), edensTHT(500)
+    real*4,intent(out)::    nr2, dnr2dr
+
+    real*4::                edens, edensUP, vedens, elev, Bvec(2), dip(500,2)
+
+    ! Finds electron density at current position
+    call IRI_INTERP(tht, r*1e-3-Rav, edensTHT, edensARR, edens)
+    call IRI_INTERP(tht, r*1e-3-Rav+1., edensTHT, edensARR, edensUP)
+
+    ! Calculates gradient
+    vedens = (edensUP-edens)/1e3
+
+    ! Calculates refractive index (sqaured) with Appleton-Hartree formula (no field, no colisions)
+    nr2 = (1. - 80.5e-12*edens/(freq**2.))
+
+    ! Calculates vertical gradient of the square of the refractive index
+    dnr2dr = -80.5e-12/(freq**2.)*vedens
+
+!   print*,'CALC_INDEX', tht*radeg, (r*1e-3 - Rav), edens, edensUP, nr2, dnr2dr
+
+
+
+END SUBROUTINE CALC_INDEX
+
+
+! *************************************************************************
+! Calculates new position for a given path distance, elevation angle and azimuth.
+! Input and output positions are in degrees
+! *************************************************************************
+SUBROUTINE CALC_POS(lati, longi, alti, azim, dist, elev, latiout, longiout)
+
+    use constants
+    implicit none
+    real*4,intent(in)::         lati, longi, alti, dist, azim, elev
+    real*4,intent(out)::        latiout, longiout
+
+    real*4::    Re, glat, glon, rho, gaz, gel
+    real*4::    rx, ry, rz, sx, sy, sz, tx, ty, tz
+    real*4::    coslat, sinlat, coslon, sinlon, tlat, tlon
+
+! use temp variable to store latitude and longitude
+    tlat = lati
+    tlon = longi
+
+! Converts from geodetic to geocentric and find Earth radius
+    CALL CALC_GD2GC(1, tlat, tlon, Re, glat, glon)
+
+! Adjusts azimuth and elevation for the oblateness of the Earth
+    CALL CALC_AZEL(tlat, tlon, azim, elev, gaz, gel)
+
+! Pre-calculate sin and cos of lat and lon
+    coslat = cos(glat*dtor)
+    sinlat = sin(glat*dtor)
+    coslon = cos(glon*dtor)
+    sinlon = sin(glon*dtor)
+
+! Convert from glabal spherical to global cartesian
+    rx = (Re + alti) * coslat * coslon
+    ry = (Re + alti) * coslat * sinlon
+    rz = (Re + alti) * sinlat
+
+! Convert from local spherical to local cartesian
+    sx = -dist * cos(gel*dtor) * cos(gaz*dtor)
+    sy = dist * cos(gel*dtor) * sin(gaz*dtor)
+    sz = dist * sin(gel*dtor)
+
+! Convert from local cartesian to global cartesian
+    tx = sinlat * sx + coslat * sz
+    ty = sy
+    tz = -coslat * sx + sinlat * sz
+    sx = coslon * tx - sinlon * ty
+    sy = sinlon * tx + coslon * ty
+    sz = tz
+
+! Add vectors in global cartesian system
+    tx = rx + sx
+    ty = ry + sy
+    tz = rz + sz
+
+! Convert from global cartesian to global spherical
+    rho = sqrt( tx**2. + ty**2. + tz**2. )
+    glat = 90. - acos(tz/rho)*radeg
+    glon = atan2(ty, tx)*radeg
+
+! Compute geodetic coordinates and Earth radius at new point
+    CALL CALC_GD2GC(-1, latiout, longiout, Re, glat, glon)
+
+END SUBROUTINE CALC_POS
+
+
+! *************************************************************************
+! Converts between geocentric coordinates and geodetic (World Geodetic System 1984 (WGS84))
+! iopt: -1, geocentric to geodetic
+!           +1, geodetic to geocentric
+! *************************************************************************
+SUBROUTINE CALC_GD2GC(iopt, gdlat, gdlon, rho, glat, glon)
+
+    use constants
+    implicit none
+    integer,intent(in)::        iopt
+    real*4,intent(inout)::      gdlat, gdlon, glat, glon
+    real*4,intent(out)::        rho
+
+    real*4::                    b, e2
+
+! semi-minor axis (polar radius)
+    b = a*(1. - f)
+
+! first eccentricity squared
+    e2 = a**2./b**2. - 1.
+
+! geodetic to geocentric
+    if (iopt.eq.1) then
+        glat = atan( b**2./a**2. * tan(gdlat*dtor) ) * radeg
+        glon = gdlon
+        if (glon.gt.180.)  glon = glon - 360.
+! geocentric to geodetic
+    else if (iopt.eq.-1) then
+        gdlat = atan( a**2./b**2. * tan(glat*dtor) ) * radeg
+        gdlon = glon
+    else
+        print*, 'CALC_GD2GC: wrong argument iopt = ', iopt
+    endif
+
+! calculate Earth radius at point (uses geocentric latitude)
+    rho = a / sqrt( 1. + e2*sin(glat*dtor)**2. )
+
+END SUBROUTINE CALC_GD2GC
+
+
+! *************************************************************************
+! Calculates azimuth and elevation for oblate Earth.
+! Input and output positions are in degrees
+! *************************************************************************
+SUBROUTINE CALC_AZEL(lati, longi, azim, elev, gaz, gel)
+
+    use constants
+    implicit none
+    real*4,intent(in)::         lati, longi, azim, elev
+    real*4,intent(out)::        gaz, gel
+
+    real*4::    Re, glat, glon, del, tlat, tlon
+    real*4::    kxg, kyg, kzg, kxr, kyr, kzr
+
+! use temp variable to store latitude and longitude
+    tlat = lati
+    tlon = longi
+
+! Converts from geodetic to geocentric and find Earth radius
+    CALL CALC_GD2GC(1, tlat, tlon, Re, glat, glon)
+    del = tlat - glat
+
+! Ray k-vector
+    kxg = cos(elev*dtor) * sin(azim*dtor)
+    kyg = cos(elev*dtor) * cos(azim*dtor)
+    kzg = sin(elev*dtor)
+
+! Correction to the k-vector due to oblateness
+    kxr = kxg
+    kyr = kyg * cos(del*dtor) + kzg * sin(del*dtor)
+    kzr = -kyg * sin(del*dtor) + kzg * cos(del*dtor)
+
+! Finally compute corrected elevation and azimuth
+    gaz = atan2(kxr,kyr) * radeg
+    gel = atan(kzr / sqrt(kxr**2. + kyr**2.) ) * radeg
+
+END SUBROUTINE CALC_AZEL
+
+
+! *************************************************************************
+! Calculates aspect angle and determines if it satisfies reflection conditions
+! Calculations are performed in the propagation plane with:
+! - Z axis directed upward.
+! - X axis in the direction of propagation,
+!   tangential to the Earth at current position.
+! *************************************************************************
+SUBROUTINE CALC_ASPECT(edensTHT, dip, azim, stht, ftht, salt, falt, aspind, aspect)
+
+    use constants
+    implicit none
+    real*4,intent(in)::     edensTHT(500), dip(500,2)
+    real*4,intent(in)::     azim, stht, ftht, salt, falt
+    integer,intent(out)::   aspind
+    real*4,intent(out)::    aspect
+
+    real*4::    kx, kz, kvec, Bx, Bz
+    real*4::    midtht, diff, middip, middec
+    integer::   temp(1)
+
+    ! Calculate k vector for current ray step
+    kx = falt*sin(ftht - stht)
+    kz = falt*cos(ftht - stht) - salt
+    kvec = sqrt(kx**2. + kz**2.)
+
+    ! Middle of the step: position and index in B grid
+    midtht = (ftht-stht)/2. + stht
+    temp = minloc(abs(edensTHT - midtht))
+    aspind = temp(1)
+
+    ! Dip and declination at this position
+    temp = dip(aspind,1)
+    middip = temp(1)
+    temp = dip(aspind,2)
+    middec = temp(1)
+
+    ! calculate vector magnetic field
+    Bx = cos(-middip*dtor) * cos(azim*dtor - middec*dtor)
+    Bz = sin(-middip*dtor)
+
+    ! calculate cosine of aspect angle
+    aspect = (Bx*kx + Bz*kz)/kvec
+
+    if (abs(aspect).le.cos(pi/2. - 1.*dtor)) then
+        aspect = acos(aspect)*radeg
+    else
+        aspind = -1
+    endif
+
+END SUBROUTINE CALC_ASPECT
+
+
+! *************************************************************************
+! Generates fixed arrays of electron densities along the azimuth path:
+!   - from 60 to 560 km in 1km steps
+!   - over 2500km surface distance in 5km steps
+! *************************************************************************
+SUBROUTINE LOAD_BEAM_PROFILE(params,edensARR, edensPOS, edensTHT, dip)
+    use constants
+    implicit none
+    type(prm),intent(in)::                      params
+
+    integer i,j,stat
+    integer nrows
+    parameter (nrows=500)
+    character(100):: msg
+
+    real*4,dimension(500,500),intent(out)::     edensARR
+    real*4,dimension(500,2),intent(out)::       edensPOS, dip
+    real*4,dimension(500),intent(out)::         edensTHT
+
+    open(unit=73,file=trim(params%edens_file),form='unformatted',recl=4*nrows,access='direct')
+    do i=1,500
+    read(unit=73,iostat=stat,iomsg=msg,rec=i) (edensARR(i,j), j=1,nrows)
+    end do
+
+    read(unit=73,rec=501) (edensPOS(j,1), j=1,nrows)
+    read(unit=73,rec=502) (edensPOS(j,2), j=1,nrows)
+
+    read(unit=73,rec=503) (dip(j,1), j=1,nrows)
+    read(unit=73,rec=504) (dip(j,2), j=1,nrows)
+
+    read(unit=73,rec=505) (edensTHT(j), j=1,nrows)
+    close(73)
+
+END SUBROUTINE LOAD_BEAM_PROFILE
+
+SUBROUTINE IRI_ARR(params, hour, azim, edensARR, edensPOS, edensTHT, dip)
+
+    use constants
+    implicit none
+    real*4,intent(in)::                         azim, hour
+    type(prm),intent(in)::                      params
+    real*4,dimension(500,500),intent(out)::     edensARR
+    real*4,dimension(500,2),intent(out)::       edensPOS, dip
+    real*4,dimension(500),intent(out)::         edensTHT
+
+    real*4::                    old_hour, vbeg, vend, vstp
+    real*4::                    lonDeg, latDeg, thtmp
+    integer::                   n, j
+    logical::                   jf(50)
+    real*4,dimension(100)::     oar
+    real*4,dimension(20,1000):: outf
+    real*4,dimension(500)::     dayNe
+
+    integer i,stat
+    integer nrows
+    parameter (nrows=500)
+    character(100):: msg
+    character(250):: datapath
+
+    datapath = params%indir
+! Initialize position
+    vbeg = 60.
+    vend = 560.
+    vstp = (vend-vbeg)/500.
+
+    ! adjust to have latitude between -90 and 90
+    edensPOS(1,1) = params%txlat
+    IF(edensPOS(1,1).gt.90.OR.edensPOS(1,1).lt.-90)THEN
+        edensPOS(1,1) = sign(modulo(-abs(edensPOS(1,1)), 90.), edensPOS(1,1))
+    ENDIF
+    ! adjust to have tongitude between 0 and 360E
+    edensPOS(1,2) = params%txlon
+    IF(edensPOS(1,2).lt.0)THEN
+        edensPOS(1,2) = modulo(edensPOS(1,2), 360.)
+    ENDIF
+    edensTHT(1) = 0.
+
+! Initialize call for IRI
+    do n=1,50
+       jf(n) = .true.
+    enddo
+    if (params%hmf2.gt.0.) then
+        jf(9) = .false.
+        oar(2) = params%hmf2
+    endif
+    if (params%nmf2.gt.0.) then
+        jf(8) = .false.
+        oar(1) = 10.**(params%nmf2)
+    endif
+    jf(2) = .false.               ! no temperatures
+    jf(3) = .false.               ! no ion composition
+    jf(5) = .false.               ! URSI foF2 model
+    jf(6) = .false.               ! Newest ion composition model
+    jf(21) = .false.              ! ion drift not computed
+    jf(23) = .false.              ! Te topside (TBT 2011)
+    jf(26) = .false.              ! no fof2 storm updating
+    jf(29) = .false.              ! New Topside options
+    jf(30) = .false.              ! NeQuick topside
+    jf(33) = .false.               ! Do not calcultae auroral boundary
+    jf(34) = .false.              ! Messages off
+    jf(35) = .false.              ! no foE storm updating
+
+! Calling IRI subroutine
+    call IRI_SUB(jf,0,edensPOS(1,1),edensPOS(1,2),params%year,params%mmdd,hour, &
+               vbeg,vend,vstp,outf,oar,datapath)
+
+    do j=1,500
+        edensARR(j,1) = outf(1,j)
+    enddo
+    dip(1,1) = oar(25)
+    dip(1,2) = oar(27)
+
+! Lat/lon loop
+    do n=2,500
+        ! Calculates new position after one step
+!        call CALC_POS(edensPOS(n-1,1), edensPOS(n-1,2), 0., azim, 5., 0., &
+!                edensPOS(n,1), edensPOS(n,2))
+
+        call CALC_POS(edensPOS(1,1), edensPOS(1,2), 0., azim, (5.*(n-1)), 0., &
+                edensPOS(n,1), edensPOS(n,2))
+
+        edensTHT(n) = acos( cos(edensPOS(1,1)*PI/180.)*cos(edensPOS(n,1)*PI/180.)* &
+                            cos((edensPOS(n,2) - edensPOS(1,2))*PI/180.) &
+                    + sin(edensPOS(1,1)*PI/180.)*sin(edensPOS(n,1)*PI/180.))
+        ! Calculates electron density and magnetic dip and dec at current position and time
+        call IRI_SUB(jf,0,edensPOS(n,1),edensPOS(n,2),params%year,params%mmdd,hour, &
+                   vbeg,vend,vstp,outf,oar,datapath)
+        ! Altitude loop (pass output of IRI_SUB to the proper matrix)
+        do j=1,500
+            edensARR(j,n) = outf(1,j) 
+        enddo
+        dip(n,1) = oar(25)
+        dip(n,2) = oar(27)
+    ENDDO
+END SUBROUTINE IRI_ARR
+
+
+! *************************************************************************
+! Interpolates electron densities at a given position
+! *************************************************************************
+SUBROUTINE IRI_INTERP(tht, alti, edensTHT, edensARR, edens)
+
+    use constants
+    implicit none
+    real*4,intent(in)::                         tht, alti
+    real*4,dimension(500),intent(in)::          edensTHT
+    real*4,dimension(500,500),intent(in)::      edensARR
+    real*4,intent(out)::                        edens
+
+    integer::   vind, thtind, i
+    real*4::    neazu, neazd
+    real*4::    dtht, tdiff
+
+    if(alti.lt.60.or.alti.gt.560.or.isnan(alti).or.isnan(tht))then
+        edens = 0.
+      return
+    endif
+
+! Look-up in table (vertical, latitudinal, longitudinal limits)
+    vind = INT(alti-60.)+1
+    thtind = 1
+    do i=1,499
+        dtht = edensTHT(i+1) - edensTHT(i)
+        tdiff = tht - edensTHT(i)
+        if (ABS(tdiff).lt.ABS(dtht)) then
+            thtind = i
+            EXIT
+        endif
+    enddo
+    if (tht.gt.edensTHT(500)) then
+        thtind = 499
+    endif
+
+!    print*, tht,alti,thtind, vind
+
+    ! Bilinear interpolation
+    neazu = (edensTHT(thtind+1) - tht)/(edensTHT(thtind+1) - edensTHT(thtind))*edensARR(vind+1,thtind) + &
+         (tht - edensTHT(thtind))/(edensTHT(thtind+1) - edensTHT(thtind))*edensARR(vind+1,thtind+1)
+    neazd = (edensTHT(thtind+1) - tht)/(edensTHT(thtind+1) - edensTHT(thtind))*edensARR(vind,thtind) + &
+         (tht - edensTHT(thtind))/(edensTHT(thtind+1) - edensTHT(thtind))*edensARR(vind,thtind+1)
+!   neazu = edensARR(vind+1,1)
+!   neazd = edensARR(vind,1)
+    edens = (alti - ((vind-1)*1.+60.))/1.*neazu + (vind*1.+60. - alti)/1.*neazd
+
+
+END SUBROUTINE IRI_INTERP
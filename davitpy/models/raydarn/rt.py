@@ -12,10 +12,19 @@ rt.Edens    store and process electron density profiles
 rt.Rays     store and process individual rays
 -------------------------------------------------------
 
+Functions
+-------------------------------------------------------
+rt.traceRays        run the code without MPI
+rt.edensSlice       IRI electron densities along an azimuth
+rt.writeEdensFile   write a user-defined electron profile
+-------------------------------------------------------
+
 Notes
 -----
-The ray tracing requires mpi to run. You can adjust the number of processors, but
-be wise about it and do not assign more than you have
+RtRun runs the ray tracing with mpi by default. With backend='pool' it uses
+the rtKernel extension and a pool of python processes instead (see
+rt.traceRays). You can adjust the number of processors, but be wise about it
+and do not assign more than you have
 
 """
 import numpy as np
@@ -61,6 +70,9 @@ class RtRun(object):
         file name where a pickled instance of RtRun was saved (supersedes all other args)
     nprocs : Optional[int]
         number of processes to use with MPI
+    backend : Optional[str]
+        'mpi' to run rtFort with mpiexec, or 'pool' to run the rtKernel 
+        extension in a pool of nprocs python processes (default='mpi')
 
     Attributes
     ----------
@@ -122,7 +134,7 @@ class RtRun(object):
         fext=None, 
         loadFrom=None, 
         edens_file=None,
-        nprocs=4):
+        nprocs=4, backend='mpi'):
         import datetime as dt
         from os import path
         from davitpy.pydarn import radar
@@ -194,7 +206,10 @@ class RtRun(object):
             inputFile = self._genInput()
             
             # Run the ray tracing
-            success = self._execute(nprocs, inputFile)
+            if backend == 'pool':
+                success = self._executePool(nprocs)
+            else:
+                success = self._execute(nprocs, inputFile)
 
 
     def _genInput(self):
@@ -281,6 +296,61 @@ class RtRun(object):
             return True
 
 
+    def _executePool(self, nprocs):
+        """Execute raytracing with rt.traceRays and write the same output 
+        files as the fortran code
+
+        Parameters
+        ----------
+        nprocs : int
+            number of python processes to use
+
+        """
+        # Parameters as read from the input file by the fortran code
+        inp = lambda x: np.float32('{:8.2f}'.format(x))
+        txlat, txlon = inp(self.site.geolat), inp(self.site.geolon)
+        azim = [inp(x) for x in self.azim]
+        elev = [inp(x) for x in self.elev]
+        hour = [self.time[0].hour + self.time[0].minute/60. + 25., 
+            self.time[1].hour + self.time[1].minute/60. + 25. + 
+            (self.time[1].day - self.time[0].day) * 24., self.dTime]
+        hour = [inp(x) for x in hour]
+        year = self.time[0].year
+        mmdd = self.time[0].month*100 + self.time[0].day
+        freq, hmf2, nmf2 = inp(self.freq), inp(self.hmf2), inp(self.nmf2)
+
+        # Loops of the fortran code
+        nhour = _nLoop(*hour)
+        if hour[1] < hour[0]:
+            nhour = int(round((24. - hour[0] + hour[1])/hour[2])) + 1
+        if hour[1] == hour[0]:
+            nhour = int(round(24./hour[2])) + 1
+        hours = _loopValues(hour[0], hour[1], hour[2], nhour, 
+            nextday=49. if hour[0] >= 25. else 24.)
+        azims = _loopValues(azim[0], azim[1], azim[2], _nLoop(*azim), 
+            clip=True)
+        elevs = _loopValues(elev[0], elev[1], elev[2], _nLoop(*elev))
+
+        out = traceRays(txlat, txlon, year, mmdd, hours, azims, elevs, freq, 
+            nhops=self.nhops, hmf2=hmf2, nmf2=nmf2, 
+            edens_file=getattr(self, 'edens_file', None), 
+            davitpy_path=self.davitpy_path, nprocs=nprocs)
+
+        # Header of the output files
+        header = np.zeros(1, dtype=_headerDtype)
+        header['n'] = [nhour, _nLoop(*azim), _nLoop(*elev)]
+        header['prm'] = [txlat, txlon] + azim + elev + [freq]
+        header['iprm'] = [self.nhops, year, mmdd]
+        header['hprm'] = hour + [hmf2, nmf2]
+        header['filext'] = self.fExt.ljust(10)
+        header['indir'] = self.davitpy_path.ljust(250)
+        header['outdir'] = self.outDir.ljust(250)
+
+        _writeOutput(self.outDir, self.fExt, header, out)
+
+        return True
+
+
     def readRays(self, saveToAscii=None):
         """Read rays.dat fortran output into dictionnary
 
@@ -440,7 +510,14 @@ class Edens(object):
     ----------
     readFrom : str
 
+    index : dict
+        'time', 'beam' (azimuth rounded to 2 decimals without a site), 
+        'hour' and 'azim' of each profile
+    data : dict
+        'th' (profile, 250), 'nel' (profile, altitude, distance) and 'dip' 
+        (profile, 250, 2)
     edens : dict
+        profiles as dict[time][beam], built from index and data on first use
 
     name : str
 
@@ -453,7 +530,7 @@ class Edens(object):
     def __init__(self, readFrom, 
         site=None, radar=None):
         self.readFrom = readFrom
-        self.edens = {}
+        self._edens = None
 
         self.name = ''
         if radar:
@@ -473,43 +550,39 @@ class Edens(object):
 
         Returns
         -------
-        Populate member edens class rt.Edens
+        Populate members index and data class rt.Edens
 
         """
-        from struct import unpack
-        import datetime as dt
-        from numpy import array
+        # Fixed size records: hour, azimuth, then every other point of 
+        # theta, electron density and dip in fortran order
+        recType = np.dtype([('hour', '<f4'), ('azim', '<f4'), 
+            ('th', '<f4', 250), ('nel', '<f4', (250, 250)), 
+            ('dip', '<f4', (2, 250))])
 
         # Read binary file
         with open(self.readFrom, 'rb') as f:
             logging.debug(self.readFrom + ' header: ')
             self.header = _readHeader(f)
-            self.edens = {}
-            while True:
-                bytes = f.read(2*4)
-                # Check for eof
-                if not bytes: break
-                # read hour and azimuth
-                hour, azim = unpack('2f', bytes)
-                # format time index
-                hour = hour - 25.
-                mm = self.header['mmdd']/100
-                dd = self.header['mmdd'] - mm*100
-                rtime = dt.datetime(self.header['year'], mm, dd) + dt.timedelta(hours=hour)
-                # format azimuth index (beam)
-                raz = site.azimToBeam(azim) if site else round(raz, 2)
-                # Initialize dicts
-                if rtime not in self.edens.keys(): self.edens[rtime] = {}
-                self.edens[rtime][raz] = {}
-                # Read edens dict
-                # self.edens[rtime][raz]['pos'] = array( unpack('{}f'.format(250*2), 
-                #     f.read(250*2*4)) )
-                self.edens[rtime][raz]['th'] = array( unpack('{}f'.format(250), 
-                    f.read(250*4)) )
-                self.edens[rtime][raz]['nel'] = array( unpack('{}f'.format(250*250), 
-                    f.read(250*250*4)) ).reshape((250,250), order='F')
-                self.edens[rtime][raz]['dip'] = array( unpack('{}f'.format(250*2), 
-                    f.read(250*2*4)) ).reshape((250,2), order='F')
+            recs = np.fromfile(f, dtype=recType)
+
+        self.index = _recordKeys(recs['hour'], recs['azim'], self.header, site)
+        self.data = {'th': recs['th'], 
+            'nel': recs['nel'].transpose((0, 2, 1)), 
+            'dip': recs['dip'].transpose((0, 2, 1))}
+        self._edens = None
+
+
+    @property
+    def edens(self):
+        """Profiles as dict[time][beam] of dicts ('th', 'nel', 'dip'), 
+        built on first use"""
+        if self._edens is None:
+            self._edens = {}
+            for i, (rtime, raz) in enumerate(zip(self.index['time'], 
+                self.index['beam'])):
+                self._edens.setdefault(rtime, {})[raz] = dict(
+                    (k, v[i]) for k, v in self.data.items())
+        return self._edens
 
 
     def plot(self, time, beam=None, maxground=2000, maxalt=500,
@@ -646,9 +719,21 @@ class Scatter(object):
         iscat.dat file to read the ionospheric scatter from
     readGSFrom : str
         gscat.dat file to read the ground scatter from
+    gsData : dict
+        one array per ground scatter field: 'time', 'beam' (azimuth 
+        rounded to 2 decimals without a site), 'hour', 'azim', 'elev', 
+        'r', 'th', 'gran', 'lat', 'lon'
+    isIndex : dict
+        'time', 'beam', 'hour', 'azim', 'elev' of each ray, and the number 
+        'nstep' and offset 'offset' of its ionospheric scatter points in 
+        isData
+    isData : dict
+        flat arrays of the ionospheric scatter points: 'r', 'th', 'gran', 
+        'rel', 'w', 'nr', 'lat', 'lon', 'h'
     gsc :
-
+        ground scatter as dict[time][beam][elev], built on first use
     isc :
+        ionospheric scatter as dict[time][beam][elev], built on first use
 
     Methods
     -------
@@ -661,15 +746,15 @@ class Scatter(object):
         site=None, radar=None):
         self.readISFrom = readISFrom
         self.readGSFrom = readGSFrom
+        self._gsc = None
+        self._isc = None
 
         # Read ground scatter
         if self.readGSFrom:
-            self.gsc = {}
             self.readGS(site=site)
 
         # Read ionospheric scatter
         if self.readISFrom:
-            self.isc = {}
             self.readIS(site=site)
 
 
@@ -683,68 +768,30 @@ class Scatter(object):
 
         Returns
         -------
-        Populate member isc class rt.Scatter
+        Populate members gsData and gsc_df class rt.Scatter
 
         """
-        from struct import unpack
-        import datetime as dt
-        import numpy as np
+        keys = ['hour', 'azim', 'elev', 'r', 'th', 'gran', 'lat', 'lon']
 
         with open(self.readGSFrom, 'rb') as f:
             # read header
             logging.debug(self.readGSFrom + ' header: ')
             self.header = _readHeader(f)
-
-            scatter_list = []
-
-            # Then read ray data, one ray at a time
-            while True:
-                bytes = f.read(3*4)
-                # Check for eof
-                if not bytes: break
-                # read number of ray steps, time, azimuth and elevation
-                rhr, raz, rel = unpack('3f', bytes)
-                # Read reminder of the record
-                rr, tht, gran, lat, lon  = unpack('5f', f.read(5*4))
-                # Convert azimuth to beam number
-                raz = site.azimToBeam(raz) if site else np.round(raz, 2)
-                # Adjust rel to 2 decimal
-                rel = np.around(rel, 2)
-                # convert time to python datetime
-                rhr = rhr - 25.
-                mm = self.header['mmdd']/100
-                dd = self.header['mmdd'] - mm*100
-                rtime = dt.datetime(self.header['year'], mm, dd) + dt.timedelta(hours=rhr)
-                # Create new entries in rays dict
-                if rtime not in self.gsc.keys(): self.gsc[rtime] = {}
-                if raz not in self.gsc[rtime].keys(): self.gsc[rtime][raz] = {}
-                if rel not in self.gsc[rtime][raz].keys(): 
-                    self.gsc[rtime][raz][rel] = {
-                        'r': np.empty(0),
-                        'th': np.empty(0),
-                        'gran': np.empty(0),
-                        'lat': np.empty(0),
-                        'lon': np.empty(0) }
-                self.gsc[rtime][raz][rel]['r'] = np.append( self.gsc[rtime][raz][rel]['r'], rr )
-                self.gsc[rtime][raz][rel]['th'] = np.append( self.gsc[rtime][raz][rel]['th'], tht )
-                self.gsc[rtime][raz][rel]['gran'] = np.append( self.gsc[rtime][raz][rel]['gran'], gran )
-                self.gsc[rtime][raz][rel]['lat'] = np.append( self.gsc[rtime][raz][rel]['lat'], lat )
-                self.gsc[rtime][raz][rel]['lon'] = np.append( self.gsc[rtime][raz][rel]['lon'], lon )
-
-                # Same thing, but let's prepare for a Pandas DataFrame...
-                tmp = {}
-                tmp['type']     = 'gs'
-                tmp['rtime']    = rtime
-                tmp['raz']      = raz
-                tmp['rel']      = rel
-                tmp['r']        = rr
-                tmp['th']       = tht
-                tmp['gran']     = gran
-                tmp['lat']      = lat
-                tmp['lon']      = lon
-                scatter_list.append(tmp)
-
-        self.gsc_df = pd.DataFrame(scatter_list)
+            # Fixed size records, one per ground hit
+            recs = np.fromfile(f, dtype=np.dtype([(k, '<f4') for k in keys]))
+
+        self.gsData = _recordKeys(recs['hour'], recs['azim'], self.header, 
+            site)
+        for k in keys[2:]:
+            self.gsData[k] = recs[k]
+        self._gsc = None
+
+        # Same thing, but in a Pandas DataFrame...
+        self.gsc_df = pd.DataFrame({'type': 'gs', 
+            'rtime': self.gsData['time'], 'raz': self.gsData['beam'], 
+            'rel': np.around(self.gsData['elev'].astype(float), 2), 
+            'r': recs['r'], 'th': recs['th'], 'gran': recs['gran'], 
+            'lat': recs['lat'], 'lon': recs['lon']})
 
     def readIS(self, site=None):
         """Read iscat.dat fortran output
@@ -756,58 +803,45 @@ class Scatter(object):
 
         Returns
         -------
-        Populate member isc class rt.Scatter
+        Populate members isIndex and isData class rt.Scatter
 
         """
-        from struct import unpack
-        import datetime as dt
-        from numpy import around, array
-
-        with open(self.readISFrom, 'rb') as f:
-            # read header
-            logging.debug(self.readISFrom+' header: ')
-            self.header = _readHeader(f)
-            # Then read ray data, one ray at a time
-            while True:
-                bytes = f.read(4*4)
-                # Check for eof
-                if not bytes: break
-                # read number of ray steps, time, azimuth and elevation
-                nstp, rhr, raz, rel = unpack('4f', bytes)
-                nstp = int(nstp)
-                # Convert azimuth to beam number
-                raz = site.azimToBeam(raz) if site else around(raz, 2)
-                # Adjust rel to 2 decimal
-                rel = around(rel, 2)
-                # convert time to python datetime
-                rhr = rhr - 25.
-                mm = self.header['mmdd']/100
-                dd = self.header['mmdd'] - mm*100
-                rtime = dt.datetime(self.header['year'], mm, dd) + dt.timedelta(hours=rhr)
-                # Create new entries in rays dict
-                if rtime not in self.isc.keys(): self.isc[rtime] = {}
-                if raz not in self.isc[rtime].keys(): self.isc[rtime][raz] = {}
-                self.isc[rtime][raz][rel] = {}
-                # Read to paths dict
-                self.isc[rtime][raz][rel]['nstp'] = nstp
-                self.isc[rtime][raz][rel]['r'] = array( unpack('{}f'.format(nstp), 
-                    f.read(nstp*4)) )
-                self.isc[rtime][raz][rel]['th'] = array( unpack('{}f'.format(nstp), 
-                    f.read(nstp*4)) )
-                self.isc[rtime][raz][rel]['gran'] = array( unpack('{}f'.format(nstp), 
-                    f.read(nstp*4)) )
-                self.isc[rtime][raz][rel]['rel'] = array( unpack('{}f'.format(nstp), 
-                    f.read(nstp*4)) )
-                self.isc[rtime][raz][rel]['w'] = array( unpack('{}f'.format(nstp), 
-                    f.read(nstp*4)) )
-                self.isc[rtime][raz][rel]['nr'] = array( unpack('{}f'.format(nstp), 
-                    f.read(nstp*4)) )
-                self.isc[rtime][raz][rel]['lat'] = array( unpack('{}f'.format(nstp), 
-                    f.read(nstp*4)) )
-                self.isc[rtime][raz][rel]['lon'] = array( unpack('{}f'.format(nstp), 
-                    f.read(nstp*4)) )
-                self.isc[rtime][raz][rel]['h'] = array( unpack('{}f'.format(nstp), 
-                    f.read(nstp*4)) )
+        keys = ['r', 'th', 'gran', 'rel', 'w', 'nr', 'lat', 'lon', 'h']
+
+        # read header
+        logging.debug(self.readISFrom+' header: ')
+        self.header, self.isIndex, self.isData = _readRecords(
+            self.readISFrom, keys, site)
+        self._isc = None
+
+
+    @property
+    def gsc(self):
+        """Ground scatter as dict[time][beam][elev] of dicts ('r', 'th', 
+        'gran', 'lat', 'lon'), built on first use"""
+        if self._gsc is None:
+            self._gsc = {}
+            gs = self.gsData
+            groups = {}
+            for i, (rtime, raz, rel) in enumerate(zip(gs['time'], gs['beam'], 
+                np.around(gs['elev'].astype(float), 2))):
+                groups.setdefault((rtime, raz, rel), []).append(i)
+            for (rtime, raz, rel), inds in groups.items():
+                self._gsc.setdefault(rtime, {}).setdefault(raz, {})[rel] = \
+                    dict((k, gs[k][inds]) for k in 
+                        ['r', 'th', 'gran', 'lat', 'lon'])
+        return self._gsc
+
+
+    @property
+    def isc(self):
+        """Ionospheric scatter as dict[time][beam][elev] of dicts ('nstp', 
+        'r', 'th', 'gran', 'rel', 'w', 'nr', 'lat', 'lon', 'h'), built on 
+        first use"""
+        if self._isc is None:
+            self._isc = _nestedDict(self.isIndex, self.isData, 'nstp', 
+                np.around(self.isIndex['elev'].astype(float), 2))
+        return self._isc
 
 
     def plot(self, time, beam=None, maxground=2000, maxalt=500,
@@ -996,8 +1030,14 @@ class Rays(object):
     ----------
     readFrom : str
         rays.dat file to read the rays from
+    index : dict
+        'time', 'beam' (azimuth rounded to 2 decimals without a site), 
+        'hour', 'azim', 'elev' of each ray, and the number 'nstep' and 
+        offset 'offset' of its steps in data
+    data : dict
+        flat arrays of the ray steps: 'r', 'th', 'gran', 'nr'
     paths :
-
+        rays as dict[time][beam][elev], built on first use
     name : str
 
 
@@ -1012,7 +1052,7 @@ class Rays(object):
         site=None, radar=None, 
         saveToAscii=None):
         self.readFrom = readFrom
-        self.paths = {}
+        self._paths = None
 
         self.name = ''
         if radar:
@@ -1036,49 +1076,24 @@ class Rays(object):
 
         Returns
         -------
-        Populate member paths class rt.Rays
+        Populate members index and data class rt.Rays
 
         """
-        from struct import unpack
-        import datetime as dt
-        from numpy import round, array
+        # read header
+        logging.debug(self.readFrom+' header: ')
+        self.header, self.index, self.data = _readRecords(self.readFrom, 
+            ['r', 'th', 'gran', 'nr'], site)
+        self._paths = None
 
-        # Read binary file
-        with open(self.readFrom, 'rb') as f:
-            # read header
-            logging.debug(self.readFrom+' header: ')
-            self.header = _readHeader(f)
-            # Then read ray data, one ray at a time
-            while True:
-                bytes = f.read(4*4)
-                # Check for eof
-                if not bytes: break
-                # read number of ray steps, time, azimuth and elevation
-                nrstep, rhr, raz, rel = unpack('4f', bytes)
-                nrstep = int(nrstep)
-                # Convert azimuth to beam number
-                raz = site.azimToBeam(raz) if site else round(raz, 2)
-                # convert time to python datetime
-                rhr = rhr - 25.
-                mm = self.header['mmdd']/100
-                dd = self.header['mmdd'] - mm*100
-                rtime = dt.datetime(self.header['year'], mm, dd) + dt.timedelta(hours=rhr)
-                # Create new entries in rays dict
-                if rtime not in self.paths.keys(): self.paths[rtime] = {}
-                if raz not in self.paths[rtime].keys(): self.paths[rtime][raz] = {}
-                self.paths[rtime][raz][rel] = {}
-                # Read to paths dict
-                self.paths[rtime][raz][rel]['nrstep'] = nrstep
-                self.paths[rtime][raz][rel]['r'] = array( unpack('{}f'.format(nrstep), 
-                    f.read(nrstep*4)) )
-                self.paths[rtime][raz][rel]['th'] = array( unpack('{}f'.format(nrstep), 
-                    f.read(nrstep*4)) )
-                self.paths[rtime][raz][rel]['gran'] = array( unpack('{}f'.format(nrstep), 
-                    f.read(nrstep*4)) )
-                # self.paths[rtime][raz][rel]['pran'] = array( unpack('{}f'.format(nrstep), 
-                #     f.read(nrstep*4)) )
-                self.paths[rtime][raz][rel]['nr'] = array( unpack('{}f'.format(nrstep), 
-                    f.read(nrstep*4)) )
+
+    @property
+    def paths(self):
+        """Rays as dict[time][beam][elev] of dicts ('nrstep', 'r', 'th', 
+        'gran', 'nr'), built on first use"""
+        if self._paths is None:
+            self._paths = _nestedDict(self.index, self.data, 'nrstep', 
+                self.index['elev'].astype(float))
+        return self._paths
 
 
     def writeToAscii(self, fname):
@@ -1302,6 +1317,465 @@ class Rays(object):
 
 
 
+#########################################################################
+# Ray tracing without MPI
+#########################################################################
+# Shared arrays holding the electron density slices and the user-defined
+# electron profile, set in each process of the pool by _poolInit
+_shared = {}
+
+
+def traceRays(txlat, txlon, year, mmdd, hours, azims, elevs, freq, nhops=1, 
+    hmf2=0., nmf2=0., edens_file=None, iriCache=False, davitpy_path=None, 
+    nprocs=4):
+    """Run the ray tracing in a pool of python processes, without MPI
+
+    Each (hour, azimuth) pair is a work unit: the electron density slice is 
+    generated and all the elevations are traced by the rtKernel extension. 
+    The electron density slices are gathered in shared arrays and the rays 
+    and scatter in flat arrays.
+
+    Parameters
+    ----------
+    txlat : float
+        transmitter latitude [degrees N]
+    txlon : float
+        transmitter longitude [degrees E]
+    year : int
+        year
+    mmdd : int
+        month and day (mmdd)
+    hours : list
+        hours (add 25 for UT)
+    azims : list
+        azimuths [degrees E]
+    elevs : list
+        elevation angles [degrees]
+    freq : float
+        operating frequency [MHz]
+    nhops : Optional[int]
+        number of hops
+    hmf2 : Optional[float]
+        F2 peak alitude [km] (default: use IRI)
+    nmf2 : Optional[float]
+        F2 peak electron density [log10(m^-3)] (default: use IRI)
+    edens_file : Optional[str]
+        user-defined electron profile used for all the work units (see 
+        writeEdensFile)
+    iriCache : Optional[bool]
+        get the electron densities from edensSlice, which caches the IRI 
+        profiles, instead of computing them in fortran (UT hours only)
+    davitpy_path : Optional[str]
+        DaViTpy install path. Default is to use rcParams' 'DAVITPY_PATH'
+    nprocs : Optional[int]
+        number of processes to use (1 runs in the calling process)
+
+    Returns
+    -------
+    out : dict
+        'hour', 'azim', 'elev': the values traced
+        'edens': dict of electron densities every other grid point, as in 
+            edens.dat: 'th' (hour, azim, 250), 'nel' (hour, azim, altitude, 
+            distance) and 'dip' (hour, azim, 250, 2)
+        'rays': dict with the number of steps 'nstep' and the offset of 
+            the first step 'offset' of each (hour, azim, elev) ray, and 
+            flat arrays of altitude 'r', theta 'th', group range 'gran' and 
+            refractive index 'nr'
+        'gscat': dict of flat arrays with one element per ground hit: 
+            'hour', 'azim', 'elev', 'r', 'th', 'gran', 'lat', 'lon'
+        'iscat': dict with the number of points 'nstep' and the offset 
+            'offset' of each (hour, azim, elev) ray, and flat arrays 'r', 
+            'th', 'gran', 'rel', 'w', 'nr', 'lat', 'lon', 'h'
+
+    Example
+    -------
+        from davitpy.models import raydarn
+        out = raydarn.rt.traceRays(37.1, -77.95, 2012, 1118, [42., 42.5], 
+            [-40., -36.76], np.arange(5., 45., .5), 11., nprocs=2)
+
+    """
+    import multiprocessing as mp
+    import ctypes
+
+    if davitpy_path is None:
+        from davitpy import rcParams
+        davitpy_path = rcParams['DAVITPY_PATH']
+
+    hours = np.asarray(hours, dtype=np.float32)
+    azims = np.asarray(azims, dtype=np.float32)
+    elevs = np.asarray(elevs, dtype=np.float32)
+    nh, na, ne = hours.size, azims.size, elevs.size
+
+    # Load the user-defined electron profile once (see LOAD_BEAM_PROFILE)
+    edens = None
+    if edens_file:
+        rec = np.fromfile(edens_file, dtype=np.float32, 
+            count=505*500).reshape((505, 500))
+        edens = {'nel': rec[:500], 'th': rec[504], 
+            'dip': rec[502:504].T.copy()}
+
+    # Shared arrays for the electron density slices
+    shared = {}
+    for k, shape in [('th', (250,)), ('nel', (250, 250)), ('dip', (250, 2))]:
+        shape = (nh, na) + shape
+        shared[k] = (mp.RawArray(ctypes.c_float, int(np.prod(shape))), shape)
+
+    prm = (float(txlat), float(txlon), year, mmdd, float(freq), nhops, 
+        float(hmf2), float(nmf2), davitpy_path, iriCache, elevs)
+    units = [(ih, ia, hours[ih], azims[ia], prm) 
+        for ih in range(nh) for ia in range(na)]
+    if nprocs > 1 and len(units) > 1:
+        pool = mp.Pool(min(nprocs, len(units)), _poolInit, (shared, edens))
+        try:
+            results = pool.map(_traceUnit, units, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        _poolInit(shared, edens)
+        results = map(_traceUnit, units)
+
+    out = {'hour': hours, 'azim': azims, 'elev': elevs}
+    out['edens'] = _sharedArrays(shared)
+
+    # Gather the rays and scatter, in (hour, azim, elev) order
+    out['rays'] = _gather([r[2] for r in results], [r[5] for r in results], 
+        (nh, na, ne), ['r', 'th', 'gran', 'nr'])
+    out['iscat'] = _gather([r[4] for r in results], [r[7] for r in results], 
+        (nh, na, ne), ['r', 'th', 'gran', 'rel', 'w', 'nr', 'lat', 'lon', 
+        'h'])
+    hits = np.concatenate([r[6] for r in results], axis=1)
+    out['gscat'] = dict(zip(['hour', 'azim', 'elev', 'r', 'th', 'gran', 
+        'lat', 'lon'], hits))
+
+    return out
+
+
+def _poolInit(shared, edens):
+    """Give a process of the pool access to the shared arrays and the 
+    user-defined electron profile"""
+    _shared.clear()
+    _shared.update(_sharedArrays(shared))
+    _shared['profile'] = edens
+
+
+def _sharedArrays(shared):
+    """numpy views of shared arrays"""
+    return dict((k, np.frombuffer(v[0], dtype=np.float32).reshape(v[1])) 
+        for k, v in shared.items())
+
+
+def _traceUnit(args):
+    """Generate the electron densities and trace the rays of one 
+    (hour, azimuth) work unit
+
+    Parameters
+    ----------
+    args : tuple
+        hour index, azimuth index, hour, azimuth, and the parameters of 
+        traceRays
+
+    Returns
+    -------
+    ih, ia, nstep, nhit, nasp, rays, hits, ionos :
+        the work unit indices and the outputs of rt_azim, with the flat 
+        arrays trimmed to their used length
+
+    """
+    import datetime as dt
+    import rtKernel
+
+    ih, ia, hour, azim, prm = args
+    (txlat, txlon, year, mmdd, freq, nhops, hmf2, nmf2, davitpy_path, 
+        iriCache, elevs) = prm
+
+    # Electron density slice
+    edens = _shared['profile']
+    if edens is not None:
+        arr, tht, dip = edens['nel'], edens['th'], edens['dip']
+    elif iriCache and hour >= 25.:
+        time = dt.datetime(year, mmdd/100, mmdd%100) + \
+            dt.timedelta(hours=float(hour) - 25.)
+        slc = edensSlice(txlat, txlon, azim, time, hmf2=hmf2, nmf2=nmf2)
+        arr, tht, dip = slc['nel'], slc['th'], slc['dip']
+    else:
+        arr, pos, tht, dip = rtKernel.rt_edens(txlat, txlon, year, mmdd, 
+            hour, azim, hmf2, nmf2, davitpy_path)
+    _shared['th'][ih, ia] = tht[::2]
+    _shared['nel'][ih, ia] = arr[::2, ::2]
+    _shared['dip'][ih, ia] = dip[::2]
+
+    # Trace the rays, growing the output arrays as needed
+    ne = elevs.size
+    nstep = np.zeros(ne, dtype=np.int32)
+    nhit = nstep.copy()
+    nasp = nstep.copy()
+    rays = np.zeros((4, 500*ne), dtype=np.float32, order='F')
+    hits = np.zeros((8, nhops*ne), dtype=np.float32, order='F')
+    ionos = np.zeros((9, 100*ne), dtype=np.float32, order='F')
+    ndone, nsused, nhused, naused = 0, 0, 0, 0
+    while ndone < ne:
+        ndone, nsused, nhused, naused = rtKernel.rt_azim(txlat, txlon, freq, 
+            nhops, hour, azim, elevs, arr, tht, dip, ndone + 1, nstep, nhit, 
+            nasp, rays, hits, ionos, nsused, nhused, naused)
+        if ndone < ne:
+            # Make sure the next ray will fit
+            rays = _grow(rays, nsused, 5000)
+            ionos = _grow(ionos, naused, 5000)
+
+    return (ih, ia, nstep, nhit, nasp, rays[:, :nsused], hits[:, :nhused], 
+        ionos[:, :naused])
+
+
+def _grow(arr, nused, nmin):
+    """Larger copy of a (n, ncap) output array of rt_azim, with room for at 
+    least nmin more elements"""
+    ncap = max(2*arr.shape[1], nused + nmin)
+    out = np.zeros((arr.shape[0], ncap), dtype=arr.dtype, order='F')
+    out[:, :nused] = arr[:, :nused]
+    return out
+
+
+def _gather(counts, data, shape, keys):
+    """Concatenate the per-unit outputs of rt_azim into flat arrays with 
+    per-ray counts and offsets"""
+    out = {}
+    out['nstep'] = np.concatenate(counts).reshape(shape)
+    out['offset'] = np.concatenate(([0], 
+        np.cumsum(out['nstep'].ravel())[:-1])).reshape(shape)
+    data = np.concatenate(data, axis=1)
+    for i, k in enumerate(keys):
+        out[k] = data[i]
+    return out
+
+
+def _nLoop(beg, end, stp):
+    """Number of iterations of a loop of the fortran code"""
+    return int(round((end - beg)/stp)) + 1
+
+
+def _loopValues(beg, end, stp, n, clip=False, nextday=None):
+    """Values of a loop of the fortran code, in single precision"""
+    beg, end, stp = np.float32(beg), np.float32(end), np.float32(stp)
+    values = []
+    val = beg
+    newday = False
+    for i in range(n):
+        if val > end: break
+        values.append(val)
+        val = np.float32(val + stp)
+        if clip:
+            if val > max(beg, end) or val < min(beg, end): val = end
+        elif nextday is not None:
+            if val >= nextday: newday = True
+            if newday and val > end: val = end
+        elif val > end:
+            val = end
+    return np.array(values, dtype=np.float32)
+
+
+# Header of the fortran output files
+_headerDtype = np.dtype([('n', '<i4', 3), ('prm', '<f4', 9), 
+    ('iprm', '<i4', 3), ('hprm', '<f4', 5), ('filext', 'S10'), 
+    ('indir', 'S250'), ('outdir', 'S250')])
+
+
+def _writeOutput(outDir, fExt, header, out):
+    """Write the output of traceRays to the files written by the fortran 
+    code, so that they can be read by Rays, Edens and Scatter"""
+    from os import path
+
+    hours, azims, elevs = out['hour'], out['azim'], out['elev']
+    fName = lambda name: path.join(outDir, '{}.{}.dat'.format(name, fExt))
+
+    with open(fName('edens'), 'wb') as f:
+        header.tofile(f)
+        ed = out['edens']
+        for ih, hour in enumerate(hours):
+            for ia, azim in enumerate(azims):
+                np.array([hour, azim], dtype=np.float32).tofile(f)
+                ed['th'][ih, ia].tofile(f)
+                ed['nel'][ih, ia].T.tofile(f)
+                ed['dip'][ih, ia].T.tofile(f)
+
+    with open(fName('gscat'), 'wb') as f:
+        header.tofile(f)
+        keys = ['hour', 'azim', 'elev', 'r', 'th', 'gran', 'lat', 'lon']
+        np.array([out['gscat'][k] for k in keys], 
+            dtype=np.float32).T.tofile(f)
+
+    for name, keys in [('rays', ['r', 'th', 'gran', 'nr']), 
+        ('iscat', ['r', 'th', 'gran', 'rel', 'w', 'nr', 'lat', 'lon', 'h'])]:
+        dat = out[name]
+        with open(fName(name), 'wb') as f:
+            header.tofile(f)
+            for ih, hour in enumerate(hours):
+                for ia, azim in enumerate(azims):
+                    for ie, elev in enumerate(elevs):
+                        n = dat['nstep'][ih, ia, ie]
+                        i0 = dat['offset'][ih, ia, ie]
+                        np.array([n, hour, azim, elev], 
+                            dtype=np.float32).tofile(f)
+                        for k in keys:
+                            dat[k][i0:i0+n].tofile(f)
+
+
+#########################################################################
+# Electron density slices
+#########################################################################
+def edensSlice(txlat, txlon, azim, time, hmf2=None, nmf2=None, cache=True):
+    """Compute the IRI electron densities used to trace rays along one
+    azimuth, on the grid of the fortran code: from 60 to 560 km altitude
+    in 1 km steps and over 2500 km ground distance in 5 km steps
+
+    Parameters
+    ----------
+    txlat : float
+        transmitter latitude [degrees N]
+    txlon : float
+        transmitter longitude [degrees E]
+    azim : float
+        azimuth [degrees E]
+    time : datetime.datetime
+        time UT
+    hmf2 : Optional[float]
+        F2 peak alitude [km] (default: use IRI)
+    nmf2 : Optional[float]
+        F2 peak electron density [log10(m^-3)] (default: use IRI)
+    cache : Optional[bool]
+        use the IRI profile cache (see models.iri.edens_profiles), so that
+        slices already computed for the same radar, time and options are
+        not computed again (default=True)
+
+    Returns
+    -------
+    edens : dict
+        'nel': electron density [m^-3], shape (altitude, distance)
+        'pos': latitude and longitude of each ground position, shape (500, 2)
+        'th': angular distance from the transmitter [rad]
+        'dip': magnetic dip and modified dip latitude, shape (500, 2)
+
+    Example
+    -------
+        import datetime as dt
+        from davitpy.models import raydarn
+        edens = raydarn.rt.edensSlice(37.1, -77.95, 0., dt.datetime(2012, 11, 18, 5))
+        raydarn.rt.writeEdensFile('/tmp/edens_bks.dat', edens)
+        rto = raydarn.RtRun(dt.datetime(2012, 11, 18, 5), rCode='bks', 
+            azim=(0., 0., 1.), edens_file='/tmp/edens_bks.dat')
+
+    """
+    from davitpy.models import iri
+
+    # Transmitter position, as adjusted by the fortran code
+    if txlat > 90. or txlat < -90.:
+        txlat = np.sign(txlat) * (-abs(txlat) % 90.)
+    if txlon < 0.:
+        txlon = txlon % 360.
+
+    dist = 5. * np.arange(500)
+    lat, lon = _calcPos(txlat, txlon, azim, dist)
+    lat[0], lon[0] = txlat, txlon
+    dtor = np.pi/180.
+    th = np.arccos(np.clip(np.cos(txlat*dtor) * np.cos(lat*dtor) * 
+        np.cos((lon - txlon)*dtor) + np.sin(txlat*dtor) * np.sin(lat*dtor), 
+        -1., 1.))
+    th[0] = 0.
+
+    jf, oarr = iri.jf_options(hmf2=hmf2, nmf2=nmf2)
+    nel, oarr = iri.edens_profiles(lat, lon, time, jf=jf, oarr=oarr, 
+        heibeg=60., heiend=560., heistp=1., cache=cache)
+
+    edens = {}
+    edens['nel'] = nel[:, :500].T.copy()
+    edens['pos'] = np.array([lat, lon]).T.astype(np.float32)
+    edens['th'] = th.astype(np.float32)
+    edens['dip'] = oarr[:, [24, 26]].copy()
+
+    return edens
+
+
+def writeEdensFile(fname, edens):
+    """Write an electron density slice as a user-defined electron profile,
+    to be passed to RtRun as edens_file
+
+    Parameters
+    ----------
+    fname : str
+        output file name
+    edens : dict
+        electron density slice, as returned by edensSlice
+
+    """
+    with open(fname, 'wb') as f:
+        np.asarray(edens['nel'], dtype=np.float32).tofile(f)
+        np.asarray(edens['pos'], dtype=np.float32).T.tofile(f)
+        np.asarray(edens['dip'], dtype=np.float32).T.tofile(f)
+        np.asarray(edens['th'], dtype=np.float32).tofile(f)
+
+
+def _calcPos(lati, longi, azim, dist):
+    """Ground position at a distance along an azimuth, accounting for the
+    oblateness of the Earth (see CALC_POS in raytrace_mpi.f90)
+
+    Parameters
+    ----------
+    lati : float
+        geodetic latitude [degrees N]
+    longi : float
+        longitude [degrees E]
+    azim : float
+        azimuth [degrees E]
+    dist : np.array
+        distances [km]
+
+    Returns
+    -------
+    lat : np.array
+        geodetic latitude [degrees N]
+    lon : np.array
+        longitude [degrees E]
+
+    """
+    dtor = np.pi/180.
+    a = 6378.137
+    b = a*(1. - 1./298.257223563)
+
+    # Geodetic to geocentric, and Earth radius
+    glat = np.arctan(b**2/a**2 * np.tan(lati*dtor)) / dtor
+    glon = longi - 360. if longi > 180. else longi
+    Re = a / np.sqrt(1. + (a**2/b**2 - 1.) * np.sin(glat*dtor)**2)
+
+    # Azimuth corrected for the oblateness of the Earth (zero elevation)
+    delta = (lati - glat)*dtor
+    kx = np.sin(azim*dtor)
+    ky = np.cos(azim*dtor) * np.cos(delta)
+    kz = -np.cos(azim*dtor) * np.sin(delta)
+    gaz = np.arctan2(kx, ky)
+    gel = np.arctan(kz / np.sqrt(kx**2 + ky**2))
+
+    coslat, sinlat = np.cos(glat*dtor), np.sin(glat*dtor)
+    coslon, sinlon = np.cos(glon*dtor), np.sin(glon*dtor)
+
+    # Step in local cartesian coordinates, rotated to global cartesian
+    sx = -dist * np.cos(gel) * np.cos(gaz)
+    sy = dist * np.cos(gel) * np.sin(gaz)
+    sz = dist * np.sin(gel)
+    tx = sinlat * sx + coslat * sz
+    tz = -coslat * sx + sinlat * sz
+    x = Re * coslat * coslon + coslon * tx - sinlon * sy
+    y = Re * coslat * sinlon + sinlon * tx + coslon * sy
+    z = Re * sinlat + tz
+
+    # Back to geodetic coordinates
+    rho = np.sqrt(x**2 + y**2 + z**2)
+    glat = 90. - np.arccos(z/rho)/dtor
+    lon = np.arctan2(y, x)/dtor
+    lat = np.arctan(a**2/b**2 * np.tan(glat*dtor)) / dtor
+
+    return lat, lon
+
+
 #########################################################################
 # Misc.
 #########################################################################
@@ -1345,6 +1819,120 @@ def _readHeader(fObj):
     return header
 
 
+def _readRecords(fName, keys, site=None):
+    """Read a rays.dat or iscat.dat file, made of variable length records: 
+    number of points, hour, azimuth, elevation, then one array per field
+
+    Parameters
+    ----------
+    fName : str
+        file name
+    keys : list
+        names of the fields of the points
+    site : Optional[pydarn.radar.radStrict.site]
+        site object of current radar
+
+    Returns
+    -------
+    header : dict
+        a dictionary of header values
+    index : dict
+        'time', 'beam', 'hour', 'azim', 'elev', number of points 'nstep' 
+        and offset 'offset' of the first point of each record
+    data : dict
+        one flat array of points per field
+
+    """
+    from os import path
+
+    with open(fName, 'rb') as f:
+        header = _readHeader(f)
+        offset = f.tell()
+    if path.getsize(fName) > offset:
+        raw = np.memmap(fName, dtype='<f4', mode='r', offset=offset)
+    else:
+        raw = np.zeros(0, dtype='<f4')
+
+    # Find the start of each record
+    starts = []
+    i = 0
+    while i < raw.size:
+        starts.append(i)
+        i += 4 + len(keys)*int(raw[i])
+    starts = np.array(starts, dtype=np.int64)
+    nstep = raw[starts].astype(np.int64)
+    first = np.concatenate(([0], np.cumsum(nstep)[:-1])).astype(np.int64)
+
+    index = _recordKeys(raw[starts + 1], raw[starts + 2], header, site)
+    index['elev'] = np.array(raw[starts + 3])
+    index['nstep'] = nstep
+    index['offset'] = first
+
+    # Position of each point of the first field, and stride between fields
+    pos = np.repeat(starts + 4 - first, nstep) + np.arange(nstep.sum())
+    stride = np.repeat(nstep, nstep)
+    data = {}
+    for k, key in enumerate(keys):
+        data[key] = np.array(raw[pos + k*stride])
+
+    return header, index, data
+
+
+def _recordKeys(hour, azim, header, site=None):
+    """Times and beams of records from their hour and azimuth
+
+    Parameters
+    ----------
+    hour : np.array
+        hours (+25 for UT)
+    azim : np.array
+        azimuths
+    header : dict
+        header of fortran output file
+    site : Optional[pydarn.radar.radStrict.site]
+        site object of current radar
+
+    Returns
+    -------
+    keys : dict
+        'time' (datetime.datetime), 'beam' (beam number, or azimuth rounded 
+        to 2 decimals without a site), 'hour' and 'azim'
+
+    """
+    import datetime as dt
+
+    mm = header['mmdd']/100
+    dd = header['mmdd'] - mm*100
+    day = dt.datetime(header['year'], mm, dd)
+
+    # Only convert each distinct value once
+    uhour, ihour = np.unique(hour, return_inverse=True)
+    times = np.empty(uhour.size, dtype=object)
+    times[:] = [day + dt.timedelta(hours=float(h) - 25.) for h in uhour]
+    uazim, iazim = np.unique(azim, return_inverse=True)
+    beams = np.empty(uazim.size, dtype=object)
+    beams[:] = [site.azimToBeam(float(a)) if site else np.round(float(a), 2) 
+        for a in uazim]
+
+    return {'time': times[ihour], 'beam': beams[iazim], 
+        'hour': np.array(hour), 'azim': np.array(azim)}
+
+
+def _nestedDict(index, data, countKey, elevs):
+    """dict[time][beam][elev] of per record dicts, holding the number of 
+    points and views of the flat arrays"""
+    out = {}
+    for i, (rtime, raz, rel) in enumerate(zip(index['time'], index['beam'], 
+        elevs)):
+        i0 = index['offset'][i]
+        n = index['nstep'][i]
+        rec = {countKey: int(n)}
+        for k, v in data.items():
+            rec[k] = v[i0:i0+n]
+        out.setdefault(rtime, {}).setdefault(raz, {})[rel] = rec
+    return out
+
+
 def _getTitle(time, beam, header, name):
     """Create a title for ground/altitude plots
 
@@ -0,0 +1,112 @@
+! Copyright (C) 2012  VT SuperDARN Lab
+! Full license can be found in LICENSE.txt
+! Ray tracing kernel callable from python (f2py), without MPI.
+! Each call sets up or traces one (hour, azimuth) work unit, so that python
+! can distribute the work units between processes.
+
+! *************************************************************************
+! Generates the IRI electron densities along one azimuth (see IRI_ARR)
+! *************************************************************************
+SUBROUTINE RT_EDENS(txlat, txlon, year, mmdd, hour, azim, hmf2, nmf2, indir, &
+                    edensARR, edensPOS, edensTHT, dip)
+
+    use constants
+    implicit none
+    real*4,intent(in)::                         txlat, txlon, hour, azim, hmf2, nmf2
+    integer,intent(in)::                        year, mmdd
+    character*250,intent(in)::                  indir
+    real*4,dimension(500,500),intent(out)::     edensARR
+    real*4,dimension(500,2),intent(out)::       edensPOS, dip
+    real*4,dimension(500),intent(out)::         edensTHT
+
+    type(prm)::     params
+
+    params%txlat = txlat
+    params%txlon = txlon
+    params%year = year
+    params%mmdd = mmdd
+    params%hmf2 = hmf2
+    params%nmf2 = nmf2
+    params%indir = indir
+
+    CALL IRI_ARR(params, hour, azim, edensARR, edensPOS, edensTHT, dip)
+
+END SUBROUTINE RT_EDENS
+
+
+! *************************************************************************
+! Traces the rays of one (hour, azimuth) work unit through an electron
+! density slice, starting with elevation elevs(istart).
+!
+! The results of each ray are appended to compact arrays:
+!   - rays(4,nscap): altitude, theta, group range, refractive index of the
+!     nstep(i) steps of ray i
+!   - hits(8,nhcap): hour, azimuth, elevation, reflection altitude, theta,
+!     group range, latitude, longitude of the nhit(i) ground hits of ray i
+!   - ionos(9,nacap): altitude, theta, group range, elevation, weight,
+!     refractive index, latitude, longitude, step size of the nasp(i)
+!     ionospheric scatter points of ray i
+! nsused, nhused and naused count the elements in use. If a ray does not
+! fit, the subroutine returns early; it may then be called again with larger
+! arrays and istart=ndone+1.
+! *************************************************************************
+SUBROUTINE RT_AZIM(txlat, txlon, freq, nhop, hour, azim, nelev, elevs, &
+                   edensARR, edensTHT, dip, istart, nscap, nhcap, nacap, &
+                   nstep, nhit, nasp, rays, hits, ionos, ndone, nsused, nhused, naused)
+
+    use constants
+    implicit none
+    real*4,intent(in)::                         txlat, txlon, freq, hour, azim
+    integer,intent(in)::                        nhop, nelev, istart, nscap, nhcap, nacap
+    real*4,dimension(nelev),intent(in)::        elevs
+    real*4,dimension(500,500),intent(in)::      edensARR
+    real*4,dimension(500,2),intent(in)::        dip
+    real*4,dimension(500),intent(in)::          edensTHT
+    integer,dimension(nelev),intent(inout)::    nstep, nhit, nasp
+    real*4,dimension(4,nscap),intent(inout)::   rays
+    real*4,dimension(8,nhcap),intent(inout)::   hits
+    real*4,dimension(9,nacap),intent(inout)::   ionos
+    integer,intent(out)::                       ndone
+    integer,intent(inout)::                     nsused, nhused, naused
+
+    type(prm)::     params
+    integer::       iel, n, ns, nh, na
+    real*4,dimension(5000)::    rsave, thsave, grpsave, nrsave
+    real*4,dimension(8,nhop)::  ranout
+    real*4,dimension(9,5000)::  ionosout
+
+    params%txlat = txlat
+    params%txlon = txlon
+    params%freq = freq
+    params%nhop = nhop
+
+    ndone = istart - 1
+    do iel=istart,nelev
+        CALL RAY_RKCK(params, hour, azim, elevs(iel), edensARR, edensTHT, dip, &
+                      ns, rsave, thsave, grpsave, nrsave, nh, ranout, na, ionosout)
+
+        ! Stop before this ray if it does not fit in the output arrays
+        if (nsused+ns.gt.nscap.or.nhused+nh.gt.nhcap.or.naused+na.gt.nacap) return
+
+        do n=1,ns
+            rays(1,nsused+n) = rsave(n)
+            rays(2,nsused+n) = thsave(n)
+            rays(3,nsused+n) = grpsave(n)
+            rays(4,nsused+n) = nrsave(n)
+        enddo
+        do n=1,nh
+            hits(1:8,nhused+n) = ranout(1:8,n)
+        enddo
+        do n=1,na
+            ionos(1:9,naused+n) = ionosout(1:9,n)
+        enddo
+        nstep(iel) = ns
+        nhit(iel) = nh
+        nasp(iel) = na
+        nsused = nsused + ns
+        nhused = nhused + nh
+        naused = naused + na
+        ndone = iel
+    enddo
+
+END SUBROUTINE RT_AZIM
@@ -0,0 +1,511 @@
+# Copyright (C) 2012  VT SuperDARN Lab
+# Full license can be found in LICENSE.txt
+"""Ray-tracing lookup tables
+
+This module runs the ray tracing once over a grid of (month, UT, frequency,
+azimuth, elevation) for a radar, and stores compact tables of the ground hits
+and of the ray paths, which can then be interpolated for many echoes at once
+
+Classes
+-------------------------------------------------------
+rtTable.RtTable     build, store and interpolate the tables
+-------------------------------------------------------
+
+Notes
+-----
+All ranges are in km and all heights are in km above the ground (Re = 6370
+km, as in the ray tracing). The rays are traced with rt.traceRays, so the
+rtKernel extension is needed to build the tables, but not to use them
+
+"""
+import numpy as np
+import logging
+
+
+# Earth radius used by the ray tracing [km]
+Re = 6370.
+
+# Grid axes and table arrays written to and read from the table files
+_AXES = ['months', 'hours', 'freqs', 'azims', 'elevs', 'grans']
+_TABLES = ['gsGran', 'gsGrange', 'gsHeight', 'pathGrange', 'pathHeight']
+
+
+#########################################################################
+# Lookup tables
+#########################################################################
+class RtTable(object):
+    """Build or read ray-tracing lookup tables for a radar
+
+    Parameters
+    ----------
+    rCode : Optional[str]
+        radar 3-letter code
+    radarObj : Optional[pydarn.radar.radar]
+        radar object (overrides rCode)
+    year : Optional[int]
+        year of the ionosphere (IRI) and of the radar site
+    months : Optional[list]
+        months to trace (the rays are traced on the 15th)
+    hours : Optional[list]
+        UT hours to trace
+    freqs : Optional[list]
+        operating frequencies [MHz]
+    azims : Optional[list]
+        azimuths [degrees E] (default: the azimuths of the radar beams)
+    elevs : Optional[list]
+        elevation angles [degrees]
+    grans : Optional[list]
+        group ranges at which the ray paths are tabulated [km]
+    nhops : Optional[int]
+        number of hops
+    nprocs : Optional[int]
+        number of processes used by the ray tracing
+    iriCache : Optional[bool]
+        use the cached IRI profiles (see rt.edensSlice)
+    readFrom : Optional[str]
+        read the tables from a file written by RtTable.save instead of
+        tracing the rays
+
+    Attributes
+    ----------
+    txlat, txlon : float
+        transmitter position [degrees N, degrees E]
+    code : str
+        radar code
+    months, hours, freqs, azims, elevs, grans : np.array
+        grid axes
+    nhops : int
+        number of hops
+    gsGran, gsGrange, gsHeight : np.array
+        group range, ground range and reflection height of the ground hits,
+        (month, hour, freq, azim, elev, hop). NaN when a ray does not reach
+        the ground for that hop
+    pathGrange, pathHeight : np.array
+        ground range and height of the rays at the group ranges grans,
+        (month, hour, freq, azim, elev, gran). NaN past the end of a ray
+
+    Methods
+    -------
+    RtTable.build
+    RtTable.save
+    RtTable.read
+    RtTable.ground
+    RtTable.path
+    RtTable.geolocate
+
+    Example
+    -------
+        # Build the tables once, and save them
+        from davitpy.models import raydarn
+        tab = raydarn.RtTable(rCode='bks', year=2012, months=[11, 12],
+            freqs=[10.5, 12.])
+        tab.save('bks_2012.npz')
+        # Then get the ground range and height of echoes
+        tab = raydarn.RtTable(readFrom='bks_2012.npz')
+        out = tab.path(ut, azim, elev, slant_range, freq=tfreq*1e-3,
+            month=month)
+
+    """
+    def __init__(self, rCode=None, radarObj=None, year=None,
+        months=range(1, 13), hours=np.arange(0., 24., 2.), freqs=(11.,),
+        azims=None, elevs=np.arange(5., 50.5, 1.),
+        grans=np.arange(180., 3600., 45.), nhops=2, nprocs=4, iriCache=False,
+        readFrom=None):
+        import datetime as dt
+
+        # Read the tables from a file...
+        if readFrom:
+            self.read(readFrom)
+        # ...or trace the rays
+        else:
+            from davitpy.pydarn import radar
+
+            if not year:
+                logging.warning('No year. Using this year.')
+                year = dt.datetime.utcnow().year
+
+            # Load radar info
+            if radarObj:
+                self.radar = radarObj
+            elif rCode:
+                self.radar = radar.radar(code=rCode)
+            site = self.radar.getSiteByDate(dt.datetime(year, months[0], 15))
+            self.code = self.radar.code[0]
+            self.txlat = site.geolat
+            self.txlon = site.geolon
+
+            # Default to the beam azimuths
+            if azims is None:
+                azims = site.beamToAzim(np.arange(site.maxbeam))
+
+            # The grid axes are kept sorted for the interpolation
+            self.year = year
+            self.months = np.unique(np.asarray(months, dtype=int))
+            self.hours = np.unique(np.asarray(hours, dtype=float) % 24.)
+            self.freqs = np.unique(np.asarray(freqs, dtype=float))
+            self.azims = np.unique(np.asarray(azims, dtype=float))
+            self.elevs = np.unique(np.asarray(elevs, dtype=float))
+            self.grans = np.unique(np.asarray(grans, dtype=float))
+            self.nhops = nhops
+
+            self.build(nprocs=nprocs, iriCache=iriCache)
+
+
+    def build(self, nprocs=4, iriCache=False):
+        """Trace the rays over the grid and fill the tables
+
+        Parameters
+        ----------
+        nprocs : Optional[int]
+            number of processes used by the ray tracing
+        iriCache : Optional[bool]
+            use the cached IRI profiles (see rt.edensSlice)
+
+        Returns
+        -------
+        Populate the table members of class rtTable.RtTable
+
+        """
+        from davitpy.models.raydarn import rt
+
+        nm, nh, nf = self.months.size, self.hours.size, self.freqs.size
+        na, ne, ng = self.azims.size, self.elevs.size, self.grans.size
+
+        gshape = (nm, nh, nf, na, ne, self.nhops)
+        pshape = (nm, nh, nf, na, ne, ng)
+        for k in ['gsGran', 'gsGrange', 'gsHeight']:
+            setattr(self, k, np.empty(gshape, dtype=np.float32))
+        for k in ['pathGrange', 'pathHeight']:
+            setattr(self, k, np.empty(pshape, dtype=np.float32))
+
+        for im, month in enumerate(self.months):
+            for jf, freq in enumerate(self.freqs):
+                logging.info('Tracing {} month {} at {} MHz'.format(self.code,
+                    month, freq))
+                out = rt.traceRays(self.txlat, self.txlon, self.year,
+                    month*100 + 15, self.hours + 25., self.azims, self.elevs,
+                    freq, nhops=self.nhops, iriCache=iriCache, nprocs=nprocs)
+
+                gs = _groundTable(out, self.nhops)
+                self.gsGran[im, :, jf] = gs[0]
+                self.gsGrange[im, :, jf] = gs[1]
+                self.gsHeight[im, :, jf] = gs[2]
+
+                path = _pathTable(out, self.grans)
+                self.pathGrange[im, :, jf] = path[0]
+                self.pathHeight[im, :, jf] = path[1]
+
+
+    def save(self, filename):
+        """Save the tables to a compressed numpy file
+
+        Parameters
+        ----------
+        filename : str
+            file name (.npz)
+
+        """
+        arrays = dict((k, getattr(self, k)) for k in _AXES + _TABLES)
+        np.savez_compressed(filename, code=self.code, txlat=self.txlat,
+            txlon=self.txlon, year=self.year, nhops=self.nhops, **arrays)
+
+
+    def read(self, filename):
+        """Read the tables from a file written by RtTable.save
+
+        Parameters
+        ----------
+        filename : str
+            file name (.npz)
+
+        """
+        with np.load(filename) as f:
+            for k in _AXES + _TABLES:
+                setattr(self, k, f[k])
+            self.code = str(f['code'])
+            self.txlat = float(f['txlat'])
+            self.txlon = float(f['txlon'])
+            self.year = int(f['year'])
+            self.nhops = int(f['nhops'])
+
+
+    def ground(self, ut, azim, elev, freq=None, month=None, hop=1):
+        """Ground range, group range and reflection height of ground
+        scatter
+
+        Parameters
+        ----------
+        ut : float or np.array
+            UT hours
+        azim : float or np.array
+            azimuth [degrees E]
+        elev : float or np.array
+            elevation angle [degrees]
+        freq : Optional[float or np.array]
+            operating frequency [MHz] (default: first frequency of the table)
+        month : Optional[int or np.array]
+            month, the nearest month of the table is used (default: first
+            month of the table)
+        hop : Optional[int]
+            hop number, from 1 to nhops
+
+        Returns
+        -------
+        out : dict
+            'gran' group range [km], 'grange' ground range [km] and
+            'height' reflection height [km] at the broadcast shape of the
+            inputs. NaN where the rays do not reach the ground
+
+        """
+        assert 1 <= hop <= self.nhops, \
+            logging.error('hop must be between 1 and {}'.format(self.nhops))
+
+        coords = self._coords(ut, azim, elev, freq, month)
+        sel = (slice(None),)*5 + (hop - 1,)
+        vals = _interpTable([self.gsGran[sel], self.gsGrange[sel],
+            self.gsHeight[sel]], coords)
+        return dict(zip(['gran', 'grange', 'height'], vals))
+
+
+    def path(self, ut, azim, elev, gran, freq=None, month=None):
+        """Ground range and height of the rays at given group ranges,
+        e.g. of ionospheric scatter
+
+        Parameters
+        ----------
+        ut : float or np.array
+            UT hours
+        azim : float or np.array
+            azimuth [degrees E]
+        elev : float or np.array
+            elevation angle [degrees]
+        gran : float or np.array
+            group range [km]
+        freq : Optional[float or np.array]
+            operating frequency [MHz] (default: first frequency of the table)
+        month : Optional[int or np.array]
+            month, the nearest month of the table is used (default: first
+            month of the table)
+
+        Returns
+        -------
+        out : dict
+            'grange' ground range [km] and 'height' height [km] at the
+            broadcast shape of the inputs. NaN past the end of the rays
+
+        """
+        coords = self._coords(ut, azim, elev, freq, month)
+        coords.append((self.grans, np.asarray(gran, dtype=float), 'linear'))
+        vals = _interpTable([self.pathGrange, self.pathHeight], coords)
+        return dict(zip(['grange', 'height'], vals))
+
+
+    def geolocate(self, ut, azim, elev, gran, freq=None, month=None):
+        """Geographic position of echoes from their group range
+
+        Parameters
+        ----------
+        ut, azim, elev, gran, freq, month :
+            see RtTable.path
+
+        Returns
+        -------
+        lat : np.array
+            latitude [degrees N]
+        lon : np.array
+            longitude [degrees E]
+        height : np.array
+            height [km]
+
+        """
+        from davitpy.utils import greatCircleMove
+
+        out = self.path(ut, azim, elev, gran, freq=freq, month=month)
+        azim = np.broadcast_to(np.asarray(azim, dtype=float),
+            out['grange'].shape)
+        lat, lon = greatCircleMove(self.txlat, self.txlon, out['grange'],
+            azim, Re=Re)
+        lat = lat.reshape(out['grange'].shape)
+        lon = lon.reshape(out['grange'].shape)
+
+        return lat, lon, out['height']
+
+
+    def _coords(self, ut, azim, elev, freq, month):
+        """Table coordinates of the month, UT, frequency, azimuth and
+        elevation"""
+        if month is None:
+            month = self.months[0]
+        if freq is None:
+            freq = self.freqs[0]
+
+        # Distance to the table months, with december next to january
+        month = np.asarray(month, dtype=int)
+        dm = np.abs(month[..., np.newaxis] - self.months)
+        im = np.argmin(np.minimum(dm, 12 - dm), axis=-1)
+
+        # UT wraps around if the table hours cover the whole day
+        hmode = 'linear'
+        if self.hours.size > 1:
+            step = self.hours[1] - self.hours[0]
+            if np.isclose(self.hours[-1] + step - self.hours[0], 24.):
+                hmode = 'cyclic'
+
+        return [(self.months, im, 'index'),
+            (self.hours, np.asarray(ut, dtype=float) % 24., hmode),
+            (self.freqs, np.asarray(freq, dtype=float), 'linear'),
+            (self.azims, np.asarray(azim, dtype=float), 'linear'),
+            (self.elevs, np.asarray(elev, dtype=float), 'linear')]
+
+
+#########################################################################
+# Misc.
+#########################################################################
+def _groundTable(out, nhops):
+    """Group range, ground range and reflection height of each hop of each
+    ray of a rt.traceRays output, (hour, azim, elev, hop) [km]"""
+    gs = out['gscat']
+    shape = (out['hour'].size, out['azim'].size, out['elev'].size)
+    tabs = [np.full(shape + (nhops,), np.nan, dtype=np.float32)
+        for i in range(3)]
+
+    if gs['hour'].size:
+        # The hits of a ray follow each other, in (hour, azim, elev) order
+        ray = np.ravel_multi_index((
+            np.searchsorted(out['hour'], gs['hour']),
+            np.searchsorted(out['azim'], gs['azim']),
+            np.searchsorted(out['elev'], gs['elev'])), shape)
+        hop = np.arange(ray.size) - np.searchsorted(ray, ray)
+        keep = hop < nhops
+        ind = np.unravel_index(ray[keep], shape) + (hop[keep],)
+
+        tabs[0][ind] = gs['gran'][keep]*1e-3
+        tabs[1][ind] = gs['th'][keep]*Re
+        tabs[2][ind] = gs['r'][keep]*1e-3 - Re
+
+    return tabs
+
+
+def _pathTable(out, grans):
+    """Ground range and height of each ray of a rt.traceRays output at the
+    group ranges grans, (hour, azim, elev, gran) [km]"""
+    rays = out['rays']
+    shape = (out['hour'].size, out['azim'].size, out['elev'].size)
+    nstep = rays['nstep'].ravel().astype(np.int64)
+    offset = rays['offset'].ravel().astype(np.int64)
+    nray = nstep.size
+
+    # No ray steps were recorded (e.g., all rays were absorbed or escaped)
+    if rays['gran'].size == 0:
+        return tuple(np.full(shape + (grans.size,), np.nan, dtype=np.float32)
+            for i in range(2))
+
+    # Sort key of the steps: ray number, then group range (which increases
+    # along a ray)
+    span = 2.*max(grans.max(), rays['gran'].max()*1e-3) + 1.
+    key = np.repeat(np.arange(nray), nstep)*span + rays['gran']*1e-3
+    query = (np.arange(nray)[:, np.newaxis]*span + grans).ravel()
+
+    # Steps before and after each group range, within the same ray
+    i1 = np.searchsorted(key, query, side='right')
+    i0 = i1 - 1
+    first = np.repeat(offset, grans.size)
+    last = first + np.repeat(nstep, grans.size) - 1
+    valid = (i0 >= first) & (i1 <= last)
+    i0 = np.where(valid, i0, 0)
+    i1 = np.where(valid, i1, 0)
+
+    dg = key[i1] - key[i0]
+    w = np.where(dg > 0, (query - key[i0])/np.where(dg > 0, dg, 1.), 0.)
+    th = rays['th'][i0]*(1. - w) + rays['th'][i1]*w
+    r = rays['r'][i0]*(1. - w) + rays['r'][i1]*w
+
+    grange = np.where(valid, th*Re, np.nan).astype(np.float32)
+    height = np.where(valid, r*1e-3 - Re, np.nan).astype(np.float32)
+
+    return (grange.reshape(shape + (grans.size,)),
+        height.reshape(shape + (grans.size,)))
+
+
+def _interpTable(tables, coords):
+    """Multilinear interpolation in tables on the same rectilinear grid
+
+    Parameters
+    ----------
+    tables : list
+        table values, one dimension per coordinate
+    coords : list
+        (grid, values, mode) of each dimension: mode is 'linear' (values
+        outside the grid give NaN), 'cyclic' (the grid wraps around 24) or
+        'index' (values are indices of the grid). A grid with a single 
+        value is used for all the values
+
+    Returns
+    -------
+    out : list
+        interpolated values of each table at the broadcast shape of the 
+        coordinates. Corners with NaN values are left out, and the result 
+        is NaN when they hold half the weight or more
+
+    """
+    shape = np.broadcast(*[c[1] for c in coords]).shape
+    tables = [np.ascontiguousarray(t) for t in tables]
+
+    # Lower index and weight of the upper index along each dimension
+    lower, weights = [], []
+    for grid, x, mode in coords:
+        x = np.broadcast_to(x, shape).ravel()
+        if mode == 'index':
+            lower.append(x.astype(np.int64))
+            weights.append(None)
+            continue
+        n = grid.size
+        if n == 1:
+            i0 = np.zeros(x.shape, dtype=np.int64)
+            w = None
+        elif mode == 'cyclic':
+            step = grid[1] - grid[0]
+            f = ((x - grid[0]) % 24.)/step
+            i0 = np.floor(f).astype(np.int64)
+            w = f - i0
+        else:
+            i0 = np.clip(np.searchsorted(grid, x, side='right') - 1, 0, n - 2)
+            w = (x - grid[i0])/(grid[i0 + 1] - grid[i0])
+            w[(w < -1e-6) | (w > 1 + 1e-6) | np.isnan(x)] = np.nan
+            w = np.clip(w, 0., 1.)
+        lower.append(i0)
+        weights.append(w)
+
+    # Sum over the corners of the grid cells
+    size = lower[0].size
+    total = [np.zeros(size) for t in tables]
+    wsum = [np.zeros(size) for t in tables]
+    dims = [d for d, w in enumerate(weights) if w is not None]
+    tshape = tables[0].shape
+    for corner in range(2**len(dims)):
+        ind = list(lower)
+        wc = np.ones(size)
+        for b, d in enumerate(dims):
+            if (corner >> b) & 1:
+                ind[d] = (lower[d] + 1) % tshape[d]
+                wc = wc*weights[d]
+            else:
+                wc = wc*(1. - weights[d])
+        flat = np.ravel_multi_index(ind, tshape)
+        for t, table in enumerate(tables):
+            v = table.ravel()[flat]
+            ok = ~np.isnan(v) & (wc > 0)
+            total[t] += np.where(ok, v*wc, 0.)
+            wsum[t] += np.where(ok, wc, 0.)
+
+    # Out of grid coordinates
+    out = []
+    for t in range(len(tables)):
+        for w in weights:
+            if w is not None:
+                wsum[t][np.isnan(w)] = 0.
+        out.append(np.where(wsum[t] > .5, 
+            total[t]/np.where(wsum[t] > 0, wsum[t], 1.), 
+            np.nan).reshape(shape))
+
+    return out
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (C) 2012  VT SuperDARN Lab
+# Full license can be found in LICENSE.txt
+"""This module contains routines to test the ray-tracing lookup tables on
+small synthetic rt.traceRays outputs
+
+Functions
+-------------------------------------------------------------------------------
+test_synthetic_trace  Build a table from a synthetic trace and interpolate it
+test_no_ray_steps     Build a table from a trace with no ray steps
+-------------------------------------------------------------------------------
+"""
+import numpy as np
+
+import rtTable
+
+Re = rtTable.Re
+
+
+def _trace(elevs, nstep, steps, hits):
+    """Synthetic rt.traceRays output for one hour and one azimuth
+
+    Parameters
+    ----------
+    elevs : (list)
+        elevation angles [degrees]
+    nstep : (list)
+        number of ray steps of each elevation
+    steps : (list)
+        (group range, ground range, height) of the ray steps [km], in ray
+        order
+    hits : (list)
+        (elevation, group range, ground range) of the ground hits [km], in
+        ray order
+
+    Returns
+    -------
+    out : (dict)
+        trace with the 'hour', 'azim', 'elev', 'rays' and 'gscat' members
+        read by the lookup tables (lengths in m and angles in rad)
+    """
+    steps = np.array(steps, dtype=float).reshape(-1, 3)
+    hits = np.array(hits, dtype=float).reshape(-1, 3)
+    nstep = np.array(nstep, dtype=np.int32).reshape(1, 1, -1)
+    offset = np.cumsum(nstep) - nstep.ravel()
+
+    rays = {'nstep': nstep, 'offset': offset.reshape(nstep.shape),
+            'gran': steps[:, 0]*1e3, 'th': steps[:, 1]/Re,
+            'r': (steps[:, 2] + Re)*1e3}
+    gscat = {'hour': np.full(len(hits), 12.), 'azim': np.zeros(len(hits)),
+             'elev': hits[:, 0], 'gran': hits[:, 1]*1e3,
+             'th': hits[:, 2]/Re, 'r': np.full(len(hits), Re*1e3)}
+
+    return {'hour': np.array([12.]), 'azim': np.array([0.]),
+            'elev': np.array(elevs, dtype=float), 'rays': rays,
+            'gscat': gscat}
+
+
+def _table(out, grans, nhops=2):
+    """Fill a one month, one frequency RtTable from a trace, as
+    RtTable.build does for each month and frequency"""
+    tab = rtTable.RtTable.__new__(rtTable.RtTable)
+    tab.code = 'tst'
+    tab.txlat, tab.txlon = 0., 0.
+    tab.year = 2012
+    tab.months = np.array([1])
+    tab.hours = out['hour']
+    tab.freqs = np.array([11.])
+    tab.azims = out['azim']
+    tab.elevs = out['elev']
+    tab.grans = np.asarray(grans, dtype=float)
+    tab.nhops = nhops
+
+    gs = rtTable._groundTable(out, nhops)
+    tab.gsGran, tab.gsGrange, tab.gsHeight = [g[np.newaxis, :, np.newaxis]
+                                              for g in gs]
+    path = rtTable._pathTable(out, tab.grans)
+    tab.pathGrange, tab.pathHeight = [p[np.newaxis, :, np.newaxis]
+                                      for p in path]
+
+    return tab
+
+
+def test_synthetic_trace():
+    """Build a table from a synthetic trace and interpolate it
+
+    The first ray climbs linearly to 1000 km of group range and hits the
+    ground three times, the second one stops at 400 km and never comes back
+    """
+    steps = [(0., 0., 0.), (500., 400., 100.), (1000., 800., 200.),
+             (0., 0., 0.), (400., 300., 150.)]
+    hits = [(10., 1000., 800.), (10., 2000., 1600.), (10., 3000., 2400.)]
+    out = _trace([10., 20.], [3, 2], steps, hits)
+    tab = _table(out, [250., 750., 1200.])
+
+    # Path tables: linear along the rays, NaN past their ends
+    assert tab.pathGrange.shape == (1, 1, 1, 1, 2, 3)
+    assert tab.pathGrange.dtype == np.float32
+    assert np.allclose(tab.pathGrange[0, 0, 0, 0, 0, :2], [200., 600.])
+    assert np.allclose(tab.pathHeight[0, 0, 0, 0, 0, :2], [50., 150.])
+    assert np.allclose(tab.pathGrange[0, 0, 0, 0, 1, 0], 187.5)
+    assert np.allclose(tab.pathHeight[0, 0, 0, 0, 1, 0], 93.75)
+    assert np.isnan(tab.pathGrange[0, 0, 0, 0, 0, 2])
+    assert np.isnan(tab.pathHeight[0, 0, 0, 0, 1, 1:]).all()
+
+    # Ground tables: hops past nhops are dropped, NaN without a hit
+    assert tab.gsGran.shape == (1, 1, 1, 1, 2, 2)
+    assert np.allclose(tab.gsGran[0, 0, 0, 0, 0], [1000., 2000.])
+    assert np.allclose(tab.gsGrange[0, 0, 0, 0, 0], [800., 1600.])
+    assert np.allclose(tab.gsHeight[0, 0, 0, 0, 0], 0., atol=1e-3)
+    assert np.isnan(tab.gsGran[0, 0, 0, 0, 1]).all()
+
+    # Interpolation along the group range, broadcast against the inputs
+    pth = tab.path(12., 0., 10., np.array([250., 500., 700., 1000.]))
+    assert np.allclose(pth['grange'][:3], [200., 400., 560.])
+    assert np.allclose(pth['height'][:3], [50., 100., 140.])
+    assert np.isnan(pth['grange'][3])
+    gnd = tab.ground(12., 0., 10., hop=2)
+    assert np.allclose(gnd['gran'], 2000.)
+
+    # Half way between the two rays, the second one has no value at 750 km
+    pth = tab.path(12., 0., 15., np.array([250., 750.]))
+    assert np.allclose(pth['grange'][0], (200. + 187.5)/2.)
+    assert np.isnan(pth['grange'][1])
+
+    # Saved tables read back the same
+    import os
+    import tempfile
+    fd, fname = tempfile.mkstemp(suffix='.npz')
+    os.close(fd)
+    try:
+        tab.save(fname)
+        tab2 = rtTable.RtTable(readFrom=fname)
+    finally:
+        os.remove(fname)
+    assert tab2.code == 'tst' and tab2.nhops == 2
+    for k in rtTable._AXES + rtTable._TABLES:
+        np.testing.assert_array_equal(getattr(tab2, k), getattr(tab, k))
+
+
+def test_no_ray_steps():
+    """Build a table from a trace with no ray steps, e.g. when all the rays
+    escape, which gives NaN tables of the full shape"""
+    out = _trace([10., 20., 30.], [0, 0, 0], [], [])
+    tab = _table(out, [250., 750.])
+
+    for k in rtTable._TABLES:
+        assert np.isnan(getattr(tab, k)).all()
+    assert tab.pathGrange.shape == (1, 1, 1, 1, 3, 2)
+    assert tab.pathHeight.dtype == np.float32
+    assert tab.gsGran.shape == (1, 1, 1, 1, 3, 2)
+
+    pth = tab.path(12., 0., [15., 25.], 500.)
+    assert pth['grange'].shape == (2,)
+    assert np.isnan(pth['grange']).all() and np.isnan(pth['height']).all()
+
+
+if __name__ == "__main__":
+    for name in ['test_synthetic_trace', 'test_no_ray_steps']:
+        globals()[name]()
+        print name, "passed"
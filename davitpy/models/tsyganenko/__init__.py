@@ -10,6 +10,13 @@ Classes
 tsygTrace   Wraps fortran subroutines in one convenient class
 -------------------------------------------------------------
 
+Functions
+-------------------------------------------------------------
+trace_batch     Trace many field lines in one compiled call
+trace_ensemble  Trace tracks of points with time series of solar wind
+                drivers
+-------------------------------------------------------------
+
 Module
 -------------------------------
 tsygFort    Fortran subroutines
@@ -59,6 +66,8 @@ class tsygTrace(object):
         maximum tracing step size
     err : Optional[float]
         tracing step tolerance
+    nprocs : Optional[int]
+        number of processes to share the points between
 
     Attributes
     ----------
@@ -92,6 +101,12 @@ class tsygTrace(object):
         longitude of the trace footpoint in Northern/Southern hemispher
     rho[N/S]H :
         distance of the trace footpoint in Northern/Southern hemispher
+    l :
+        number of points in each traced field line
+    offset :
+        index of the first point of each field line in the flattened traces
+    [x/y/z]Trace :
+        GSW coordinates of the field lines, one row per start point
 
     Examples
     --------
@@ -125,7 +140,7 @@ class tsygTrace(object):
     def __init__(self, lat=None, lon=None, rho=None, filename=None, 
         coords='geo', datetime=None,
         vswgse=[-400.,0.,0.], pdyn=2., dst=-5., byimf=0., bzimf=-5.,
-        lmax=5000, rmax=60., rmin=1., dsmax=0.01, err=0.000001):
+        lmax=5000, rmax=60., rmin=1., dsmax=0.01, err=0.000001, nprocs=1):
         from datetime import datetime as pydt
 
         advice = ('You must provide either (lat, lon, rho) or a ' +
@@ -150,7 +165,8 @@ class tsygTrace(object):
             iTest = self.__test_valid__()
             if not iTest: self.__del__()
 
-            self.trace()
+            self.trace(lmax=lmax, rmax=rmax, rmin=rmin, dsmax=dsmax, err=err,
+                       nprocs=nprocs)
 
         else:
             self.load(filename)
@@ -189,7 +205,7 @@ class tsygTrace(object):
 
     def trace(self, lat=None, lon=None, rho=None, coords=None, datetime=None,
         vswgse=None, pdyn=None, dst=None, byimf=None, bzimf=None,
-        lmax=5000, rmax=60., rmin=1., dsmax=0.01, err=0.000001):
+        lmax=5000, rmax=60., rmin=1., dsmax=0.01, err=0.000001, nprocs=1):
         """See tsygTrace for a description of each parameter
         Any unspecified parameter default to the one stored in the object
         Unspecified lmax, rmax, rmin, dsmax, err has a set default value
@@ -226,12 +242,14 @@ class tsygTrace(object):
             maximum tracing step size
         err : Optional[float]
             tracing step tolerance
+        nprocs : Optional[int]
+            number of processes to share the points between
 
         Written by Sebastien 2012-10
 
         """
 
-        from numpy import radians, degrees, zeros
+        from numpy import arange, zeros
 
         # Store existing values of class attributes in case something is wrong
         # and we need to revert back to them
@@ -278,94 +296,24 @@ class tsygTrace(object):
             if vswgse: self.vswgse = _vswgse
             if not datetime is None: self.datetime = _datetime
 
-        # Declare the same Re as used in Tsyganenko models [km]
-        Re = 6371.2
-        
-        # Initialize trace array
-        self.l = zeros(len(lat))
-        self.xTrace = zeros((len(lat),2*lmax))
+        # Trace all the points in one go
+        trace = trace_batch(lat, lon, rho, datetime, vswgse=vswgse, pdyn=pdyn,
+                            dst=dst, byimf=byimf, bzimf=bzimf, lmax=lmax,
+                            rmax=rmax, rmin=rmin, dsmax=dsmax, err=err,
+                            nprocs=nprocs)
+        for key in ['xGsw', 'yGsw', 'zGsw', 'latNH', 'lonNH', 'rhoNH',
+                    'latSH', 'lonSH', 'rhoSH', 'l', 'offset']:
+            setattr(self, key, trace[key])
+
+        # Pad the traces into one row per point, as long as the longest trace
+        ind = int(self.l.max())
+        inTrace = arange(ind) < self.l[:, None]
+        self.xTrace = zeros((len(self.l), ind))
         self.yTrace = self.xTrace.copy()
         self.zTrace = self.xTrace.copy()
-        self.xGsw = self.l.copy()
-        self.yGsw = self.l.copy()
-        self.zGsw = self.l.copy()
-        self.latNH = self.l.copy()
-        self.lonNH = self.l.copy()
-        self.rhoNH = self.l.copy()
-        self.latSH = self.l.copy()
-        self.lonSH = self.l.copy()
-        self.rhoSH = self.l.copy()
-
-        # And now iterate through the desired points
-        for ip in xrange(len(lat)):
-            # This has to be called first
-            tsygFort.recalc_08(datetime[ip].year,datetime[ip].timetuple().tm_yday,
-                                datetime[ip].hour,datetime[ip].minute,datetime[ip].second,
-                                vswgse[0],vswgse[1],vswgse[2])
-
-            # Convert lat,lon to geographic cartesian and then gsw
-            r, theta, phi, xgeo, ygeo, zgeo = tsygFort.sphcar_08(
-                                                    rho[ip]/Re, radians(90.-lat[ip]), radians(lon[ip]),
-                                                    0., 0., 0.,
-                                                    1)
-            if coords.lower() == 'geo':
-                xgeo, ygeo, zgeo, xgsw, ygsw, zgsw = tsygFort.geogsw_08(
-                                                            xgeo, ygeo, zgeo,
-                                                            0. ,0. ,0. ,
-                                                            1)
-            self.xGsw[ip] = xgsw
-            self.yGsw[ip] = ygsw
-            self.zGsw[ip] = zgsw
-
-            # Trace field line
-            inmod = 'IGRF_GSW_08'
-            exmod = 'T96_01'
-            parmod = [pdyn, dst, byimf, bzimf, 0, 0, 0, 0, 0, 0]
-            # First towards southern hemisphere
-            maptoL = [-1, 1]
-            for mapto in maptoL:
-                xfgsw, yfgsw, zfgsw, xarr, yarr, zarr, l = tsygFort.trace_08( xgsw, ygsw, zgsw,
-                                                                mapto, dsmax, err, rmax, rmin, 0,
-                                                                parmod, exmod, inmod,
-                                                                lmax )
-
-                # Convert back to spherical geographic coords
-                xfgeo, yfgeo, zfgeo, xfgsw, yfgsw, zfgsw  = tsygFort.geogsw_08(
-                                                                    0. ,0. ,0. ,
-                                                                    xfgsw, yfgsw, zfgsw,
-                                                                    -1)
-                geoR, geoColat, geoLon, xgeo, ygeo, zgeo = tsygFort.sphcar_08(
-                                                                    0., 0., 0.,
-                                                                    xfgeo, yfgeo, zfgeo,
-                                                                    -1)
-
-                # Get coordinates of traced point
-                if mapto == 1:
-                    self.latSH[ip] = 90. - degrees(geoColat)
-                    self.lonSH[ip] = degrees(geoLon)
-                    self.rhoSH[ip] = geoR*Re
-                elif mapto == -1:
-                    self.latNH[ip] = 90. - degrees(geoColat)
-                    self.lonNH[ip] = degrees(geoLon)
-                    self.rhoNH[ip] = geoR*Re
-                    
-                # Store trace
-                if mapto == -1:
-                    self.xTrace[ip,0:l] = xarr[l-1::-1]
-                    self.yTrace[ip,0:l] = yarr[l-1::-1]
-                    self.zTrace[ip,0:l] = zarr[l-1::-1]
-                elif mapto == 1:
-                    ind = int(self.l[ip])
-                    self.xTrace[ip,ind:ind+l] = xarr[0:l]
-                    self.yTrace[ip,ind:ind+l] = yarr[0:l]
-                    self.zTrace[ip,ind:ind+l] = zarr[0:l]
-                self.l[ip] += l
-
-        # Resize trace output to more minimum possible length
-        ind = int(self.l.max())
-        self.xTrace = self.xTrace[:,0:ind]
-        self.yTrace = self.yTrace[:,0:ind]
-        self.zTrace = self.zTrace[:,0:ind]
+        self.xTrace[inTrace] = trace['xTrace']
+        self.yTrace[inTrace] = trace['yTrace']
+        self.zTrace[inTrace] = trace['zTrace']
 
 
     def __str__(self):
@@ -632,3 +580,361 @@ bzimf={:3.0f}                       [nT]
         if disp: show()
 
         return ax
+
+
+def trace_batch(lat, lon, rho, datetime, vswgse=[-400.,0.,0.], pdyn=2.,
+    dst=-5., byimf=0., bzimf=-5., lmax=5000, rmax=60., rmin=1., dsmax=0.01,
+    err=0.000001, nprocs=1):
+    """Trace the magnetic field lines through many geographic points
+
+    The points are sorted by time and traced in one call to the fortran
+    routine trace_batch_08, which only recomputes the GEOPACK transformations
+    when the time or solar wind velocity changes.  The traces are returned
+    in compact form: one flat array per coordinate and an offset and length
+    for each point.
+
+    Parameters
+    ----------
+    lat : (float or array-like)
+        latitude [degrees]
+    lon : (float or array-like)
+        longitude [degrees]
+    rho : (float or array-like)
+        distance from center of the Earth [km]
+    datetime : (datetime or array-like)
+        a python datetime object, or one per point
+    vswgse : Optional[list or array-like]
+        solar wind velocity in GSE coordinates [km/s, km/s, km/s], or an
+        (N, 3) array with one velocity per point
+    pdyn : Optional[float or array-like]
+        solar wind dynamic pressure [nPa]
+    dst : Optional[float or array-like]
+        Dst index [nT]
+    byimf : Optional[float or array-like]
+        IMF By [nT]
+    bzimf : Optional[float or array-like]
+        IMF Bz [nT]
+    lmax : Optional[int]
+        maximum number of points to trace in each direction
+    rmax : Optional[float]
+        upper trace boundary in Re
+    rmin : Optional[float]
+        lower trace boundary in Re
+    dsmax : Optional[float]
+        maximum tracing step size
+    err : Optional[float]
+        tracing step tolerance
+    nprocs : Optional[int]
+        number of processes to share the points between.  The fortran
+        routines keep their state in common blocks, so each process traces
+        a contiguous block of the time-sorted points. (default=1)
+
+    Returns
+    -------
+    trace : dict
+        lat[N/S]H, lon[N/S]H, rho[N/S]H : footpoints in the Northern and
+            Southern hemispheres [degrees, degrees, km]
+        [x/y/z]Gsw : GSW coordinates of the start points [Re]
+        l : number of points in each traced field line
+        offset : index of the first point of each field line in the flat
+            trace arrays
+        [x/y/z]Trace : GSW coordinates of all the field lines [Re], one after
+            the other in the order of the start points.  Each field line runs
+            from its northern to its southern footpoint.
+
+    Examples
+    --------
+        import numpy as np
+        import datetime as dt
+        from davitpy.models import tsyganenko
+        trace = tsyganenko.trace_batch(np.arange(50, 80, 0.5), 0., 6672.,
+                                       dt.datetime(2012, 3, 1), nprocs=4)
+        # Field line through the 3rd start point
+        i0 = trace['offset'][2]
+        xline = trace['xTrace'][i0:i0 + trace['l'][2]]
+
+    """
+    import numpy as np
+
+    # Declare the same Re as used in Tsyganenko models [km]
+    Re = 6371.2
+
+    lat, lon, rho = np.broadcast_arrays(np.atleast_1d(lat).astype(float),
+                                        np.atleast_1d(lon).astype(float),
+                                        np.atleast_1d(rho).astype(float))
+    lat, lon, rho = lat.ravel(), lon.ravel(), rho.ravel()
+    npts = lat.size
+
+    # Set up the per-point model inputs
+    times = np.empty(npts, dtype=object)
+    times[:] = datetime
+    itime = np.array([[t.year, t.timetuple().tm_yday, t.hour, t.minute,
+                       t.second] for t in times], dtype=np.int32)
+    vgse = np.empty((npts, 3), dtype=np.float32)
+    vgse[:] = vswgse
+    parmod = np.zeros((npts, 10), dtype=np.float32)
+    for i, par in enumerate([pdyn, dst, byimf, bzimf]):
+        parmod[:, i] = par
+
+    # Sort the points by time and solar wind velocity
+    order = np.lexsort(np.column_stack((itime, vgse)).T[::-1])
+    inputs = [(rho[order] / Re).astype(np.float32),
+              np.radians(90. - lat[order]).astype(np.float32),
+              np.radians(lon[order]).astype(np.float32),
+              itime[order], vgse[order], parmod[order]]
+
+    # Trace the points, splitting them between processes if desired
+    nprocs = max(1, min(nprocs, npts))
+    chunks = [[arr[ind] for arr in inputs] +
+              [lmax, rmax, rmin, dsmax, err]
+              for ind in np.array_split(np.arange(npts), nprocs)]
+    if nprocs > 1:
+        import multiprocessing as mp
+        pool = mp.Pool(nprocs)
+        try:
+            results = pool.map(_trace_chunk, chunks)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [_trace_chunk(chunks[0])]
+
+    # Put the per-point outputs back in the order of the start points
+    gsw, fnh, fsh, nl = [np.empty((npts,) + r.shape[1:], dtype=r.dtype)
+                         for r in results[0][:4]]
+    ioff = np.empty(npts, dtype=np.int64)
+    ntot = 0
+    for ind, res in zip(np.array_split(order, nprocs), results):
+        gsw[ind], fnh[ind], fsh[ind], nl[ind] = res[:4]
+        ioff[ind] = res[4] + ntot
+        ntot += len(res[5])
+    flat = [np.concatenate([res[j] for res in results]) for j in range(5, 8)]
+
+    # And the traces too, so they follow the order of the start points
+    offset = np.cumsum(nl) - nl
+    itrace = np.repeat(ioff - offset, nl) + np.arange(nl.sum())
+
+    trace = {'xGsw': gsw[:, 0], 'yGsw': gsw[:, 1], 'zGsw': gsw[:, 2],
+             'latNH': 90. - np.degrees(fnh[:, 1]),
+             'lonNH': np.degrees(fnh[:, 2]), 'rhoNH': fnh[:, 0] * Re,
+             'latSH': 90. - np.degrees(fsh[:, 1]),
+             'lonSH': np.degrees(fsh[:, 2]), 'rhoSH': fsh[:, 0] * Re,
+             'l': nl, 'offset': offset, 'xTrace': flat[0][itrace],
+             'yTrace': flat[1][itrace], 'zTrace': flat[2][itrace]}
+
+    return trace
+
+
+def trace_ensemble(lat, lon, rho, datetime, drivers=None, lmax=5000,
+    rmax=60., rmin=1., dsmax=0.01, err=0.000001, nprocs=None):
+    """Trace the magnetic field lines through tracks of points, with solar
+    wind drivers taken from time series
+
+    Each point gets the drivers of the last record at or before its time
+    (missing values are filled with the previous valid one).  Points before
+    the first record, or before the first valid value of a driver, get the
+    default value of that driver.  All the
+    points are traced together by trace_batch: the GEOPACK transformations
+    are set up once per epoch and shared by the points at that epoch, and
+    the points are split between worker processes.
+
+    Parameters
+    ----------
+    lat : (float or array-like)
+        latitude [degrees], (..., ntime) for several tracks
+    lon : (float or array-like)
+        longitude [degrees], (..., ntime)
+    rho : (float or array-like)
+        distance from center of the Earth [km], (..., ntime)
+    datetime : (array-like)
+        the ntime python datetime objects of the points of each track
+    drivers : Optional[list or dict]
+        a list of gme.ind.omni.omniRec (vxe, vye, vze, pDyn, bym, bzm and
+        symh, as a proxy for Dst), or a dict with 'time' and any of
+        'vswgse' (n, 3) [km/s], 'pdyn' [nPa], 'dst' [nT], 'byimf' [nT] and
+        'bzimf' [nT].  The drivers not given are set to the defaults of
+        trace_batch
+    lmax : Optional[int]
+        maximum number of points to trace in each direction
+    rmax : Optional[float]
+        upper trace boundary in Re
+    rmin : Optional[float]
+        lower trace boundary in Re
+    dsmax : Optional[float]
+        maximum tracing step size
+    err : Optional[float]
+        tracing step tolerance
+    nprocs : Optional[int]
+        number of processes to share the points between.  Default is the
+        number of CPUs
+
+    Returns
+    -------
+    trace : dict
+        as for trace_batch, with the outputs of each point (footpoints, GSW
+        start points, l and offset) at the broadcast shape of lat, lon and
+        rho, and the driver values used: 'vswgse', 'pdyn', 'dst', 'byimf'
+        and 'bzimf' for each time
+
+    Examples
+    --------
+        import numpy as np
+        from davitpy.gme.ind import omni
+        from davitpy.models import tsyganenko
+        # Footpoints of two spacecraft, one per minute
+        recs = omni.readOmni(sTime, eTime, res=1)
+        trace = tsyganenko.trace_ensemble(np.array([latA, latB]),
+                                          np.array([lonA, lonB]),
+                                          np.array([rhoA, rhoB]), times,
+                                          drivers=recs)
+        latNH_A = trace['latNH'][0]
+
+    """
+    import numpy as np
+    import multiprocessing as mp
+
+    times = np.empty(len(datetime), dtype=object)
+    times[:] = list(datetime)
+    lat, lon, rho = np.broadcast_arrays(np.asarray(lat, dtype=float),
+                                        np.asarray(lon, dtype=float),
+                                        np.asarray(rho, dtype=float))
+    shape = lat.shape
+    assert (shape[-1] == times.size), \
+        logging.error('the last dimension of lat, lon and rho must match ' +
+                      'datetime')
+
+    # Drivers at the time of each point
+    series = _driver_series(drivers)
+    values = {}
+    if series is not None:
+        t = times.astype('datetime64[us]')
+        ind = np.searchsorted(series['time'], t, side='right') - 1
+        before = ind < 0
+        ind = np.maximum(ind, 0)
+        for key, default in [('vswgse', [-400., 0., 0.]), ('pdyn', 2.),
+                             ('dst', -5.), ('byimf', 0.), ('bzimf', -5.)]:
+            if key not in series:
+                continue
+            val = series[key][ind]
+            # Points before the first record or the first valid value get
+            # the defaults
+            bad = before | np.isnan(val.reshape(val.shape[0], -1)).any(axis=1)
+            val[bad] = default
+            values[key] = val
+
+    npts = lat.size
+    if nprocs is None:
+        nprocs = mp.cpu_count()
+    kwargs = dict((k, np.broadcast_to(v, shape[:-1] + v.shape).reshape(
+        (npts,) + v.shape[1:])) for k, v in values.items())
+    trace = trace_batch(lat.ravel(), lon.ravel(), rho.ravel(),
+                        np.broadcast_to(times, shape).ravel(), lmax=lmax,
+                        rmax=rmax, rmin=rmin, dsmax=dsmax, err=err,
+                        nprocs=nprocs, **kwargs)
+
+    for key in ['xGsw', 'yGsw', 'zGsw', 'latNH', 'lonNH', 'rhoNH', 'latSH',
+                'lonSH', 'rhoSH', 'l', 'offset']:
+        trace[key] = trace[key].reshape(shape)
+    trace.update(values)
+
+    return trace
+
+
+def _driver_series(drivers):
+    """Time series of solar wind drivers, with missing values filled with
+    the previous valid one
+
+    Parameters
+    ----------
+    drivers : list or dict
+        omniRec list, or dict (see trace_ensemble)
+
+    Returns
+    -------
+    series : dict
+        'time' (datetime64, sorted) and driver arrays, or None
+
+    """
+    import numpy as np
+
+    if drivers is None or len(drivers) == 0:
+        return None
+
+    if isinstance(drivers, dict):
+        series = dict((k, np.array(v, dtype=float)) for k, v in
+                      drivers.items() if k != 'time')
+        times = drivers['time']
+    else:
+        def column(attr):
+            return np.array([np.nan if getattr(r, attr) is None else
+                             getattr(r, attr) for r in drivers], dtype=float)
+        series = {'vswgse': np.column_stack([column(a) for a in
+                                             ['vxe', 'vye', 'vze']]),
+                  'pdyn': column('pDyn'), 'dst': column('symh'),
+                  'byimf': column('bym'), 'bzimf': column('bzm')}
+        times = [r.time for r in drivers]
+
+    times = np.array(times, dtype='datetime64[us]')
+    order = np.argsort(times, kind='mergesort')
+    series = dict((k, v[order]) for k, v in series.items())
+    series['time'] = times[order]
+
+    # Carry the last valid value forward over the gaps
+    for key, val in series.items():
+        if key == 'time':
+            continue
+        valid = ~np.isnan(val.reshape(val.shape[0], -1)).any(axis=1)
+        last = np.maximum.accumulate(np.where(valid, np.arange(valid.size),
+                                              0))
+        series[key] = val[last]
+
+    return series
+
+
+def _trace_chunk(args):
+    """Trace a block of time-sorted points with trace_batch_08
+
+    Parameters
+    ----------
+    args : list
+        rho [Re], colatitude [rad], longitude [rad], itime, vgse, parmod,
+        lmax, rmax, rmin, dsmax, err
+
+    Returns
+    -------
+    gsw, fnh, fsh, nl, ioff, xx, yy, zz : np.ndarray
+        the outputs of trace_batch_08, with the traces trimmed to their
+        used length
+
+    """
+    import numpy as np
+
+    rho, theta, phi, itime, vgse, parmod, lmax, rmax, rmin, dsmax, err = args
+    npts = len(rho)
+
+    gsw = np.zeros((npts, 3), dtype=np.float32)
+    fnh = gsw.copy()
+    fsh = gsw.copy()
+    nl = np.zeros(npts, dtype=np.int32)
+    ioff = nl.copy()
+
+    # Start with room for short traces and grow as needed
+    ncap = max(2 * lmax, 256 * npts)
+    xyz = [np.zeros(ncap, dtype=np.float32) for i in range(3)]
+
+    ndone, nused = 0, 0
+    while ndone < npts:
+        ndone, nused = tsygFort.trace_batch_08(rho, theta, phi, itime.T,
+                                               vgse.T, parmod.T, dsmax, err,
+                                               rmax, rmin, 0, 'T96_01',
+                                               'IGRF_GSW_08', lmax, ndone + 1,
+                                               gsw.T, fnh.T, fsh.T, nl, ioff,
+                                               xyz[0], xyz[1], xyz[2], nused)
+        if ndone < npts:
+            # Make sure the next point will fit
+            ncap = max(2 * ncap, nused + 2 * lmax)
+            for i in range(3):
+                xyz[i] = np.append(xyz[i][:nused],
+                                   np.zeros(ncap - nused, dtype=np.float32))
+
+    return [gsw, fnh, fsh, nl, ioff] + [x[:nused] for x in xyz]
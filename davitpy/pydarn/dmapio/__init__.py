@@ -18,7 +18,8 @@
 dmapio
 ------
 
-Module for interfacing with dmapio c code
+Module for interfacing with dmapio c code, and for writing DMAP records in
+python
 
 """
 import logging
@@ -28,3 +29,7 @@ try:
 except Exception, e:
     logging.exception(__file__+' -> dmapio: ' + str(e))
 
+try:
+    from dmapWrite import *
+except Exception, e:
+    logging.exception(__file__+' -> dmapWrite: ' + str(e))
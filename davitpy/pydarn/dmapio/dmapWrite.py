@@ -0,0 +1,322 @@
+# Copyright (C) 2012  VT SuperDARN Lab
+# Full license can be found in LICENSE.txt
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+pydarn.dmapio.dmapWrite
+-------------------------------------
+Write DMAP records natively in python, in the format read by readDmapRec
+
+Parameters
+----------
+dmap_types : (dict)
+    DMAP data type codes for the standard fitted data record scalars and
+    arrays, keyed by the DMAP variable name
+
+Functions
+----------
+encodeDmapRec
+writeDmapRec
+writeFitRec
+"""
+
+import numpy as np
+import struct
+import logging
+
+__all__ = ['encodeDmapRec', 'writeDmapRec', 'writeFitRec']
+
+# DMAP data type codes, as defined in rst/src/dmap.h
+DATACHAR = 1
+DATASHORT = 2
+DATAINT = 3
+DATAFLOAT = 4
+DATADOUBLE = 8
+DATASTRING = 9
+DATALONG = 10
+DATACODE = 0x00010001
+
+# Little-endian formats for each data type
+_dmap_formats = {DATACHAR:'b', DATASHORT:'<i2', DATAINT:'<i4',
+                 DATAFLOAT:'<f4', DATADOUBLE:'<f8', DATALONG:'<i8'}
+
+# Data types of the standard fitted data record variables, in the order they
+# are written by the RST
+dmap_types = [('radar.revision.major', DATACHAR),
+              ('radar.revision.minor', DATACHAR), ('origin.code', DATACHAR),
+              ('origin.time', DATASTRING), ('origin.command', DATASTRING),
+              ('cp', DATASHORT), ('stid', DATASHORT), ('time.yr', DATASHORT),
+              ('time.mo', DATASHORT), ('time.dy', DATASHORT),
+              ('time.hr', DATASHORT), ('time.mt', DATASHORT),
+              ('time.sc', DATASHORT), ('time.us', DATAINT),
+              ('txpow', DATASHORT), ('nave', DATASHORT), ('atten', DATASHORT),
+              ('lagfr', DATASHORT), ('smsep', DATASHORT), ('ercod', DATASHORT),
+              ('stat.agc', DATASHORT), ('stat.lopwr', DATASHORT),
+              ('noise.search', DATAFLOAT), ('noise.mean', DATAFLOAT),
+              ('channel', DATASHORT), ('bmnum', DATASHORT),
+              ('bmazm', DATAFLOAT), ('scan', DATASHORT), ('offset', DATASHORT),
+              ('rxrise', DATASHORT), ('intt.sc', DATASHORT),
+              ('intt.us', DATAINT), ('txpl', DATASHORT), ('mpinc', DATASHORT),
+              ('mppul', DATASHORT), ('mplgs', DATASHORT),
+              ('mplgexs', DATASHORT), ('ifmode', DATASHORT),
+              ('nrang', DATASHORT), ('frang', DATASHORT), ('rsep', DATASHORT),
+              ('xcf', DATASHORT), ('tfreq', DATASHORT), ('mxpwr', DATAINT),
+              ('lvmax', DATAINT), ('fitacf.revision.major', DATAINT),
+              ('fitacf.revision.minor', DATAINT), ('combf', DATASTRING),
+              ('noise.sky', DATAFLOAT), ('noise.lag0', DATAFLOAT),
+              ('noise.vel', DATAFLOAT), ('tdiff', DATAFLOAT),
+              ('ptab', DATASHORT), ('ltab', DATASHORT), ('pwr0', DATAFLOAT),
+              ('slist', DATASHORT), ('nlag', DATASHORT), ('qflg', DATACHAR),
+              ('gflg', DATACHAR), ('p_l', DATAFLOAT), ('p_l_e', DATAFLOAT),
+              ('p_s', DATAFLOAT), ('p_s_e', DATAFLOAT), ('v', DATAFLOAT),
+              ('v_e', DATAFLOAT), ('w_l', DATAFLOAT), ('w_l_e', DATAFLOAT),
+              ('w_s', DATAFLOAT), ('w_s_e', DATAFLOAT), ('sd_l', DATAFLOAT),
+              ('sd_s', DATAFLOAT), ('sd_phi', DATAFLOAT),
+              ('x_qflg', DATACHAR), ('x_gflg', DATACHAR), ('x_p_l', DATAFLOAT),
+              ('x_p_l_e', DATAFLOAT), ('x_p_s', DATAFLOAT),
+              ('x_p_s_e', DATAFLOAT), ('x_v', DATAFLOAT), ('x_v_e', DATAFLOAT),
+              ('x_w_l', DATAFLOAT), ('x_w_l_e', DATAFLOAT),
+              ('x_w_s', DATAFLOAT), ('x_w_s_e', DATAFLOAT),
+              ('phi0', DATAFLOAT), ('phi0_e', DATAFLOAT), ('elv', DATAFLOAT),
+              ('elv_low', DATAFLOAT), ('elv_high', DATAFLOAT),
+              ('x_sd_l', DATAFLOAT), ('x_sd_s', DATAFLOAT),
+              ('x_sd_phi', DATAFLOAT)]
+_type_order = dict([(name, i) for i,(name, dtype) in enumerate(dmap_types)])
+_point_names = [name for name, dtype in dmap_types
+                if _type_order[name] >= _type_order['slist']]
+dmap_types = dict(dmap_types)
+
+# Names of the radar parameter attributes that differ from the DMAP names
+_prm_names = {'inttsc':'intt.sc', 'inttus':'intt.us', 'noisesky':'noise.sky',
+              'noisesearch':'noise.search', 'noisemean':'noise.mean'}
+
+def _dmap_type(name, value):
+    """Find the DMAP data type for a variable
+
+    Parameters
+    -----------
+    name : (str)
+        DMAP variable name
+    value : (int, float, str, or np.ndarray)
+        Variable value
+
+    Returns
+    --------
+    dtype : (int or NoneType)
+        DMAP data type code, or None if the value can't be written
+    """
+    if dmap_types.has_key(name):
+        return dmap_types[name]
+
+    value = np.asarray(value)
+    kind = value.dtype.kind
+    if kind in 'SU':
+        return DATASTRING
+    elif kind in 'biu':
+        return DATAINT
+    elif kind == 'f':
+        return DATAFLOAT
+    elif kind == 'O' and all([isinstance(v, basestring) for v in value.flat]):
+        return DATASTRING
+    return None
+
+def encodeDmapRec(scalars, arrays):
+    """Encode a DMAP record
+
+    Parameters
+    -----------
+    scalars : (dict)
+        Scalar variables, keyed by the DMAP variable name.  Variables with a
+        value of None are not written.
+    arrays : (dict)
+        Array variables, keyed by the DMAP variable name.  Multidimensional
+        arrays are written with the last index varying fastest.  Variables with
+        a value of None or no elements are not written.
+
+    Returns
+    --------
+    rec : (str)
+        The encoded record
+
+    Notes
+    ------
+    The data types of the standard fitted data variables are set by
+    dmap_types.  Other integer variables are written as 32-bit integers,
+    floating point variables as 32-bit floats, and strings (including object
+    arrays holding only strings) as strings.  Variables of any other type are
+    not written.
+    """
+    def name_order(name):
+        return (_type_order.get(name, len(_type_order)), name)
+
+    snames = sorted([name for name in scalars.keys()
+                     if scalars[name] is not None], key=name_order)
+    anames = sorted([name for name in arrays.keys()
+                     if arrays[name] is not None and
+                     np.size(arrays[name]) > 0], key=name_order)
+
+    body = list()
+    nscalars = 0
+    for name in snames:
+        value = scalars[name]
+        dtype = _dmap_type(name, value)
+        if dtype is None:
+            logging.warning("unable to write scalar [{:s}] of type {:}".format(
+                name, type(value)))
+            continue
+
+        body.append("{:s}\0{:s}".format(name, chr(dtype)))
+        nscalars += 1
+
+        if dtype == DATASTRING:
+            body.append("{:s}\0".format(value))
+        elif dtype == DATACHAR and isinstance(value, str):
+            body.append(value[:1])
+        else:
+            body.append(np.array(value,
+                                 dtype=_dmap_formats[dtype]).tostring())
+
+    narrays = 0
+    for name in anames:
+        value = np.asarray(arrays[name])
+        dtype = _dmap_type(name, value)
+        if dtype is None:
+            logging.warning("unable to write array [{:s}] of type {:}".format(
+                name, value.dtype))
+            continue
+
+        rng = value.shape[::-1]
+        body.append("{:s}\0{:s}".format(name, chr(dtype)))
+        body.append(struct.pack("<{:d}i".format(len(rng) + 1), len(rng),
+                                *rng))
+        if dtype == DATASTRING:
+            body.append("".join(["{:s}\0".format(str(v))
+                                 for v in value.flat]))
+        else:
+            body.append(value.astype(_dmap_formats[dtype]).tostring())
+        narrays += 1
+
+    body = "".join(body)
+    header = struct.pack("<4i", DATACODE, len(body) + 16, nscalars,
+                         narrays)
+
+    return header + body
+
+def writeDmapRec(scalars, arrays, fp):
+    """Write a DMAP record to an open file
+
+    Parameters
+    -----------
+    scalars : (dict)
+        Scalar variables, keyed by the DMAP variable name
+    arrays : (dict)
+        Array variables, keyed by the DMAP variable name
+    fp : (file)
+        File opened for binary writing
+
+    Returns
+    --------
+    size : (int)
+        Number of bytes written
+    """
+    rec = encodeDmapRec(scalars, arrays)
+    fp.write(rec)
+
+    return len(rec)
+
+def writeFitRec(beam, epoch, fp):
+    """Write a beam of fitted data as a DMAP record, which can be read back as
+    a fitacf file
+
+    Parameters
+    -----------
+    beam : (pydarn.sdio.radDataTypes.beamData)
+        Beam with radar parameters and fitted data.  Variables in the record
+        the beam was read from (beam.recordDict) are also written, unless they
+        are replaced by the beam's current values.
+    epoch : (float)
+        Beam time in seconds since 1 Jan 1970
+    fp : (file)
+        File opened for binary writing
+
+    Returns
+    --------
+    size : (int)
+        Number of bytes written
+
+    Notes
+    ------
+    readDmapRec does not return the last row of the lag table, so a row of
+    zeros is written in its place.
+
+    Example
+    --------
+    ::
+
+    from davitpy import utils
+    with open('filtered.fitacf', 'wb') as fp:
+        writeFitRec(beam, utils.datetimeToEpoch(beam.time), fp)
+    """
+    import datetime as dt
+
+    scalars = dict()
+    arrays = dict()
+
+    # Start with the variables from the original record
+    if isinstance(beam.recordDict, dict):
+        for name, value in beam.recordDict.iteritems():
+            if name == 'time':
+                continue
+            elif isinstance(value, list):
+                arrays[name] = value
+            else:
+                scalars[name] = value
+
+    # Update the beam and radar parameters
+    for name in ['cp', 'stid', 'bmnum', 'channel']:
+        if getattr(beam, name) is not None:
+            scalars[name] = getattr(beam, name)
+
+    for attr, value in beam.prm.__dict__.iteritems():
+        if value is not None:
+            if attr in ['ptab', 'ltab']:
+                arrays[attr] = value
+            elif not isinstance(value, list):
+                scalars[_prm_names.get(attr, attr)] = value
+
+    if arrays.has_key('ltab') and len(arrays['ltab']) > 0:
+        arrays['ltab'] = np.append(arrays['ltab'], [[0, 0]], axis=0)
+
+    # Set the record time
+    btime = dt.datetime(1970, 1, 1) + dt.timedelta(seconds=epoch)
+    scalars.update({'time.yr':btime.year, 'time.mo':btime.month,
+                    'time.dy':btime.day, 'time.hr':btime.hour,
+                    'time.mt':btime.minute, 'time.sc':btime.second,
+                    'time.us':btime.microsecond})
+
+    # Update the fitted data, which replaces all of the fitted data arrays in
+    # the original record
+    for name in arrays.keys():
+        if name in _point_names or hasattr(beam.fit, name):
+            del arrays[name]
+
+    for attr, value in beam.fit.__dict__.iteritems():
+        if isinstance(value, (list, np.ndarray)):
+            arrays[attr] = value
+
+    if scalars.has_key('npnts'):
+        scalars['npnts'] = len(arrays.get('slist', list()))
+
+    return writeDmapRec(scalars, arrays, fp)
@@ -95,18 +95,13 @@ def daynight_terminator(date, lons):
     Notes
     -----
     Adapted from mpl_toolkits.basemap.solar by Nathaniel A. Frissell, Fall 2013
+    Now computed by utils.calcSun.calcDayNightTerminator, which caches the
+    terminators by minute.
 
     """
-    import mpl_toolkits.basemap.solar as solar
+    from davitpy.utils.calcSun import calcDayNightTerminator
 
-    dg2rad = np.pi/180.
-    # compute greenwich hour angle and solar declination
-    # from datetime object (assumed UTC).
-    tau, dec = solar.epem(date)
-    # compute day/night terminator from hour angle, declination.
-    longitude = lons + tau
-    lats = np.arctan(-np.cos(longitude*dg2rad)/np.tan(dec*dg2rad))/dg2rad
-    return lats,tau,dec
+    return calcDayNightTerminator(date, lons)
 
 class musicFan(object):
     """Class to plot a fan plot using a pydarn.proc.music.musicArray object as the data source.
@@ -574,19 +569,12 @@ class musicRTI(object):
 
         # Calculate terminator. ########################################################
         if plotTerminator:
-            daylight = np.ones([nrTimes,nrGates],np.bool)
-            for tm_inx in range(nrTimes):
-                tm                  = time[tm_inx]
-                term_lons           = lonCenter[beamInx,:]
-                term_lats,tau,dec   = daynight_terminator(tm,term_lons)
-
-                if dec > 0: # NH Summer
-                    day_inx = np.where(radar_lats < term_lats)[1]
-                else:
-                    day_inx = np.where(radar_lats > term_lats)[1]
+            term_lons           = lonCenter[beamInx,:][0]
+            term_lats,tau,dec   = daynight_terminator(time,term_lons)
 
-                if day_inx.size != 0:
-                    daylight[tm_inx,day_inx] = False
+            # NH Summer if dec > 0
+            night       = np.where(dec[:,np.newaxis] > 0, radar_lats < term_lats, radar_lats > term_lats)
+            daylight    = ~night
 
         # Translate parameter information from short to long form.
         paramDict = getParamDict(metadata['param'])
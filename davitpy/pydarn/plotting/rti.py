@@ -1167,7 +1167,8 @@ def rti_panel(ax, data_dict, pArr, gsct, rad, bmnum, coords, cmap,
     bmnum : int
         The beam number of the data to plot
     coords : str
-        plotting coordinates ('gate', 'range', 'geo', 'mag')
+        plotting coordinates ('gate', 'range', 'geo', 'mag').  Magnetic
+        latitudes are found at the time of each record.
     cmap :
         a matplotlib.colors.ListedColormap (such as that returned
         by utils.plotUtils.genCmap)
@@ -1187,6 +1188,7 @@ def rti_panel(ax, data_dict, pArr, gsct, rad, bmnum, coords, cmap,
 
     """
     from davitpy import pydarn
+    from davitpy.utils.coordUtils import coord_conv
     import matplotlib
     from matplotlib.dates import date2num, num2date
     import numpy as np
@@ -1222,14 +1224,15 @@ def rti_panel(ax, data_dict, pArr, gsct, rad, bmnum, coords, cmap,
                 elif gsct and data_dict['gsflg'][i][j] == 1:
                     data[tcnt][data_dict['slist'][i][j]] = -100000.
 
-    # For geo or mag coords, get radar FOV lats/lons.
+    # For geo or mag coords, get radar FOV lats/lons.  The geographic FOV
+    # does not change with time, and is also what the terminator needs.
     if (coords != 'gate' and coords != 'rng') or plot_terminator is True:
         site = pydarn.radar.network().getRadarByCode(rad) \
             .getSiteByDate(data_dict['times'][0])
         myFov = pydarn.radar.radFov.fov(site=site, ngates=rmax,
                                         nbeams=site.maxbeam,
                                         rsep=data_dict['rsep'][0],
-                                        coords=coords,
+                                        coords='geo',
                                         date_time=data_dict['times'][0])
         myLat = myFov.latCenter[bmnum]
         myLon = myFov.lonCenter[bmnum]
@@ -1247,20 +1250,21 @@ def rti_panel(ax, data_dict, pArr, gsct, rad, bmnum, coords, cmap,
     # Generate a mesh of x and y coords to plot data to.
     X, Y = np.meshgrid(x[:tcnt], y)
 
+    if(coords == 'mag'):
+        # Convert the gate edges to magnetic coordinates at the time of
+        # each plotted record in a single call.
+        times = np.array([tm.replace(tzinfo=None) for tm in dt_list])
+        lons = np.meshgrid(x[:tcnt], myFov.lonFull[bmnum])[1]
+        dts = np.meshgrid(times, y)[0]
+        Y = coord_conv(lons, Y, 'geo', 'mag', altitude=0., date_time=dts)[1]
+
     # Calculate terminator as required.
     if plot_terminator:
-        daylight = np.ones([len(dt_list), len(myLat)], np.bool)
-        for tm_inx in range(len(dt_list)):
-            tm = dt_list[tm_inx]
-            term_lats, tau, dec = daynight_terminator(tm, myLon)
-            if dec > 0:
-                # NH Summer
-                day_inx = np.where(myLat < term_lats)[0]
-            else:
-                day_inx = np.where(myLat > term_lats)[0]
-
-            if day_inx.size != 0:
-                daylight[tm_inx, day_inx] = False
+        term_lats, tau, dec = daynight_terminator(dt_list, myLon)
+        # NH Summer if dec > 0
+        night = np.where(dec[:, np.newaxis] > 0, myLat < term_lats,
+                         myLat > term_lats)
+        daylight = ~night
         daylight = np.ma.array(daylight, mask=daylight)
         ax.pcolormesh(X, Y, daylight.T, lw=0, alpha=0.10,
                       cmap=matplotlib.cm.binary_r, zorder=99)
@@ -1282,30 +1286,26 @@ def daynight_terminator(date, lons):
 
     Parameters
     ----------
-    date : datetime.datetime
-        a datetime.datetime object (assumed UTC)
+    date : datetime.datetime or list
+        a datetime.datetime object (assumed UTC), or a list of them
     lons : list
         a numpy array of lons
 
     Returns
     -------
     lat
-        the latitude of the day night terminator
+        the latitude of the day night terminator, with shape
+        (len(date), len(lons)) for a list of dates
     tau
         grenwich hour angle
     dec
         solar declination
 
+    Notes
+    -----
+    Terminators are cached by minute (see utils.calcSun.calcDayNightTerminator)
+
     """
-    import mpl_toolkits.basemap.solar as solar
-    import numpy as np
+    from davitpy.utils.calcSun import calcDayNightTerminator
 
-    dg2rad = np.pi / 180.
-    # compute greenwich hour angle and solar declination
-    # from datetime object (assumed UTC).
-    tau, dec = solar.epem(date)
-    # compute day/night terminator from hour angle, declination.
-    longitude = lons + tau
-    lats = np.arctan(-np.cos(longitude * dg2rad) /
-                     np.tan(dec * dg2rad)) / dg2rad
-    return lats, tau, dec
+    return calcDayNightTerminator(date, lons)
@@ -7,12 +7,14 @@ This subpackage contains various data processing routines for DaViT-py
 
 Modules
 ----------------------------------------
-fov     field-of-view, propagation paths
-music   wave analysis
-signal  time series data
+fov       field-of-view, propagation paths
+music     wave analysis
+signal    time series data
+pipeline  streaming scan-by-scan processing
 ----------------------------------------
 
 """
 import signal
 import music
 import fov
+import pipeline
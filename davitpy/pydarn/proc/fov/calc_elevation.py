@@ -14,6 +14,7 @@ Functions
 calc_elv        Calculate elevation angle using phase lag
 calc_elv_w_err  Calculate elevation angle and error using phase lag
 calc_elv_list   Calculate elevation angle using input from lists or np.arrays
+calc_elv_array  Calculate elevation angle and error for arrays of observations
 ------------------------------------------------------------------------------
 
 Author: Angeline G. Burrell (AGB)
@@ -26,6 +27,180 @@ import numpy as np
 from scipy import constants as scicon
 import logging
 
+#---------------------------------------------------------------------------
+def _phase_to_elv(phi0, good, back, bm_az, tfreq, interfer, tdiff, alias):
+    """Find the phase shift and the sine of the elevation angle for arrays of
+    phase lags.  All array inputs are broadcast against each other.
+
+    Parameters
+    -----------
+    phi0 : (np.array)
+        Phase lags in radians
+    good : (np.array of bools)
+        True where the elevation angle should be calculated
+    back : (np.array)
+        1 for the front field-of-view, -1 for the rear
+    bm_az : (np.array)
+        Beam azimuth off the boresite at zero elevation (radians)
+    tfreq : (np.array)
+        Transmission frequency (kHz)
+    interfer : (list)
+        Offset of the interferometer array [X, Y, Z] (meters)
+    tdiff : (np.array)
+        Relative time delay of the interferometer signal path (microsec)
+    alias : (float)
+        Amount to offset the acceptable phase shifts by
+
+    Returns
+    --------
+    ok : (np.array of bools)
+        True where an elevation angle was found
+    fail : (np.array of bools)
+        True where the phase shift could not be fixed
+    phi_temp, amb_temp, sin_delta, cos_theta, yscale2, k, sin_az, cos_az :
+    (np.array)
+        Phase shift, phase ambiguity, sine of elevation and intermediate
+        values used by the elevation error calculation
+
+    Notes
+    ------
+    The phase shift is brought between the minimum and maximum possible
+    phase shifts by adding the number of 2 pi turns needed in one step,
+    rather than one turn at a time.
+    """
+    (phi0, good, back, bm_az, tfreq,
+     tdiff) = np.broadcast_arrays(np.asarray(phi0, dtype=float),
+                                  np.asarray(good, dtype=bool),
+                                  np.asarray(back, dtype=float),
+                                  np.asarray(bm_az, dtype=float),
+                                  np.asarray(tfreq, dtype=float),
+                                  np.asarray(tdiff, dtype=float))
+    twopi = 2.0 * np.pi
+
+    # k is the wavenumber in radians per meter
+    k = twopi * tfreq * 1.0e3 / scicon.c
+
+    # Calculate the phase shift due to the radar cables
+    del_chi = -np.pi * tfreq * tdiff * 2.0e-3
+
+    # Calculate geometry parameters
+    sin_az = np.sin(bm_az)
+    cos_az = np.cos(bm_az)
+    az_sign = 1.0 if interfer[1] > 0.0 else -1.0
+    yz_sum2 = interfer[1]**2 + interfer[2]**2
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Find the elevation angle with the maximum phase lag
+        el_max = np.maximum(np.arcsin(az_sign * interfer[2] * cos_az /
+                                      np.sqrt(yz_sum2)), 0.0)
+        cos_max = np.cos(el_max)
+        sin_max = np.sin(el_max)
+
+        # Find the maximum possible phase shift
+        chimax = k * (interfer[0] * sin_az + interfer[1] *
+                      np.sqrt(cos_max**2 - sin_az**2) + interfer[2] * sin_max)
+        chimin = chimax - (alias + 1.0) * az_sign * twopi
+        phi_max = np.maximum(chimax, chimin)
+
+        # Find the right phase.  This method works for both front and back
+        # lobe calculations, unlike the more efficient method used by RST
+        # in elevation.c.  Start with the phase in [0, 2 pi)
+        phi_temp = (back * (phi0 - del_chi)) % twopi
+        amb_temp = -np.floor(back * (phi0 - del_chi) / twopi)
+
+        # Ensure that phi_temp falls within the proper limits, stepping by
+        # az_sign * 2 pi.  Phases above the maximum can only be brought down
+        # if az_sign is negative; otherwise they are flagged below
+        if az_sign < 0.0:
+            nturn = np.where(phi_temp > phi_max,
+                             np.ceil((phi_temp - phi_max) / twopi), 0.0)
+            phi_temp -= twopi * nturn
+            amb_temp -= nturn
+
+        nturn = np.where(np.abs(phi_temp) < np.abs(chimin),
+                         np.ceil((np.abs(chimin) - az_sign * phi_temp) /
+                                 twopi), 0.0)
+        phi_temp += az_sign * twopi * nturn
+        amb_temp += az_sign * nturn
+
+        # Evaluate the phase shift
+        fail = good & (phi_temp > phi_max)
+
+        # Calcualte the elevation angle and set if realistic
+        cos_theta = phi_temp / k - interfer[0] * sin_az
+        yscale2 = ((cos_theta * interfer[2])**2 -
+                   yz_sum2 * (cos_theta**2 - (interfer[1] * cos_az)**2))
+        sin_delta = (cos_theta * interfer[2] + np.sqrt(yscale2)) / yz_sum2
+        ok = good & ~fail & (sin_delta <= 1.0)
+
+    return (ok, fail, phi_temp, amb_temp, sin_delta, cos_theta, yscale2, k,
+            sin_az, cos_az)
+
+#---------------------------------------------------------------------------
+def _elv_err(phi0_e, interfer, cos_theta, yscale2, k, sin_az, cos_az,
+             bmaz_e=0.0, boresite_e=0.0, ix_e=0.0, iy_e=0.0, iz_e=0.0,
+             tdiff_e=0.0):
+    """Propagate the provided uncertainties to find the elevation angle error
+    for arrays of observations, using the intermediate values found by
+    _phase_to_elv.  Errors may be arrays broadcastable to the observations.
+
+    Returns
+    --------
+    elv_e : (np.array)
+        Elevation angle error, or NaN if no error could be obtained
+    """
+    # If any of the errors are NaN, set to zero
+    (bmaz_e, boresite_e, ix_e, iy_e, iz_e,
+     tdiff_e) = [np.nan_to_num(np.asarray(e, dtype=float)) for e in
+                 [bmaz_e, boresite_e, ix_e, iy_e, iz_e, tdiff_e]]
+    phi0_e = np.asarray(phi0_e, dtype=float)
+    sig2_az = bmaz_e**2 + boresite_e**2
+    yz_sum2 = interfer[1]**2 + interfer[2]**2
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Calculate the phase-lag independent portion of the theta error
+        theta2_base = (sig2_az * (interfer[0] * cos_az)**2 +
+                       np.where(ix_e > 0.0, (ix_e * sin_az)**2, 0.0) +
+                       np.where(tdiff_e > 0.0,
+                                (scicon.c * tdiff_e * 1.0e-6)**2, 0.0))
+
+        # If the azimuthal error is not zero, calculate derivative
+        az_term2 = np.where(sig2_az > 0.0, (cos_az * sin_az)**2 / yscale2 *
+                            np.power(interfer[1], 4) * sig2_az, 0.0)
+
+        # If there is an error in the phase lag, add this to the theta sigma
+        # and then calculate the theta term
+        theta_term2 = theta2_base + np.where(phi0_e > 0.0, (phi0_e / k)**2,
+                                             0.0)
+        theta_term2 = np.where(theta_term2 > 0.0, theta_term2 *
+                               ((interfer[2] - interfer[1]**2 * cos_theta /
+                                 np.sqrt(yscale2)) / yz_sum2)**2, theta_term2)
+
+        # If the interferometer Y error is not zero, get derivative
+        iy_term2 = np.where(iy_e > 0.0, (yz_sum2 - 2.0 * cos_theta *
+                                         interfer[1] * interfer[2] - 2.0 *
+                                         interfer[1] * np.sqrt(yscale2) +
+                                         interfer[1]**2 * yz_sum2 *
+                                         (yz_sum2 * cos_az**2 - cos_theta**2)
+                                         / np.sqrt(yscale2))**2
+                            / np.power(yz_sum2, 4) * iy_e**2, 0.0)
+
+        # If the interferometer Z error is not zero, get derivative
+        iz_term2 = np.where(iz_e > 0.0, ((yz_sum2 * (cos_theta + interfer[2] *
+                                                    (interfer[1] * cos_az)**2
+                                                    / np.sqrt(yscale2)) -
+                                          2.0 * interfer[2] * np.sqrt(yscale2))
+                                         * iz_e)**2 / np.power(yz_sum2, 4),
+                            0.0)
+
+        # Calculate the elevation error, adding in quadrature.  If the
+        # elevation error is identically zero, assume that no error could be
+        # obtained
+        elv_e = np.sqrt(az_term2 + theta_term2 + iy_term2 + iz_term2)
+        elv_e = np.where(elv_e == 0.0, np.nan, elv_e)
+
+    return elv_e
+
 #---------------------------------------------------------------------------
 def calc_elv(beam, phi0_attr="phi0", phi0_e_attr="phi0_e", hard=None,
              tdiff=None, alias=0.0, fov='front'):
@@ -99,11 +274,6 @@ def calc_elv(beam, phi0_attr="phi0", phi0_e_attr="phi0_e", hard=None,
     else:
         phi0_e = [1.0 for p in phi0]
 
-    #-------------------------------------------------------------------------
-    # Initialize output
-    elv = np.empty(shape=(len(phi0),), dtype=float) * np.nan
-    phase_amb = np.zeros(shape=(len(phi0),), dtype=int)
-
     #-------------------------------------------------------------------------
     # If desired, load the radar hardware data for the specified site and time
     if hard is None:
@@ -127,83 +297,30 @@ def calc_elv(beam, phi0_attr="phi0", phi0_e_attr="phi0_e", hard=None,
     # angle of zero.  This is calculated by the hardware routine 'beamToAzim'
     # located in pydarn.radar.radStruct
     bm_az = np.radians(hard.beamToAzim(beam.bmnum) - hard.boresite)
-    cos_az = np.cos(bm_az)
-    sin_az = np.sin(bm_az)
-    az_sign = 1.0 if hard.interfer[1] > 0.0 else -1.0
 
-    # Find the elevation angle with the maximum phase lag
-    el_max = np.arcsin(az_sign * hard.interfer[2] * cos_az /
-                       np.sqrt(hard.interfer[1]**2 + hard.interfer[2]**2))
-    if el_max < 0.0:
-        el_max = 0.0
-
-    cos_max = np.cos(el_max)
-    sin_max = np.sin(el_max)
-
-    # k is the wavenumber in radians per meter
-    k = 2.0 * np.pi * beam.prm.tfreq * 1.0e3 / scicon.c
-
-    # Calculate the phase shift due to the radar cables
-    del_chi = -np.pi * beam.prm.tfreq * tdiff * 2.0e-3
-
-    # Find the maximum possible phase shift
-    chimax = k * (hard.interfer[0] * sin_az + hard.interfer[1] *
-                  np.sqrt(cos_max**2- sin_az**2) + hard.interfer[2] * sin_max)
-    chimin = chimax - (alias + 1.0) * az_sign * 2.0 * np.pi
-    
     #-------------------------------------------------------------------------
-    # Calculate the elevation for each value of phi0
-    for i,p0 in enumerate(phi0):
-        #---------------------------------------------------------------------
-        # Use only data where the angular drift between signals is not
-        # identically zero with an error of zero, since this could either be a
-        # sloppy flag denoting no data or an actual measurement.
-        if p0 != 0.0 or phi0_e[i] != 0.0:
-            # Find the right phase.  This method works for both front and back
-            # lobe calculations, unlike the more efficient method used by RST
-            # in elevation.c:
-            # phi_tempf = phi0 + 2.0*np.pi* np.floor(((chimax+del_chi)-phi0)/
-            #                                       (2.0*np.pi))
-            # if phi_sign < 0.:
-            #     phi_tempf += 2.0 * np.pi
-            # cos_thetaf = (phi_tempf - del_chi) / (k * asep)
-            # sin2_deltaf = cos_phi**2 - cos_thetaf**2
-            #
-            # They both yield the same elevation for front lobe calculations
-            phi_temp = (back * (p0 - del_chi)) % (2.0 * np.pi)
-            amb_temp = -np.floor(back * (p0 - del_chi) / (2.0 * np.pi))
-
-            # Ensure that phi_temp falls within the proper limits
-            while phi_temp > max(chimax, chimin):
-                phi_temp += az_sign * 2.0 * np.pi
-                amb_temp += az_sign
-
-            while abs(phi_temp) < abs(chimin):
-                phi_temp += az_sign * 2.0 * np.pi
-                amb_temp += az_sign
-
-            #--------------------------
-            # Evaluate the phase shift
-            if phi_temp > max(chimax, chimin):
-                estr = "can't fix phase shift for beam {:d}".format(beam.bmnum)
-                estr = "{:s} [{:f} not between ".format(estr, phi_temp)
-                estr = "{:s}{:f},{:f} on ".format(estr, chimin, chimax)
-                estr = "{:s}{:} at range gate {:d}".format(estr, beam.time,
-                                                           beam.fit.slist[i])
-                logging.critical(estr)
-            else:
-                # Calcualte the elevation angle and set if realistic
-                cos_theta = phi_temp / k - hard.interfer[0] * sin_az
-                yz_sum2 = hard.interfer[1]**2 + hard.interfer[2]**2
-                sin_delta = (cos_theta * hard.interfer[2] +
-                             np.sqrt((cos_theta * hard.interfer[2])**2 -
-                                     yz_sum2 * (cos_theta**2 -
-                                                (hard.interfer[1] *
-                                                 cos_az)**2))) / yz_sum2
-
-                if sin_delta <= 1.0:
-                    elv[i] = np.degrees(np.arcsin(sin_delta))
-                    phase_amb[i] = int(amb_temp)
+    # Calculate the elevation for all values of phi0 at once.  Use only data
+    # where the angular drift between signals is not identically zero with an
+    # error of zero, since this could either be a sloppy flag denoting no
+    # data or an actual measurement.
+    phi0 = np.asarray(phi0, dtype=float)
+    phi0_e = np.asarray(phi0_e, dtype=float)
+    good = (phi0 != 0.0) | (phi0_e != 0.0)
+    (ok, fail, phi_temp, amb_temp, sin_delta, cos_theta, yscale2, k, sin_az,
+     cos_az) = _phase_to_elv(phi0, good, back, bm_az, beam.prm.tfreq,
+                             hard.interfer, tdiff, alias)
+
+    for i in np.where(fail)[0]:
+        estr = "can't fix phase shift for beam {:d}".format(beam.bmnum)
+        estr = "{:s} [{:f} not between limits on ".format(estr, phi_temp[i])
+        estr = "{:s}{:} at range gate {:d}".format(estr, beam.time,
+                                                   beam.fit.slist[i])
+        logging.critical(estr)
+
+    # Set the elevation angle where realistic
+    with np.errstate(invalid='ignore'):
+        elv = np.where(ok, np.degrees(np.arcsin(sin_delta)), np.nan)
+    phase_amb = np.where(ok, amb_temp, 0).astype(int)
 
     return elv, phase_amb, hard
 
@@ -315,26 +432,6 @@ def calc_elv_w_err(beam, phi0_attr="phi0", phi0_e_attr="phi0_e", hard=None,
     else:
         phi0_e = [0.0 for p in phi0]
 
-    # If any of the errors are NaN, set to zero
-    if np.isnan(bmaz_e):
-        bmaz_e = 0.0
-    if np.isnan(boresite_e):
-        boresite_e = 0.0
-    if np.isnan(ix_e):
-        ix_e = 0.0
-    if np.isnan(iy_e):
-        iy_e = 0.0
-    if np.isnan(iz_e):
-        iz_e = 0.0
-    if np.isnan(tdiff_e):
-        tdiff_e = 0.0
-
-    #-------------------------------------------------------------------------
-    # Initialize output
-    elv = np.empty(shape=(len(phi0),), dtype=float) * np.nan
-    elv_e = np.empty(shape=(len(phi0),), dtype=float) * np.nan
-    phase_amb = np.zeros(shape=(len(phi0),), dtype=int)
-
     #-------------------------------------------------------------------------
     # If desired, load the radar hardware data for the specified site and time
     if hard is None:
@@ -358,147 +455,34 @@ def calc_elv_w_err(beam, phi0_attr="phi0", phi0_e_attr="phi0_e", hard=None,
     # angle of zero.  This is calculated by the hardware routine 'beamToAzim'
     # located in pydarn.radar.radStruct
     bm_az = np.radians(hard.beamToAzim(beam.bmnum) - hard.boresite)
-    cos_az = np.cos(bm_az)
-    sin_az = np.sin(bm_az)
-    az_sign = 1.0 if hard.interfer[1] > 0.0 else -1.0
-    sig2_az = bmaz_e**2 + boresite_e**2 
-    
-    # Find the elevation angle with the maximum phase lag
-    el_max = np.arcsin(az_sign * hard.interfer[2] * cos_az /
-                       np.sqrt(hard.interfer[1]**2 + hard.interfer[2]**2))
-    if el_max < 0.0:
-        el_max = 0.0
-
-    cos_max = np.cos(el_max)
-    sin_max = np.sin(el_max)
-    
-    # k is the wavenumber in radians per meter
-    k = 2.0 * np.pi * beam.prm.tfreq * 1.0e3 / scicon.c
-
-    # Calculate the phase-lag independent portion of the theta error
-    theta2_base = sig2_az * (hard.interfer[0] * cos_az)**2
-
-    if ix_e > 0.0:
-        theta2_base += (ix_e * sin_az)**2
-
-    if tdiff_e > 0.0:
-        theta2_base += (scicon.c * tdiff_e * 1.0e-6)**2
 
-    # Calculate the phase shift due to the radar cables
-    del_chi = -np.pi * beam.prm.tfreq * tdiff * 2.0e-3
-
-    # Find the maximum possible phase shift
-    chimax = k * (hard.interfer[0] * sin_az + hard.interfer[1] *
-                  np.sqrt(cos_max**2- sin_az**2) + hard.interfer[2] * sin_max)
-    chimin = chimax - (alias + 1.0) * az_sign * 2.0 * np.pi
-    
     #-------------------------------------------------------------------------
-    # Calculate the elevation for each value of phi0
-    for i,p0 in enumerate(phi0):
-        #---------------------------------------------------------------------
-        # Use only data where the angular drift between signals is not
-        # identically zero and the error is not NaN
-        if p0 != 0.0 and not np.isnan(phi0_e[i]):
-            # Find the right phase.  This method works for both front and back
-            # lobe calculations, unlike the more efficient method used by RST
-            # in elevation.c:
-            # phi_tempf = phi0 + 2.0*np.pi* np.floor(((chimax+del_chi)-phi0)/
-            #                                       (2.0*np.pi))
-            # if phi_sign < 0.:
-            #     phi_tempf += 2.0 * np.pi
-            # cos_thetaf = (phi_tempf - del_chi) / (k * asep)
-            # sin2_deltaf = cos_phi**2 - cos_thetaf**2
-            #
-            # They both yield the same elevation for front lobe calculations
-            phi_temp = (back * (p0 - del_chi)) % (2.0 * np.pi)
-            amb_temp = -np.floor(back * (p0 - del_chi) / (2.0 * np.pi))
-
-            # Ensure that phi_temp falls within the proper limits
-            while phi_temp > max(chimax, chimin):
-                phi_temp += az_sign * 2.0 * np.pi
-                amb_temp += az_sign
-
-            while abs(phi_temp) < abs(chimin):
-                phi_temp += az_sign * 2.0 * np.pi
-                amb_temp += az_sign
-
-            #--------------------------
-            # Evaluate the phase shift
-            if phi_temp > max(chimax, chimin):
-                estr = "can't fix phase shift for beam {:d}".format(beam.bmnum)
-                estr = "{:s} [{:f} not between ".format(estr, phi_temp)
-                estr = "{:s}{:f},{:f} on ".format(estr, chimin, chimax)
-                estr = "{:s}{:} at range gate {:d}".format(estr, beam.time,
-                                                           beam.fit.slist[i])
-                logging.critical(estr)
-            else:
-                # Calculate the elevation angle and set if realistic
-                cos_theta = phi_temp / k - hard.interfer[0] * sin_az
-                yz_sum2 = hard.interfer[1]**2 + hard.interfer[2]**2
-                yscale2 = ((cos_theta * hard.interfer[2])**2 -
-                           yz_sum2 * (cos_theta**2 -
-                                      (hard.interfer[1] * cos_az)**2))
-                sin_delta = (cos_theta * hard.interfer[2] +
-                             np.sqrt(yscale2)) / yz_sum2
-
-                if sin_delta <= 1.0:
-                    # Calculate the elevation
-                    elv[i] = np.degrees(np.arcsin(sin_delta))
-                    phase_amb[i] = int(amb_temp)
-
-                    # Now that the elevation was calculated, find the
-                    # elevation error, using the propagation of error to
-                    # propagate the provided uncertainties
-                    asin_der = 1.0 / np.sqrt(1.0 - sin_delta**2)
-
-                    # If the azimuthal error is not zero, calculate derivative
-                    if sig2_az > 0.0:
-                        az_term2 = (cos_az * sin_az)**2 / yscale2
-                        az_term2 *= np.power(hard.interfer[1], 4) * sig2_az
-
-                    else:
-                        az_term2 = 0.0
-
-                    # If there is an error in the phase lag, add this to the
-                    # theta sigma and then calculate the theta term
-                    if phi0_e[i] > 0.0:
-                        theta_term2 = theta2_base + (phi0_e[i] / k)**2
-                    else:
-                        theta_term2 = theta2_base
-
-                    if theta_term2 > 0.0:
-                        theta_term2 *= ((hard.interfer[2] - hard.interfer[1]**2
-                                        * cos_theta / np.sqrt(yscale2))
-                                       / yz_sum2)**2
-
-                    # If the interferometer Y error is not zero, get derivative
-                    if iy_e > 0.0:
-                        iy_term2 = (yz_sum2 - 2.0 * cos_theta *
-                                    hard.interfer[1] * hard.interfer[2] - 2.0 *
-                                    hard.interfer[1] * np.sqrt(yscale2) +
-                                    hard.interfer[1]**2 * yz_sum2 *
-                                    (yz_sum2 * cos_az**2 - cos_theta**2) /
-                                    np.sqrt(yscale2))**2 / np.power(yz_sum2, 4)
-                        iy_term2 *= iy_e**2
-                    else:
-                        iy_term2 = 0.0
-
-                    # If the interferometer Z error is not zero, get derivative
-                    if iz_e > 0.0:
-                        iz_term2 = ((yz_sum2 * (cos_theta + hard.interfer[2] *
-                                                (hard.interfer[1] * cos_az)**2 /
-                                                np.sqrt(yscale2)) - 2.0 *
-                                     hard.interfer[2] * np.sqrt(yscale2))
-                                    * iz_e)**2 / np.power(yz_sum2, 4)
-                    else:
-                        iz_term2 = 0.0                        
-
-                    # Calculate the elevation error, adding in quadrature
-                    temp = np.sqrt(az_term2 + theta_term2 + iy_term2 + iz_term2)
-
-                    # If the elevation error is identically zero, assume
-                    # that no error could be obtained
-                    elv_e[i] = np.nan if temp == 0.0 else temp
+    # Calculate the elevation for all values of phi0 at once.  Use only data
+    # where the angular drift between signals is not identically zero and the
+    # error is not NaN
+    phi0 = np.asarray(phi0, dtype=float)
+    phi0_e = np.asarray(phi0_e, dtype=float)
+    good = (phi0 != 0.0) & ~np.isnan(phi0_e)
+    (ok, fail, phi_temp, amb_temp, sin_delta, cos_theta, yscale2, k, sin_az,
+     cos_az) = _phase_to_elv(phi0, good, back, bm_az, beam.prm.tfreq,
+                             hard.interfer, tdiff, alias)
+
+    for i in np.where(fail)[0]:
+        estr = "can't fix phase shift for beam {:d}".format(beam.bmnum)
+        estr = "{:s} [{:f} not between limits on ".format(estr, phi_temp[i])
+        estr = "{:s}{:} at range gate {:d}".format(estr, beam.time,
+                                                   beam.fit.slist[i])
+        logging.critical(estr)
+
+    # Calculate the elevation and, using the propagation of error to
+    # propagate the provided uncertainties, the elevation error
+    with np.errstate(invalid='ignore'):
+        elv = np.where(ok, np.degrees(np.arcsin(sin_delta)), np.nan)
+    phase_amb = np.where(ok, amb_temp, 0).astype(int)
+    elv_e = np.where(ok, _elv_err(phi0_e, hard.interfer, cos_theta, yscale2,
+                                  k, sin_az, cos_az, bmaz_e=bmaz_e,
+                                  boresite_e=boresite_e, ix_e=ix_e, iy_e=iy_e,
+                                  iz_e=iz_e, tdiff_e=tdiff_e), np.nan)
 
     return elv, elv_e, phase_amb, hard
 
@@ -579,79 +563,119 @@ def calc_elv_list(phi0, phi0_e, fovflg, bm_az, tfreq, interfer_offset,
         return elv
     
     #-------------------------------------------------------------------------
-    # Calculate the elevation for each value of phi0
-    for i,p0 in enumerate(phi0):
-        #---------------------------------------------------------------------
-        # Use only data where the angular drift between signals is not
-        # identically zero with an error of zero, since this could either be a
-        # sloppy flag denoting no data or an actual measurement.
-        if p0 != 0.0 or phi0_e[i] != 0.0 and abs(fovflg[i]) == 1:
-            # Calculate the frequency based values
-            #
-            # k is the wavenumber in radians per meter
-            k = 2.0 * np.pi * tfreq[i] * 1.0e3 / scicon.c
-
-            # Calculate the phase shift due to the radar cables
-            del_chi = -np.pi * tfreq[i] * tdiff * 2.0e-3
-
-            # Calculate geometry parameters
-            sin_az = np.sin(bm_az[i])
-            cos_az = np.cos(bm_az[i])
-            az_sign = 1.0 if interfer_offset[1] > 0.0 else -1.0
-
-            # Find the elevation angle with the maximum phase lag
-            el_max = np.arcsin(az_sign * interfer_offset[2] * cos_az /
-                               np.sqrt(interfer_offset[1]**2 +
-                                       interfer_offset[2]**2))
-            if el_max < 0.0:
-                el_max = 0.0
-
-            cos_max = np.cos(el_max)
-            sin_max = np.sin(el_max)
-
-            # Find the maximum possible phase shift
-            chimax = k * (interfer_offset[0] * sin_az + interfer_offset[1] *
-                          np.sqrt(cos_max**2- sin_az**2)
-                          + interfer_offset[2] * sin_max)
-            chimin = chimax - (alias + 1.0) * az_sign * 2.0 * np.pi
-    
-            # Find the right phase.  This method works for both front and
-            # back lobe calculations.
-            phi_temp = (fovflg[i] * (p0 - del_chi)) % (2.0 * np.pi)
-
-            # Ensure that phi_temp falls within the proper limits
-            while phi_temp > max(chimax, chimin):
-                phi_temp += az_sign * 2.0 * np.pi
-
-            while abs(phi_temp) < abs(chimin):
-                phi_temp += az_sign * 2.0 * np.pi
-
-            #--------------------------
-            # Evaluate the phase shift
-            if phi_temp > max(chimax, chimin):
-                estr = "BUG: can't fix phase shift [{:f} ".format(phi_temp)
-                estr = "{:s}not between {:f},".format(estr, chimin)
-                estr = "{:s}{:f}] for index [{:d}]".format(estr, chimax, i)
-                logging.critical(estr)
-                elv.append(np.nan)
-            else:
-                # Calcualte the elevation angle and set if realistic
-                cos_theta = phi_temp / k - interfer_offset[0] * sin_az
-                yz_sum2 = interfer_offset[1]**2 + interfer_offset[2]**2
-                sin_delta = (cos_theta * interfer_offset[2] +
-                             np.sqrt((cos_theta * interfer_offset[2])**2 -
-                                     yz_sum2 * (cos_theta**2 -
-                                                (interfer_offset[1] *
-                                                 cos_az)**2))) / yz_sum2
-
-                if sin_delta <= 1.0:
-                    new_elv = np.arcsin(sin_delta)
-                    elv.append(new_elv)
-                else:
-                    elv.append(np.nan)
-        else:
-            # Pad the elevation and phase ambiguity arrays if insufficient data
-            # is available to calculate the elevation
-            elv.append(np.nan)
+    # Calculate the elevation for all values of phi0 at once.  Use only data
+    # where the angular drift between signals is not identically zero with an
+    # error of zero, since this could either be a sloppy flag denoting no
+    # data or an actual measurement.
+    phi0 = np.asarray(phi0, dtype=float)
+    phi0_e = np.asarray(phi0_e, dtype=float)
+    fovflg = np.asarray(fovflg, dtype=float)
+    good = (phi0 != 0.0) | ((phi0_e != 0.0) & (np.abs(fovflg) == 1))
+    (ok, fail, phi_temp, amb_temp, sin_delta, cos_theta, yscale2, k, sin_az,
+     cos_az) = _phase_to_elv(phi0, good, fovflg, bm_az, tfreq,
+                             interfer_offset, tdiff, alias)
+
+    for i in np.where(fail)[0]:
+        estr = "BUG: can't fix phase shift [{:f} ".format(phi_temp[i])
+        estr = "{:s}not between limits] for index [{:d}]".format(estr, i)
+        logging.critical(estr)
+
+    with np.errstate(invalid='ignore'):
+        elv = list(np.where(ok, np.arcsin(sin_delta), np.nan))
 
     return elv
+
+#---------------------------------------------------------------------------
+def calc_elv_array(phi0, phi0_e, fovflg, bm_az, tfreq, interfer_offset,
+                   tdiff, alias=0.0, calc_err=False, bmaz_e=0.0,
+                   boresite_e=0.0, ix_e=0.0, iy_e=0.0, iz_e=0.0, tdiff_e=0.0):
+    '''Calculate the elevation angle in degrees (and its error) for arrays of
+    observations from a single radar, such as whole scans or days of data
+
+    Parameters
+    -----------
+    phi0 : (np.ndarray)
+        Phase lags in radians
+    phi0_e : (np.ndarray or NoneType)
+        Phase lag errors in radians, or None if unknown
+    fovflg : (np.ndarray or int)
+        Field-of-view flags where 1 indicates the front, -1 the rear
+    bm_az : (np.ndarray or float)
+        Azimuthal angle between the beam and the radar boresite at zero
+        elevation (radians)
+    tfreq : (np.ndarray or float)
+        Transmission frequency (kHz)
+    interfer_offset : (list or numpy.ndarray of floats)
+        Offset of the midpoints of the interferometer and main array (meters),
+        where [0] is X, [1] is Y, and [2] is Z.
+    tdiff : (np.ndarray or float)
+        The relative time delay of the signal paths from the interferometer
+        array to the receiver and the main array to the reciver (microsec).
+        An array with an extra leading dimension (e.g. shape (ntdiff, 1))
+        evaluates several tdiff values at once.
+    alias : (float)
+        Amount to offset the acceptable phase shifts by.  The default phase
+        shift range starts at the calculated max - 2 pi, any (positive) alias
+        will remove 2 pi from the minimum allowable phase shift. (default=0.0)
+    calc_err : (bool)
+        Calculate the elevation angle error as well (default=False)
+    bmaz_e : (float or np.ndarray)
+        Error in beam azimuth in degrees (default=0.0)
+    boresite_e : (float or np.ndarray)
+        Error in the boresite location in degrees (default=0.0)
+    ix_e : (float or np.ndarray)
+        Error in the interferometer x coordinate in meters (default=0.0)
+    iy_e : (float or np.ndarray)
+        Error in the interferometer y coordinate in meters (default=0.0)
+    iz_e : (float or np.ndarray)
+        Error in the interferometer z coordinate in meters (default=0.0)
+    tdiff_e : (float or np.ndarray)
+        Error in the tdiff value in microseconds (default=0.0)
+
+    Returns
+    --------
+    elv : (np.ndarray)
+        Elevation angles in degrees, or NaN where an elevation angle could not
+        be calculated.  The shape is that of the broadcast inputs.
+    elv_e : (np.ndarray)
+        Elevation angle errors, or NaN if an error could not be calculated.
+        Only returned if calc_err is True.
+    phase_amb : (np.ndarray)
+        Integers containing the phase ambiguity used to alias the elevation
+        angles
+
+    Notes
+    ------
+    Observations with both a phase lag and a phase lag error that are
+    identically zero (no data) are skipped, as are those with a field-of-view
+    flag other than 1 or -1.  Unlike calc_elv_list, this routine has no
+    per-observation Python loop.
+    '''
+    phi0 = np.asarray(phi0, dtype=float)
+    phi0_e = np.ones(shape=phi0.shape) if phi0_e is None \
+        else np.asarray(phi0_e, dtype=float)
+    fovflg = np.asarray(fovflg, dtype=float)
+    interfer_offset = [float(i) for i in interfer_offset]
+
+    good = ((phi0 != 0.0) | (phi0_e != 0.0)) & (np.abs(fovflg) == 1)
+    (ok, fail, phi_temp, amb_temp, sin_delta, cos_theta, yscale2, k, sin_az,
+     cos_az) = _phase_to_elv(phi0, good, fovflg, bm_az, tfreq,
+                             interfer_offset, tdiff, alias)
+
+    if fail.any():
+        estr = "can't fix phase shift for {:d} ".format(int(fail.sum()))
+        logging.critical("{:s}observation(s)".format(estr))
+
+    with np.errstate(invalid='ignore'):
+        elv = np.where(ok, np.degrees(np.arcsin(sin_delta)), np.nan)
+    phase_amb = np.where(ok, amb_temp, 0).astype(int)
+
+    if not calc_err:
+        return elv, phase_amb
+
+    elv_e = np.where(ok, _elv_err(phi0_e, interfer_offset, cos_theta, yscale2,
+                                  k, sin_az, cos_az, bmaz_e=bmaz_e,
+                                  boresite_e=boresite_e, ix_e=ix_e, iy_e=iy_e,
+                                  iz_e=iz_e, tdiff_e=tdiff_e), np.nan)
+
+    return elv, elv_e, phase_amb
@@ -13,6 +13,10 @@ Functions
 ------------------------------------------------------------------------------
 calc_virtual_height        calculate virtual height
 calc_virtual_height_w_err  calculate virtual height with error
+calc_virtual_height_array  calculate virtual height for arrays of data
+calc_virtual_height_w_err_array
+                           calculate virtual height with error for arrays of
+                           data
 ------------------------------------------------------------------------------
 
 Author: Angeline G. Burrell (AGB)
@@ -201,33 +205,13 @@ def calc_virtual_height(beam, radius, elv=list(), elv_attr="elv", dist=list(),
         return None
 
     #-----------------------------------------------------------------------
-    # Cycle through the beams and elevations, calculating the virtual height
-    height = np.empty(shape=(len(dist),), dtype=float) * np.nan
-
-    for i,d in enumerate(dist):
-        if model in s_model:
-            # Calculate height using standard model
-            hh = hop[i]
-            if model != "S":
-                hh = 0.5 if model == "IS" else 1.0
-                
-            height[i] = vhm.standard_vhm(d, adjusted_sr=dist_adjust,
-                                         max_vh=max_vh, hop=hh, elv=elv[i])
-        elif model in c_model:
-            # Calculate height using Chisham model
-            cm = None if model == "C" else model
-            height[i] = vhm.chisham_vhm(d, vhmtype=cm, hop_output=False)
-        elif model is None and not np.isnan(elv[i]):
-            # Calculate height by assuming a spherical earth and solving the
-            # law of cosines for an obtuse triangle with sides radius,
-            # radius + height, and distance, where the angle between the side of
-            # length distance and radius + height is equal to 90 deg - elevation
-            if not dist_adjust:
-                d /= hop[i] * 2.0
-            
-            hsqrt = np.sqrt(d**2 + radius**2 + 2.0 * d * radius
-                            * np.sin(np.radians(elv[i])))
-            height[i] = hsqrt - radius
+    # Calculate the virtual height for all of the beam's range gates at once
+    if model is not None and all(e is None for e in elv):
+        elv = None
+
+    height = calc_virtual_height_array(elv, dist, radius, hop=hop,
+                                       dist_adjust=dist_adjust, model=model,
+                                       max_vh=max_vh)
 
     return height
 
@@ -391,36 +375,133 @@ def calc_virtual_height_w_err(beam, radius, radius_e=0.0, elv=list(),
         return None
 
     #-----------------------------------------------------------------------
-    # Cycle through the beams and elevations, calculating the virtual height
-    height = np.empty(shape=(len(dist),), dtype=float) * np.nan
-    height_err = np.empty(shape=(len(dist),), dtype=float) * np.nan
-
-    for i,d in enumerate(dist):
-        if not np.isnan(elv[i]):
-            # Calculate height by assuming a spherical earth and solving the
-            # law of cosines for an obtuse triangle with sides radius,
-            # radius + height, and distance, where the angle between the side of
-            # length distance and radius + height is equal to 90 deg - elevation
-            sin_elv = np.sin(np.radians(elv[i]))
-            hsqrt = np.sqrt(d**2 + radius**2 + 2.0 * d * radius * sin_elv)
-            height[i] = hsqrt - radius
-
-            # Now that the height has been calculated, find the error
-            term_elv = 0.0
-            if not np.isnan(elv_e[i]) or elv_e[i] > 0.0:
-                temp = d * radius * np.cos(np.radians(elv[i])) / hsqrt
-                term_elv = (elv_e[i] * temp)**2
-
-            term_rad = 0.0
-            if not np.isnan(radius_e) or radius_e > 0.0:
-                temp = (radius + d * sin_elv) / hsqrt - 1.0
-                term_rad = (radius_e * temp)**2
-
-            term_d = 0.0
-            if not np.isnan(dist_e[i]) or dist_e[i] > 0.0:
-                temp = (d + radius * sin_elv) / hsqrt
-                term_d = (dist_e[i] * temp)**2
-
-            height_err[i] = np.sqrt(term_rad + term_d + term_elv)
+    # Calculate the virtual height and error for all of the beam's range
+    # gates at once
+    height, height_err = calc_virtual_height_w_err_array(elv, dist, radius,
+                                                         elv_e=elv_e,
+                                                         dist_e=dist_e,
+                                                         radius_e=radius_e)
+
+    return height, height_err
+
+#---------------------------------------------------------------------------
+def calc_virtual_height_array(elv, dist, radius, hop=0.5, dist_adjust=False,
+                              model=None, max_vh=400.0):
+    """Calculate the virtual height for arrays of slant distance and elevation
+    using the elevation or a model
+
+    Parameters
+    -----------
+    elv : (numpy.ndarray or NoneType)
+        Elevation in degrees, of any shape (e.g. (time, beam, gate)).  May be
+        None if a model is used.
+    dist : (numpy.ndarray)
+        Slant distance from the radar to the reflection location of the
+        backscatter in km, broadcastable to the shape of elv
+    radius : (float or numpy.ndarray)
+        Earth radius in km
+    hop : (float or numpy.ndarray)
+        Hop for each point (default=0.5)
+    dist_adjust : (bool)
+        Denotes whether or not the slant distance has been adjusted for hop.
+        (default=False)
+    model : (str or NoneType)
+        Calculate virtual height using elevation (None) or model (see
+        calc_virtual_height) (default=None)
+    max_vh : (float)
+        Maximum height for longer slant ranges in Standard model (default=400)
+
+    Returns
+    --------
+    height : (numpy.ndarray)
+        Virtual heights in km with the broadcast shape of the inputs, or NaN
+        where a virtual height could not be calculated
+    """
+    import davitpy.utils.model_vheight as vhm
+
+    dist = np.asarray(dist, dtype=float)
+    hop = np.asarray(hop, dtype=float)
+
+    if model in ["S", "IS", "GS"]:
+        # Calculate height using standard model
+        if model != "S":
+            hop = 0.5 if model == "IS" else 1.0
+
+        return np.asarray(vhm.standard_vhm(dist, adjusted_sr=dist_adjust,
+                                           max_vh=max_vh, hop=hop, elv=elv),
+                          dtype=float)
+    elif model in ["C", "F1", "F3", "E1"]:
+        # Calculate height using Chisham model
+        cm = None if model == "C" else model
+        return np.asarray(vhm.chisham_vhm(dist, vhmtype=cm, hop_output=False),
+                          dtype=float)
+
+    # Calculate height by assuming a spherical earth and solving the law of
+    # cosines for an obtuse triangle with sides radius, radius + height, and
+    # distance, where the angle between the side of length distance and
+    # radius + height is equal to 90 deg - elevation
+    elv = np.asarray(elv, dtype=float)
+    if not dist_adjust:
+        dist = dist / (hop * 2.0)
+
+    with np.errstate(invalid='ignore'):
+        hsqrt = np.sqrt(dist**2 + radius**2 + 2.0 * dist * radius
+                        * np.sin(np.radians(elv)))
+
+    return hsqrt - radius
+
+#---------------------------------------------------------------------------
+def calc_virtual_height_w_err_array(elv, dist, radius, elv_e=0.0, dist_e=0.0,
+                                    radius_e=0.0):
+    """Calculate the virtual height and error for arrays of backscatter
+    distance and elevation angle
+
+    Parameters
+    -----------
+    elv : (numpy.ndarray)
+        Elevation in degrees, of any shape (e.g. (time, beam, gate))
+    dist : (numpy.ndarray)
+        Slant distance from the radar to the reflection location of the
+        backscatter in km, broadcastable to the shape of elv
+    radius : (float or numpy.ndarray)
+        Earth radius in km
+    elv_e : (float or numpy.ndarray)
+        Elevation error in degrees (default=0.0)
+    dist_e : (float or numpy.ndarray)
+        Slant distance error in km (default=0.0)
+    radius_e : (float or numpy.ndarray)
+        Earth radius error in km (default=0.0)
+
+    Returns
+    --------
+    height : (numpy.ndarray)
+        Virtual heights in km, or NaN where the elevation is NaN
+    height_err : (numpy.ndarray)
+        Virtual height errors in km, or NaN where the elevation is NaN.  NaN
+        errors in the inputs are left out of the total error.
+    """
+    elv = np.asarray(elv, dtype=float)
+    dist = np.asarray(dist, dtype=float)
+
+    # Calculate height by assuming a spherical earth and solving the law of
+    # cosines for an obtuse triangle with sides radius, radius + height, and
+    # distance, where the angle between the side of length distance and
+    # radius + height is equal to 90 deg - elevation
+    sin_elv = np.sin(np.radians(elv))
+    with np.errstate(invalid='ignore'):
+        hsqrt = np.sqrt(dist**2 + radius**2 + 2.0 * dist * radius * sin_elv)
+    height = hsqrt - radius
+
+    # Now that the height has been calculated, find the error, leaving out the
+    # terms with unknown errors
+    term_elv = np.nan_to_num((np.asarray(elv_e, dtype=float) * dist * radius *
+                              np.cos(np.radians(elv)) / hsqrt)**2)
+    term_rad = np.nan_to_num((np.asarray(radius_e, dtype=float) *
+                              ((radius + dist * sin_elv) / hsqrt - 1.0))**2)
+    term_d = np.nan_to_num((np.asarray(dist_e, dtype=float) *
+                            (dist + radius * sin_elv) / hsqrt)**2)
+
+    height_err = np.where(np.isnan(height), np.nan,
+                          np.sqrt(term_rad + term_d + term_elv))
 
     return height, height_err
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#-----------------------------------------------------------------------------
+# test_select_alt_groups.py
+#
+# Comments: Regression benchmark for the closed-form Gaussian peak fitting in
+#           select_alt_groups
+#-----------------------------------------------------------------------------
+"""This module contains routines to test the closed-form virtual height
+grouping in select_alt_groups against the original least-squares Gaussian fits
+
+Functions
+-------------------------------------------------------------------------------
+layered_heights           Create virtual heights for a range gate box
+group_labels              Label virtual heights by altitude group
+rand_index                Fraction of point pairs grouped the same way
+benchmark_alt_groups      Compare the speed and output of the two methods
+test_fit_gaussian_peak    Test the closed-form fit of a Gaussian histogram
+test_closed_form_groups   Test the closed-form altitude groups
+-------------------------------------------------------------------------------
+"""
+import time
+import warnings
+import numpy as np
+
+import update_backscatter as ub
+
+
+def layered_heights(rs):
+    """Create virtual heights for a range gate box, made up of one to three
+    Gaussian layers in the E or F region
+
+    Parameters
+    ----------
+    rs : (class `np.random.RandomState`)
+        Random number generator
+
+    Returns
+    -------
+    gate : (np.ndarray)
+        Range gates (all zero, since they are not used to find the groups)
+    vheight : (np.ndarray)
+        Virtual heights in km
+    rmin : (float)
+        Minimum virtual height for this region in km
+    rmax : (float)
+        Maximum virtual height for this region in km
+    vh_box : (float)
+        Suggested virtual height width in km
+    layer : (np.ndarray)
+        Index of the layer each virtual height was drawn from
+    """
+    rmin, rmax, vh_box = [(115.0, 150.0, 50.0), (150.0, 900.0, 150.0),
+                          (150.0, 900.0, 50.0)][rs.randint(3)]
+    vheight = list()
+    layer = list()
+
+    for i in range(rs.randint(1, 4)):
+        npnts = rs.randint(5, 150)
+        vheight.append(rs.normal(rs.uniform(rmin + 10.0, rmax - 10.0),
+                                 rs.uniform(3.0, (rmax - rmin) / 8.0), npnts))
+        layer.append(np.ones(npnts, dtype=int) * i)
+
+    vheight = np.concatenate(vheight)
+    layer = np.concatenate(layer)
+    inside = (vheight >= rmin) & (vheight < rmax)
+
+    return(np.zeros(inside.sum()), vheight[inside], rmin, rmax, vh_box,
+           layer[inside])
+
+
+def group_labels(vheight, vh_mins, vh_maxs):
+    """Label virtual heights by the first altitude group that contains them
+
+    Parameters
+    ----------
+    vheight : (np.ndarray)
+        Virtual heights in km
+    vh_mins : (list)
+        Virtual height minima for each group
+    vh_maxs : (list)
+        Virtual height maxima for each group
+
+    Returns
+    -------
+    labels : (np.ndarray)
+        Index of the altitude group for each point, -1 if not in a group
+    """
+    labels = -np.ones(len(vheight), dtype=int)
+
+    for i, vmin in enumerate(vh_mins):
+        labels[(labels < 0) & (vheight >= vmin) & (vheight < vh_maxs[i])] = i
+
+    return labels
+
+
+def rand_index(labels1, labels2):
+    """Fraction of point pairs that are either grouped together or separately
+    by both sets of labels
+
+    Parameters
+    ----------
+    labels1 : (np.ndarray)
+        First set of group labels
+    labels2 : (np.ndarray)
+        Second set of group labels
+
+    Returns
+    -------
+    rand : (float)
+        Rand index, where 1.0 means the two sets of labels agree
+    """
+    same1 = labels1[:, np.newaxis] == labels1[np.newaxis, :]
+    same2 = labels2[:, np.newaxis] == labels2[np.newaxis, :]
+
+    return (same1 == same2).mean()
+
+
+def benchmark_alt_groups(ncases=300, seed=1):
+    """Compare the speed and output of select_alt_groups using least-squares
+    and closed-form Gaussian fits
+
+    Parameters
+    ----------
+    ncases : (int)
+        Number of range gate boxes to test (default=300)
+    seed : (int)
+        Random number generator seed (default=1)
+
+    Returns
+    -------
+    bench : (dict)
+        Dictionary with the run time in seconds ("time"), the mean Rand index
+        with respect to the true layers ("truth"), and the mean number of
+        groups ("ngroups") for each method, keyed by the method name, as well
+        as the mean Rand index between the two methods ("agree") and the
+        fraction of points that are in a group for both or neither method
+        ("cover")
+    """
+    rs = np.random.RandomState(seed)
+    cases = [layered_heights(rs) for i in range(ncases)]
+    cases = [case for case in cases if len(case[1]) >= 3]
+
+    bench = {"agree":0.0, "cover":0.0}
+    labels = dict()
+    for method in ["curve_fit", "closed_form"]:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            stime = time.time()
+            groups = [ub.select_alt_groups(*case[:5], peak_fit=method)
+                      for case in cases]
+            bench[method] = {"time":time.time() - stime}
+
+        labels[method] = [group_labels(case[1], *groups[i])
+                          for i, case in enumerate(cases)]
+        bench[method]["truth"] = np.mean([rand_index(lab, cases[i][5])
+                                          for i, lab in
+                                          enumerate(labels[method])])
+        bench[method]["ngroups"] = np.mean([len(g[0]) for g in groups])
+
+    for i, lab in enumerate(labels["curve_fit"]):
+        lab2 = labels["closed_form"][i]
+        bench["agree"] += rand_index(lab, lab2) / len(cases)
+        bench["cover"] += np.mean((lab >= 0) == (lab2 >= 0)) / len(cases)
+
+    return bench
+
+
+def test_fit_gaussian_peak():
+    """Test the closed-form fit of a histogram that is exactly Gaussian"""
+    cbin = np.arange(150.0, 900.0, 12.5) + 6.25
+    hnum = 40.0 * np.exp(-(cbin - 312.0)**2 / (2.0 * 35.0**2))
+    coeff = ub.fit_gaussian_peak(cbin, hnum, np.argmax(hnum))
+
+    assert np.allclose(coeff, [40.0, 312.0, 35.0], rtol=1.0e-9)
+
+    # A single-bin peak uses the bin width to set the standard deviation
+    hnum = np.zeros(len(cbin))
+    hnum[10] = 5.0
+    coeff = ub.fit_gaussian_peak(cbin, hnum, 10)
+
+    assert np.allclose(coeff, [5.0, cbin[10], 6.25])
+
+
+def test_closed_form_groups():
+    """Test the closed-form altitude groups against the least-squares groups
+    and the true layers"""
+    bench = benchmark_alt_groups()
+
+    assert bench["agree"] >= 0.9
+    assert bench["cover"] >= 0.99
+    assert (bench["closed_form"]["truth"] >=
+            bench["curve_fit"]["truth"] - 0.05)
+
+    # Unknown peak fitting methods are rejected
+    case = layered_heights(np.random.RandomState(2))
+    assert ub.select_alt_groups(*case[:5], peak_fit="closed-form") == ([], [])
+
+
+if __name__ == "__main__":
+    test_fit_gaussian_peak()
+    test_closed_form_groups()
+
+    bench = benchmark_alt_groups()
+    for method in ["curve_fit", "closed_form"]:
+        print "{:s}: {:.3f} s, {:.2f} groups, Rand index {:.3f}".format(
+            method, bench[method]["time"], bench[method]["ngroups"],
+            bench[method]["truth"])
+    print "agreement: Rand index {:.3f}, coverage {:.3f}".format(
+        bench["agree"], bench["cover"])
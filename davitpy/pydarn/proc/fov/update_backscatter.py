@@ -17,12 +17,14 @@ Functions
 assign_region               ionosphere region based on virtual height
 test_propagation            test propgation against reality
 select_alt_groups           determine altitude limits for range gate
+fit_gaussian_peak           closed-form Gaussian fit to a histogram peak
 get_beam                    load beams from list or pointer
 calc_distance               calculate slant range
 select_beam_groundscatter   filter to select groundscatter data
 calc_frac_points            calculate precentage of groundscatter
 update_bs_w_scan            update propagation parameters, 1 > beam
 update_beam_fit             update beam data
+split_scans                 split a list of beams into scans
 update_backscatter          update propagation parameters, one beam
 beam_ut_struct_test         test for continuity in UT across beams
 ------------------------------------------------------------------------------
@@ -128,7 +130,8 @@ def test_propagation(hop, vheight, dist,
     return good
 
 #---------------------------------------------------------------------------
-def select_alt_groups(gate, vheight, rmin, rmax, vh_box, min_pnts=3):
+def select_alt_groups(gate, vheight, rmin, rmax, vh_box, min_pnts=3,
+                      peak_fit="curve_fit"):
     """Determine appropriate altitude limits for the data in this range gate
     box.  This is done by fitting a Gaussian curve to each of the occurance
     peaks and setting the range to +/-3 sigma from the mean.  Areas with points
@@ -150,13 +153,20 @@ def select_alt_groups(gate, vheight, rmin, rmax, vh_box, min_pnts=3):
     min_pnts : (int)
         Minimum number of points needed to actually use a height bracket.
         (default=3)
+    peak_fit : (str)
+        Method used to fit a Gaussian to each histogram peak.  "curve_fit"
+        performs a least-squares fit to the whole histogram, while
+        "closed_form" fits a parabola to the logarithm of the histogram bins
+        surrounding the peak, which is much faster. (default="curve_fit")
 
     Returns
     -----------
     vh_mins : (list)
-        list of virtual height minima
+        list of virtual height minima, empty if the peak fitting method is
+        unknown
     vh_maxs : (list)
-        List of virtual height maxima
+        List of virtual height maxima, empty if the peak fitting method is
+        unknown
     """
     # Define local functions
     def gaussian(x, *p):
@@ -168,6 +178,10 @@ def select_alt_groups(gate, vheight, rmin, rmax, vh_box, min_pnts=3):
     vh_maxs = list()
     vh_peaks = list()
 
+    if peak_fit not in ["curve_fit", "closed_form"]:
+        logging.error('unknown peak fitting method [{:}]'.format(peak_fit))
+        return vh_mins, vh_maxs
+
     # Create a histogram of the number of observations at each virtual height
     bnum = int((rmax-rmin) / (vh_box * 0.25))
     hnum, hbin = np.histogram(vheight, bnum if bnum > 10 else 10, (rmin,rmax))
@@ -204,7 +218,11 @@ def select_alt_groups(gate, vheight, rmin, rmax, vh_box, min_pnts=3):
             param[0] = hh
             param[1] = cbin[ih]
             try:
-                coeff, var = optimize.curve_fit(gaussian, cbin, hnum, p0=param)
+                if peak_fit == "closed_form":
+                    coeff = fit_gaussian_peak(cbin, hnum, ih)
+                else:
+                    coeff, var = optimize.curve_fit(gaussian, cbin, hnum,
+                                                    p0=param)
                 # Evaluate for np.nan in coefficients
                 try:
                     np.isnan(coeff).tolist().index(True)
@@ -371,6 +389,82 @@ def select_alt_groups(gate, vheight, rmin, rmax, vh_box, min_pnts=3):
     # Return the limits
     return vh_mins, vh_maxs
 
+#---------------------------------------------------------------------------
+def fit_gaussian_peak(cbin, hnum, ipeak):
+    """Fit a Gaussian curve to a peak in a histogram using a closed-form
+    solution.  The bins on either side of the peak are included until a bin
+    is empty or the number of observations rises above the lowest number
+    found so far by more than the counting noise.  A parabola is then fitted
+    to the logarithm of the number of observations in these bins using
+    weighted least squares (Guo, IEEE Signal Processing Magazine, 2011).  If
+    fewer than three bins are found, the Gaussian is estimated from the
+    moments of the peak.
+
+    Parameters
+    -------------
+    cbin : (np.ndarray)
+        Array of histogram bin centers
+    hnum : (list or np.ndarray)
+        Number of observations in each bin
+    ipeak : (int)
+        Index of the histogram peak
+
+    Returns
+    -----------
+    coeff : (np.ndarray)
+        Amplitude, mean, and standard deviation of the Gaussian curve
+
+    Raises
+    -----------
+    ValueError : if there are no observations at the peak
+    """
+    cbin = np.asarray(cbin, dtype=float)
+    hnum = np.asarray(hnum, dtype=float)
+
+    if not hnum[ipeak] > 0.0:
+        raise ValueError("no observations at histogram peak")
+
+    # Find the bins in the peak, stopping at empty bins and at bins where
+    # the number of observations rises significantly
+    def in_peak(inext, nmin):
+        return(0.0 < hnum[inext] < hnum[ipeak] and
+               hnum[inext] <= nmin + np.sqrt(nmin))
+
+    ilow = ipeak
+    nmin = hnum[ipeak]
+    while ilow > 0 and in_peak(ilow - 1, nmin):
+        ilow -= 1
+        nmin = min(nmin, hnum[ilow])
+
+    ihigh = ipeak
+    nmin = hnum[ipeak]
+    while ihigh < len(hnum) - 1 and in_peak(ihigh + 1, nmin):
+        ihigh += 1
+        nmin = min(nmin, hnum[ihigh])
+
+    x = cbin[ilow:ihigh+1] - cbin[ipeak]
+    y = hnum[ilow:ihigh+1]
+
+    if len(y) >= 3:
+        # Fit ln(y) = a + b x + c x^2, weighting each bin by y^2
+        lsq = np.linalg.lstsq(np.column_stack((y, y * x, y * x**2)),
+                              y * np.log(y), rcond=-1)[0]
+
+        if lsq[2] < 0.0:
+            sigma = np.sqrt(-0.5 / lsq[2])
+            mu = -0.5 * lsq[1] / lsq[2]
+            amp = np.exp(lsq[0] + 0.5 * (mu / sigma)**2)
+            return np.array([amp, mu + cbin[ipeak], sigma])
+
+    # Estimate the Gaussian from the moments, ensuring the standard deviation
+    # is at least half the bin width
+    mu = np.sum(x * y) / np.sum(y)
+    sigma = np.sqrt(np.sum((x - mu)**2 * y) / np.sum(y))
+    if len(cbin) > 1:
+        sigma = max(sigma, 0.5 * abs(cbin[1] - cbin[0]))
+
+    return np.array([hnum[ipeak], mu + cbin[ipeak], sigma])
+
 #---------------------------------------------------------------------------
 def get_beam(radar_beams, nbeams):
     """Define a routine to load the beams from either a list/np.array or
@@ -742,7 +836,8 @@ def update_bs_w_scan(scan, hard, min_pnts=3,
                      vh_box=[50.0,50.0,50.0,150.0], max_hop=3.0, tdiff=None,
                      tdiff_args=list(), tdiff_e=None, tdiff_e_args=list(),
                      ptest=True, strict_gs=False, bmaz_e=0.0, boresite_e=0.0,
-                     ix_e=0.0, iy_e=0.0, iz_e=0.0, step=6):
+                     ix_e=0.0, iy_e=0.0, iz_e=0.0, step=6,
+                     peak_fit="curve_fit"):
     """Updates the propagation path, elevation, backscatter type, structure
     flag, and origin field-of-view (FoV) for all backscatter observations in
     each beam for a scan of data.  A full scan is not necessary, but if the
@@ -821,12 +916,17 @@ def update_bs_w_scan(scan, hard, min_pnts=3,
         3: Add assignments for points with realistic heights in only one FoV
         4: Add assignments using single-beam elevation angle variations
         5 or more: Test assignements for consistency along the scan.
+    peak_fit : (str)
+        Method used to fit Gaussians to the virtual height distributions when
+        selecting altitude groups, "curve_fit" or the faster "closed_form".
+        See select_alt_groups for details. (default="curve_fit")
 
     Returns
     ---------
     beams : (np.array)
         An array of updated beamData class objects.  These updated objects have
-        the following additional/updated attributes
+        the following additional/updated attributes, where the attributes
+        for the assigned origin FoV are np.arrays
 
         beam.fit.fovelv : added : Accounts for adjusted tdiff and origin FoV
         beam.fit.fovelv_e : added : elevation error
@@ -901,6 +1001,10 @@ def update_bs_w_scan(scan, hard, min_pnts=3,
         logging.error('bad FoV virtual height box [{:}]'.format(vh_box))
         return None
 
+    if peak_fit not in ["curve_fit", "closed_form"]:
+        logging.error('unknown peak fitting method [{:}]'.format(peak_fit))
+        return None
+
     #-------------------------------------------------------------------------
     # Loading the beams into the output list, updating the distance,
     # groundscatter flag, virtual height, and propogation path
@@ -1107,7 +1211,8 @@ def update_bs_w_scan(scan, hard, min_pnts=3,
                                                      rgvh[fov[ff]][itest],
                                                      region_hmin[reg],
                                                      region_hmax[reg],
-                                                     vh_box[ilim], min_pnts)
+                                                     vh_box[ilim], min_pnts,
+                                                     peak_fit=peak_fit)
 
                     for iv,vmin in enumerate(vmins):
                         # Select the data for this height range
@@ -1475,32 +1580,34 @@ def update_bs_w_scan(scan, hard, min_pnts=3,
     #--------------------------------------------------------------------------
     # Assign the appropriate virtual heights and elevation angles to each
     # point based on their FoV.  Also assign initial regions based on virtual
-    # height
+    # height.  Points without a FoV default to the front FoV values, but have
+    # no error estimates
     for bi in range(bnum):
-        snum = len(beams[bi].fit.slist)
-        beams[bi].fit.region = ["" for si in range(snum)]
-        beams[bi].fit.hop = [np.nan for si in range(snum)]
-        beams[bi].fit.vheight = [np.nan for si in range(snum)]
-        beams[bi].fit.vheight_e = [np.nan for si in range(snum)]
-        beams[bi].fit.fovelv = [np.nan for si in range(snum)]
-        beams[bi].fit.fovelv_e = [np.nan for si in range(snum)]
-        beams[bi].fit.fovflg = fovflg[bi]
-
-        for si,ifov in enumerate(beams[bi].fit.fovflg):
-            if ifov == 0 or np.isnan(ifov):
-                # Default to front FoV if none was found
-                beams[bi].fit.fovelv[si] = elvs["front"][bi][si]
-                beams[bi].fit.vheight[si] = vheights["front"][bi][si]
-                beams[bi].fit.hop[si] = hops["front"][bi][si]
-                beams[bi].fit.region[si] = regions["front"][bi][si]
-            else:
-                # Assign the appropriate FoV
-                beams[bi].fit.region[si] = regions[fov[ifov]][bi][si]
-                beams[bi].fit.hop[si] = hops[fov[ifov]][bi][si]
-                beams[bi].fit.vheight[si] = vheights[fov[ifov]][bi][si]
-                beams[bi].fit.vheight_e[si] = vherrs[fov[ifov]][bi][si]
-                beams[bi].fit.fovelv_e[si] = elv_errs[fov[ifov]][bi][si]
-                beams[bi].fit.fovelv[si] = elvs[fov[ifov]][bi][si]
+        ifov = np.array(fovflg[bi], dtype=int)
+        back = ifov == -1
+        known = ifov != 0
+
+        beams[bi].fit.fovflg = ifov
+        beams[bi].fit.region = np.where(back,
+                                        np.array(regions["back"][bi],
+                                                 dtype=object),
+                                        np.array(regions["front"][bi],
+                                                 dtype=object))
+        beams[bi].fit.hop = np.where(back, hops["back"][bi],
+                                     hops["front"][bi]).astype(float)
+        beams[bi].fit.vheight = np.where(back, vheights["back"][bi],
+                                         vheights["front"][bi]).astype(float)
+        beams[bi].fit.vheight_e = np.where(known,
+                                           np.where(back, vherrs["back"][bi],
+                                                    vherrs["front"][bi]),
+                                           np.nan).astype(float)
+        beams[bi].fit.fovelv = np.where(back, elvs["back"][bi],
+                                        elvs["front"][bi]).astype(float)
+        beams[bi].fit.fovelv_e = np.where(known,
+                                          np.where(back, elv_errs["back"][bi],
+                                                   elv_errs["front"][bi]),
+                                          np.nan).astype(float)
+
         # Additional values returned for use in analysis and UT continuity test
         beams[bi].fit.felv = elvs["front"][bi]
         beams[bi].fit.felv_e = elv_errs["front"][bi]
@@ -1514,7 +1621,7 @@ def update_bs_w_scan(scan, hard, min_pnts=3,
         beams[bi].fit.bhop = hops["back"][bi]
         beams[bi].fit.fregion = regions["front"][bi]
         beams[bi].fit.bregion = regions["back"][bi]
-        beams[bi].fit.pastfov = fovpast[bi]
+        beams[bi].fit.pastfov = np.array(fovpast[bi], dtype=int)
 
     return beams
 
@@ -1828,6 +1935,77 @@ def update_beam_fit(beam, hard=None,
     return beam, elvs, elv_errs, vheights, vherrs, hops, regions, hard
 
 #---------------------------------------------------------------------------
+def split_scans(rad_bms, max_del_beam=3):
+    """Split a time-ordered list of beams into scans.  A beam belongs to the
+    current scan if it has the same common program as the first beam in the
+    scan, it was observed within three integration periods per beam step of
+    the previous beam, and the beam number keeps changing in the same direction
+    by no more than max_del_beam.
+
+    Parameters
+    ------------
+    rad_bms : (list or np.array)
+        List of beamData class objects, sorted by UT
+    max_del_beam : (int)
+        Maximum change in beam number between consecutive beams in a scan
+        (default=3)
+
+    Returns
+    ---------
+    scans : (list)
+        List of scans, each of which is a list of beamData class objects.
+        Each beam has the additional attribute scan_time, the time of the first
+        beam in its scan
+    """
+    scans = list()
+    scan = list()
+    bm_sign = 0
+
+    for bm in rad_bms:
+        if len(scan) > 0:
+            del_time = (bm.time - scan[-1].time).total_seconds()
+            del_beam = bm.bmnum - scan[-1].bmnum
+            time_inc = bm.prm.inttsc + bm.prm.inttus * 1.0e-6
+
+            if(del_beam != 0 and bm.cp == scan[0].cp and
+               del_time <= 3.0 * abs(del_beam) * time_inc and
+               abs(del_beam) <= max_del_beam and
+               (bm_sign == 0 or bm_sign == np.sign(del_beam))):
+                bm_sign = np.sign(del_beam)
+                bm.scan_time = scan[0].time
+                scan.append(bm)
+                continue
+
+            scans.append(scan)
+
+        # Start a new scan with this beam
+        bm.scan_time = bm.time
+        scan = [bm]
+        bm_sign = 0
+
+    if len(scan) > 0:
+        scans.append(scan)
+
+    return scans
+
+def _update_scan(scan_args):
+    """Update a scan of beams using the arguments in a tuple, allowing
+    update_bs_w_scan to be run by a multiprocessing pool
+
+    Parameters
+    ------------
+    scan_args : (tuple)
+        Scan, radar hardware data, and a dictionary of keyword arguments for
+        update_bs_w_scan
+
+    Returns
+    ---------
+    beams : (np.array or NoneType)
+        Output from update_bs_w_scan
+    """
+    scan, hard, kwargs = scan_args
+    return update_bs_w_scan(scan, hard, **kwargs)
+
 def update_backscatter(rad_bms, min_pnts=3,
                        region_hmax={"D":115.0,"E":150.0,"F":900.0},
                        region_hmin={"D":75.0,"E":115.0,"F":150.0},
@@ -1836,7 +2014,8 @@ def update_backscatter(rad_bms, min_pnts=3,
                        ut_box=dt.timedelta(minutes=20.0), tdiff=None,
                        tdiff_args=list(), tdiff_e=None, tdiff_e_args=list(),
                        ptest=True, strict_gs=False, bmaz_e=0.0, boresite_e=0.0,
-                       ix_e=0.0, iy_e=0.0, iz_e=0.0, step=6):
+                       ix_e=0.0, iy_e=0.0, iz_e=0.0, step=6,
+                       peak_fit="curve_fit", nprocs=1):
     """Updates the propagation path, elevation, backscatter type, and origin
     field-of-view (FoV) for all backscatter observations in each beam.  Scans
     of data are used to determine the origin field-of-view (FoV), but a full
@@ -1914,6 +2093,16 @@ def update_backscatter(rad_bms, min_pnts=3,
         3: Add assignments for points with realistic heights in only one FoV
         4: Add assignments using single-beam elevation angle variations
         5 or more: Test assignements for consistency along the scan.
+    peak_fit : (str)
+        Method used to fit Gaussians to the virtual height distributions when
+        selecting altitude groups, "curve_fit" or the faster "closed_form".
+        See select_alt_groups for details. (default="curve_fit")
+    nprocs : (int)
+        Number of processes used to update the scans.  The results are the
+        same for any number of processes, but with more than one process the
+        output beams are updated copies of the input beams and any tdiff or
+        tdiff_e functions must be defined at the top level of a module.
+        (default=1)
 
     Returns
     ---------
@@ -1985,85 +2174,84 @@ def update_backscatter(rad_bms, min_pnts=3,
     if isinstance(step, float):
         step = int(step)
     assert isinstance(step, int), logging.error('step flag must be an int')
+    assert peak_fit in ["curve_fit", "closed_form"], \
+        logging.error('unknown peak fitting method [{:}]'.format(peak_fit))
+    assert isinstance(nprocs, int) and nprocs >= 1, \
+        logging.error('unknown number of processes [{:}]'.format(nprocs))
 
     #-----------------------------------------------------------------------
-    # Cycle through all the beams
-    snum = 0
+    # Load all of the beams and split them into scans
+    bms = list()
     num = 0
     bm, num = get_beam(rad_bms, num)
-    max_del_beam = 3
-    have_scan = False
+    while bm is not None:
+        bms.append(bm)
+        bm, num = get_beam(rad_bms, num)
 
     # Load the hardware data for the first time
     try:
-        hard = pyrad.site(radId=bm.stid, dt=bm.time)
+        hard = pyrad.site(radId=bms[0].stid, dt=bms[0].time)
     except:
         logging.error("no data available in input rad structure")
         return None
 
+    # The last scan may be incomplete, so it is not updated
+    scans = [scan for scan in split_scans(bms)[:-1] if len(scan) >= min_pnts]
+
     #----------------------------------------------------------------
-    # Cycle through the data, updating the beams one scan at a time
-    scan = np.empty(shape=(hard.maxbeam,), dtype=type(bm))
-    beams = list()
+    # Update the backscatter data in the beams one scan at a time, spreading
+    # the scans between processes if desired.  Each scan is independent of
+    # the others, so the order in which they are evaluated doesn't matter
+    scan_kwargs = {"min_pnts":min_pnts, "region_hmax":region_hmax,
+                   "region_hmin":region_hmin, "rg_box":rg_box,
+                   "vh_box":vh_box, "rg_max":max_rg, "max_hop":max_hop,
+                   "tdiff":tdiff, "tdiff_args":tdiff_args, "tdiff_e":tdiff_e,
+                   "tdiff_e_args":tdiff_e_args, "ptest":ptest,
+                   "strict_gs":strict_gs, "bmaz_e":bmaz_e,
+                   "boresite_e":boresite_e, "ix_e":ix_e, "iy_e":iy_e,
+                   "iz_e":iz_e, "step":step, "peak_fit":peak_fit}
+    nprocs = max(1, min(nprocs, len(scans)))
+
+    if nprocs > 1:
+        import multiprocessing as mp
+
+        # Beams read from a data pointer keep a reference to the open file,
+        # which can't be sent to another process
+        fptrs = [[getattr(bm, "fPtr", None) for bm in scan] for scan in scans]
+        for scan in scans:
+            for bm in scan:
+                bm.fPtr = None
+
+        pool = mp.Pool(nprocs)
+        try:
+            scan_args = [(scan, hard, scan_kwargs) for scan in scans]
+            updated = pool.map(_update_scan, scan_args)
+        finally:
+            pool.close()
+            pool.join()
+
+            for i,scan in enumerate(scans):
+                for j,bm in enumerate(scan):
+                    bm.fPtr = fptrs[i][j]
+
+        # The updated beams are copies, so restore their file references
+        for i,b in enumerate(updated):
+            if b is not None:
+                bfptr = dict([((bm.bmnum, bm.time), fptrs[i][j])
+                              for j,bm in enumerate(scans[i])])
+                for bm in b:
+                    bm.fPtr = bfptr[(bm.bmnum, bm.time)]
+    else:
+        updated = [update_bs_w_scan(scan, hard, **scan_kwargs)
+                   for scan in scans]
 
-    while bm is not None:
-        # Load the beam into the current scan if the scan is empty or if
-        # the current beam is within a specified period of time considering
-        # the difference in beams
-        if snum == 0:
-            bm.scan_time = bm.time
-            scan[snum] = bm
-            snum += 1
-            bm_sign = 0
+    beams = list()
+    for i,b in enumerate(updated):
+        if b is not None:
+            beams.extend(list(b))
         else:
-            del_time = (bm.time - scan[snum-1].time).total_seconds()
-            del_beam = bm.bmnum - scan[snum-1].bmnum
-            time_inc = bm.prm.inttsc + bm.prm.inttus * 1.0e-6
-
-            if(del_beam != 0 and bm.cp == scan[0].cp and
-               del_time <= 3.0 * abs(del_beam) * time_inc and
-               abs(del_beam) <= max_del_beam):
-                if bm_sign == 0 or bm_sign == np.sign(del_beam):
-                    bm_sign = np.sign(del_beam)
-                    bm.scan_time = scan[0].time
-                    scan[snum] = bm
-                    snum += 1
-                else:
-                    have_scan = True
-            else:
-                have_scan = True
-
-            #-----------------------------------------------------------------
-            # If a scan has been loaded, update the backscatter data in the
-            # beams and load the current beam as the first element of a new scan
-            if have_scan:
-                if snum >= min_pnts:
-                    st = scan[0].time
-                    b = update_bs_w_scan(scan[0:snum], hard, min_pnts=min_pnts,
-                                         region_hmax=region_hmax,
-                                         region_hmin=region_hmin,
-                                         rg_box=rg_box, vh_box=vh_box,
-                                         rg_max=max_rg, max_hop=max_hop,
-                                         tdiff=tdiff, tdiff_args=tdiff_args,
-                                         tdiff_e=tdiff_e,
-                                         tdiff_e_args=tdiff_e_args, ptest=ptest,
-                                         strict_gs=strict_gs, bmaz_e=bmaz_e,
-                                         boresite_e=boresite_e, ix_e=ix_e,
-                                         iy_e=iy_e, iz_e=iz_e, step=step)
-
-                    if b is not None:
-                        beams.extend(list(b))
-                    else:
-                        logging.info("unable to update scan at {:}".format(st))
-
-                bm.scan_time = bm.time
-                scan[0] = bm
-                snum = 1
-                bm_sign = 0
-                have_scan = False
-
-        # Cycle to next beam
-        bm, num = get_beam(rad_bms, num)
+            estr = "unable to update scan at {:}".format(scans[i][0].time)
+            logging.info(estr)
 
     #---------------------------------------------------------------------
     # Once the scans have been loaded, beam-UT tests of the FoV flags can
@@ -2239,246 +2427,304 @@ def beam_ut_struct_test(rad_bms, min_frac=.10, frg_box=[5,8,13,23],
     #-----------------------------------------------------------------------
     # Cycle through all the beams, updating the FoV flag and structure flag
     # once enough data has been loaded
+    ut_usec = _timedelta_usec(ut_box)
+    max_rg = np.asarray(max_rg)
+    frg_box = np.asarray(frg_box)
+    rhalf = np.asarray(rhalf)
+
     for bnum in beams.keys():
+        bms = beams[bnum]
+
+        #-------------------------------------------------------------------
+        # Load the backscatter points at this beam into columnar arrays
+        pnts = _load_ut_columns(bms, near_rg, reg_attr, hop_attr, fov_attr,
+                                restrict_attr, restrict_lim)
+        npnts = len(pnts["rg"])
+        fovbelong = {"out":np.zeros(npnts, dtype=int),
+                     "in":np.zeros(npnts, dtype=int),
+                     "mix":np.zeros(npnts, dtype=int)}
+        nlow = 0
+
+        #-------------------------------------------------------------------
+        # Find the UT windows.  Each window begins at a beam that is at least
+        # ut_box older than a later beam and includes the beams with the same
+        # common program that were observed within ut_box of the first beam
+        btime = np.array([_timedelta_usec(b.time - bms[0].time) for b in bms])
+        bcp = np.array([b.cp for b in bms])
+        windows = list()
         bis = 0
-        fovbelong = [[{"out":0, "in":0, "mix":0}
-                      for j in beams[bnum][i].fit.slist]
-                     for i in np.arange(0, len(beams[bnum]))]
-        fovpast = [[j for j in beams[bnum][i].fit.pastfov]
-                   for i in np.arange(0, len(beams[bnum]))]
-        for i in np.arange(0, len(beams[bnum])):
-            # See if there is enough data at this beam to begin the evaluation
-            while beams[bnum][i].time - beams[bnum][bis].time >= ut_box:
-                # Check the common program of each of the beams.  For a UT
-                # comparision, the cp must be the same for all beams
-                bicp = [bis + j for j,b in enumerate(beams[bnum][bis:i])
-                        if(b.cp == beams[bnum][bis].cp and
-                           b.time - beams[bnum][bis].time < ut_box)]
-
-                # Test to see if there is enough data to fill the time window
-                if beams[bnum][i].time - beams[bnum][bis].time < ut_box:
-                    break
+        for i in np.arange(0, len(bms)):
+            while btime[i] - btime[bis] >= ut_usec:
+                wbeams = np.arange(bis, i)
+                wbeams = wbeams[(bcp[bis:i] == bcp[bis]) &
+                                (btime[bis:i] - btime[bis] < ut_usec)]
+                windows.append((bis, wbeams))
+                bis += 1
 
-                # Get the range gate, FoV flag, hop, beam index, and range
-                # gate index for all backscatter points at these beams
-                rgates = list()
-                fovflg = list()
-                onefov = list()
-                hops = list()
-                regions = list()
-                bi = list()
-                ri = list()
-                rdata = dict()
-                for rattr in restrict_attr:
-                    rdata[rattr] = list()
-
-                for bb in bicp:
-                    b = beams[bnum][bb]
-
-                    # Load data from the beam, if it exists
-                    if(b.fit is not None and hasattr(b.fit, "slist") and
-                       hasattr(b.fit, fov_attr) and hasattr(b.fit, hop_attr)):
-                        slist = getattr(b.fit, "slist")
-                        rgates.extend(slist)
-                        bi.extend([bb for j in slist])
-                        ri.extend([j for j,r in enumerate(slist)])
-                        fflg = getattr(b.fit, fov_attr)
-                        fovflg.extend(fflg)
-                        otherelv = [b.fit.felv[oe] if ff == -1 else
-                                    b.fit.belv[oe] for oe,ff in enumerate(fflg)]
-                        onefov.extend([np.isnan(oe) if slist[j] < near_rg
-                                       else False
-                                       for j,oe in enumerate(otherelv)])
-                        hops.extend(getattr(b.fit, hop_attr))
-                        if len(reg_attr) > 0 and hasattr(b.fit, reg_attr):
-                            regions.extend(getattr(b.fit, reg_attr))
-
-                        for j,rattr in enumerate(restrict_attr):
-                            if hasattr(b.fit, rattr):
-                                rdata[rattr].extend(getattr(b.fit, rattr))
-                            else:
-                                rdata[rattr].extend([restrict_lim[j][0]
-                                                     for r in slist])
-
-                if len(rgates) > 0:
-                    # Cycle through range gate boxes
-                    range_min = np.nanmin(rgates)
-                    range_max = np.nanmax(rgates)
-                    if range_max > max(max_rg):
-                        range_max = max(max_rg)
-
-                    rgates = np.array(rgates)
-                    fovflg = np.array(fovflg)
-                    onefov = np.array(onefov)
-
-                    # Combine hop and region data (if available), to allow
-                    # a comprehensive division by propagation path
-                    if len(regions) == len(hops):
-                        chops = ["{:.1f}{:s}".format(hops[ihop], reg)
-                                 if not np.isnan(hops[ihop]) and len(reg) > 0
-                                 else np.nan for ihop,reg in enumerate(regions)]
-                    else:
-                        chops = hops
-
-                    for rattr in restrict_attr:
-                        rdata[rattr] = np.array(rdata[rattr])
-
-                    for r in np.arange(range_min, range_max + 1):
-                        # Select the indexes for this range gate box
-                        ilim = 0
-                        while ilim < len(max_rg) and r >= max_rg[ilim]:
-                            ilim += 1
-
-                        rmin = r - rhalf[ilim]
-                        rmax = r + rhalf[ilim]
-
-                        # If the box size is even, then the testing
-                        # conditions will put too many points in the box
-                        # unless the size is reduced.  Effectively sets:
-                        # jr = np.where(rgates[ir] < rmax)[0]
-                        if frg_box[ilim] % 2 == 0:
-                            rmax -= 1
-
-                        # Now that we know how big our window is, we can
-                        # determine the maximum number of points
-                        max_pnts = float(len(bicp) * frg_box[ilim])
-                        ir = np.where(rgates >= rmin)[0]
-                        jr = np.where(rgates[ir] <= rmax)[0]
-
-                        # Find the hop numbers to consider
-                        shop = set([chops[ihop] for ihop in ir[jr]
-                                    if isinstance(chops[ihop], str) or
-                                    not np.isnan(chops[ihop])])
-
-                        for ihop in shop:
-                            hr = [ih for ih in ir[jr] if chops[ih] == ihop]
-
-                            # Test any additional restrictions
-                            if float(len(hr)) / max_pnts >= min_frac:
-                                for j,rattr in enumerate(restrict_attr):
-                                    if len(restrict_lim[j]) == 2:
-                                        hk = [hr[k] for k,rd in
-                                              enumerate(rdata[rattr][hr])
-                                              if(rd >= restrict_lim[j][0]
-                                                 and rd < restrict_lim[j][1])]
-                                        hr = hk
-
-                                    # Quit testing if there aren't enough
-                                    # points to perform the UT structure
-                                    # evaluation
-                                    if float(len(hr)) / max_pnts < min_frac:
-                                        break
-
-                            # Evaluate the temporal FoV structures
-                            if float(len(hr)) / max_pnts < min_frac:
-                                # There are not enough points in this range
-                                # gate and UT box to evaluate the
-                                # backscatter structures at this hop
-                                estr = "unable to evaluate beam ["
-                                estr = "{:s}{:d}] at [".format(estr, bnum)
-                                estr = "{:s}{:}".format(estr,
-                                                        beams[bnum][bis].time)
-                                estr = "{:s}] gate [{:d}], ".format(estr, r)
-                                estr = "{:s}insufficient ".format(estr)
-                                estr = "{:s}backscatter [".format(estr)
-                                estr = "{:s}{:d} < ".format(estr, len(hr))
-                                estr = "{:s}{:.0f}".format(estr, max_pnts
-                                                           * min_frac)
-                                estr = "{:s}] at hop [{:s}]".format(estr, ihop)
-                                logging.info(estr)
-                            elif float(len(hr)) / max_pnts > 1.0:
-                                estr = "maximum number of points exceeded for "
-                                estr = "{:s}beam [{:d}] ".format(estr, bnum)
-                                estr = "{:s}between range gates ".format(estr)
-                                estr = "{:s}[{:d}-{:d}".format(estr, rmin, rmax)
-                                estr = "{:s}] at [{:}".format(estr, \
-                                                        beams[bnum][bis].time)
-                                estr = "{:s} to {:}]".format(estr, \
-                                                    beams[bnum][max(bicp)].time)
-                                estr = "{:s}: {:d} > ".format(estr, len(hr))
-                                estr = "{:s}{:f}".format(estr, max_pnts)
-                                logging.error(estr)
-                            else:
-                                # Get the number of backscatter observations
-                                # in each field-of-view
-                                rr = dict()
-                                rr[1] = np.where(fovflg[hr] == 1)[0]
-                                rr[-1] = np.where(fovflg[hr] == -1)[0]
-                                fn = float(len(rr[1]))
-                                bn = float(len(rr[-1]))
-                                tn = fn + bn
-                                ffrac = fn / tn if tn > 0.0 else -1.0
-
-                                bad_fov = 0
-                                good_fov = False
-                                if(ffrac > 0.0 and ffrac >= fov_frac and
-                                   bn > 0.0):
-                                    good_fov = True
-                                    bad_fov = -1
-                                elif(ffrac >= 0.0 and 1.0-ffrac >= fov_frac
-                                     and fn > 0.0):
-                                    good_fov = True
-                                    bad_fov = 1
-
-                                # Tag the FoV for being consistent or not and
-                                # mixed or not, unless this backscatter point
-                                # only as one valid FoV
-                                if good_fov:
-                                    for irr in rr[bad_fov]:
-                                        if not onefov[hr[irr]]:
-                                            zz = bi[hr[irr]]
-                                            yy = ri[hr[irr]]
-                                            fovbelong[zz][yy]['out'] += 1
-
-                                    for irr in rr[-bad_fov]:
-                                        zz = bi[hr[irr]]
-                                        yy = ri[hr[irr]]
-                                        fovbelong[zz][yy]['in'] += 1
-                                else:
-                                    for ih in hr:
-                                        if abs(fovflg[ih]) == 1:
-                                            zz = bi[ih]
-                                            yy = ri[ih]
-                                            fovbelong[zz][yy]['mix'] += 1
+        for bis, bicp in windows:
+            # Get the backscatter points for all beams in this window
+            inwin = np.zeros(len(bms), dtype=bool)
+            inwin[bicp] = True
+            ip = np.nonzero(inwin[pnts["bi"]])[0]
 
-                del rgates, fovflg, hops, bi, ri
-                bis += 1
+            if len(ip) == 0:
+                continue
+
+            # Combine hop and region data (if available), to allow a
+            # comprehensive division by propagation path
+            if(pnts["nreg"][bicp].sum() == pnts["nhop"][bicp].sum()):
+                pcode = pnts["reghop"][ip]
+            else:
+                pcode = pnts["hop"][ip]
+            chops = -np.ones(len(ip), dtype=int)
+            hops, chops[pcode >= 0] = np.unique(pcode[pcode >= 0],
+                                                return_inverse=True)
+            nhops = len(hops)
+
+            if nhops == 0:
+                continue
+
+            # Set the range gate boxes
+            rgates = pnts["rg"][ip]
+            range_max = np.nanmax(rgates)
+            if range_max > max(max_rg):
+                range_max = max(max_rg)
+            rcen = np.arange(np.nanmin(rgates), range_max + 1)
+
+            if len(rcen) == 0:
+                continue
 
+            below = rcen[:,np.newaxis] < max_rg[np.newaxis,:]
+            ilim = np.where(below.any(axis=1), below.argmax(axis=1),
+                            len(max_rg))
+            rmin = rcen - rhalf[ilim]
+            # If the box size is even, then the testing conditions will put
+            # too many points in the box unless the size is reduced
+            rmax = rcen + rhalf[ilim] - (frg_box[ilim] % 2 == 0)
+            max_pnts = (len(bicp) * frg_box[ilim]).astype(float)
+
+            # Count the backscatter points from each propagation path in each
+            # range gate box, considering any additional restrictions
+            inbox = ((rgates[:,np.newaxis] >= rmin[np.newaxis,:]) &
+                     (rgates[:,np.newaxis] <= rmax[np.newaxis,:]))
+            inbox = inbox.astype(float)
+            ihop = np.zeros(shape=(len(ip), nhops), dtype=float)
+            good = np.nonzero((chops >= 0) & pnts["restrict"][ip])[0]
+            ihop[good, chops[good]] = 1.0
+            fovflg = pnts["fov"][ip]
+
+            nbox = np.dot(inbox.transpose(), ihop)
+            fn = np.dot(inbox.transpose(), ihop * (fovflg == 1)[:,np.newaxis])
+            bn = np.dot(inbox.transpose(), ihop * (fovflg == -1)[:,np.newaxis])
+            frac = nbox / max_pnts[:,np.newaxis]
+            nlow += np.sum((frac < min_frac) & (nbox > 0))
+
+            for ir, ih in zip(*np.nonzero(frac > 1.0)):
+                estr = "maximum number of points exceeded for "
+                estr = "{:s}beam [{:d}] ".format(estr, bnum)
+                estr = "{:s}between range gates ".format(estr)
+                estr = "{:s}[{:d}-{:d}".format(estr, int(rmin[ir]),
+                                               int(rmax[ir]))
+                estr = "{:s}] at [{:}".format(estr, bms[bis].time)
+                estr = "{:s} to {:}]".format(estr, bms[max(bicp)].time)
+                estr = "{:s}: {:.0f} > ".format(estr, nbox[ir,ih])
+                estr = "{:s}{:f}".format(estr, max_pnts[ir])
+                logging.error(estr)
+
+            # Evaluate the temporal FoV structures in boxes with enough
+            # backscatter, testing to see if a FoV dominates each one
+            evaluate = (frac >= min_frac) & (frac <= 1.0)
+            tn = fn + bn
+            with np.errstate(invalid="ignore", divide="ignore"):
+                ffrac = np.where(tn > 0.0, fn / tn, -1.0)
+            bad_back = (ffrac > 0.0) & (ffrac >= fov_frac) & (bn > 0.0)
+            bad_front = (~bad_back & (ffrac >= 0.0) &
+                         (1.0 - ffrac >= fov_frac) & (fn > 0.0))
+            mixed = evaluate & ~bad_back & ~bad_front
+            bad_back &= evaluate
+            bad_front &= evaluate
+
+            # Tag the FoV of each point for being consistent or not and mixed
+            # or not in each box that contains it, unless this backscatter
+            # point only has one valid FoV
+            pi = good
+            pk = chops[good]
+            pfov = fovflg[good]
+            nback = np.dot(inbox, bad_back.astype(float))[pi, pk]
+            nfront = np.dot(inbox, bad_front.astype(float))[pi, pk]
+            nmix = np.dot(inbox, mixed.astype(float))[pi, pk]
+            multi = ~pnts["onefov"][ip][good]
+            iout = (np.where((pfov == -1) & multi, nback, 0) +
+                    np.where((pfov == 1) & multi, nfront, 0))
+            iin = np.where(pfov == 1, nback, 0) + np.where(pfov == -1, nfront,
+                                                           0)
+            imix = np.where(np.abs(pfov) == 1, nmix, 0)
+
+            fovbelong["out"][ip[good]] += iout.astype(int)
+            fovbelong["in"][ip[good]] += iin.astype(int)
+            fovbelong["mix"][ip[good]] += imix.astype(int)
+
+        if nlow > 0:
+            estr = "unable to evaluate [{:d}] range gate ".format(nlow)
+            estr = "{:s}boxes at beam [{:d}], insufficient ".format(estr, bnum)
+            estr = "{:s}backscatter".format(estr)
+            logging.info(estr)
+
+        #-------------------------------------------------------------------
         # Update the fovflags
-        for i in np.arange(0, len(beams[bnum])):
-            for j,bdict in enumerate(fovbelong[i]):
-                if(bdict["out"] > 0 and
-                   bdict["in"] < bdict["out"] + bdict["mix"]):
-                    # Update the FoV flag and the structure flag, since a
-                    # structure cannot be set without a FoV
-                    if(bdict['out'] > bdict['mix'] and
-                       bdict['out'] > bdict['in']):
-                        beams[bnum][i].fit.fovflg[j] = fovpast[i][j]
-                    else:
-                        beams[bnum][i].fit.fovflg[j] = 0
-
-                    if fovpast[i][j] != 0:
-                        if fovpast[i][j] == -1:
-                            nelv = beams[bnum][i].fit.belv[j]
-                            nelve = beams[bnum][i].fit.belv_e[j]
-                            nheight = beams[bnum][i].fit.bvheight[j]
-                            nheighte = beams[bnum][i].fit.bvheight_e[j]
-                            nhop = beams[bnum][i].fit.bhop[j]
-                            nreg = beams[bnum][i].fit.bregion[j]
-                        else:
-                            nelv = beams[bnum][i].fit.felv[j]
-                            nelve = beams[bnum][i].fit.felv_e[j]
-                            nheight = beams[bnum][i].fit.fvheight[j]
-                            nheighte = beams[bnum][i].fit.fvheight_e[j]
-                            nhop = beams[bnum][i].fit.fhop[j]
-                            nreg = beams[bnum][i].fit.fregion[j]
-
-                        beams[bnum][i].fit.fovelv[j] = nelv
-                        beams[bnum][i].fit.fovelv_e[j] = nelve
-                        beams[bnum][i].fit.vheight[j] = nheight
-                        beams[bnum][i].fit.vheight_e[j] = nheighte
-                        beams[bnum][i].fit.hop[j] = nhop
-                        beams[bnum][i].fit.region[j] = nreg
-                        fovpast[i][j] = 0
+        upd = ((fovbelong["out"] > 0) &
+               (fovbelong["in"] < fovbelong["out"] + fovbelong["mix"]))
+
+        for i in np.unique(pnts["bi"][upd]):
+            fit = bms[i].fit
+            iupd = np.nonzero(upd & (pnts["bi"] == i))[0]
+            j = pnts["ri"][iupd]
+            past = np.array(fit.pastfov)[j]
+
+            for attr in ["fovflg", "fovelv", "fovelv_e", "vheight",
+                         "vheight_e", "hop", "region"]:
+                if not isinstance(getattr(fit, attr), np.ndarray):
+                    dtype = object if attr == "region" else None
+                    setattr(fit, attr, np.array(getattr(fit, attr),
+                                                dtype=dtype))
+
+            # Update the FoV flag and the structure flag, since a structure
+            # cannot be set without a FoV
+            isout = ((fovbelong["out"][iupd] > fovbelong["mix"][iupd]) &
+                     (fovbelong["out"][iupd] > fovbelong["in"][iupd]))
+            fit.fovflg[j] = np.where(isout, past, 0)
+
+            jpast = j[past != 0]
+            back = past[past != 0] == -1
+            for attr, fattr, battr in [("fovelv", "felv", "belv"),
+                                       ("fovelv_e", "felv_e", "belv_e"),
+                                       ("vheight", "fvheight", "bvheight"),
+                                       ("vheight_e", "fvheight_e",
+                                        "bvheight_e"),
+                                       ("hop", "fhop", "bhop"),
+                                       ("region", "fregion", "bregion")]:
+                fval = np.array(getattr(fit, fattr), dtype=object)[jpast]
+                bval = np.array(getattr(fit, battr), dtype=object)[jpast]
+                getattr(fit, attr)[jpast] = np.where(back, bval, fval)
 
     return(beams)
+
+def _timedelta_usec(delta):
+    """Convert a time difference to an integer number of microseconds, so
+    that time differences can be compared exactly
+
+    Parameters
+    -----------
+    delta : (class `dt.timedelta`)
+        Time difference
+
+    Returns
+    ---------
+    usec : (int)
+        Time difference in microseconds
+    """
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+def _load_ut_columns(bms, near_rg, reg_attr, hop_attr, fov_attr,
+                     restrict_attr, restrict_lim):
+    """Load the backscatter points in a list of beams into columnar arrays for
+    the UT continuity test
+
+    Parameters
+    -----------
+    bms : (list)
+        List of beamData class objects
+    near_rg : (float)
+        Range gate within which backscatter with only one valid FoV is not
+        counted as an outlier
+    reg_attr : (string)
+        beam.fit attribute name for the ionospheric region
+    hop_attr : (string)
+        beam.fit attribute name for the hop or groundscatter flag
+    fov_attr : (string)
+        beam.fit attribute name for the FoV flag
+    restrict_attr : (list)
+        List of beam.fit attribute names used to restrict the points
+    restrict_lim : (list)
+        List of two-element lists with the minimum and maximum allowed values
+        for each attribute in restrict_attr
+
+    Returns
+    ---------
+    pnts : (dict)
+        Dictionary of arrays with one element per backscatter point ("bi" the
+        beam index, "ri" the index within the beam, "rg" the range gate,
+        "fov" the FoV flag, "onefov" whether only one FoV is valid, "hop" the
+        propagation path code using only the hop, "reghop" the propagation
+        path code using the hop and region, "restrict" whether the point
+        meets the restrictions) and one element per beam ("nhop" and "nreg"
+        the number of hop and region values)
+    """
+    bi = list()
+    ri = list()
+    rgates = list()
+    fovflg = list()
+    onefov = list()
+    hops = list()
+    reghops = list()
+    restrict = list()
+    nhop = np.zeros(len(bms), dtype=int)
+    nreg = np.zeros(len(bms), dtype=int)
+
+    for bb,b in enumerate(bms):
+        # Load data from the beam, if it exists
+        if(b.fit is not None and hasattr(b.fit, "slist") and
+           hasattr(b.fit, fov_attr) and hasattr(b.fit, hop_attr)):
+            slist = np.asarray(getattr(b.fit, "slist"))
+            fflg = np.asarray(getattr(b.fit, fov_attr))
+            bhop = np.asarray(getattr(b.fit, hop_attr), dtype=float)
+            bi.append(np.ones(len(slist), dtype=int) * bb)
+            ri.append(np.arange(0, len(slist)))
+            rgates.append(slist)
+            fovflg.append(fflg)
+            otherelv = np.where(fflg == -1, np.asarray(b.fit.felv, dtype=float),
+                                np.asarray(b.fit.belv, dtype=float))
+            onefov.append(np.isnan(otherelv) & (slist < near_rg))
+            hops.append(bhop)
+            nhop[bb] = len(bhop)
+
+            if len(reg_attr) > 0 and hasattr(b.fit, reg_attr):
+                breg = getattr(b.fit, reg_attr)
+                nreg[bb] = len(breg)
+                reghops.append(["{:.1f}{:s}".format(bhop[ir], reg)
+                                if not np.isnan(bhop[ir]) and len(reg) > 0
+                                else "" for ir,reg in enumerate(breg)])
+            else:
+                reghops.append(["" for r in slist])
+
+            rok = np.ones(len(slist), dtype=bool)
+            for j,rattr in enumerate(restrict_attr):
+                if len(restrict_lim[j]) == 2 and hasattr(b.fit, rattr):
+                    rd = np.asarray(getattr(b.fit, rattr))
+                    rok &= ((rd >= restrict_lim[j][0]) &
+                            (rd < restrict_lim[j][1]))
+                elif len(restrict_lim[j]) == 2:
+                    rok &= (restrict_lim[j][0] < restrict_lim[j][1])
+            restrict.append(rok)
+
+    if len(bi) == 0:
+        return {"bi":np.zeros(0, dtype=int), "ri":np.zeros(0, dtype=int),
+                "rg":np.zeros(0), "fov":np.zeros(0), "hop":np.zeros(0),
+                "reghop":np.zeros(0), "onefov":np.zeros(0, dtype=bool),
+                "restrict":np.zeros(0, dtype=bool), "nhop":nhop, "nreg":nreg}
+
+    # Propagation paths are identified by integer codes, where -1 indicates
+    # that the path is unknown
+    hops = np.concatenate(hops)
+    hcode = np.unique(hops[~np.isnan(hops)], return_inverse=True)[1]
+    hop_code = -np.ones(len(hops), dtype=int)
+    hop_code[~np.isnan(hops)] = hcode
+    reghops = np.concatenate(reghops)
+    rcode = np.unique(reghops, return_inverse=True)[1]
+    reghop_code = np.where(reghops == "", -1, rcode)
+
+    return {"bi":np.concatenate(bi), "ri":np.concatenate(ri),
+            "rg":np.concatenate(rgates), "fov":np.concatenate(fovflg),
+            "onefov":np.concatenate(onefov), "hop":hop_code,
+            "reghop":reghop_code, "restrict":np.concatenate(restrict),
+            "nhop":nhop, "nreg":nreg}
@@ -0,0 +1,569 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2012  VT SuperDARN Lab
+# Full license can be found in LICENSE.txt
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""pipeline
+
+Streaming processing of radar data one scan at a time.  A scan source feeds a
+chain of stages, each of which sees a sliding window of its input, and the
+output of the last stage is collected by a sink.  The stages are connected by
+generators, so only the items inside the stage windows are held in memory.
+
+Functions
+------------------------------------------------------------------------------
+scanSource      yield scans from a data pointer or an iterable
+runPipeline     connect a source, stages, and a sink
+------------------------------------------------------------------------------
+
+Classes
+------------------------------------------------------------------------------
+windowStage     apply a function to a sliding window of items
+mapStage        apply a function to each item
+dmapSink        write beams to a DMAP file
+columnSink      collect beam data as columns of point data
+cubeSink        collect scans as (time, beam, range gate) arrays
+------------------------------------------------------------------------------
+
+Example
+--------
+::
+
+    import datetime as dt
+    from davitpy import pydarn
+    from davitpy.pydarn.sdio import fitexfilter as ff
+    from davitpy.pydarn.proc import pipeline as pp
+
+    ptr = pydarn.sdio.radDataOpen(dt.datetime(2011,1,1), 'bks',
+                                  fileType='fitacf')
+    nrec = pp.runPipeline(pp.scanSource(ptr),
+                          [pp.mapStage(ff.scanArrays),
+                           pp.windowStage(ff.boxcarFilter, 1, 1)],
+                          pp.dmapSink('filtered.fitacf'), processes=True)
+"""
+import numpy as np
+import logging
+from collections import deque
+
+#---------------------------------------------------------------------------
+def scanSource(source):
+    """Yield scans of data
+
+    Parameters
+    -----------
+    source : (class `pydarn.sdio.radDataTypes.radDataPtr` or iterable)
+        Data pointer to read scans from, or an iterable of scans
+
+    Returns
+    --------
+    scans : (generator)
+        Generator of scans (class `pydarn.sdio.radDataTypes.scanData`, or the
+        items of an iterable source)
+    """
+    from davitpy.pydarn.sdio import radDataPtr
+
+    if isinstance(source, radDataPtr):
+        scan = source.readScan()
+        while scan is not None:
+            yield scan
+            scan = source.readScan()
+    else:
+        for scan in source:
+            yield scan
+
+#---------------------------------------------------------------------------
+class windowStage(object):
+    """Apply a function to a sliding window over a stream of items
+
+    Parameters
+    -----------
+    func : (function)
+        Function called as func(window, **kwargs), where window is a list of
+        behind + 1 + ahead consecutive items with the current item at index
+        behind.  Items before the start or after the end of the stream are
+        None.  The function returns an output item, or None to drop it.
+    behind : (int)
+        Number of previous items needed by func (default=0)
+    ahead : (int)
+        Number of following items needed by func (default=0)
+    kwargs : (dict)
+        Keyword arguments for func
+
+    Attributes
+    -----------
+    func : (function)
+        Function applied to each window
+    behind : (int)
+        Number of previous items in each window
+    ahead : (int)
+        Number of following items in each window
+    kwargs : (dict)
+        Keyword arguments for func
+
+    Notes
+    ------
+    Calling the stage with an iterable of items returns a generator of output
+    items.  No more than behind + 1 + ahead input items are held at one time.
+    """
+    def __init__(self, func, behind=0, ahead=0, **kwargs):
+        assert isinstance(behind, int) and behind >= 0, \
+            logging.error('unknown look-behind [{:}]'.format(behind))
+        assert isinstance(ahead, int) and ahead >= 0, \
+            logging.error('unknown look-ahead [{:}]'.format(ahead))
+
+        self.func = func
+        self.behind = behind
+        self.ahead = ahead
+        self.kwargs = kwargs
+
+    def _apply(self, window):
+        """Apply the function to a window
+
+        Parameters
+        -----------
+        window : (list)
+            Consecutive items, with the current item at index self.behind
+
+        Returns
+        --------
+        out : (object)
+            Output of self.func
+        """
+        return self.func(window, **self.kwargs)
+
+    def __call__(self, items):
+        """Process a stream of items
+
+        Parameters
+        -----------
+        items : (iterable)
+            Input items
+
+        Returns
+        --------
+        out : (generator)
+            Generator of output items that are not None
+        """
+        nwin = self.behind + 1 + self.ahead
+        window = deque([None] * self.behind, maxlen=nwin)
+        nitems = 0
+        ndone = 0
+
+        for item in items:
+            window.append(item)
+            nitems += 1
+            if len(window) == nwin:
+                ndone += 1
+                out = self._apply(list(window))
+                if out is not None:
+                    yield out
+
+        # Finish the items still waiting for their following items
+        while ndone < nitems:
+            window.append(None)
+            if len(window) == nwin:
+                ndone += 1
+                out = self._apply(list(window))
+                if out is not None:
+                    yield out
+
+class mapStage(windowStage):
+    """Apply a function to each item in a stream
+
+    Parameters
+    -----------
+    func : (function)
+        Function called as func(item, **kwargs), which returns an output item,
+        or None to drop it
+    kwargs : (dict)
+        Keyword arguments for func
+    """
+    def __init__(self, func, **kwargs):
+        windowStage.__init__(self, func, 0, 0, **kwargs)
+
+    def _apply(self, window):
+        """Apply the function to the only item in a window
+
+        Parameters
+        -----------
+        window : (list)
+            List holding the current item
+
+        Returns
+        --------
+        out : (object)
+            Output of self.func
+        """
+        return self.func(window[0], **self.kwargs)
+
+#---------------------------------------------------------------------------
+def _iter_beams(item):
+    """Yield the beams in a pipeline item
+
+    Parameters
+    -----------
+    item : (beamData, list, or dict)
+        A beam, a scan or other list of beams, or a dict with a list of beams
+        under the key 'beams' (as output by pydarn.sdio.fitexfilter.scanArrays)
+
+    Returns
+    --------
+    beams : (generator)
+        Generator of beamData class objects
+    """
+    if isinstance(item, dict):
+        item = item['beams']
+
+    if isinstance(item, (list, tuple, np.ndarray)):
+        for beam in item:
+            yield beam
+    else:
+        yield item
+
+class dmapSink(object):
+    """Write the beams in a stream of items to a DMAP file
+
+    Parameters
+    -----------
+    outfile : (str)
+        Name of the output file, which is overwritten
+
+    Attributes
+    -----------
+    outfile : (str)
+        Name of the output file
+
+    Notes
+    ------
+    Calling the sink with an iterable of beams or scans writes the beams with
+    pydarn.dmapio.writeFitRec and returns the number of records written.
+    """
+    def __init__(self, outfile):
+        self.outfile = outfile
+
+    def __call__(self, items):
+        from davitpy import pydarn
+        from davitpy import utils
+
+        nrec = 0
+        with open(self.outfile, 'wb') as outp:
+            for item in items:
+                for beam in _iter_beams(item):
+                    pydarn.dmapio.writeFitRec(beam,
+                                              utils.datetimeToEpoch(beam.time),
+                                              outp)
+                    nrec += 1
+
+        return nrec
+
+class columnSink(object):
+    """Collect the fitted data in a stream of beams or scans as columns, with
+    one row for each range gate with data
+
+    Parameters
+    -----------
+    attrs : (list)
+        Names of the fitted data attributes to collect.  Beams without an
+        attribute are given NaN. (default=['v', 'w_l', 'p_l', 'gflg'])
+
+    Attributes
+    -----------
+    attrs : (list)
+        Names of the fitted data attributes to collect
+
+    Notes
+    ------
+    Calling the sink with an iterable of items returns a dict of np.ndarrays
+    holding the 'time' (datetime64[us]), 'stid', 'bmnum', 'tfreq', and
+    'slist' of each point, as well as the requested attributes.
+    """
+    def __init__(self, attrs=['v', 'w_l', 'p_l', 'gflg']):
+        self.attrs = list(attrs)
+
+    def __call__(self, items):
+        keys = ['time', 'stid', 'bmnum', 'tfreq', 'slist'] + self.attrs
+        cols = dict([(key, list()) for key in keys])
+
+        for item in items:
+            for beam in _iter_beams(item):
+                slist = beam.fit.slist
+                npnts = 0 if slist is None else len(slist)
+                if npnts == 0:
+                    continue
+
+                cols['time'].append(np.repeat(np.datetime64(beam.time, 'us'),
+                                              npnts))
+                cols['stid'].append(np.repeat(beam.stid, npnts))
+                cols['bmnum'].append(np.repeat(beam.bmnum, npnts))
+                cols['tfreq'].append(np.repeat(beam.prm.tfreq, npnts))
+                cols['slist'].append(np.asarray(slist))
+                for attr in self.attrs:
+                    val = getattr(beam.fit, attr, None)
+                    if val is None or len(val) != npnts:
+                        val = np.full(npnts, np.nan)
+                    cols[attr].append(np.asarray(val))
+
+        for key in keys:
+            cols[key] = (np.concatenate(cols[key]) if len(cols[key]) > 0
+                         else np.array(list(), dtype='datetime64[us]'
+                                       if key == 'time' else float))
+
+        return cols
+
+class cubeSink(object):
+    """Collect a stream of scans as (time, beam, range gate) arrays
+
+    Parameters
+    -----------
+    attrs : (list)
+        Names of the fitted data attributes to collect
+        (default=pydarn.sdio.fitexfilter.filter_attrs)
+
+    Attributes
+    -----------
+    attrs : (list)
+        Names of the fitted data attributes to collect
+
+    Notes
+    ------
+    Calling the sink with an iterable of scans, or of the output of
+    pydarn.sdio.fitexfilter.scanArrays, returns a dict holding the scan start
+    'time' (datetime64[us]), 'has_beam' (time, beam) and 'good'
+    (time, beam, range gate) boolean arrays, and a (time, beam, range gate)
+    array for each attribute, with NaN where there is no data.  Only the
+    arrays are kept, not the beams.
+    """
+    def __init__(self, attrs=None):
+        self.attrs = attrs
+
+    def __call__(self, items):
+        from davitpy.pydarn.sdio import fitexfilter
+
+        attrs = fitexfilter.filter_attrs if self.attrs is None else self.attrs
+        keys = ['has_beam', 'good'] + list(attrs)
+        scans = list()
+        stimes = list()
+
+        for item in items:
+            if not isinstance(item, dict) or \
+               not all([item.has_key(key) for key in keys]):
+                item = fitexfilter.scanArrays(list(_iter_beams(item)),
+                                              attrs=attrs)
+            if len(item['beams']) == 0:
+                continue
+
+            stimes.append(np.datetime64(min([b.time for b in item['beams']]),
+                                        'us'))
+            scans.append(dict([(key, item[key]) for key in keys]))
+
+        nbeam = max([len(s['has_beam']) for s in scans]) if scans else 0
+        ngate = max([s['good'].shape[1] for s in scans]) if scans else 0
+        cube = {'time':np.array(stimes, dtype='datetime64[us]'),
+                'has_beam':np.zeros(shape=(len(scans), nbeam), dtype=bool),
+                'good':np.zeros(shape=(len(scans), nbeam, ngate), dtype=bool)}
+        for attr in attrs:
+            cube[attr] = np.full((len(scans), nbeam, ngate), np.nan)
+
+        for i,s in enumerate(scans):
+            nb, ng = s['good'].shape
+            for key in keys:
+                if key == 'has_beam':
+                    cube[key][i,:nb] = s[key]
+                else:
+                    cube[key][i,:nb,:ng] = s[key]
+
+        return cube
+
+#---------------------------------------------------------------------------
+def _detach(item):
+    """Remove the open file references from the beams in an item, so that it
+    can be sent to another process
+
+    Parameters
+    -----------
+    item : (object)
+        Pipeline item
+
+    Returns
+    --------
+    item : (object)
+        The same item, with the fPtr attribute of any beams set to None
+    """
+    if isinstance(item, dict):
+        beams = item.get('beams', list())
+    elif isinstance(item, (list, tuple)):
+        beams = item
+    else:
+        beams = [item]
+
+    for beam in beams:
+        if getattr(beam, 'fPtr', None) is not None:
+            beam.fPtr = None
+
+    return item
+
+def _feed(items, queue):
+    """Put a stream of items on a queue, followed by an end marker
+
+    Parameters
+    -----------
+    items : (iterable)
+        Items to send
+    queue : (class `multiprocessing.Queue`)
+        Bounded queue
+    """
+    import traceback
+
+    try:
+        for item in items:
+            queue.put(('item', _detach(item)))
+        queue.put(('end', None))
+    except Exception:
+        queue.put(('error', traceback.format_exc()))
+
+def _receive(queue, done=None):
+    """Yield the items from a queue until the end marker
+
+    Parameters
+    -----------
+    queue : (class `multiprocessing.Queue`)
+        Queue filled by _feed
+    done : (list or NoneType)
+        One-element list set to [True] once the end marker or an error is
+        received (default=None)
+
+    Returns
+    --------
+    items : (generator)
+        Generator of items.  An error raised upstream is raised again here.
+    """
+    while True:
+        kind, item = queue.get()
+        if kind != 'item' and done is not None:
+            done[0] = True
+
+        if kind == 'end':
+            return
+        elif kind == 'error':
+            raise RuntimeError("pipeline stage failed:\n{:s}".format(item))
+        yield item
+
+def _run_stage(stage, inq, outq):
+    """Run a stage between two queues, used as a process target
+
+    Parameters
+    -----------
+    stage : (class `windowStage`)
+        Stage to run
+    inq : (class `multiprocessing.Queue`)
+        Input queue
+    outq : (class `multiprocessing.Queue`)
+        Output queue
+    """
+    done = [False]
+    _feed(stage(_receive(inq, done)), outq)
+
+    # If this stage failed, drain the input so the upstream stages can finish
+    if not done[0]:
+        try:
+            for item in _receive(inq, done):
+                pass
+        except RuntimeError:
+            pass
+
+def runPipeline(source, stages=list(), sink=None, processes=False,
+                maxsize=2):
+    """Run a source of items through a chain of stages into a sink
+
+    Parameters
+    -----------
+    source : (iterable)
+        Input items, such as the output of scanSource
+    stages : (list)
+        Stages (windowStage or mapStage class objects) applied in order
+        (default=list())
+    sink : (function or NoneType)
+        Function or sink class object called with the iterable of output
+        items, or None to return the output items (default=None)
+    processes : (bool)
+        Run each stage in a separate process, with the items sent between
+        processes through queues (default=False)
+    maxsize : (int)
+        Maximum number of items waiting between two processes (default=2)
+
+    Returns
+    --------
+    out : (object)
+        Output of the sink, or a generator of output items if there is no sink
+
+    Notes
+    ------
+    With processes=True the source is read by a thread of this process and the
+    sink runs in this process, so neither needs to be sent between processes.
+    The items must be picklable, and beams lose their reference to the open
+    data file (fPtr) when passed between processes.  Stage functions must be
+    defined at the top level of a module.
+    """
+    assert isinstance(maxsize, int) and maxsize >= 1, \
+        logging.error('unknown queue size [{:}]'.format(maxsize))
+
+    if not processes or len(stages) == 0:
+        items = source
+        for stage in stages:
+            items = stage(items)
+        return items if sink is None else sink(items)
+
+    items = _run_processes(source, stages, maxsize)
+    return items if sink is None else sink(items)
+
+def _run_processes(source, stages, maxsize):
+    """Run each stage in a separate process
+
+    Parameters
+    -----------
+    source : (iterable)
+        Input items
+    stages : (list)
+        Stages applied in order
+    maxsize : (int)
+        Maximum number of items waiting between two processes
+
+    Returns
+    --------
+    items : (generator)
+        Generator of output items
+    """
+    import multiprocessing as mp
+    import threading
+
+    queues = [mp.Queue(maxsize) for i in range(len(stages) + 1)]
+    procs = [mp.Process(target=_run_stage,
+                        args=(stage, queues[i], queues[i+1]))
+             for i,stage in enumerate(stages)]
+    for proc in procs:
+        proc.daemon = True
+        proc.start()
+
+    feeder = threading.Thread(target=_feed, args=(source, queues[0]))
+    feeder.daemon = True
+    feeder.start()
+
+    try:
+        for item in _receive(queues[-1]):
+            yield item
+    finally:
+        for proc in procs:
+            proc.join(1.0)
+            if proc.is_alive():
+                proc.terminate()
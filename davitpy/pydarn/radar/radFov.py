@@ -360,84 +360,69 @@ class fov(object):
         beams = np.arange(nbeams + 1)
         gates = np.arange(ngates + 1)
 
-        # Create output arrays
-        slant_range_full = np.zeros((nbeams + 1, ngates + 1), dtype='float')
-        lat_full = np.zeros((nbeams + 1, ngates + 1), dtype='float')
-        lon_full = np.zeros((nbeams + 1, ngates + 1), dtype='float')
-        slant_range_center = np.zeros((nbeams + 1, ngates + 1), dtype='float')
-        lat_center = np.zeros((nbeams + 1, ngates + 1), dtype='float')
-        lon_center = np.zeros((nbeams + 1, ngates + 1), dtype='float')
-
         # Calculate deviation from boresight for center of beam
         boff_center = bmsep * (beams - (nbeams - 1) / 2.0)
         # Calculate deviation from boresight for edge of beam
         boff_edge = bmsep * (beams - (nbeams - 1) / 2.0 - 0.5)
 
-        # Iterates through beams
-        for ib in beams:
-            # if none of frang, rsep or recrise are arrays, then only execute
-            # this for the first loop, otherwise, repeat for every beam
-            if (~is_param_array and ib == 0) or is_param_array:
-                # Calculate center slant range
-                srang_center = slantRange(frang[ib], rsep[ib], recrise[ib],
-                                          gates, center=True)
-                # Calculate edges slant range
-                srang_edge = slantRange(frang[ib], rsep[ib], recrise[ib],
-                                        gates, center=False)
-            # Save into output arrays
-            slant_range_center[ib, :-1] = srang_center[:-1]
-            slant_range_full[ib, :] = srang_edge
-
-            # Calculate coordinates for Edge and Center of the current beam
-            for ig in gates:
-                # Handle array-or-not question.
-                talt = altitude[ib, ig] if isinstance(altitude, np.ndarray) \
-                    else altitude
-                telv = elevation[ib, ig] if isinstance(elevation, np.ndarray) \
-                    else elevation
-                t_c_alt = coord_alt[ib, ig] \
-                    if isinstance(coord_alt, np.ndarray) else coord_alt
-                thop = hop[ib, ig] if isinstance(hop, np.ndarray) else hop
-
-                if model == 'GS':
-                    if (~is_param_array and ib == 0) or is_param_array:
-                        slant_range_center[ib, ig] = \
-                            gsMapSlantRange(srang_center[ig], altitude=None,
-                                            elevation=None)
-                        slant_range_full[ib, ig] = \
-                            gsMapSlantRange(srang_edge[ig], altitude=None,
-                                            elevation=None)
-                        srang_center[ig] = slant_range_center[ib, ig]
-                        srang_edge[ig] = slant_range_full[ib, ig]
-
-                if (srang_center[ig] != -1) and (srang_edge[ig] != -1):
-                    # Then calculate projections
-                    latc, lonc = calcFieldPnt(siteLat, siteLon, siteAlt * 1e-3,
-                                              siteBore, boff_center[ib],
-                                              srang_center[ig], elevation=telv,
-                                              altitude=talt, hop=thop,
-                                              model=model, fov_dir=fov_dir)
-                    late, lone = calcFieldPnt(siteLat, siteLon, siteAlt * 1e-3,
-                                              siteBore, boff_edge[ib],
-                                              srang_edge[ig], elevation=telv,
-                                              altitude=talt, hop=thop,
-                                              model=model, fov_dir=fov_dir)
-                    if(coords != 'geo'):
-                        lonc, latc = coord_conv(lonc, latc, "geo", coords,
-                                                altitude=t_c_alt,
-                                                date_time=date_time)
-                        lone, late = coord_conv(lone, late, "geo", coords,
-                                                altitude=t_c_alt,
-                                                date_time=date_time)
-                else:
-                    latc, lonc = np.nan, np.nan
-                    late, lone = np.nan, np.nan
+        # Calculate center and edges slant range of every beam.  If none of
+        # frang, rsep or recrise are arrays, all beams have the same ranges
+        srang_center = slantRange(frang[:, np.newaxis], rsep[:, np.newaxis],
+                                  recrise[:, np.newaxis], gates, center=True)
+        srang_edge = slantRange(frang[:, np.newaxis], rsep[:, np.newaxis],
+                                recrise[:, np.newaxis], gates, center=False)
+        srang_center = srang_center * np.ones((nbeams + 1, 1))
+        srang_edge = srang_edge * np.ones((nbeams + 1, 1))
+        if model == 'GS':
+            srang_center = gsMapSlantRange(srang_center, altitude=None,
+                                           elevation=None)
+            srang_edge = gsMapSlantRange(srang_edge, altitude=None,
+                                         elevation=None)
+            slant_range_center = srang_center.copy()
+        else:
+            slant_range_center = np.zeros((nbeams + 1, ngates + 1))
+            slant_range_center[:, :-1] = srang_center[:, :-1]
+        slant_range_full = srang_edge.copy()
+
+        # Calculate coordinates for Edge and Center of all beams and gates
+        lat_center = np.full((nbeams + 1, ngates + 1), np.nan)
+        lon_center = np.full((nbeams + 1, ngates + 1), np.nan)
+        lat_full = np.full((nbeams + 1, ngates + 1), np.nan)
+        lon_full = np.full((nbeams + 1, ngates + 1), np.nan)
+        good = (srang_center != -1) & (srang_edge != -1)
+        boff_center = (boff_center[:, np.newaxis] * np.ones(good.shape))[good]
+        boff_edge = (boff_edge[:, np.newaxis] * np.ones(good.shape))[good]
+        # Handle array-or-not question.
+        talt = altitude[good] if isinstance(altitude, np.ndarray) \
+            else altitude
+        telv = elevation[good] if isinstance(elevation, np.ndarray) \
+            else elevation
+        t_c_alt = coord_alt[good] if isinstance(coord_alt, np.ndarray) \
+            else coord_alt
+        thop = hop[good] if isinstance(hop, np.ndarray) else hop
+
+        if good.any():
+            # Then calculate projections
+            latc, lonc = calcFieldPnt(siteLat, siteLon, siteAlt * 1e-3,
+                                      siteBore, boff_center,
+                                      srang_center[good], elevation=telv,
+                                      altitude=talt, hop=thop, model=model,
+                                      fov_dir=fov_dir)
+            late, lone = calcFieldPnt(siteLat, siteLon, siteAlt * 1e-3,
+                                      siteBore, boff_edge, srang_edge[good],
+                                      elevation=telv, altitude=talt, hop=thop,
+                                      model=model, fov_dir=fov_dir)
+            if(coords != 'geo'):
+                lonc, latc = coord_conv(lonc, latc, "geo", coords,
+                                        altitude=t_c_alt, date_time=date_time)
+                lone, late = coord_conv(lone, late, "geo", coords,
+                                        altitude=t_c_alt, date_time=date_time)
 
-                # Save into output arrays
-                lat_center[ib, ig] = latc
-                lon_center[ib, ig] = lonc
-                lat_full[ib, ig] = late
-                lon_full[ib, ig] = lone
+            # Save into output arrays
+            lat_center[good] = latc
+            lon_center[good] = lonc
+            lat_full[good] = late
+            lon_full[good] = lone
 
         # Output is...
         self.latCenter = lat_center[:-1, :-1]
@@ -536,6 +521,12 @@ def calcFieldPnt(tr_glat, tr_glon, tr_alt, boresight, beam_off, slant_range,
         Field point latitude(s) in degrees or np.nan if error
     geo_dict['geoLon'] : (float or np.ndarray)
         Field point longitude(s) in degrees or np.nan if error
+
+    Notes
+    -----
+    All of the position, range, elevation, altitude and hop inputs may be
+    arrays, which are broadcast against each other (e.g. the beam offsets as
+    a column and the slant ranges of the gates as a row).
     """
     from davitpy.utils import Re, geoPack
     import davitpy.utils.model_vheight as vhm
@@ -545,24 +536,46 @@ def calcFieldPnt(tr_glat, tr_glon, tr_alt, boresight, beam_off, slant_range,
         logging.error("Only geographic (geo) is implemented in calcFieldPnt.")
         return np.nan, np.nan
 
+    # Broadcast all inputs to arrays of the same shape, keeping track of the
+    # ones that were not provided.  Scalar inputs give scalar outputs.
+    is_scalar = all(np.ndim(x) == 0 for x in
+                    [tr_glat, tr_glon, tr_alt, boresight, beam_off,
+                     slant_range, elevation, altitude, hop])
+    elv_given = elevation is not None
+    alt_given = altitude is not None
+    hop_given = hop is not None
+    (tr_glat, tr_glon, tr_alt, boresight, beam_off, slant_range, elevation,
+     altitude, hop) = [np.array(x, ndmin=1) for x in np.broadcast_arrays(
+         *[np.asarray(np.nan if x is None else x, dtype=float) for x in
+           [tr_glat, tr_glon, tr_alt, boresight, beam_off, slant_range,
+            elevation, altitude, hop]])]
+    geo_lat = np.full(slant_range.shape, np.nan)
+    geo_lon = np.full(slant_range.shape, np.nan)
+
+    def field_pnt():
+        if is_scalar:
+            return float(geo_lat[0]), float(geo_lon[0])
+        return geo_lat, geo_lon
+
     # Use model to get altitude if desired
-    xalt = np.nan
-    calt = None
+    xalt = np.full(slant_range.shape, np.nan)
+    calt = np.full(slant_range.shape, np.nan)
     if model is not None:
         if model in ['IS', 'GS', 'S']:
             # The standard model can be used with or without an input altitude
             # or elevation.  Returns an altitude that has been adjusted to
             # comply with common scatter distributions
-            if hop is None:
+            if not hop_given:
                 if model == "S":
                     # Default to ionospheric backscatter if hop not specified
-                    hop = 0.5
+                    hop[...] = 0.5
                 else:
-                    hop = 0.5 if model == "IS" else 1.0
+                    hop[...] = 0.5 if model == "IS" else 1.0
 
             xalt = vhm.standard_vhm(slant_range, adjusted_sr=adjusted_sr,
-                                    max_vh=max_vh, hop=hop, alt=altitude,
-                                    elv=elevation)
+                                    max_vh=max_vh, hop=hop,
+                                    alt=altitude if alt_given else None,
+                                    elv=elevation if elv_given else None)
         else:
             # The Chisham model uses only the total slant range to determine
             # altitude based on years of backscatter data at SAS.  Performs
@@ -570,143 +583,176 @@ def calcFieldPnt(tr_glat, tr_glon, tr_alt, boresight, beam_off, slant_range,
             # backscatter, not tested on groundscatter
             if adjusted_sr:
                 logging.error("Chisham model needs total slant range")
-                return np.nan, np.nan
+                return field_pnt()
 
             # Use Chisham model to calculate virtual height
             cmodel = None if model == "C" else model
             xalt, shop = vhm.chisham_vhm(slant_range, cmodel, hop_output=True)
 
             # If hop is not known, set using model divisions
-            if hop is None:
-                hop = shop
+            if not hop_given:
+                hop = np.array(shop, dtype=float)
 
             # If hop is greater than 1/2, the elevation angle needs to be
             # calculated from the ground range rather than the virtual height
-            if hop > 0.5:
-                calt = float(xalt)
+            calt = np.where(hop > 0.5, xalt, np.nan)
 
-    elif elevation is None or np.isnan(elevation):
-        if hop is None or adjusted_sr:
+    elif not elv_given or np.isnan(elevation).any():
+        # Points without an elevation use the measured altitude
+        use_alt = np.isnan(elevation)
+        if not hop_given or adjusted_sr:
             logging.error("Total slant range and hop needed with measurements")
-            return np.nan, np.nan
-        if altitude is None or np.isnan(altitude):
+            return field_pnt()
+        if np.isnan(altitude[use_alt]).any():
             logging.error("No observations supplied")
-            return np.nan, np.nan
 
         # Adjust slant range if there is groundscatter and the location
         # desired is the ionospheric reflection point
         asr = slant_range
-        if hop == np.floor(hop) and gs_loc == "I":
-            asr *= 1.0 - 1.0 / (2.0 * hop)
+        if gs_loc == "I":
+            asr = np.where(hop == np.floor(hop),
+                           asr * (1.0 - 1.0 / (2.0 * hop)), asr)
 
         # Adjust altitude if it's unrealistic
-        if asr < altitude:
-            altitude = asr - 10
+        altitude = np.where(asr < altitude, asr - 10, altitude)
 
-        xalt = altitude
+        xalt = np.where(use_alt, altitude, np.nan)
 
     # Use model altitude to determine elevation angle and then the location,
     # or if elevation angle was supplied, find the location
-    if not np.isnan(xalt):
+    use_xalt = ~np.isnan(xalt)
+    if use_xalt.any():
+        # Work on the points with a modeled or measured altitude only
+        pnts = np.nonzero(use_xalt)
+        xalt = xalt[pnts]
+        calt = calt[pnts]
+        shop = hop[pnts]
+        p_glat = tr_glat[pnts]
+        p_glon = tr_glon[pnts]
+        p_alt = tr_alt[pnts]
+
         # Since we have a modeled or measured altitude, start by setting the
         # Earth radius below field point to Earth radius at radar
-        (lat, lon, tr_rad) = geoPack.geodToGeoc(tr_glat, tr_glon)
+        (lat, lon, tr_rad) = geoPack.geodToGeoc(p_glat, p_glon)
         rad_pos = tr_rad
 
         # Iterate until the altitude corresponding to the calculated elevation
         # matches the desired altitude.  Assumes straight-line path to last
         # ionospheric scattering point, so adjust slant range if necessary
         # for groundscatter
-        asr = slant_range
-        shop = hop
-        if not adjusted_sr and hop == np.floor(hop) and gs_loc == "I":
-            asr *= 1.0 - 1.0 / (2.0 * hop)
-            shop = hop - 0.5
+        asr = slant_range[pnts]
+        if not adjusted_sr and gs_loc == "I":
+            is_gs = shop == np.floor(shop)
+            asr = np.where(is_gs, asr * (1.0 - 1.0 / (2.0 * shop)), asr)
+            shop = np.where(is_gs, shop - 0.5, shop)
 
         # Set safty counter and iteratively determine location
         maxn = 30
-        hdel = 100.0
-        htol = 0.5
-        if (slant_range >= 800.0 and model != 'GS') or shop > 1.0:
-            htol = 5.0
-        n = 0
-        while n < maxn:
-            tr_dist = tr_rad + tr_alt
-            if calt is not None:
-                # Adjust elevation angle for any hop > 1 (Chisham et al. 2008)
-                pos_dist = rad_pos + calt
-                phi = np.arccos((tr_dist**2 + pos_dist**2 - asr**2) /
-                                (2.0 * tr_dist * pos_dist))
-                beta = np.arcsin((tr_dist * np.sin(phi / (shop * 2.0))) /
-                                 (asr / (shop * 2.0)))
-                tel = np.pi / 2.0 - beta - phi / (shop * 2.0)
-
-                if xalt == calt:
-                    xalt = np.sqrt(tr_rad**2 + asr**2 + 2.0 * asr * tr_rad *
-                                   np.sin(tel)) - tr_rad
-                tel = np.degrees(tel)
-            else:
+        hdel = np.full(asr.shape, 100.0)
+        htol = np.where(((slant_range[pnts] >= 800.0) & (model != 'GS')) |
+                        (shop > 1.0), 5.0, 0.5)
+        n = np.zeros(asr.shape, dtype=int)
+        tr_dist = tr_rad + p_alt
+        pnt_lat = np.full(asr.shape, np.nan)
+        pnt_lon = np.full(asr.shape, np.nan)
+        todo = np.ones(asr.shape, dtype=bool)
+        while todo.any():
+            i = np.nonzero(todo)[0]
+            with np.errstate(invalid='ignore'):
                 # pointing elevation (spherical Earth value) [degree]
-                tel = np.arcsin(((rad_pos + xalt)**2 - tr_dist**2 - asr**2) /
-                                (2.0 * tr_dist * asr))
-                tel = np.degrees(tel)
+                tel = np.arcsin(((rad_pos[i] + xalt[i])**2 - tr_dist[i]**2 -
+                                 asr[i]**2) / (2.0 * tr_dist[i] * asr[i]))
+
+                # Adjust elevation angle for any hop > 1 (Chisham et al. 2008)
+                chop = ~np.isnan(calt[i])
+                if chop.any():
+                    pos_dist = rad_pos[i] + calt[i]
+                    phi = np.arccos((tr_dist[i]**2 + pos_dist**2 - asr[i]**2) /
+                                    (2.0 * tr_dist[i] * pos_dist))
+                    beta = np.arcsin((tr_dist[i] *
+                                      np.sin(phi / (shop[i] * 2.0))) /
+                                     (asr[i] / (shop[i] * 2.0)))
+                    ctel = np.pi / 2.0 - beta - phi / (shop[i] * 2.0)
+
+                    first = chop & (xalt[i] == calt[i])
+                    xalt[i[first]] = np.sqrt(tr_rad[i]**2 + asr[i]**2 + 2.0 *
+                                             asr[i] * tr_rad[i] *
+                                             np.sin(ctel))[first] - \
+                        tr_rad[i[first]]
+                    tel = np.where(chop, ctel, tel)
+            tel = np.degrees(tel)
 
             # estimate off-array-normal azimuth (because it varies slightly
             # with elevation) [degree]
-            boff = calcAzOffBore(tel, beam_off, fov_dir=fov_dir)
+            boff = calcAzOffBore(tel, beam_off[pnts][i], fov_dir=fov_dir)
             # pointing azimuth
-            taz = boresight + boff
+            taz = boresight[pnts][i] + boff
             # calculate position of field point
-            geo_dict = geoPack.calcDistPnt(tr_glat, tr_glon, tr_alt,
-                                           dist=asr, el=tel, az=taz)
+            geo_dict = geoPack.calcDistPnt(p_glat[i], p_glon[i], p_alt[i],
+                                           dist=asr[i], el=tel, az=taz)
+            pnt_lat[i] = geo_dict['distLat']
+            pnt_lon[i] = geo_dict['distLon']
 
             # Update Earth radius
-            rad_pos = geo_dict['distRe']
+            rad_pos = rad_pos.copy()
+            rad_pos[i] = geo_dict['distRe']
 
             # stop if the altitude is what we want it to be (or close enough)
-            new_hdel = abs(xalt - geo_dict['distAlt'])
-            if new_hdel <= htol or not eval_loc:
-                break
+            new_hdel = abs(xalt[i] - geo_dict['distAlt'])
+            with np.errstate(invalid='ignore'):
+                done = (new_hdel <= htol[i]) | (not eval_loc)
 
-            # stop unsuccessfully if the altitude difference hasn't improved
-            if abs(new_hdel - hdel) < 1.0e-3:
-                n = maxn
+                # stop unsuccessfully if the altitude difference hasn't
+                # improved
+                n[i[~done & (abs(new_hdel - hdel[i]) < 1.0e-3)]] = maxn
 
             # Prepare the next iteration
-            hdel = new_hdel
-            n += 1
+            hdel[i] = new_hdel
+            n[i[~done]] += 1
+            todo[i[done | (n[i] >= maxn)]] = False
 
-        if n >= maxn:
-            estr = 'Accuracy on height calculation ({}) not '.format(htol)
+        if (n >= maxn).any():
+            estr = 'Accuracy on height calculation ({}) not '.format(htol.max())
             estr = '{:s}reached quick enough. Returning nan, nan.'.format(estr)
             logging.warning(estr)
-            return np.nan, np.nan
-        else:
-            return geo_dict['distLat'], geo_dict['distLon']
-    elif elevation is not None:
+            pnt_lat[n >= maxn] = np.nan
+            pnt_lon[n >= maxn] = np.nan
+
+        geo_lat[pnts] = pnt_lat
+        geo_lon[pnts] = pnt_lon
+
+    use_elv = ~use_xalt if elv_given else np.zeros(use_xalt.shape, bool)
+    if use_elv.any():
         # No projection model (i.e., the elevation or altitude is so good that
         # it gives you the proper projection by simple geometric
         # considerations). Using no models simply means tracing based on
         # trustworthy elevation or altitude
-        if hop is None or adjusted_sr:
+        if (model is None and not hop_given) or adjusted_sr:
             logging.error("Hop and total slant range needed with measurements")
-            return np.nan, np.nan
+            return field_pnt()
 
-        if np.isnan(elevation):
+        if np.isnan(elevation[use_elv]).any():
             logging.error("No observations provided")
-            return np.nan, np.nan
 
-        shop = hop - 0.5 if hop == np.floor(hop) and gs_loc == "I" else hop
-        asr = slant_range
-        if hop > 0.5 and hop != shop:
-            asr *= 1.0 - 1.0 / (2.0 * hop)
+        pnts = np.nonzero(use_elv)
+        shop = hop[pnts]
+        asr = slant_range[pnts]
+        if gs_loc == "I":
+            is_gs = shop == np.floor(shop)
+            asr = np.where(is_gs & (shop > 0.5),
+                           asr * (1.0 - 1.0 / (2.0 * shop)), asr)
 
         # The tracing is done by calcDistPnt
-        boff = calcAzOffBore(elevation, beam_off, fov_dir=fov_dir)
-        geo_dict = geoPack.calcDistPnt(tr_glat, tr_glon, tr_alt, dist=asr,
-                                       el=elevation, az=boresight + boff)
+        boff = calcAzOffBore(elevation[pnts], beam_off[pnts], fov_dir=fov_dir)
+        geo_dict = geoPack.calcDistPnt(tr_glat[pnts], tr_glon[pnts],
+                                       tr_alt[pnts], dist=asr,
+                                       el=elevation[pnts],
+                                       az=boresight[pnts] + boff)
+
+        geo_lat[pnts] = geo_dict['distLat']
+        geo_lon[pnts] = geo_dict['distLon']
 
-        return geo_dict['distLat'], geo_dict['distLon']
+    return field_pnt()
 
 
 # *************************************************************
@@ -771,11 +817,9 @@ def calcAzOffBore(elevation, boff_zero, fov_dir='front'):
     bdir = np.cos(np.radians(boff_zero))**2 - np.sin(np.radians(elevation))**2
 
     # Calculate the front fov azimuthal angle off the boresite
-    if bdir < 0.0:
-        bore_offset = np.pi / 2.
-    else:
+    with np.errstate(divide='ignore', invalid='ignore'):
         tan_boff = np.sqrt(np.sin(np.radians(boff_zero))**2 / bdir)
-        bore_offset = np.arctan(tan_boff)
+        bore_offset = np.where(bdir < 0.0, np.pi / 2., np.arctan(tan_boff))
 
 # Old version
 #   if bdir < 0.0:
@@ -793,10 +837,11 @@ def calcAzOffBore(elevation, boff_zero, fov_dir='front'):
 
     # Correct the sign based on the sign of the zero-elevation off-boresight
     # azimuth
-    if boff_zero < 0.0:
-        bore_offset *= -1.0
+    bore_offset = np.where(np.asarray(boff_zero) < 0.0, -bore_offset,
+                           bore_offset)
 
-    return np.degrees(bore_offset)
+    bore_offset = np.degrees(bore_offset)
+    return float(bore_offset) if bore_offset.ndim == 0 else bore_offset
 
 
 def gsMapSlantRange(slant_range, altitude=None, elevation=None):
@@ -823,23 +868,22 @@ def gsMapSlantRange(slant_range, altitude=None, elevation=None):
     from davitpy.utils import Re
 
     # Make sure you have altitude, because these 2 projection models rely on it
-    if not elevation and not altitude:
+    if not np.any(elevation) and not np.any(altitude):
         # Set default altitude to 300 km
         altitude = 300.0
-    elif elevation and not altitude:
+    elif np.any(elevation) and not np.any(altitude):
         # If you have elevation but not altitude, then you calculate altitude,
         # and elevation will be adjusted anyway
         altitude = np.sqrt(Re ** 2 + slant_range ** 2 + 2. * slant_range * Re *
                            np.sin(np.radians(elevation))) - Re
 
-    if (slant_range**2) / 4. - altitude ** 2 >= 0:
-        gsSlantRange = Re * \
-            np.arcsin(np.sqrt(slant_range ** 2 / 4. - altitude ** 2) / Re)
-        # From Bristow et al. [1994]
-    else:
-        gsSlantRange = -1
+    # From Bristow et al. [1994]
+    dist_2 = np.asarray((slant_range**2) / 4. - altitude ** 2)
+    with np.errstate(invalid='ignore'):
+        gsSlantRange = np.where(dist_2 >= 0, Re * np.arcsin(
+            np.sqrt(np.maximum(dist_2, 0.)) / Re), -1)
 
-    return gsSlantRange
+    return float(gsSlantRange) if gsSlantRange.ndim == 0 else gsSlantRange
 
 if __name__ == "__main__":
     from davitpy.pydarn.radar import radStruct
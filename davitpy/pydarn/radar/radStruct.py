@@ -16,6 +16,18 @@ pydarn.radar.radStruct.radar
 pydarn.radar.radStruct.site
     hdw.dat information
 
+Functions
+---------
+pydarn.radar.radStruct.clearRadarCache
+    clear the radar information loaded from the sqlite DB
+
+Note
+----
+The radar and site information in each sqlite DB is read once per process and
+kept in memory, so that creating many radar and site objects (e.g., one per
+beam) does not query the DB.  The information is read again if the DB is
+updated.
+
 Moduleauthor
 ------------
 Sebastien
@@ -23,6 +35,101 @@ Sebastien
 """
 import logging
 
+# Radar and hardware rows read from each sqlite DB, keyed by the DB name
+_db_rows = dict()
+
+
+def _get_db_rows(dbname):
+    """Get the radar and hardware rows from a sqlite DB, reading the DB only
+    if it has not been read before or has been modified since
+
+    Parameters
+    ----------
+    dbname : str
+        sqlite database path/name
+
+    Returns
+    -------
+    rows : dict
+        Dictionary with the radar IDs in DB order ('ids'), the radar rows keyed
+        by ID ('rad'), and the hardware rows for each radar sorted by the end
+        of their validity interval ('hdw') together with the interval ends
+        ('tval')
+
+    Note
+    ----
+        The pickled radar codes and interferometer offsets are unpickled
+
+    """
+    import sqlite3 as lite
+    import pickle
+    import os
+
+    mtime = os.path.getmtime(dbname)
+    if dbname in _db_rows and _db_rows[dbname]['mtime'] == mtime:
+        return _db_rows[dbname]
+
+    with lite.connect(dbname, detect_types=lite.PARSE_DECLTYPES) as conn:
+        cur = conn.cursor()
+        cur.execute('SELECT * FROM rad')
+        rad_rows = cur.fetchall()
+        cur.execute('SELECT * FROM hdw ORDER BY id ASC, tval ASC')
+        hdw_rows = cur.fetchall()
+
+    rows = {'mtime': mtime, 'ids': list(), 'rad': dict(), 'hdw': dict(),
+            'tval': dict()}
+    for row in rad_rows:
+        row = list(row)
+        row[2] = pickle.loads(row[2].encode('ascii'))
+        rows['ids'].append(row[0])
+        rows['rad'][row[0]] = row
+
+    for row in hdw_rows:
+        row = list(row)
+        row[15] = pickle.loads(row[15].encode('ascii'))
+        rows['hdw'].setdefault(row[0], list()).append(row)
+        rows['tval'].setdefault(row[0], list()).append(row[1])
+
+    _db_rows[dbname] = rows
+    return rows
+
+
+def _get_radar_id(dbname, code):
+    """Get the radar ID for a radar code
+
+    Parameters
+    ----------
+    dbname : str
+        sqlite database path/name
+    code : str
+        radar code
+
+    Returns
+    -------
+    radId : int or NoneType
+        radar ID, or None if the code is not found
+
+    """
+    rows = _get_db_rows(dbname)
+    radId = None
+    for rid in rows['ids']:
+        if code in rows['rad'][rid][2]:
+            radId = rid
+
+    return radId
+
+
+def clearRadarCache():
+    """Clear the radar and site information read from the sqlite DBs, so
+    that it is read again when next needed
+
+    Returns
+    -------
+    None
+
+    """
+    _db_rows.clear()
+
 
 class network(object):
     """ This class stores information from all radars according to their
@@ -58,7 +165,6 @@ class network(object):
 
     """
     def __init__(self):
-        import sqlite3 as lite
         import os
         import davitpy
 
@@ -77,16 +183,12 @@ class network(object):
             logging.error("%s not found", dbname)
             return
 
-        with lite.connect(dbname) as conn:
-            cur = conn.cursor()
-            cur.execute("select count() from rad")
-            self.nradar = cur.fetchone()[0]
-            cur.execute("select id from rad")
-            rows = cur.fetchall()
+        ids = _get_db_rows(dbname)['ids']
+        self.nradar = len(ids)
 
-        for row in rows:
+        for radId in ids:
             self.radars.append(radar())
-            self.radars[-1].fillFromSqlite(dbname, row[0])
+            self.radars[-1].fillFromSqlite(dbname, radId)
 
     def __len__(self):
         """Object length (number of radars)
@@ -469,8 +571,6 @@ class radar(object):
     #              'hdwfname', 'stTime', 'edTime', 'snum', 'site')
 
     def __init__(self, code=None, radId=None):
-        import sqlite3 as lite
-        import pickle
         import os
         import davitpy
 
@@ -503,13 +603,7 @@ class radar(object):
 
             # if the radar code was provided, look for corresponding id
             if code:
-                with lite.connect(dbname) as conn:
-                    cur = conn.cursor()
-                    cur.execute('SELECT id,code FROM rad')
-                    rows = cur.fetchall()
-                for row in rows:
-                    if code in pickle.loads(row[1].encode('ascii')):
-                        radId = row[0]
+                radId = _get_radar_id(dbname, code)
 
             self.fillFromSqlite(dbname, radId)
 
@@ -534,37 +628,31 @@ class radar(object):
         written by Sebastien, 2013-02
 
         """
-        import sqlite3 as lite
-        import pickle
         import os
 
         if not os.path.isfile(dbname):
             logging.error("%s not found", dbname)
             return
 
-        with lite.connect(dbname, detect_types=lite.PARSE_DECLTYPES) as conn:
-            cur = conn.cursor()
-            cur.execute('SELECT * FROM rad WHERE id=?', (radId,))
-
-            row = cur.fetchone()
-            if not row:
-                logging.error('Radar not found in DB: {}'.format(radId))
-                return
+        row = _get_db_rows(dbname)['rad'].get(radId)
+        if not row:
+            logging.error('Radar not found in DB: {}'.format(radId))
+            return
 
-            self.id = row[0]
-            self.cnum = row[1]
-            self.code = pickle.loads(row[2].encode('ascii'))
-            self.name = row[3]
-            self.operator = row[4]
-            self.hdwfname = row[5]
-            self.status = row[6]
-            self.stTime = row[7]
-            self.edTime = row[8]
-            self.snum = row[9]
-            for ist in range(self.snum):
-                self.sites[ist].fillFromSqlite(dbname, radId, ind=ist)
-                self.sites.append(site())
-            del self.sites[-1]
+        self.id = row[0]
+        self.cnum = row[1]
+        self.code = list(row[2])
+        self.name = row[3]
+        self.operator = row[4]
+        self.hdwfname = row[5]
+        self.status = row[6]
+        self.stTime = row[7]
+        self.edTime = row[8]
+        self.snum = row[9]
+        for ist in range(self.snum):
+            self.sites[ist].fillFromSqlite(dbname, radId, ind=ist)
+            self.sites.append(site())
+        del self.sites[-1]
 
     def __len__(self):
         """Object length (number of site updates)"""
@@ -717,8 +805,6 @@ class site(object):
     """
 
     def __init__(self, radId=None, code=None, dt=None):
-        import sqlite3 as lite
-        import pickle
         import os
         import davitpy
         import datetime
@@ -776,13 +862,7 @@ class site(object):
 
             # if the radar code was provided, look for corresponding id
             if code:
-                with lite.connect(dbname) as conn:
-                    cur = conn.cursor()
-                    cur.execute('SELECT id,code FROM rad')
-                    rows = cur.fetchall()
-                for row in rows:
-                    if code in pickle.loads(row[1].encode('ascii')):
-                        radId = row[0]
+                radId = _get_radar_id(dbname, code)
 
             self.fillFromSqlite(dbname, radId, dt=dt)
 
@@ -807,45 +887,47 @@ class site(object):
         -------
         None
 
+        Note
+        ----
+            The site for a date is the first configuration whose validity
+            interval ends (tval) at or after that date
+
         written by Sebastien, 2013-02
 
         """
-        import sqlite3 as lite
-        import pickle
+        import bisect
         import os
 
         if not os.path.isfile(dbname):
             logging.error("%s not found", dbname)
             return
 
-        with lite.connect(dbname, detect_types=lite.PARSE_DECLTYPES) as conn:
-            cur = conn.cursor()
-            command = 'SELECT * FROM hdw WHERE id=? '
-            if dt:
-                command = '{:s}and tval>=? ORDER BY tval ASC'.format(command)
-                cur.execute(command, (radId, dt))
-                row = cur.fetchone()
-            else:
-                command = '{:s}ORDER BY tval ASC'.format(command)
-                cur.execute(command, (radId,))
-                row = cur.fetchall()[ind]
-
-            self.id = row[0]
-            self.tval = row[1]
-            self.geolat = row[2]
-            self.geolon = row[3]
-            self.alt = row[4]
-            self.boresite = row[5]
-            self.bmsep = row[6]
-            self.vdir = row[7]
-            self.tdiff = row[8]
-            self.phidiff = row[9]
-            self.recrise = row[10]
-            self.atten = row[11]
-            self.maxatten = row[12]
-            self.maxgate = row[13]
-            self.maxbeam = row[14]
-            self.interfer = pickle.loads(row[15].encode('ascii'))
+        rows = _get_db_rows(dbname)
+        hdw = rows['hdw'].get(radId, list())
+        if dt:
+            ind = bisect.bisect_left(rows['tval'].get(radId, list()), dt)
+
+        if ind >= len(hdw) or ind < -len(hdw):
+            logging.error('Site not found in DB: {} {}'.format(radId, dt))
+            return
+
+        row = hdw[ind]
+        self.id = row[0]
+        self.tval = row[1]
+        self.geolat = row[2]
+        self.geolon = row[3]
+        self.alt = row[4]
+        self.boresite = row[5]
+        self.bmsep = row[6]
+        self.vdir = row[7]
+        self.tdiff = row[8]
+        self.phidiff = row[9]
+        self.recrise = row[10]
+        self.atten = row[11]
+        self.maxatten = row[12]
+        self.maxgate = row[13]
+        self.maxbeam = row[14]
+        self.interfer = list(row[15])
 
     def __len__(self):
         """Object length"""
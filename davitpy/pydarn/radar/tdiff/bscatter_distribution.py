@@ -38,18 +38,18 @@ def lat_distribution(tdiff, ref_lat, hard, phi0, phi0e, fovflg, bm_az, tfreq,
         reference latitude in degrees
     hard : (class davitpy.pydarn.radar.radStruct.site)
         radar hardware data
-    phi0 : (list)
+    phi0 : (list or np.ndarray)
         phase lags in radians
-    phi0e : (list)
+    phi0e : (list or np.ndarray)
         phase lag errors in radians
-    fovflg : (list)
+    fovflg : (list or np.ndarray)
         field-of-view flags
-    bm_az : (list)
+    bm_az : (list or np.ndarray)
         Azimuthal angle between the beam and the radar boresite at zero
         elevation (radians)
-    tfreq : (list)
+    tfreq : (list or np.ndarray)
         transmission frequencies in kHz
-    dist : (list)
+    dist : (list or np.ndarray)
         slant distance from radar to ionospheric reflection point in km
 
     Returns
@@ -74,21 +74,24 @@ def lat_distribution(tdiff, ref_lat, hard, phi0, phi0e, fovflg, bm_az, tfreq,
     if not isinstance(tdiff, float):
         tdiff = float(tdiff)
 
-    # Calculate the elevation and latitude
+    # Calculate the elevation and latitude for all observations at once
     try:
+        fovflg = np.asarray(fovflg)
+        if np.any(np.abs(fovflg) != 1):
+            raise ValueError("unknown field-of-view flag")
+
         # elevation is in radians
         elv = np.array(celv.calc_elv_list(phi0, phi0e, fovflg, bm_az, tfreq,
                                           hard.interfer, tdiff))
         elv = np.degrees(elv)
         # Correction to boresight azimuth due to elevation angle
-        fov_dir = {1:"front", -1:"back"}
-        az = np.array([rfov.calcAzOffBore(e, np.degrees(bm_az[i]),
-                                          fov_dir[fovflg[i]]) + hard.boresite
-                       for i,e in enumerate(elv)])
+        bm_az = np.degrees(bm_az)
+        az = np.where(fovflg == -1, rfov.calcAzOffBore(elv, bm_az, "back"),
+                      rfov.calcAzOffBore(elv, bm_az, "front")) + hard.boresite
 
         # Calculate location
         loc = geo.calcDistPnt(hard.geolat, hard.geolon, hard.alt,
-                              az=az, el=elv, dist=np.array(dist))
+                              az=az, el=elv, dist=np.asarray(dist, dtype=float))
         lat = loc['distLat'][~np.isnan(loc['distLat'])] # Remove nan
 
         #--------------------------------------------------------------------
@@ -107,8 +110,8 @@ def lat_distribution(tdiff, ref_lat, hard, phi0, phi0e, fovflg, bm_az, tfreq,
     return ff
 
 #---------------------------------------------------------------------------
-def vheight_distribution(tdiff, ref_height, radius, asep, phi_sign, ecor, phi0,
-                         phi0e, fovflg, cos_phi, tfreq, dist):
+def vheight_distribution(tdiff, ref_height, radius, interfer, phi0, phi0e,
+                         fovflg, bm_az, tfreq, dist):
     '''Returns the squared sum of the difference between the mean and the
     specified height and the standard deviation of the backscatter heights
 
@@ -120,23 +123,21 @@ def vheight_distribution(tdiff, ref_height, radius, asep, phi_sign, ecor, phi0,
         reference altitude in km
     radius : (float)
         earth radius in km
-    asep : (float)
-        antenna seperation in m
-    phi_sign : (float)
-        states whether or not the interferometer is in front of the radar
-    ecor : (float)
-        correction to elevation angle based on interferometer alt
-    phi0 : (list)
+    interfer : (list)
+        Offset of the midpoints of the interferometer and main array (meters),
+        where [0] is X, [1] is Y, and [2] is Z.
+    phi0 : (list or np.ndarray)
         phase lags in radians
-    phi0e : (list)
+    phi0e : (list or np.ndarray)
         phase lag errors in radians
-    fovflg : (list)
+    fovflg : (list or np.ndarray)
         field-of-view flags
-    cos_phi : (list)
-        cos of azimuthal angles
-    tfreq : (list)
+    bm_az : (list or np.ndarray)
+        Azimuthal angle between the beam and the radar boresite at zero
+        elevation (radians)
+    tfreq : (list or np.ndarray)
         transmission frequencies in kHz
-    dist : (list)
+    dist : (list or np.ndarray)
         slant distance from radar to ionospheric reflection point in km
 
     Returns
@@ -160,14 +161,14 @@ def vheight_distribution(tdiff, ref_height, radius, asep, phi_sign, ecor, phi0,
     if not isinstance(tdiff, float):
         tdiff = float(tdiff)
 
-    # Calculate the elevation and virtual height
+    # Calculate the elevation and virtual height for all observations at once
     try:
-        elv = celv.calc_elv_list(phi0, phi0e, fovflg, cos_phi, tfreq, asep,
-                                 ecor, phi_sign, tdiff) # in radians
-        heights = [np.sqrt(dd**2 + radius**2 + 2.0 * dd * radius *
-                           np.sin(elv[di])) - radius
-                   for di,dd in enumerate(dist)
-                   if not np.isnan(dd) and not np.isnan(elv[di])] # in km
+        elv = np.array(celv.calc_elv_list(phi0, phi0e, fovflg, bm_az, tfreq,
+                                          interfer, tdiff)) # in radians
+        dist = np.asarray(dist, dtype=float)
+        good = ~np.isnan(dist) & ~np.isnan(elv)
+        heights = np.sqrt(dist[good]**2 + radius**2 + 2.0 * dist[good] *
+                          radius * np.sin(elv[good])) - radius # in km
 
         #--------------------------------------------------------------------
         # When the distribution is approximately gaussian, the error depends
@@ -201,7 +202,7 @@ def distribution_min(tdiff, ref_loc, loc_args, loc_func, func_tol,
         A set containing the values for each backscatter measurement needed to
         calculate the location of the scattering point.  For example, latitude
         requires:
-        (hard, asep, phi_sign, ecor, phi0, phi0e, fovflg, cos_phi, tfreq)
+        (hard, phi0, phi0e, fovflg, bm_az, tfreq, dist)
     loc_func : (function)
         Function that describes the goodness of the backscatter distribution
         about the reference location, where a lower value indicates a better fit
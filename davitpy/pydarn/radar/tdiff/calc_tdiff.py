@@ -10,8 +10,15 @@ location
 
 Functions
 -------------------------------------------------------------------------------
-calc_tdiff       Calculate tdiff by minimizing the distribution about a location
-select_bscatter  Select appropriate backscatter
+calc_tdiff          Calculate tdiff by minimizing the distribution about a
+                    location
+calc_network_tdiff  Calculate tdiff for many radars and frequency bands at once
+select_bscatter     Select appropriate backscatter
+-------------------------------------------------------------------------------
+
+Classes
+-------------------------------------------------------------------------------
+bscatterColumns     Backscatter arrays for repeated data selection
 -------------------------------------------------------------------------------
 
 References
@@ -38,7 +45,7 @@ def calc_tdiff(init_tdiff, ref_loc, ref_err, loc_args, loc_func, func_tol,
         List of arguements needed to calculate the location, in the correct
         order to use as input for the location function.  For example, latitude
         requires:
-        (hard, asep, phi_sign, ecor, phi0, phi0e, fovflg, cos_phi, tfreq)
+        (hard, phi0, phi0e, fovflg, bm_az, tfreq, dist)
     loc_func : (function)
         Function that describes the goodness of the backscatter distribution
         about the reference location, where a lower value indicates a better fit
@@ -89,13 +96,134 @@ def calc_tdiff(init_tdiff, ref_loc, ref_err, loc_args, loc_func, func_tol,
                                                loc_args, loc_func, func_tol,
                                                tdiff_tol=tdiff_tol,
                                                tperiod=tperiod, maxiter=maxiter)
+    terr = _tdiff_err(tdiff, thigh, tlow)
+
+    return tdiff, terr, miter, res
+
+def calc_network_tdiff(calibrations, nprocs=1):
+    ''' Calculate tdiff for several radars and frequency bands at once.  The
+    minimizations for each tdiff and the two used to find its uncertainty are
+    all independent, so they are run concurrently on a pool of processes.
+
+    Parameters
+    ----------
+    calibrations : (dict)
+        Dictionary of calibrations, with keys chosen by the user (for example,
+        (radar code, frequency band) tuples).  Each value is a dictionary of
+        calc_tdiff keyword arguments: init_tdiff, ref_loc, ref_err, loc_args,
+        loc_func, func_tol, and optionally tdiff_tol, tperiod, and maxiter.
+        loc_func must be defined at the top level of a module, such as
+        bscatter_distribution.lat_distribution, so that it can be sent to
+        another process.
+    nprocs : (int)
+        Number of processes to use (default=1)
+
+    Returns
+    -----------
+    tdiffs : (dict)
+        Dictionary with the same keys as calibrations, containing tuples with
+        the calc_tdiff output: (tdiff, terr, miter, res)
+
+    Example
+    ----------
+    In[1]: import davitpy.pydarn.radar.tdiff as dtdiff
+    In[2]: cal = dict()
+    In[3]: for tb in rad_bands.tbands:
+    ...:       cal[("han", tb)] = {"init_tdiff":hard.tdiff, "ref_loc":ref_lat,
+    ...:                           "ref_err":ref_err, "loc_args":lat_args[tb],
+    ...:                           "loc_func":dtdiff.bscatter_distribution.\
+    ...:                                      lat_distribution,
+    ...:                           "func_tol":0.01,
+    ...:                           "tperiod":1000.0 /
+    ...:                           rad_bands.get_mean_tband_freq(tb)}
+    In[4]: tdiffs = dtdiff.calc_tdiff.calc_network_tdiff(cal, nprocs=4)
+    '''
+    # Set up the minimizations for each tdiff and its uncertainty
+    keys = list(calibrations.keys())
+    tasks = list()
+    for key in keys:
+        cal = calibrations[key]
+        opts = {"tdiff_tol":cal.get("tdiff_tol", 1.0e-4),
+                "tperiod":cal.get("tperiod", np.nan),
+                "maxiter":cal.get("maxiter", 2000)}
+        for ref_loc in [cal["ref_loc"], cal["ref_loc"] + cal["ref_err"],
+                        cal["ref_loc"] - cal["ref_err"]]:
+            tasks.append(((cal["init_tdiff"], ref_loc, cal["loc_args"],
+                           cal["loc_func"], cal["func_tol"]), opts))
+
+    # Perform the minimizations, one task at a time in each process since the
+    # time needed varies a lot between tasks
+    nprocs = max(1, min(nprocs, len(tasks)))
+    if nprocs > 1:
+        import multiprocessing as mp
+        pool = mp.Pool(nprocs)
+        try:
+            results = pool.map(_distribution_min_task, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [_distribution_min_task(task) for task in tasks]
+
+    # Combine the results for each calibration
+    tdiffs = dict()
+    for i,key in enumerate(keys):
+        tdiff, miter, res = results[3*i]
+        if np.isnan(tdiff):
+            tdiffs[key] = (tdiff, np.nan, miter, res)
+        else:
+            terr = _tdiff_err(tdiff, results[3*i+1][0], results[3*i+2][0])
+            tdiffs[key] = (tdiff, terr, miter, res)
+
+    return tdiffs
+
+def _distribution_min_task(task):
+    ''' Run bscatter_distribution.distribution_min for a tuple of positional
+    and keyword arguments, allowing it to be used with a multiprocessing pool
+
+    Parameters
+    ----------
+    task : (tuple)
+        Tuple containing a tuple of positional arguments and a dictionary of
+        keyword arguments
+
+    Returns
+    -----------
+    Output from distribution_min: (tdiff, miter, res)
+    '''
+    import bscatter_distribution as bdist
+
+    args, kwargs = task
+    return bdist.distribution_min(*args, **kwargs)
+
+def _tdiff_err(tdiff, thigh, tlow):
+    ''' Find the tdiff uncertainty as the largest difference between the
+    tdiff and the tdiffs found using the reference location plus and minus
+    its uncertainty
+
+    Parameters
+    ----------
+    tdiff : (float)
+        tdiff in microseconds
+    thigh : (float)
+        tdiff found using the reference location plus its uncertainty
+    tlow : (float)
+        tdiff found using the reference location minus its uncertainty
+
+    Returns
+    -----------
+    terr : (float)
+        uncertainty in tdiff in microseconds, NaN if unknown
+    '''
+    terr = np.nan
+
     if not np.isnan(thigh):
         terr = abs(thigh - tdiff)
     if not np.isnan(tlow):
         if np.isnan(terr) or terr < abs(tlow - tdiff):
             terr = abs(tlow - tdiff)
 
-    return tdiff, terr, miter, res
+    return terr
 
 def select_bscatter(beams, ret_attrs, radcp, tband, bnum, min_power=0.0,
                     min_rg=0, max_rg=75, fovflg=None, gflg=None, stimes=list(),
@@ -104,9 +232,11 @@ def select_bscatter(beams, ret_attrs, radcp, tband, bnum, min_power=0.0,
 
     Parameters
     ------------
-    beams : (list or np.ndarray)
+    beams : (list, np.ndarray, or class `bscatterColumns`)
         List or array of beam class objects, or scan class object from a
-        single radar
+        single radar.  Selecting from a bscatterColumns object loads the data
+        only once and caches each selection, which is faster when the same
+        beams are searched repeatedly.
     ret_attrs : (list of strings)
         List of desired attributes to return
     radcp : (int)
@@ -135,75 +265,250 @@ def select_bscatter(beams, ret_attrs, radcp, tband, bnum, min_power=0.0,
     ret_data : (dict of lists)
         Dictionary containing lists of desired return attributes
     '''
-    import rad_freqbands
+    if not isinstance(beams, bscatterColumns):
+        # Only load the beams that may be selected
+        stid = beams[0].stid if len(beams) > 0 else None
+        beams = bscatterColumns([beam for beam in beams
+                                 if beam.cp == radcp and beam.bmnum == bnum],
+                                stid=stid)
 
-    # Define the local routines
-    def good_fov(fovflg, bfit, i):
-        if fovflg is None:
-            return True
-        else:
-            if hasattr(bfit, "fovflg"):
-                fitflg = getattr(bfit, "fovflg")
-                if fitflg is not None and fitflg[i] == fovflg:
-                    return True
-        return False
-            
-    def good_time(stimes, etimes, btime):
-        if len(stimes) > 0:
-            for i,ss in enumerate(stimes):
-                if ss <= btime and  btime <= etimes[i]:
-                    return True
-        else:
-            return True
-        return False
-                
-    # Initialize output
-    ret_data = {rkey:list() for rkey in ret_attrs}
+    return beams.select(ret_attrs, radcp, tband, bnum, min_power=min_power,
+                        min_rg=min_rg, max_rg=max_rg, fovflg=fovflg,
+                        gflg=gflg, stimes=stimes, etimes=etimes)
+
+#-----------------------------------------------------------------------------
+class bscatterColumns(object):
+    '''Backscatter from a single radar held as arrays with a record (beam
+    sounding, in time order) and a range gate dimension, for fast and repeated
+    data selection
+
+    Parameters
+    ------------
+    beams : (list or np.ndarray)
+        List or array of beam class objects, or scan class object from a
+        single radar
+    stid : (int or NoneType)
+        Radar ID used to define the frequency bands, or None to use the radar
+        of the first beam (default=None)
 
-    # Begin evaluating beam data
-    rad_tfreq = None
+    Attributes
+    ------------
+    rad_tfreq : (class `rad_freqbands.radFreqBands` or NoneType)
+        Frequency bands for the radar, None if the radar is unknown because
+        there are no beams
+    has_fit : (np.ndarray)
+        Boolean array flagging records with fitted data and radar parameters
+    cp : (np.ndarray)
+        Radar program mode for each record
+    bmnum : (np.ndarray)
+        Beam number for each record
+    tband : (np.ndarray)
+        Transmission frequency band number for each record, -1 if unknown
+    time : (np.ndarray)
+        Record times as datetime64 values
+    gate : (np.ndarray)
+        Range gate numbers
+    good : (np.ndarray)
+        Boolean array of shape (record, gate) flagging gates with fitted data
+
+    Methods
+    ---------
+    select
+    '''
+    def __init__(self, beams, stid=None):
+        import rad_freqbands
+
+        self._beams = list(beams)
+        self._fit_arrays = dict()
+        self._cache = dict()
 
-    for beam in beams:
         # Use the first beam to define the frequency band object
-        if rad_tfreq is None:
-            rad_tfreq = rad_freqbands.radFreqBands(beam.stid)
-
-            # Test to see if the frequency band is defined
-            if len(rad_tfreq.tbands) < tband:
-                logging.warn("undefined frequency band [{:}]".format(tband))
-                return ret_data
-
-        # Identify acceptable backscatter for this beam
-        if(hasattr(beam, "fit") and beam.cp == radcp and beam.bmnum == bnum
-           and hasattr(beam, "prm") and
-           tband == rad_tfreq.get_tfreq_band_num(beam.prm.tfreq)):
-            igood = [i for i,p in enumerate(beam.fit.p_l) if p >= min_power and
-                     min_rg <= beam.fit.slist[i] and max_rg >= beam.fit.slist[i]
-                     and good_fov(fovflg, beam.fit, i) and
-                     (gflg is None or beam.fit.gflg[i] == gflg)
-                     and good_time(stimes, etimes, beam.time)]
-
-            if len(igood) > 0:
-                # Assign values for each requested data type, padding with
-                # NaN if the key or values aren't available
-                for rkey in ret_data.keys():
-                    if hasattr(beam, rkey):
-                        # Add beam attribute
-                        rdata = getattr(beam, rkey)
-                        ret_data[rkey].extend([rdata for i in igood])
-                    elif hasattr(beam.fit, rkey):
-                        # Add fit attribute
-                        rdata = getattr(beam.fit, rkey)
-                        if rdata is not None:
-                            ret_data[rkey].extend([rdata[i] for i in igood])
-                        else:
-                            ret_data[rkey].extend([np.nan for i in igood])
-                    elif hasattr(beam.prm, rkey):
-                        # Add parameter attribute
-                        rdata = getattr(beam.prm, rkey)
-                        ret_data[rkey].extend([rdata for i in igood])
-                    else:
-                        # Pad unavailable attribute
-                        ret_data[rkey].extend([np.nan for i in igood])
-
-    return ret_data
+        if stid is None and len(self._beams) > 0:
+            stid = self._beams[0].stid
+
+        self.rad_tfreq = None
+        if stid is not None:
+            self.rad_tfreq = rad_freqbands.radFreqBands(stid)
+
+        # Load the record attributes
+        self.has_fit = np.array([hasattr(beam, "fit") and hasattr(beam, "prm")
+                                 for beam in self._beams], dtype=bool)
+        self.cp = np.array([beam.cp for beam in self._beams])
+        self.bmnum = np.array([beam.bmnum for beam in self._beams])
+        self.time = np.array([beam.time for beam in self._beams],
+                             dtype="datetime64[us]")
+
+        tfreq = np.array([beam.prm.tfreq if self.has_fit[i] else -1
+                          for i,beam in enumerate(self._beams)])
+        self.tband = -np.ones(shape=tfreq.shape, dtype=int)
+        if self.has_fit.any():
+            self.tband[self.has_fit] = \
+                self.rad_tfreq.get_tfreq_band_num(tfreq[self.has_fit])
+
+        # Find the range gates with fitted data in each record
+        self._slist = list()
+        for i,beam in enumerate(self._beams):
+            slist = beam.fit.slist if self.has_fit[i] else None
+            self._slist.append(np.array(slist if slist is not None else list(),
+                                        dtype=int))
+
+        inone = np.array(list(), dtype=int)
+        nslist = [len(ss) for ss in self._slist]
+        slist = np.concatenate(self._slist + [inone])
+        self.gate = np.arange(slist.max() + 1 if len(slist) > 0 else 0)
+
+        # Save the position of each range gate in the fitted data arrays
+        self._pos = -np.ones(shape=(len(self._beams), len(self.gate)),
+                             dtype=int)
+        self._pos[np.repeat(np.arange(len(nslist)), nslist), slist] = \
+            np.concatenate([np.arange(n) for n in nslist] + [inone])
+        self.good = self._pos >= 0
+
+    def _fit_array(self, rkey, irec):
+        '''Fitted data attribute as a float array of shape (record, gate),
+        padded with NaN where the data is unavailable
+
+        Parameters
+        ------------
+        rkey : (str)
+            Fitted data attribute name
+        irec : (np.ndarray)
+            Indices of the records that must be loaded
+
+        Returns
+        ----------
+        rarray : (np.ndarray)
+            Fitted data, NaN for records that have not been loaded
+        '''
+        if not self._fit_arrays.has_key(rkey):
+            self._fit_arrays[rkey] = (np.full(self.good.shape, np.nan),
+                                      np.zeros(shape=self.has_fit.shape,
+                                               dtype=bool))
+
+        rarray, loaded = self._fit_arrays[rkey]
+        irec = irec[self.has_fit[irec] & ~loaded[irec]]
+
+        for i in irec:
+            rdata = getattr(self._beams[i].fit, rkey, None)
+            if rdata is not None and len(self._slist[i]) > 0:
+                rarray[i,self._slist[i]] = rdata
+        loaded[irec] = True
+
+        return rarray
+
+    def _gather(self, rkey, irec, igate):
+        '''Gather attribute values for selected backscatter.  Beam attributes
+        are used first, followed by fitted data and radar parameter
+        attributes.  Unavailable values are NaN.
+
+        Parameters
+        ------------
+        rkey : (str)
+            Attribute name
+        irec : (np.ndarray)
+            Sorted record indices
+        igate : (np.ndarray)
+            Range gate indices
+
+        Returns
+        ----------
+        rlist : (list)
+            Attribute values
+        '''
+        rlist = list()
+        urec, ustart, ucount = np.unique(irec, return_index=True,
+                                         return_counts=True)
+
+        for j,i in enumerate(urec):
+            beam = self._beams[i]
+            npnts = ucount[j]
+
+            if hasattr(beam, rkey):
+                # Add beam attribute
+                rlist.extend([getattr(beam, rkey)] * npnts)
+            elif hasattr(beam.fit, rkey):
+                # Add fit attribute
+                rdata = getattr(beam.fit, rkey)
+                if rdata is not None:
+                    ipos = self._pos[i,igate[ustart[j]:ustart[j]+npnts]]
+                    rlist.extend([rdata[k] for k in ipos])
+                else:
+                    rlist.extend([np.nan] * npnts)
+            elif hasattr(beam.prm, rkey):
+                # Add parameter attribute
+                rlist.extend([getattr(beam.prm, rkey)] * npnts)
+            else:
+                # Pad unavailable attribute
+                rlist.extend([np.nan] * npnts)
+
+        return rlist
+
+    def select(self, ret_attrs, radcp, tband, bnum, min_power=0.0, min_rg=0,
+               max_rg=75, fovflg=None, gflg=None, stimes=list(),
+               etimes=list()):
+        '''Select backscatter, caching the selection for each set of criteria.
+        See select_bscatter for a description of the parameters.
+
+        Returns
+        ----------
+        ret_data : (dict of lists)
+            Dictionary containing lists of desired return attributes
+        '''
+        skey = (radcp, tband, bnum, min_power, min_rg, max_rg, fovflg, gflg,
+                tuple(stimes), tuple(etimes))
+
+        if not self._cache.has_key(skey):
+            self._cache[skey] = self._select_points(*skey) + (dict(),)
+
+        irec, igate, sel_data = self._cache[skey]
+        for rkey in ret_attrs:
+            if not sel_data.has_key(rkey):
+                sel_data[rkey] = self._gather(rkey, irec, igate)
+
+        return {rkey:list(sel_data[rkey]) for rkey in ret_attrs}
+
+    def _select_points(self, radcp, tband, bnum, min_power, min_rg, max_rg,
+                       fovflg, gflg, stimes, etimes):
+        '''Find the record and gate indices of the selected backscatter
+
+        Returns
+        ----------
+        irec : (np.ndarray)
+            Sorted record indices
+        igate : (np.ndarray)
+            Range gate indices
+        '''
+        inone = np.array(list(), dtype=int)
+        if self.rad_tfreq is None:
+            return inone, inone
+
+        # Test to see if the frequency band is defined
+        if len(self.rad_tfreq.tbands) < tband:
+            logging.warn("undefined frequency band [{:}]".format(tband))
+            return inone, inone
+
+        # Identify the acceptable records
+        rgood = (self.has_fit & (self.cp == radcp) & (self.bmnum == bnum) &
+                 (self.tband == tband))
+
+        if len(stimes) > 0:
+            stimes = np.array(stimes, dtype="datetime64[us]")
+            etimes = np.array(etimes[:len(stimes)], dtype="datetime64[us]")
+            rtime = self.time[:,np.newaxis]
+            rgood &= ((stimes <= rtime) & (rtime <= etimes)).any(axis=1)
+
+        # Identify the acceptable backscatter within these records, only
+        # loading the fitted data needed to do so
+        irec = np.where(rgood)[0]
+        pgood = (self.good & rgood[:,np.newaxis] & (min_rg <= self.gate) &
+                 (max_rg >= self.gate))
+
+        with np.errstate(invalid="ignore"):
+            pgood &= self._fit_array("p_l", irec) >= min_power
+
+            if fovflg is not None:
+                pgood &= self._fit_array("fovflg", irec) == fovflg
+            if gflg is not None:
+                pgood &= self._fit_array("gflg", irec) == gflg
+
+        return np.where(pgood)
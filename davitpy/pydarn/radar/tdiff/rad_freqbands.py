@@ -15,8 +15,14 @@ rad_band_num : (dict)
 rad_min : (dict)
 rad_max : (dict)
 id_to_code : (dict)
+band_table : (dict)
 ---------------------------------------------------------------------------
 
+Functions
+----------------------------------------------------------------------------
+get_band_table
+----------------------------------------------------------------------------
+
 Classes
 ----------------------------------------------------------------------------
 radFreqBands
@@ -26,6 +32,7 @@ Moduleauthor
 ------------
 Angeline G. Burrell (AGB), 25 July 2016, University of Leicester (UoL)
 '''
+import numpy as np
 import logging
 
 # Define the frequency bands for different radars
@@ -115,6 +122,9 @@ id_to_code = {
     5:'sas', 6:'pgr', 8:'sto', 9:'pyk', 10:'han', 20:'mcm', 33:'bks', 64:'inv',
     65:'rkn', 209:'ade', 208:'adw',}
 
+# Frequency band lookup tables, built as needed by get_band_table
+band_table = dict()
+
 #-----------------------------------------------------------------------------
 class radFreqBands(object):
     '''Contains the transmission frequency bands for a given radar
@@ -231,56 +241,95 @@ class radFreqBands(object):
         return ostr
 
     #--------------------------------------------------------------------------
+    def _get_band_index(self, tfreq):
+        '''Find the index of the first frequency band containing each supplied
+        frequency, using the sorted band boundaries
+
+        Parameters
+        -------------
+        tfreq : (int, float, or array-like)
+            Transmision frequency in kHz
+
+        Returns
+        -----------
+        iband : (np.ndarray)
+            Index of the frequency band in tmins and tmaxs, -1 if unavailable
+        '''
+        edges, iedge, igap = get_band_table(self.rad_code)
+        tfreq = np.asarray(tfreq, dtype=float)
+        iband = np.full(tfreq.shape, -1, dtype=int)
+
+        if len(edges) > 0:
+            # Find the last boundary at or below each frequency
+            k = np.searchsorted(edges, tfreq, side="right") - 1
+            kk = np.clip(k, 0, len(edges) - 1)
+            on_edge = (k >= 0) & (edges[kk] == tfreq)
+            in_gap = (k >= 0) & (k < len(edges) - 1) & ~on_edge
+            iband[on_edge] = iedge[kk[on_edge]]
+            iband[in_gap] = igap[kk[in_gap]]
+
+        return iband
+
     def get_tband_max_min(self, tfreq):
         '''Return the maximum and minimum frequency for the band that the
         supplied frequency falls into
 
         Parameters
         -------------
-        tfreq : (int)
+        tfreq : (int or array-like)
             Transmision frequency in kHz
 
         Returns
         -----------
-        min_freq : (int)
+        min_freq : (int or np.ndarray)
             Minimum frequency in kHz, -1 if unavailable
-        max_freq : (int)
+        max_freq : (int or np.ndarray)
             Maximum frequency in kHz, -1 if unavailable
         '''
-        #------------------------------------------------
-        # Cycle through the transmission frequency bands
-        for i,t in enumerate(self.tmins):
-            if tfreq - t >= 0 and self.tmaxs[i] - tfreq >= 0:
-                return(t, self.tmaxs[i])
-        
-        logging.warn("Unknown transmission freq [{:d} kHz]".format(tfreq))
-        return(-1, -1)
+        iband = self._get_band_index(tfreq)
+        min_freq = np.array(list(self.tmins) + [-1])[iband]
+        max_freq = np.array(list(self.tmaxs) + [-1])[iband]
+
+        if np.any(iband < 0):
+            bad_freq = np.unique(np.asarray(tfreq)[iband < 0])
+            logging.warn("Unknown transmission freq [{:} kHz]".format(
+                bad_freq[0] if np.ndim(tfreq) == 0 else bad_freq))
+
+        if np.ndim(tfreq) == 0:
+            return(min_freq.item(), max_freq.item())
+        return(min_freq, max_freq)
 
     def get_mean_tband_freq(self, tband):
-        ''' Return the maximum and minimum frequency for the band that the
-        supplied frequency falls into
+        ''' Return the mean frequency for the supplied band number
 
         Parameters
         -------------
-        tband : (int)
+        tband : (int or array-like)
             Transmision band number
 
         Returns
         -----------
-        mean_freq : (int)
+        mean_freq : (int or np.ndarray)
             Mean frequency in kHz, -1 if unavailable
         '''
-        mean_freq = -1
-            
+        tband = np.asarray(tband, dtype=int)
+        good = (tband >= 0) & (tband < len(self.tmins))
+        iband = np.where(good, tband, -1)
+
         #--------------------------------------------
         # Ensure that band information is available
-        if len(self.tmins) > tband:
-            mean_freq = int((self.tmaxs[tband] + self.tmins[tband])
-                            / 2.0)
-        else:
-            estr = "unknown transmission freq band [{:}]".format(tband)
+        mean_freq = (np.array(list(self.tmaxs) + [-1]) +
+                     np.array(list(self.tmins) + [-1])) / 2.0
+        mean_freq = np.where(good, mean_freq[iband], -1).astype(int)
+
+        if not np.all(good):
+            bad_band = np.unique(tband[~good])
+            estr = "unknown transmission freq band [{:}]".format(
+                bad_band[0] if tband.ndim == 0 else bad_band)
             logging.warn(estr)
 
+        if tband.ndim == 0:
+            return mean_freq.item()
         return mean_freq
 
     def get_tfreq_band_num(self, tfreq):
@@ -289,19 +338,61 @@ class radFreqBands(object):
 
         Parameters
         -----------
-        tfreq : (int)
+        tfreq : (int or array-like)
             Transmission frequency in kHz
 
         Returns
         ---------
-        tband : (int)
+        tband : (int or np.ndarray)
             Transmission frequency band number, -1 if unavailable
         '''
-        #--------------------------------------------
-        # Cycle through the different frequency bands
-        for i,t in enumerate(self.tmins):
-            if t <= tfreq and tfreq <= self.tmaxs[i]:
-                return(self.tbands[i])
-        
-        logging.warn("no band for frequency [{:} kHz]".format(tfreq))
-        return(-1)
+        iband = self._get_band_index(tfreq)
+        tband = np.array(list(self.tbands) + [-1])[iband]
+
+        if np.any(iband < 0):
+            bad_freq = np.unique(np.asarray(tfreq)[iband < 0])
+            logging.warn("no band for frequency [{:} kHz]".format(
+                bad_freq[0] if np.ndim(tfreq) == 0 else bad_freq))
+
+        if np.ndim(tfreq) == 0:
+            return tband.item()
+        return tband
+
+#-----------------------------------------------------------------------------
+def get_band_table(rad_code):
+    '''Retrieve the frequency band lookup table for a radar, building it the
+    first time it is requested.  The band boundaries are sorted, and each
+    boundary and each gap between neighbouring boundaries is assigned the
+    first band (in band number order) that contains it.
+
+    Parameters
+    -----------
+    rad_code : (str)
+        3-character radar code (lowercase only)
+
+    Returns
+    ---------
+    edges : (np.ndarray)
+        Sorted band boundaries in kHz
+    iedge : (np.ndarray)
+        Index of the band containing each boundary, -1 if none
+    igap : (np.ndarray)
+        Index of the band containing the frequencies between each boundary
+        and the next, -1 if none
+    '''
+    if not band_table.has_key(rad_code):
+        tmins = np.array(rad_min.get(rad_code, list()), dtype=float)
+        tmaxs = np.array(rad_max.get(rad_code, list()), dtype=float)
+        edges = np.unique(np.append(tmins, tmaxs))
+
+        def first_band(freq):
+            if len(tmins) == 0:
+                return np.array(list(), dtype=int)
+            inband = ((tmins <= freq[:,np.newaxis]) &
+                      (freq[:,np.newaxis] <= tmaxs))
+            return np.where(inband.any(axis=1), inband.argmax(axis=1), -1)
+
+        band_table[rad_code] = (edges, first_band(edges),
+                                first_band(0.5 * (edges[1:] + edges[:-1])))
+
+    return band_table[rad_code]
@@ -22,6 +22,8 @@ Filter fitexfiles natively in python
 Functions
 ----------
 combBeams
+scanArrays
+boxcarFilter
 fitFilter
 doFilter
 
@@ -33,15 +35,23 @@ Gate : A class to hold limited fitted and interferometer values for a single
 
 Notes
 ---------
-This is very SLOW.   We recommend using the c version which is folded into
-the sdio function radDataRead.radDataOpen
+Each scan is turned into (beam, range gate) arrays once, and three consecutive
+scans are filtered together as (time, beam, range gate) arrays.  A C version
+of the filter is also folded into the sdio function radDataRead.radDataOpen
 """
 
 import numpy as np
 import datetime as dt
+import warnings
 from davitpy import utils
 import logging
 
+# Fitted parameters that are median filtered
+filter_attrs = ['v', 'w_l', 'p_l', 'elv', 'phi0']
+
+# Filtered parameters for which a value of zero denotes missing data
+zero_missing_attrs = ['elv', 'phi0']
+
 class Gate(object):
     """A class to represent a single range gate
   
@@ -69,6 +79,69 @@ class Gate(object):
         self.elv = None if fit.elv is None else fit.elv[i]
         self.phi0 = None if fit.phi0 is None else fit.phi0[i]
 
+def _point_attrs(fit, numeric=None):
+    """List the fitted data attributes with one value per range gate in slist
+
+    Parameters
+    -----------
+    fit : (pydarn.sdio.radDataTypes.fitData)
+        Fitted data
+    numeric : (bool or NoneType)
+        List only the numeric attributes (True), only the other attributes,
+        such as string labels (False), or all of them (None). (default=None)
+
+    Returns
+    --------
+    attrs : (list)
+        Attribute names, not including slist
+    """
+    npnts = len(fit.slist) if fit.slist is not None else 0
+
+    attrs = list()
+    for key, val in fit.__dict__.iteritems():
+        if(key not in ['slist', 'pwr0'] and
+           isinstance(val, (list, np.ndarray)) and len(val) == npnts and
+           (numeric is None or
+            numeric == (np.asarray(val).dtype.kind in 'biuf'))):
+            attrs.append(key)
+
+    return attrs
+
+def _gate_arrays(beam, attrs, ngate):
+    """Place the fitted data for a beam in range gate arrays
+
+    Parameters
+    -----------
+    beam : (pydarn.sdio.radDataTypes.beamData)
+        Beam with fitted data
+    attrs : (list)
+        Names of the fitted data attributes with one value per point
+    ngate : (int)
+        Number of range gates
+
+    Returns
+    --------
+    good : (np.ndarray)
+        Boolean array flagging range gates with fitted data
+    vals : (dict)
+        Dictionary of float arrays for each attribute, NaN where the data is
+        unavailable
+    """
+    slist = beam.fit.slist if beam.fit.slist is not None else list()
+    slist = np.array(slist, dtype=int)
+    inside = slist < ngate
+    good = np.zeros(shape=ngate, dtype=bool)
+    good[slist[inside]] = True
+
+    vals = dict()
+    for attr in attrs:
+        vals[attr] = np.full(ngate, np.nan)
+        aval = getattr(beam.fit, attr, None)
+        if aval is not None and len(aval) == len(slist):
+            vals[attr][slist[inside]] = np.array(aval, dtype=float)[inside]
+
+    return good, vals
+
 def combBeams(scan):
     """This function combines all repeated beams within a scan into a
     single beam with medians for the velocity, elevation, phase lag, and
@@ -82,273 +155,376 @@ def combBeams(scan):
     Returns
     --------
     outscan (sdio.scanData object)
-        The averaged scan
+        The averaged scan, with beams in the order they were first sounded
+
+    Notes
+    ------
+    A range gate is kept if it has data in more than half of the repeated
+    beams.  The quality flag is set to one, the groundscatter flag is the
+    majority flag, and the other numeric fitted data are the medians of the
+    available values.  Non-numeric point data, such as region labels, are set
+    to None.  The lag zero power for each range gate is the median over the
+    repeated beams.
 
     written by AJ, 20130402
     """
     from davitpy import pydarn
-    outscan = []
-    # sort the scan by beam number
-    sorted(scan, key=lambda beam: beam.bmnum)
 
-    # see if any beam number repeat
-    bcnt = np.zeros(50)
-    for b in scan:
-        bcnt[b.bmnum] += 1.
+    outscan = pydarn.sdio.scanData()
 
-    # save any single beams:
+    # Find the beams sounded at each beam number
+    bmnums = list()
+    bmsort = dict()
     for b in scan:
-        if bcnt[b.bmnum] == 1:
-            outscan.append(b)
-
-    # average any repeat beams
-    for i in range(len(bcnt)):
-        beams = []
-        # check for more than one
-        if bcnt[i] > 1:
-            beam = pydarn.sdio.beamData()
-            for b in scan:
-                # append it to beams list
-                if b.bmnum == i:
-                    beams.append(b)
-
-            nrang = max(beams, key= lambda x:x.prm.nrang)
-
-            # initialize a new beam object
-            beam.copyData(beams[0])
-            for key,val in beam.fit.__dict__.iteritems(): 
-                setattr(beam.fit, key, [])
-            beam.prm.nrang = nrang
-
-            for j in range(nrang):
-                cnt = 0.0
-                pos = float(bcnt[i])
-                for b in beams:
-                    if j in b.fit.slist:
-                        cnt += 1.
-                if cnt / pos > .5:
-                    beam.fit.slist.append(j)
-                    beam.fit.qflg = 1
-                    for key in beam.fit.__dict__.iterkeys():
-                        if key == 'qflg' or key == 'gflg' or key == 'slist':
-                            continue
-                        arr = []
-                        for b in beams:
-                            if j in b.fit.slist:
-                                ind = b.fit.slist.index(j)
-                                arr.append(getattr(b.fit, key)[ind])
-                        setattr(beam.fit, key, np.median(arr))
-            outscan.append(beam)
-
-    sorted(outscan, key=lambda beam: beam.bmnum)
+        if not bmsort.has_key(b.bmnum):
+            bmnums.append(b.bmnum)
+            bmsort[b.bmnum] = list()
+        bmsort[b.bmnum].append(b)
+
+    for bmnum in bmnums:
+        beams = bmsort[bmnum]
+
+        # save any single beams
+        if len(beams) == 1:
+            outscan.append(beams[0])
+            continue
+
+        # average any repeat beams
+        nrang = max([b.prm.nrang for b in beams])
+        attrs = _point_attrs(beams[0].fit, numeric=True)
+        good = list()
+        vals = {attr:list() for attr in attrs}
+        for b in beams:
+            bgood, bvals = _gate_arrays(b, attrs, nrang)
+            good.append(bgood)
+            for attr in attrs:
+                vals[attr].append(bvals[attr])
+
+        good = np.array(good)
+        keep = np.where(good.sum(axis=0) / float(len(beams)) > .5)[0]
+
+        # initialize a new beam object
+        beam = pydarn.sdio.beamData()
+        beam.copyData(beams[0])
+        beam.prm.nrang = nrang
+        beam.fit.slist = keep.tolist()
+        beam.fit.npnts = len(keep)
+
+        # Point data that can't be averaged, such as region labels, is removed
+        for attr in _point_attrs(beams[0].fit, numeric=False):
+            setattr(beam.fit, attr, None)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            for attr in attrs:
+                aval = np.nanmedian(np.array(vals[attr])[:,keep], axis=0)
+                if attr == 'qflg':
+                    aval = np.ones(shape=keep.shape, dtype=int)
+                elif attr == 'gflg':
+                    aval = (aval >= .5).astype(int)
+                setattr(beam.fit, attr, aval.tolist())
+
+            pwr0 = [b.fit.pwr0 for b in beams if b.fit.pwr0 is not None and
+                    len(b.fit.pwr0) == nrang]
+            if len(pwr0) > 0:
+                beam.fit.pwr0 = np.nanmedian(pwr0, axis=0).tolist()
+
+        outscan.append(beam)
 
     return outscan
 
-def fitFilter(infile, outfile, thresh=0.4):
-    """This function applies a boxcar filter to a fitacf file.  Currently
-    hardwired to load Blackstone on 1-5-2010.  The fix to this is stored in
-    0.5-release_fitexFilter_change branch in aburrell's fork.
+def scanArrays(scan, attrs=None):
+    """This function combines the repeated beams in a scan and places the
+    fitted data in (beam, range gate) arrays
 
     Parameters
-    ------------
-    infile : (str)
-        The name of the input fitacf-format file
-    outfile : (str)
-        The name of the output file
-    thresh : (float)
-        The filter threshold for turning on a R-B cell.  (default=0.4)
+    -----------
+    scan : (list or sdio.scanData object)
+        A list of beams in a scan
+    attrs : (list or NoneType)
+        Fitted data attributes to place in arrays, or None to use filter_attrs
+        (default=None)
 
     Returns
-    ---------
-    Void
-
-    Note
-    -----
-    This is VERY slow
-
-    written by AJ, 20130402
+    --------
+    sdata : (dict)
+        Dictionary containing the combined beams ('beams'), a boolean array
+        flagging the beam numbers in the scan ('has_beam'), a boolean array of
+        shape (beam, range gate) flagging the range gates with fitted data
+        ('good'), and float arrays of the same shape for each attribute, with
+        NaN where the data is unavailable
     """
-    from davitpy import pydarn
-    inp = pydarn.sdio.radDataOpen(dt.datetime(2010,5,1), 'bks', fileName=infile)
+    if attrs is None:
+        attrs = filter_attrs
 
-    outp = open(outfile, 'w')
+    beams = combBeams(scan)
+    nbeam = max([b.bmnum for b in beams] + [-1]) + 1
+    ngate = max([b.prm.nrang for b in beams] + [0])
 
-    scans = [None, None, None]
+    sdata = {'beams':beams, 'has_beam':np.zeros(shape=nbeam, dtype=bool),
+             'good':np.zeros(shape=(nbeam, ngate), dtype=bool)}
+    for attr in attrs:
+        sdata[attr] = np.full((nbeam, ngate), np.nan)
 
-    sc = pydarn.sdio.radDataReadScan(inp)
-    scans[1] = sc
+    for b in beams:
+        good, vals = _gate_arrays(b, attrs, ngate)
+        sdata['has_beam'][b.bmnum] = True
+        sdata['good'][b.bmnum] = good
+        for attr in attrs:
+            sdata[attr][b.bmnum] = vals[attr]
 
-    sc = pydarn.sdio.radDataReadScan(inp)
-    scans[2] = sc
+    return sdata
 
-    while sc != None:
-        tsc = doFilter(scans, thresh=thresh)
+def _windows(cube):
+    """Sliding 3x3 (beam, range gate) windows over a (time, beam, range gate)
+    array that has been padded by one beam and range gate on each side
 
-        for b in tsc:
-            logging.info("processing: {:}".format(b))
-            pydarn.dmapio.writeFitRec(b, utils.datetimeToEpoch(b.time), outp)
-
-        sc = pydarn.sdio.radDataReadScan(inp)
-        scans[0] = scans[1]
-        scans[1] = scans[2]
-        scans[2] = sc
-
-    tsc = doFilter(scans, thresh=thresh)
-    logging.info("current at time: {:}".format(tsc.time))
+    Parameters
+    -----------
+    cube : (np.ndarray)
+        Padded array of shape (3, nbeam + 2, ngate + 2)
 
-    for b in tsc:
-        pydarn.dmapio.writeFitRec(b, utils.datetimeToEpoch(b.time), outp)
+    Returns
+    --------
+    win : (np.ndarray)
+        Read-only view of shape (3, nbeam, ngate, 3, 3), where win[:,i,j] is
+        the box centred on beam i and range gate j
+    """
+    from numpy.lib.stride_tricks import as_strided
 
-    outp.close()
-    return
+    nt, nb, ng = cube.shape
+    st, sb, sg = cube.strides
 
-def doFilter(scans, thresh=.4):
-    """This function applies a boxcar filter to consecutive scans
+    return as_strided(cube, shape=(nt, nb - 2, ng - 2, 3, 3),
+                      strides=(st, sb, sg, sb, sg), writeable=False)
 
-    Note
-    -----
-    This is VERY slow.
+def boxcarFilter(sarrays, thresh=.4):
+    """This function applies a weighted boxcar filter to the middle of three
+    consecutive scans
 
     Parameters
     -----------
-    scans : (list)
-        a list of 3 consecutive scans, sorted by time.
+    sarrays : (list)
+        a list of the scanArrays output for 3 consecutive scans, sorted by
+        time.  Missing scans are None.
     thresh : (float)
-        The filter threshold for turning on a R-B cell.  (default=0.4)
+        The filter threshold for turning on a R-B cell.  (default=.4)
 
     Returns
     --------
-    outscan : (list or radDataTypes.scanData object)
+    outscan : (radDataTypes.scanData object)
         The filtered scan
 
-    written by AJ, 20130402
+    Notes
+    ------
+    Each cell in the 3x3x3 (time, beam, range gate) box is weighted by one,
+    plus one for each dimension in which it is central, plus one more for the
+    central cell.  A range gate is kept if the weighted fraction of cells with
+    data is at least thresh.  Cells from missing scans or beams are not
+    counted.  The filtered values are the medians of the available values, each
+    repeated by its weight.  Values of zero for the attributes in
+    zero_missing_attrs (elv and phi0) are treated as unavailable, as they are
+    used to flag missing interferometer data.
     """
     from davitpy import pydarn
 
-    scans = []
-    for s in scans:
-        if s == None:
-            scans.append(None)
-        else:
-            scans.append(combBeams(s))
-
     outscan = pydarn.sdio.scanData()
+    if sarrays[1] is None:
+        return outscan
 
     # define the weigths array
-    w = [[[0.0 for i in range(3)] for j in range(3)] for k in range(3)]
-    for i in range(0,3):
-        for j in range(0,3):
-            for k in range(0,3):
-                tplus = 1 if k == 0 else 0
-                rplus = 1 if i == 0 else 0
-                bmplus = 1 if j == 0 else 0
-                centplus = 1 if i == 0 and j == 0 and k == 0 else 0
-
-                w[(i+1)%3][(j+1)%3][(k+1)%3] = 1+tplus+rplus+bmplus+centplus
-
-    for b in scans[1]:
-        bmnum = b.bmnum
+    w = np.ones(shape=(3, 3, 3), dtype=int)
+    w[1] += 1
+    w[:,1] += 1
+    w[:,:,1] += 1
+    w[1,1,1] += 1
+
+    # Build the padded (time, beam, range gate) arrays
+    nbeam = max([len(s['has_beam']) for s in sarrays if s is not None])
+    ngate = max([s['good'].shape[1] for s in sarrays if s is not None])
+    has_beam = np.zeros(shape=(3, nbeam + 2), dtype=bool)
+    good = np.zeros(shape=(3, nbeam + 2, ngate + 2), dtype=bool)
+    vals = {attr:np.full((3, nbeam + 2, ngate + 2), np.nan)
+            for attr in filter_attrs}
+
+    for i,s in enumerate(sarrays):
+        if s is not None:
+            nb, ng = s['good'].shape
+            has_beam[i,1:nb+1] = s['has_beam']
+            good[i,1:nb+1,1:ng+1] = s['good']
+            for attr in filter_attrs:
+                vals[attr][i,1:nb+1,1:ng+1] = s[attr]
+
+    for attr in zero_missing_attrs:
+        vals[attr][vals[attr] == 0.0] = np.nan
+
+    # Sum the weights of the available and filled cells in each box
+    bwin = np.array([has_beam[:,j:j+nbeam] for j in range(3)])
+    tot = np.einsum('jtb,tj->b', bwin, w.sum(axis=2))
+    pts = np.einsum('tbgjk,tjk->bg', _windows(good), w)
+
+    # Find the range gates that meet the threshold for each beam
+    keep = np.zeros(shape=(nbeam, ngate), dtype=bool)
+    for b in sarrays[1]['beams']:
+        keep[b.bmnum,:b.prm.nrang] = True
+    keep &= pts >= thresh * tot[:,np.newaxis]
+    ibeam, igate = np.where(keep)
+
+    # Take the weighted medians by repeating each value by its weight
+    med = dict()
+    for attr in filter_attrs:
+        box = _windows(vals[attr])[:,ibeam,igate].transpose(1, 0, 2, 3)
+        med[attr] = _row_medians(np.repeat(box.reshape(len(ibeam), 27),
+                                           w.flatten(), axis=1))
+
+    # Re-evaluate the groundscatter flag
+    with np.errstate(invalid="ignore"):
+        gflg = np.where(med['w_l'] > -3.0 * med['v'] + 90.0, 0, 1)
+
+    for b in sarrays[1]['beams']:
+        ib = np.where(ibeam == b.bmnum)[0]
+
         # make a new beam
         beam = pydarn.sdio.beamData()
         beam.copyData(b)
-        for key,val in beam.fit.__dict__.iteritems(): 
-            setattr(beam.fit,key,[])
-
-        for r in range(0,b.prm.nrang):
-            # boxcar to hold the gates
-            box = [[[None for j in range(3)] for k in range(3)]
-                   for n in range(3)]
-
-            # iterate through time
-            for j in range(0,3):
-                # iterate through beam
-                for k in range(-1,2):
-                    # iterate through gate
-                    for n in range(-1,2):
-                        # get the scan we are working on
-                        s = scans[j]
-                        if s == None:
-                            continue
-
-                        # get the beam we are working on
-                        tbm = None
-                        for bm in s:
-                            if bm.bmnum == bmnum + k:
-                                tbm = bm
-                        if tbm == None:
-                            continue
-
-                        # check if target gate number is in the beam
-                        if r+n in tbm.fit.slist:
-                            ind = tbm.fit.slist.index(r + n)
-                            box[j][k+1][n+1] = Gate(tbm.fit, ind)
-                        else:
-                            box[j][k+1][n+1] = 0
-
-            pts = 0.0
-            tot = 0.0
-            v = list()
-            w_l = list()
-            p_l = list()
-            elv = list()
-            phi0 = list()
-            pwr0 = list()
-            # iterate through time
-            for j in range(0,3):
-                # iterate through beam
-                for k in range(0,3):
-                    # iterate through gate
-                    for n in range(0,3):
-                        bx = box[j][k][n]
-                        if bx == None:
-                            continue
-                        wt = w[j][k][n]
-                        tot += wt
-                        if bx != 0:
-                            pts += wt
-                            for m in range(0, wt):
-                                v.append(bx.v)
-                                pwr0.append(bx.pwr0)
-                                w_l.append(bx.w_l)
-                                p_l.append(bx.p_l)
-                                if bx.elv:
-                                    elv.append(bx.elv)
-                                if bx.phi0:
-                                    phi0.append(bx.phi0)
-
-            # check if we meet the threshold
-            if pts / tot >= thresh:
-                beam.fit.slist.append(r)
-                beam.fit.qflg.append(1)
-                beam.fit.v.append(np.median(v))
-                beam.fit.w_l.append(np.median(w_l))
-                beam.fit.p_l.append(np.median(p_l))
-                beam.fit.pwr0.append(np.median(pwr0))
-                if len(elv) > 0:
-                    beam.fit.elv.append(np.median(elv))
-                if len(phi0) > 0:
-                    beam.fit.phi0.append(np.median(phi0))
-
-                # Re-evaluate the groundscatter flag
-                gflg = 0 if np.median(w_l) > -3.0 * np.median(v) + 90.0 else 1
-                beam.fit.gflg.append(gflg)
+        for key in _point_attrs(b.fit):
+            setattr(beam.fit, key, None)
+
+        beam.fit.slist = igate[ib].tolist()
+        beam.fit.npnts = len(ib)
+        beam.fit.qflg = [1 for i in ib]
+        beam.fit.gflg = gflg[ib].tolist()
+        for attr in filter_attrs:
+            setattr(beam.fit, attr, med[attr][ib].tolist())
 
         outscan.append(beam)
 
     return outscan
 
+def _row_medians(rvals):
+    """Find the median of each row, ignoring NaN
 
+    Parameters
+    -----------
+    rvals : (np.ndarray)
+        Two-dimensional array
 
+    Returns
+    --------
+    rmed : (np.ndarray)
+        Median of each row, NaN if a row has no values
+    """
+    rvals = np.sort(rvals, axis=1)
+    nval = (~np.isnan(rvals)).sum(axis=1)
+    irow = np.arange(rvals.shape[0])
+    ilow = np.maximum((nval - 1) // 2, 0)
+    ihigh = np.minimum(nval // 2, rvals.shape[1] - 1)
 
+    rmed = 0.5 * (rvals[irow,ilow] + rvals[irow,ihigh])
+    rmed[nval == 0] = np.nan
 
+    return rmed
 
+def fitFilter(infile, outfile, thresh=0.4, stime=None, radcode=None,
+              etime=None, file_type='fitacf', processes=False):
+    """This function applies a boxcar filter to a fitacf file, reading and
+    filtering one scan at a time
 
+    Parameters
+    ------------
+    infile : (str or radDataTypes.radDataPtr object)
+        The name of the input fitacf-format file, or an open data pointer
+    outfile : (str)
+        The name of the output file
+    thresh : (float)
+        The filter threshold for turning on a R-B cell.  (default=0.4)
+    stime : (datetime or NoneType)
+        Start time, or None to start at the first record in infile
+        (default=None)
+    radcode : (str or NoneType)
+        3-letter radar code, or None to use the radar from the first record in
+        infile (default=None)
+    etime : (datetime or NoneType)
+        End time, or None to read one day from stime (default=None)
+    file_type : (str)
+        Type of the input file (default='fitacf')
+    processes : (bool)
+        Combine the repeated beams and filter the scans in separate processes
+        (default=False)
 
+    Returns
+    ---------
+    nrec : (int)
+        The number of filtered records written
 
+    Notes
+    ------
+    If stime or radcode are not specified, infile must be an uncompressed
+    file.  The filtered records are written as DMAP records, using the
+    original record for any values that are not filtered.
 
+    written by AJ, 20130402
+    """
+    from davitpy import pydarn
+    from davitpy.pydarn.proc import pipeline
+
+    if isinstance(infile, pydarn.sdio.radDataPtr):
+        inp = infile
+    else:
+        if stime is None or radcode is None:
+            # Use the first record to set the start time and radar
+            import os
+            fd = os.open(infile, os.O_RDONLY)
+            try:
+                rec = pydarn.dmapio.readDmapRec(fd)
+            finally:
+                os.close(fd)
+
+            if rec is None:
+                logging.error("unable to read first record of {:s}".format(
+                    infile))
+                return 0
+
+            if stime is None:
+                stime = dt.datetime.utcfromtimestamp(rec['time'])
+            if radcode is None:
+                radcode = pydarn.radar.network().getRadarById(
+                    rec['stid']).code[0]
+
+        inp = pydarn.sdio.radDataOpen(stime, radcode, eTime=etime,
+                                      fileType=file_type, fileName=infile)
+
+    # Stream the scans through the pipeline, keeping the previous, current,
+    # and next scans in the filter window
+    stages = [pipeline.mapStage(scanArrays),
+              pipeline.windowStage(boxcarFilter, 1, 1, thresh=thresh)]
+
+    return pipeline.runPipeline(pipeline.scanSource(inp), stages,
+                                pipeline.dmapSink(outfile),
+                                processes=processes)
 
+def doFilter(scans, thresh=.4):
+    """This function applies a boxcar filter to consecutive scans
 
+    Parameters
+    -----------
+    scans : (list)
+        a list of 3 consecutive scans, sorted by time.  Missing scans are None.
+    thresh : (float)
+        The filter threshold for turning on a R-B cell.  (default=.4)
 
+    Returns
+    --------
+    outscan : (radDataTypes.scanData object)
+        The filtered scan
 
+    Notes
+    ------
+    When filtering many scans, fitFilter is faster, since it only combines
+    the beams in each scan once.
 
+    written by AJ, 20130402
+    """
+    sarrays = [None if s is None else scanArrays(s) for s in scans]
 
+    return boxcarFilter(sarrays, thresh=thresh)
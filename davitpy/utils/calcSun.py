@@ -37,6 +37,10 @@ calcEquationOfTime          calculate the difference between true solar time
 calcHourAngleSunrise        calculate the hour angle of the sun at sunrise
                             for the latitude (in radians)
 calcAzEl                    calculate sun azimuth and zenith angle
+calcSolarZenith             calculate the solar zenith angle for arrays of
+                            times, latitudes and longitudes
+calcSubSolar                calculate the Greenwich hour angle and the
+                            declination of the sun
 calcSolNoonUTC              calculate time of solar noon the given day at the
                             given location on earth (in minutes since 0 UTC)
 calcSolNoon                 calculate time of solar noon the given day at the
@@ -49,6 +53,8 @@ calcTerminator              calculate terminator position and solar zenith
                             angle for a given julian date-time within
                             latitude/longitude limits note that for plotting
                             only, basemap has a built-in terminator
+calcDayNightTerminator      calculate (and cache) the latitude of the
+                            day/night terminator at given longitudes
 --------------------------- -------------------------------------------------
 
 Note
@@ -73,10 +79,7 @@ def calcGeomMeanLongSun( t ):
     """Calculate the Geometric Mean Longitude of the Sun (in degrees)
     """
     L0 = 280.46646 + t * ( 36000.76983 + t*0.0003032 )
-    while L0 > 360.0:
-        L0 -= 360.0
-    while L0 < 0.0:
-        L0 += 360.0
+    L0 = numpy.mod(L0, 360.0)
     return L0 # in degrees
 
 
@@ -211,67 +214,193 @@ def calcHourAngleSunrise( lat, solarDec ):
 
 def calcAzEl( t, localtime, latitude, longitude, zone ):
     """Calculate sun azimuth and zenith angle
+
+    All arguments may be numpy arrays, in which case they are broadcast
+    against each other and arrays of azimuth and zenith angle are returned.
     """
+    isScalar = all(numpy.ndim(x) == 0 for x in
+                   (t, localtime, latitude, longitude, zone))
+    t = numpy.asarray(t, dtype=float)
+    localtime = numpy.asarray(localtime, dtype=float)
+    latitude = numpy.asarray(latitude, dtype=float)
+    longitude = numpy.asarray(longitude, dtype=float)
+
     eqTime = calcEquationOfTime(t)
     theta  = calcSunDeclination(t)
 
     solarTimeFix = eqTime + 4.0 * longitude - 60.0 * zone
-    earthRadVec = calcSunRadVector(t)
 
     trueSolarTime = localtime + solarTimeFix
-    while trueSolarTime > 1440:
-        trueSolarTime -= 1440.
+    trueSolarTime = numpy.where(trueSolarTime > 1440.,
+                                trueSolarTime - 1440. *
+                                numpy.ceil(trueSolarTime / 1440. - 1.),
+                                trueSolarTime)
 
     hourAngle = trueSolarTime / 4.0 - 180.0
-    if hourAngle < -180.: 
-        hourAngle += 360.0
+    hourAngle = numpy.where(hourAngle < -180., hourAngle + 360.0, hourAngle)
 
+    latRad = numpy.radians(latitude)
+    thetaRad = numpy.radians(theta)
     haRad = numpy.radians(hourAngle)
-    csz = numpy.sin(numpy.radians(latitude)) * numpy.sin(numpy.radians(theta)) + numpy.cos(numpy.radians(latitude)) * numpy.cos(numpy.radians(theta)) * numpy.cos(haRad)
-    if csz > 1.0: 
-        csz = 1.0 
-    elif csz < -1.0: 
-        csz = -1.0
+    csz = numpy.sin(latRad) * numpy.sin(thetaRad) + numpy.cos(latRad) * numpy.cos(thetaRad) * numpy.cos(haRad)
+    csz = numpy.clip(csz, -1.0, 1.0)
     zenith = numpy.degrees(numpy.arccos(csz))
-    azDenom = numpy.cos(numpy.radians(latitude)) * numpy.sin(numpy.radians(zenith))
-    if abs(azDenom) > 0.001: 
-        azRad = (( numpy.sin(numpy.radians(latitude)) * numpy.cos(numpy.radians(zenith)) ) - numpy.sin(numpy.radians(theta))) / azDenom
-        if abs(azRad) > 1.0: 
-            if azRad < 0.: 
-                azRad = -1.0 
-            else:
-                azRad = 1.0
-        
-        azimuth = 180.0 - numpy.degrees(numpy.arccos(azRad))
-        if hourAngle > 0.0: 
-            azimuth = -azimuth
-    else:
-        if latitude > 0.0: 
-            azimuth = 180.0 
-        else:
-            azimuth = 0.0
-    if azimuth < 0.0: 
-        azimuth += 360.0
+    zenRad = numpy.radians(zenith)
+    azDenom = numpy.cos(latRad) * numpy.sin(zenRad)
+    bigDenom = numpy.abs(azDenom) > 0.001
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        azRad = ((numpy.sin(latRad) * numpy.cos(zenRad)) - numpy.sin(thetaRad)) / numpy.where(bigDenom, azDenom, 1.)
+    azRad = numpy.clip(azRad, -1.0, 1.0)
+    azimuth = 180.0 - numpy.degrees(numpy.arccos(azRad))
+    azimuth = numpy.where(hourAngle > 0.0, -azimuth, azimuth)
+    azimuth = numpy.where(bigDenom, azimuth,
+                          numpy.where(latitude > 0.0, 180.0, 0.0))
+    azimuth = numpy.where(azimuth < 0.0, azimuth + 360.0, azimuth)
     exoatmElevation = 90.0 - zenith
 
     # Atmospheric Refraction correction
-    if exoatmElevation > 85.0: 
-        refractionCorrection = 0.0
-    else:
-        te = numpy.tan(numpy.radians(exoatmElevation))
-        if exoatmElevation > 5.0: 
-            refractionCorrection = 58.1 / te - 0.07 / (te*te*te) + 0.000086 / (te*te*te*te*te) 
-        elif exoatmElevation > -0.575: 
-            refractionCorrection = 1735.0 + exoatmElevation * (-518.2 + exoatmElevation * (103.4 + exoatmElevation * (-12.79 + exoatmElevation * 0.711) ) ) 
-        else:
-            refractionCorrection = -20.774 / te
-        refractionCorrection = refractionCorrection / 3600.0
+    e = exoatmElevation
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        te = numpy.tan(numpy.radians(e))
+        refractionCorrection = numpy.select(
+            [e > 85.0, e > 5.0, e > -0.575],
+            [0.0,
+             58.1 / te - 0.07 / (te*te*te) + 0.000086 / (te*te*te*te*te),
+             1735.0 + e * (-518.2 + e * (103.4 + e * (-12.79 + e * 0.711)))],
+            -20.774 / te) / 3600.0
 
     solarZen = zenith - refractionCorrection
-    
+
+    if isScalar:
+        return float(azimuth), float(solarZen)
     return azimuth, solarZen
 
 
+def calcSolarZenith( date, latitude, longitude ):
+    """Calculate the solar zenith angle (corrected for atmospheric
+    refraction) for arrays of times and positions
+
+    Parameters
+    ----------
+    date : datetime.datetime or array-like
+        UT time(s), as datetime objects or numpy datetime64 values
+    latitude : float or array-like
+        geographic latitude(s) in degrees
+    longitude : float or array-like
+        geographic longitude(s) in degrees
+
+    Returns
+    -------
+    zenith : float or numpy.ndarray
+        solar zenith angle in degrees, with the broadcast shape of the
+        inputs
+
+    Example
+    -------
+        zen = calcSolarZenith(times[:,None], lats[None,:], lons[None,:])
+    """
+    jd = getJD(date)
+    ut = (jd - (numpy.floor(jd - 0.5) + 0.5)) * 1440.
+    return calcAzEl(calcTimeJulianCent(jd), ut, latitude, longitude, 0.)[1]
+
+
+def calcSubSolar( date ):
+    """Calculate the Greenwich hour angle and the declination of the sun
+
+    Parameters
+    ----------
+    date : datetime.datetime or array-like
+        UT time(s), as datetime objects or numpy datetime64 values
+
+    Returns
+    -------
+    tau : float or numpy.ndarray
+        Greenwich hour angle of the sun in degrees (the subsolar longitude
+        is -tau)
+    dec : float or numpy.ndarray
+        solar declination in degrees
+    """
+    jd = getJD(date)
+    t = calcTimeJulianCent(jd)
+    ut = (jd - (numpy.floor(jd - 0.5) + 0.5)) * 1440.
+    tau = (ut + calcEquationOfTime(t)) / 4.0 - 180.0
+    dec = calcSunDeclination(t)
+    return tau, dec
+
+
+# Terminator curves computed by calcDayNightTerminator, keyed by rounded
+# time and longitudes.  Cleared when it reaches _terminatorCacheSize.
+_terminatorCache = {}
+_terminatorCacheSize = 4096
+
+
+def calcDayNightTerminator( date, lons, tres=60. ):
+    """Calculate the latitude of the day/night terminator at given
+    longitudes, for one or several times
+
+    Terminator curves are cached by time rounded to tres seconds, so that
+    repeated calls for the same times (e.g. several beams of an RTI, or
+    the frames of a fan plot movie) only compute them once.
+
+    Parameters
+    ----------
+    date : datetime.datetime or array-like
+        UT time(s), as datetime objects or numpy datetime64 values
+    lons : array-like
+        longitudes of the terminator points in degrees
+    tres : Optional[float]
+        time resolution in seconds: the terminator is computed at date
+        rounded to the nearest multiple of tres.  None computes it at the
+        exact times, without caching.
+
+    Returns
+    -------
+    lats : numpy.ndarray
+        latitude of the terminator, with shape date.shape + lons.shape
+    tau : float or numpy.ndarray
+        Greenwich hour angle of the sun in degrees
+    dec : float or numpy.ndarray
+        solar declination in degrees
+    """
+    times = _toDatetime64(date)
+    lons = numpy.asarray(lons, dtype=float)
+    if tres is not None:
+        usec = times.astype('int64')
+        step = int(round(tres * 1e6))
+        times = ((usec + step // 2) // step * step).astype('datetime64[us]')
+
+    flat = times.ravel()
+    key = None if tres is None else lons.tostring() + str(lons.shape)
+    curves = [None] * flat.size
+    miss = []
+    for i, tm in enumerate(flat):
+        if key is not None and (tm, key) in _terminatorCache:
+            curves[i] = _terminatorCache[(tm, key)]
+        else:
+            miss.append(i)
+
+    if miss:
+        tau, dec = calcSubSolar(flat[miss])
+        tau = numpy.reshape(tau, (-1,) + (1,) * lons.ndim)
+        dec = numpy.reshape(dec, (-1,) + (1,) * lons.ndim)
+        lats = numpy.degrees(numpy.arctan(-numpy.cos(numpy.radians(lons + tau)) /
+                                          numpy.tan(numpy.radians(dec))))
+        if key is not None and \
+                len(_terminatorCache) + len(miss) > _terminatorCacheSize:
+            _terminatorCache.clear()
+        for n, i in enumerate(miss):
+            curves[i] = (lats[n], tau.flat[n], dec.flat[n])
+            if key is not None:
+                _terminatorCache[(flat[i], key)] = curves[i]
+
+    lats = numpy.array([c[0] for c in curves]).reshape(times.shape + lons.shape)
+    tau = numpy.array([c[1] for c in curves]).reshape(times.shape)
+    dec = numpy.array([c[2] for c in curves]).reshape(times.shape)
+    if times.ndim == 0:
+        tau, dec = float(tau), float(dec)
+    return lats, tau, dec
+
+
 def calcSolNoonUTC( jd, longitude ):
     """Calculate time of solar noon the given day at the given location on earth (in minute since 0 UTC)
     """
@@ -344,14 +473,11 @@ def calcTerminator( date, latitudes, longitudes,nlats=50,nlons=50 ):
     jd = getJD(date)
     t = calcTimeJulianCent(jd)
     ut = ( jd - (int(jd - 0.5) + 0.5) )*1440.
-    zen  = numpy.zeros((nlats,nlons))
     lats = numpy.linspace(latitudes[0],  latitudes[1],  num=nlats)
     lons = numpy.linspace(longitudes[0], longitudes[1], num=nlons)
+    zen = calcAzEl(t, ut, lats[:,numpy.newaxis], lons[numpy.newaxis,:], 0.)[1]
     term = []
     for ilat in range(1,nlats+1):
-        for ilon in range(nlons):
-            az,el = calcAzEl(t, ut, lats[-ilat], lons[ilon], 0.) 
-            zen[-ilat,ilon] = el
         a = (90 - zen[-ilat,:])
         mins = numpy.r_[False, a[1:]*a[:-1] <= 0] | \
             numpy.r_[a[1:]*a[:-1] <= 0, False] 
@@ -366,10 +492,28 @@ def calcTerminator( date, latitudes, longitudes,nlats=50,nlons=50 ):
     return lats, lons, zen, numpy.array(term)
 
 
+def _toDatetime64( date ):
+    """Convert a datetime, or an array-like of datetimes or datetime64
+    values, to a datetime64[us] array.
+    """
+    date = numpy.asarray(date)
+    if date.dtype.kind != 'M':
+        flat = [d.replace(tzinfo=None) for d in date.ravel()]
+        date = numpy.array(flat, dtype='datetime64[us]').reshape(date.shape)
+    return date.astype('datetime64[us]')
+
+
 def getJD( date ):
     """
 Calculate julian date for a given datetime object. Based on http://www.tondering.dk/claus/cal/julperiod.php. Note that this algorithm assumes input is from the Gregorian or Proleptic Gregorian Calendar.
+
+An array-like of datetimes (or a numpy datetime64 array) returns an array
+of julian dates.
     """
+    if not hasattr(date, 'year'):
+        usec = _toDatetime64(date).astype('int64')
+        return usec / 86400e6 + 2440587.5
+
     # Note to devs: 
     # One can compare the output of this algorithm with http://aa.usno.navy.mil/data/docs/JulianDate.php
     # but make sure you remember that this algorithm assumes the Gregorian 
@@ -69,9 +69,11 @@ def coord_conv(lon, lat, start, end, altitude=None, date_time=None,
         Altitude to be used (km); required for 'mag' and 'mlt' conversions.
         May be a single value or a list/array the same size as lat and lon.
         (default=None)
-    date_time : (datetime)
-        Universal time for conversion.  Must be provided for 'mag' and 'mlt'
-        (default=None)
+    date_time : (datetime/list/np.array)
+        Universal time for conversion.  Must be provided for 'mag' and 'mlt'.
+        May be a single datetime or a list/array of datetimes the same size
+        as lat and lon, in which case the points are converted in groups
+        that share a time. (default=None)
     end_altitude : (int/float/list/np.array)
         used for conversions from coords at one
         altitude to coords at another.  In km.  Can be int/float or
@@ -92,6 +94,10 @@ def coord_conv(lon, lat, start, end, altitude=None, date_time=None,
         lon, lat = utils.coord_conv(lon, lat, 'geo', 'mlt',
                                     altitude=300.,
                                     date_time=datetime(2012,3,12,0,56))
+
+        # One time for each point
+        lon, lat = utils.coord_conv(lon_arr, lat_arr, 'geo', 'mag',
+                                    altitude=300., date_time=time_arr)
         
     Notes
     -----
@@ -201,6 +207,14 @@ def coord_conv(lon, lat, start, end, altitude=None, date_time=None,
         if np.size(e_alt) == 1:
             e_alt = np.resize(e_alt, np.size(lon))
 
+    # Test whether we have one time for each point.
+    if np.ndim(date_time) > 0:
+        date_time = np.array(date_time)
+        assert(date_time.size == np.size(lon)),\
+                logging.error("date_time must be a single datetime or " +
+                              "the same size as lon and lat")
+        date_time = date_time.flatten()
+
     # Set a flag that we are doing and altitude conversion.
     alt_conv = (end_altitude is not None and end_alt != alt)
 
@@ -226,22 +240,11 @@ def coord_conv(lon, lat, start, end, altitude=None, date_time=None,
             ############################################################
             # Convert MLT to AACGM
             if start == "mlt":
-                # Convert MLT from degrees to hours.
-                lon *= 24.0 / 360.0
-                # Sanitise for later.
-                lon %= 24.0
-                # Find MLT of 0 magnetic lon.
-                mlt_0 = aacgm.mlt_convert(date_time.year, date_time.month,
-                                          date_time.day, date_time.hour,
-                                          date_time.minute, date_time.second,
-                                          0.0, root, igrf_file)     
-                # Calculate MLT difference, which is magnetic lon in hours.
-                lon -= mlt_0
-                # Sanitise and convert to degrees.
-                lon %= 24.0
-                lon *= 360.0 / 24.0
-                # Covert from (0,360) to (-180,180).
-                lon[np.where(lon > 180.0)] -= 360.0
+                # Convert MLT from degrees to hours, then to magnetic lon
+                # using the MLT of 0 magnetic lon for this time.
+                lon = aacgm.convert_mlt_arr(lon * 24.0 / 360.0, date_time,
+                                            m2a=True, igrf_file=igrf_file,
+                                            coeff_prefix=root)
                 start = "mag"
 
             # End of MLT FROM block.
@@ -310,14 +313,10 @@ def coord_conv(lon, lat, start, end, altitude=None, date_time=None,
             ############################################################
             # MLT TO conversions.
             if end == "mlt":
-                for num, el in enumerate(lon):
-                    # Find MLT from magnetic lon and datetime.
-                    lon[num] = aacgm.mlt_convert(date_time.year,
-                                                 date_time.month, date_time.day,
-                                                 date_time.hour,
-                                                 date_time.minute, 
-                                                 date_time.second, el, root,
-                                                 igrf_file)
+                # Find MLT from magnetic lon and datetime.
+                lon = aacgm.convert_mlt_arr(lon, date_time, m2a=False,
+                                            igrf_file=igrf_file,
+                                            coeff_prefix=root)
                 # Convert hours to degrees.
                 lon *= 360.0 / 24.0
                 # Convert from (0,360) to (-180,180).
@@ -668,6 +667,22 @@ str(coord_conv([229.16163697416806, 232.38812809478577],
                [29.419420613372086, 35.725172012254788], 'mag', 'mag', 
                altitude=[200., 300.], end_altitude=[150., 175.], 
                date_time= datetime(2013, 7, 23, 12, 6, 34)))
+    print
+    print "testing with one time per point, geo to mlt"
+    print "Expected (separate calls):  " + \
+str(([coord_conv(50.7, 34.5, 'geo', 'mlt', altitude=300.,
+                 date_time=datetime(2013, 7, 23, 12, 6, 34))[0],
+      coord_conv(53.8, 40.2, 'geo', 'mlt', altitude=300.,
+                 date_time=datetime(2013, 7, 24, 0, 0, 0))[0]],
+     [coord_conv(50.7, 34.5, 'geo', 'mlt', altitude=300.,
+                 date_time=datetime(2013, 7, 23, 12, 6, 34))[1],
+      coord_conv(53.8, 40.2, 'geo', 'mlt', altitude=300.,
+                 date_time=datetime(2013, 7, 24, 0, 0, 0))[1]]))
+    print "Result:                     " + \
+str(coord_conv([50.7, 53.8], [34.5, 40.2], 'geo', 'mlt', altitude=300.,
+               date_time=[datetime(2013, 7, 23, 12, 6, 34),
+                          datetime(2013, 7, 24, 0, 0, 0)]))
+    print
     print "OTHER TESTS:  these tests will fail because of asserts so"
     print "they should be done in an interpreter."
     print "-set start or end to a fictional system code like abc"
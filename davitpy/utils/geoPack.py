@@ -25,6 +25,9 @@ greatCircleAzm : Calculates the azimuth from the coordinates of a start point
 greatCircleDist : Calculates the distance in radians along a great circle path
                   between two points.
 
+All functions accept scalars or numpy arrays (or lists); array arguments are
+broadcast against each other.
+
 References
 ----------
 Based on J.M. Ruohoniemi's geopack
@@ -34,6 +37,15 @@ Updates based on G. Chishams cnvtcoord_vhm.c
 import logging
 import numpy as np
 
+
+def _asArrays(*args):
+    """Convert the array-like arguments to float numpy arrays, leaving scalars
+    and None untouched so that scalar calls still return scalars.
+    """
+    return [a if a is None or np.isscalar(a) else np.asarray(a, dtype=float)
+            for a in args]
+
+
 def geodToGeoc(lat, lon, inverse=False):
     """Converts position from geodetic to geocentric or vice-versa.
     Based on the IAU 1964 oblate spheroid model of the Earth.
@@ -56,6 +68,7 @@ def geodToGeoc(lat, lon, inverse=False):
     rade : float
         Earth radius [km] (geocentric/detic if inverse=False/True)
     """
+    lat, lon = _asArrays(lat, lon)
     a = 6378.16
     f = 1.0 / 298.25
     b = a * (1.0 - f)
@@ -106,6 +119,7 @@ def geodToGeocAzEl(lat, lon, az, el, inverse=False):
     el : float
         elevation [degree]
     """
+    lat, lon, az, el = _asArrays(lat, lon, az, el)
     taz = np.radians(az)
     tel = np.radians(el)
     
@@ -187,6 +201,7 @@ def gspToGcar(xin, yin, zin, inverse=False):
     The meaning of the input (x,y,z) depends on the direction of the conversion 
     (to global cartesian or to global spherical).
     """
+    xin, yin, zin = _asArrays(xin, yin, zin)
 
     if not inverse:
         # Global spherical to global cartesian
@@ -248,6 +263,7 @@ def gcarToLcar(X, Y, Z, lat, lon, rho , inverse=False):
     The meaning of the input (X,Y,Z) depends on the direction of the conversion 
     (to global cartesian or to global spherical).
     """
+    X, Y, Z, lat, lon, rho = _asArrays(X, Y, Z, lat, lon, rho)
     # First get global cartesian coordinates of local origin
     (goX, goY, goZ) = gspToGcar(lat, lon, rho)
     
@@ -324,6 +340,7 @@ def lspToLcar(X, Y, Z, inverse=False):
     The meaning of the input (X,Y,Z) depends on the direction of the conversion 
     (to global cartesian or to global spherical).
     """
+    X, Y, Z = _asArrays(X, Y, Z)
     if not inverse:
         # local spherical into local cartesian
         r = Z
@@ -401,13 +418,18 @@ def calcDistPnt(origLat, origLon, origAlt, dist=None, el=None, az=None,
           distant point and elevation angle.
 
     Input/output is in geodetic coordinates, distances are in km and angles in
-    degrees.
+    degrees.  All inputs may be arrays, which are broadcast against each
+    other (e.g. the origin as scalars and the distance, elevation and azimuth
+    of every gate of every beam as (nbeams, ngates) arrays).
     """
+    (origLat, origLon, origAlt, dist, el, az, distLat, distLon,
+     distAlt) = _asArrays(origLat, origLon, origAlt, dist, el, az, distLat,
+                          distLon, distAlt)
     
     # If all the input parameters (keywords) are set to 0, show a warning, and
     # default to fint distance/azimuth/elevation
     if dist is None and el is None and az is None:
-        assert None not in [distLat, distLon, distAlt], \
+        assert all(x is not None for x in [distLat, distLon, distAlt]), \
             logging.error('Not enough keywords.')
 
         # Convert point of origin from geodetic to geocentric
@@ -426,7 +448,8 @@ def calcDistPnt(origLat, origLon, origAlt, dist=None, el=None, az=None,
         dist = np.sqrt(dX**2 + dY**2 + dZ**2)
 
     elif distLat is None and distLon is None and distAlt is None:
-        assert None not in [dist, el, az], logging.error('Not enough keywords.')
+        assert all(x is not None for x in [dist, el, az]), \
+            logging.error('Not enough keywords.')
 
         # convert pointing azimuth and elevation to geocentric
         (gcLat, gcLon, origRe, gaz, gel) = geodToGeocAzEl(origLat, origLon, az,
@@ -444,7 +467,7 @@ def calcDistPnt(origLat, origLon, origAlt, dist=None, el=None, az=None,
         distRe = Re
 
     elif dist is None and distAlt is None and az is None:
-        assert None not in [distLat, distLon, el], \
+        assert all(x is not None for x in [distLat, distLon, el]), \
             logging.error('Not enough keywords')
 
         # Convert point of origin from geodetic to geocentric
@@ -481,7 +504,7 @@ def calcDistPnt(origLat, origLon, origAlt, dist=None, el=None, az=None,
         dist = Dref * np.sin(theta) / np.cos(theta + np.radians(gel))
 
     elif distLat is None and distLon is None and dist is None:
-        assert None not in [distAlt, el, az], \
+        assert all(x is not None for x in [distAlt, el, az]), \
             logging.error('Not enough keywords')
 
         # convert pointing azimuth and elevation to geocentric
@@ -549,6 +572,8 @@ def greatCircleMove(origLat, origLon, dist, az, alt=0.0, Re=6371.0):
     longitude: (float)
         longitude in degrees
     """
+    origLat, origLon, dist, az, alt = _asArrays(origLat, origLon, dist, az,
+                                                alt)
     Re_tot = (Re + alt) * 1.0e3
     dist = dist * 1.0e3
     lat1 = np.radians(origLat) 
@@ -603,6 +628,7 @@ def greatCircleAzm(lat1, lon1, lat2, lon2):
         azimuth [deg]
 
     """
+    lat1, lon1, lat2, lon2 = _asArrays(lat1, lon1, lat2, lon2)
     lat1 = np.radians(lat1)
     lon1 = np.radians(lon1)
     lat2 = np.radians(lat2)
@@ -637,6 +663,7 @@ def greatCircleDist(lat1, lon1, lat2, lon2):
         distance [radians]
 
     """
+    lat1, lon1, lat2, lon2 = _asArrays(lat1, lon1, lat2, lon2)
     lat1 = np.radians(lat1)
     lon1 = np.radians(lon1)
     lat2 = np.radians(lat2)
@@ -18,7 +18,7 @@ def standard_vhm(slant_range, adjusted_sr=True, max_vh=400.0, hop=0.5,
 
     Parameters
     ------------
-    slant_range : (float)
+    slant_range : (float or np.ndarray)
         slant range in km
     adjusted_sr : (bool)
         This model requires a slant range that has been adjusted by hop.  If
@@ -26,7 +26,7 @@ def standard_vhm(slant_range, adjusted_sr=True, max_vh=400.0, hop=0.5,
         (default=True)
     max_vh : (float)
         Maximum allowable virtual height in km (default=400)
-    hop : (float)
+    hop : (float or np.ndarray)
         Backscatter hop (default=0.5)
     alt : (float/NoneType)
         Altitude estimate (km).  If None (and no elv) defaults to 300 km
@@ -36,16 +36,17 @@ def standard_vhm(slant_range, adjusted_sr=True, max_vh=400.0, hop=0.5,
 
     Returns
     ---------
-    vheight : (float)
+    vheight : (float or np.ndarray)
         Virtual height in km.
     '''
     from davitpy.utils import Re
 
-    vheight = np.nan
+    slant_range = np.asarray(slant_range, dtype=float)
+    hop = np.asarray(hop, dtype=float)
 
     # Adjust slant range, if necessary
     if not adjusted_sr:
-        slant_range /= 2.0 * hop
+        slant_range = slant_range / (2.0 * hop)
 
     # Set the altitude, if not provided    
     if alt is None:
@@ -58,43 +59,43 @@ def standard_vhm(slant_range, adjusted_sr=True, max_vh=400.0, hop=0.5,
             alt = np.sqrt(Re**2 + slant_range**2 + 2.0 * slant_range * Re
                           * np.sin(np.radians(elv))) - Re
 
-    # Model divides data by near and far range.  
-    if slant_range < 150.0:
-        vheight = (slant_range / 150.0) * 115.0
-    else:
-        # Model divides data by ionospheric (0.5, 1.5) and ground (1.0, 2.0)
-        if hop != np.floor(hop):
-            # Ionospheric virtual heights are defined up to slant ranges of 800
-            if slant_range <= 600.0:
-                vheight = 115.0
-            elif slant_range <= 800.0:
-                vheight = 115.0 + (slant_range - 600.0) / 200.0 * (alt - 115.0)
-            else:
-                vheight = max_vh
-        else:
-            # Ground virtual heights are defined up to slant ranges of 500 km.
-            if slant_range <= 300.0:
-                vheight = 115.0
-            elif slant_range <= 500.0:
-                vheight = 115.0 + (slant_range - 300.0) / 200.0 * (alt - 115.0)
-            else:
-                vheight = max_vh
+    # Model divides data by near and far range, and by ionospheric (0.5, 1.5)
+    # and ground (1.0, 2.0) backscatter.  Ionospheric virtual heights are
+    # defined up to slant ranges of 800 km, ground virtual heights up to
+    # slant ranges of 500 km.
+    iono = hop != np.floor(hop)
+    with np.errstate(invalid='ignore'):
+        vheight = np.select([slant_range < 150.0,
+                             iono & (slant_range <= 600.0),
+                             iono & (slant_range <= 800.0),
+                             iono,
+                             slant_range <= 300.0,
+                             slant_range <= 500.0],
+                            [(slant_range / 150.0) * 115.0,
+                             115.0,
+                             115.0 + (slant_range - 600.0) / 200.0 *
+                             (alt - 115.0),
+                             max_vh,
+                             115.0,
+                             115.0 + (slant_range - 300.0) / 200.0 *
+                             (alt - 115.0)],
+                            max_vh)
 
     # The virtual height at this point is correct for half hop ionospheric and
     # one hop ground backscatter.  Adjust virtual heights for more hops to
     # return straight-line virtual height for ionospheric backscatter and
     # straight-line path to the last refraction point for groundscatter
-    if hop > 1.0 and not np.isnan(vheight):
-        vheight *= 2.0 * hop if hop != np.floor(hop) else 2.0 * (hop - 0.5)
-        
-    return vheight
+    vheight = vheight * np.where(hop > 1.0, np.where(iono, 2.0 * hop,
+                                                     2.0 * (hop - 0.5)), 1.0)
+
+    return float(vheight) if vheight.ndim == 0 else vheight
 
 def chisham_vhm(slant_range, vhmtype=None, hop_output=False):
     '''Chisham virtual height model, only handles ionospheric backscatter
 
     Parameters
     ------------
-    slant_range : (float)
+    slant_range : (float or np.ndarray)
         Total measured slant range in km
     vhmtype : (str/NoneType)
         Model type, including "E1"=.5-hop E, "F1"=.5-hop F, "F3"=1.5-hop F,
@@ -104,36 +105,33 @@ def chisham_vhm(slant_range, vhmtype=None, hop_output=False):
 
     Returns
     ---------
-    vheight : (float)
+    vheight : (float or np.ndarray)
         Virtual height in km.
-    hop : (float)
+    hop : (float or np.ndarray)
         If hop_output is True, hop will also be output
     '''
-    vout = [np.nan, 0] if hop_output else [np.nan] 
+    # Model coefficients and hop of E1, F1, F3 and unknown model types
+    vtypes = ["E1", "F1", "F3"]
+    c0 = np.array([108.974, 384.416, 1098.28, np.nan])
+    c1 = np.array([0.0191271, -0.178640, -0.354557, np.nan])
+    c2 = np.array([6.68283e-5, 1.81405e-4, 9.39961e-5, np.nan])
+    chop = np.array([0.5, 0.5, 1.5, 0.0])
+
+    slant_range = np.asarray(slant_range, dtype=float)
     srange_2 = slant_range * slant_range
 
     if vhmtype is None:
-        if slant_range <= 787.5:
-            vhmtype = "E1"
-        elif slant_range > 787.5 and slant_range <= 2137.5:
-            vhmtype = "F1"
-        elif slant_range > 2137.5:
-            vhmtype = "F3"
-            
-    if vhmtype == "E1":
-        # .5-hop E-region
-        vout[0] = 108.974 + 0.0191271 * slant_range + 6.68283e-5 * srange_2
-        if hop_output:
-            vout[1] = 0.5
-    elif vhmtype == "F1":
-        # .5-hop F-region
-        vout[0] = 384.416 - 0.178640 * slant_range + 1.81405e-4 * srange_2
-        if hop_output:
-            vout[1] = 0.5
-    elif vhmtype == "F3":
-        # 1.5 hop F-region
-        vout[0] = 1098.28 - 0.354557 * slant_range + 9.39961e-5 * srange_2
-        if hop_output:
-            vout[1] = 1.5
- 
-    return vout if len(vout) > 1 else vout[0]
+        # .5-hop E-region, .5-hop F-region or 1.5 hop F-region
+        with np.errstate(invalid='ignore'):
+            itype = np.select([slant_range <= 787.5, slant_range <= 2137.5,
+                               slant_range > 2137.5], [0, 1, 2], -1)
+    else:
+        itype = np.zeros(slant_range.shape, dtype=int) + \
+            (vtypes.index(vhmtype) if vhmtype in vtypes else -1)
+
+    vheight = c0[itype] + c1[itype] * slant_range + c2[itype] * srange_2
+    hop = chop[itype]
+    if vheight.ndim == 0:
+        vheight, hop = float(vheight), float(hop)
+
+    return [vheight, hop] if hop_output else vheight
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (C) 2012  VT SuperDARN Lab
+# Full license can be found in LICENSE.txt
+"""This module contains routines to test that the geoPack routines give the
+same results for arrays as for scalars
+
+Functions
+-------------------------------------------------------------------------------
+test_geodToGeoc       Test geodToGeoc and its inverse
+test_geodToGeocAzEl   Test geodToGeocAzEl and its inverse
+test_gspToGcar        Test gspToGcar and its inverse
+test_gcarToLcar       Test gcarToLcar and its inverse
+test_lspToLcar        Test lspToLcar and its inverse
+test_calcDistPnt      Test the four calculation methods of calcDistPnt
+test_greatCircle      Test greatCircleMove, greatCircleAzm and greatCircleDist
+test_broadcast        Test broadcasting a scalar origin against (beam, gate)
+                      arrays
+-------------------------------------------------------------------------------
+"""
+import numpy as np
+
+import geoPack
+
+# Random test points, including the poles and the date line
+_rs = np.random.RandomState(6371)
+_npnt = 200
+_lat = np.append(_rs.uniform(-89.9, 89.9, _npnt - 2), [89.9, -89.9])
+_lon = np.append(_rs.uniform(-180.0, 180.0, _npnt - 2), [180.0, -180.0])
+_az = _rs.uniform(-180.0, 180.0, _npnt)
+_el = _rs.uniform(0.0, 60.0, _npnt)
+_alt = _rs.uniform(0.0, 1.0, _npnt)
+_dist = _rs.uniform(100.0, 3500.0, _npnt)
+
+
+def _compare(func, arrays, kwargs=dict(), rtol=1.0e-12):
+    """Check that func gives the same outputs when called with arrays as when
+    called point by point with scalars
+
+    Parameters
+    ----------
+    func : (function)
+        geoPack function returning a tuple or a dict of outputs
+    arrays : (list)
+        list of positional numpy array arguments
+    kwargs : (dict)
+        keyword arguments, which may be numpy arrays (default=dict())
+    rtol : (float)
+        relative tolerance (default=1.0e-12)
+    """
+    out = func(*arrays, **kwargs)
+    keys = sorted(out.keys()) if isinstance(out, dict) else range(len(out))
+
+    for i in range(len(arrays[0])):
+        skwargs = dict([(k, v[i] if isinstance(v, np.ndarray) else v)
+                        for k, v in kwargs.items()])
+        sout = func(*[a[i] for a in arrays], **skwargs)
+        for k in keys:
+            sval = np.asarray(sout[k]).ravel()[0]
+            aval = np.asarray(out[k]).ravel()[i]
+            assert np.isclose(aval, sval, rtol=rtol, atol=1.0e-9,
+                              equal_nan=True), \
+                "{:s}: output {} differs at point {:d}: {} != {}".format(
+                    func.__name__, k, i, aval, sval)
+
+
+def test_geodToGeoc():
+    """Test geodToGeoc and its inverse"""
+    _compare(geoPack.geodToGeoc, [_lat, _lon])
+    _compare(geoPack.geodToGeoc, [_lat, _lon], dict(inverse=True))
+
+
+def test_geodToGeocAzEl():
+    """Test geodToGeocAzEl and its inverse"""
+    _compare(geoPack.geodToGeocAzEl, [_lat, _lon, _az, _el])
+    _compare(geoPack.geodToGeocAzEl, [_lat, _lon, _az, _el],
+             dict(inverse=True))
+
+
+def test_gspToGcar():
+    """Test gspToGcar and its inverse"""
+    x, y, z = geoPack.gspToGcar(_lat, _lon, 6371.0 + _dist)
+    _compare(geoPack.gspToGcar, [_lat, _lon, 6371.0 + _dist])
+    _compare(geoPack.gspToGcar, [x, y, z], dict(inverse=True))
+
+
+def test_gcarToLcar():
+    """Test gcarToLcar and its inverse"""
+    x, y, z = geoPack.gspToGcar(_lat[::-1], _lon[::-1], 6371.0 + _dist)
+    rho = 6371.0 + _alt
+    _compare(geoPack.gcarToLcar, [x, y, z, _lat, _lon, rho])
+    _compare(geoPack.gcarToLcar, [x, y, z, _lat, _lon, rho],
+             dict(inverse=True))
+
+
+def test_lspToLcar():
+    """Test lspToLcar and its inverse"""
+    x, y, z = geoPack.lspToLcar(_az, _el, _dist)
+    _compare(geoPack.lspToLcar, [_az, _el, _dist])
+    _compare(geoPack.lspToLcar, [x, y, z], dict(inverse=True))
+
+
+def test_calcDistPnt():
+    """Test the four calculation methods of calcDistPnt"""
+    # Distant point from distance, elevation and azimuth
+    _compare(geoPack.calcDistPnt, [_lat, _lon, _alt],
+             dict(dist=_dist, el=_el, az=_az))
+
+    # Distance, elevation and azimuth from the distant point
+    dpnt = geoPack.calcDistPnt(_lat, _lon, _alt, dist=_dist, el=_el, az=_az)
+    _compare(geoPack.calcDistPnt, [_lat, _lon, _alt],
+             dict(distLat=dpnt['distLat'], distLon=dpnt['distLon'],
+                  distAlt=dpnt['distAlt']), rtol=1.0e-9)
+
+    # Distance and altitude from the distant point and elevation
+    _compare(geoPack.calcDistPnt, [_lat, _lon, _alt],
+             dict(distLat=dpnt['distLat'], distLon=dpnt['distLon'], el=_el),
+             rtol=1.0e-9)
+
+    # Distant point from the altitude, elevation and azimuth
+    _compare(geoPack.calcDistPnt, [_lat, _lon, _alt],
+             dict(distAlt=dpnt['distAlt'], el=_el, az=_az), rtol=1.0e-9)
+
+
+def test_greatCircle():
+    """Test greatCircleMove, greatCircleAzm and greatCircleDist"""
+    _compare(geoPack.greatCircleMove, [_lat, _lon, _dist, _az])
+    _compare(geoPack.greatCircleMove, [_lat, _lon, _dist, _az],
+             dict(alt=_alt * 300.0))
+
+    lat2, lon2 = geoPack.greatCircleMove(_lat, _lon, _dist, _az)
+    _compare(lambda *args: (geoPack.greatCircleAzm(*args),),
+             [_lat, _lon, lat2, lon2])
+    _compare(lambda *args: (geoPack.greatCircleDist(*args),),
+             [_lat, _lon, lat2, lon2])
+
+
+def test_broadcast():
+    """Test broadcasting a scalar origin against (beam, gate) arrays, and
+    list inputs"""
+    az = np.linspace(-24.0, 24.0, 16)[:, np.newaxis] + 23.1
+    dist = np.linspace(180.0, 3500.0, 75)[np.newaxis, :]
+    el = 20.0
+    dpnt = geoPack.calcDistPnt(52.16, -106.53, 0.489, dist=dist, el=el,
+                               az=az)
+    assert dpnt['distLat'].shape == (16, 75)
+
+    for ib in [0, 7, 15]:
+        for ig in [0, 40, 74]:
+            spnt = geoPack.calcDistPnt(52.16, -106.53, 0.489,
+                                       dist=dist[0, ig], el=el, az=az[ib, 0])
+            for key in ['distLat', 'distLon', 'distAlt']:
+                assert np.isclose(dpnt[key][ib, ig], spnt[key], rtol=1.0e-12)
+
+    lat2, lon2 = geoPack.greatCircleMove(52.16, -106.53, dist, az)
+    assert lat2.shape == (16, 75) and lon2.shape == (16, 75)
+
+    # Lists are treated as arrays
+    glat, glon, rade = geoPack.geodToGeoc(list(_lat[:5]), list(_lon[:5]))
+    assert np.allclose(glat, geoPack.geodToGeoc(_lat[:5], _lon[:5])[0])
+    assert np.allclose(geoPack.greatCircleDist([0., 10.], [0., 0.],
+                                               [0., 0.], [0., 0.]),
+                       [0., np.radians(10.)])
+
+
+if __name__ == "__main__":
+    for name in ['test_geodToGeoc', 'test_geodToGeocAzEl', 'test_gspToGcar',
+                 'test_gcarToLcar', 'test_lspToLcar', 'test_calcDistPnt',
+                 'test_greatCircle', 'test_broadcast']:
+        globals()[name]()
+        print name, "passed"
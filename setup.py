@@ -42,6 +42,7 @@ exec_command.exec_command(command)
 # Fortran extensions
 #############################################################################
 hwm = Extension('hwm14', sources=['davitpy/models/hwm/hwm14.f90',
+                                  'davitpy/models/hwm/hwm14_batch.f90',
                                   'davitpy/models/hwm/hwm14.pyf'])
 igrf = Extension("igrf", sources=['davitpy/models/igrf/igrf11.f90',
                                   'davitpy/models/igrf/igrf11.pyf'])
@@ -53,12 +54,28 @@ iri = Extension('iri', sources=['davitpy/models/iri/irisub.for',
                                 'davitpy/models/iri/cira.for',
                                 'davitpy/models/iri/iridreg.for',
                                 'davitpy/models/iri/iri.pyf'])
+rtkernel = Extension('rtKernel',
+                     sources=['davitpy/models/raydarn/constants.f90',
+                              'davitpy/models/raydarn/raytrace.f90',
+                              'davitpy/models/raydarn/rtKernel.f90',
+                              'davitpy/models/iri/irisub.for',
+                              'davitpy/models/iri/irifun.for',
+                              'davitpy/models/iri/iriflip.for',
+                              'davitpy/models/iri/iritec.for',
+                              'davitpy/models/iri/igrf.for',
+                              'davitpy/models/iri/cira.for',
+                              'davitpy/models/iri/iridreg.for',
+                              'davitpy/models/raydarn/rtKernel.pyf'],
+                     extra_f77_compile_args=['-fno-automatic'],
+                     extra_f90_compile_args=['-fno-automatic'])
 msis = Extension("msisFort", sources=['davitpy/models/msis/nrlmsise00_sub.for',
+                                      'davitpy/models/msis/gtd7_batch.for',
                                       'davitpy/models/msis/nrlmsis.pyf'])
 tsyg = Extension('tsygFort',
                  sources=['davitpy/models/tsyganenko/T02.f',
                           'davitpy/models/tsyganenko/T96.f',
                           'davitpy/models/tsyganenko/geopack08.for',
+                          'davitpy/models/tsyganenko/trace_batch.for',
                           'davitpy/models/tsyganenko/geopack08.pyf'])
 
 #############################################################################
@@ -127,7 +144,7 @@ setup(name='davitpy',
       packages=find_packages(),
       long_description=read('README.md'),
       zip_safe=False,
-      ext_modules=[dmap, aacgm, tsyg, hwm, msis, igrf, iri],
+      ext_modules=[dmap, aacgm, tsyg, hwm, msis, igrf, iri, rtkernel],
       package_data={
         'davitpy.models.iri': ['*.dat', '*.asc', '*.txt'],
         'davitpy.models.hwm': ['*.dat']